@@ -0,0 +1,186 @@
+"""
+Semantic answer cache for the Document Q&A app
+Stores generated answers with their sources, keyed by the question embedding,
+the selected documents, the model, the retrieval configuration (retrieval and
+index mode, context budget...) and the documents' index generation. A new
+question whose embedding is close enough to a stored one gets the stored
+answer without retrieval or generation. Re-indexing a document bumps its
+generation, so answers based on the old content are never returned.
+"""
+
+import json
+import math
+import threading
+import time
+from typing import Dict, Iterable, List, Optional
+
+from langchain_core.documents import Document
+
+from embedding_cache import encode_vector, decode_vector, open_cache_db
+
+# SQLite file holding cached answers
+ANSWER_CACHE_PATH = "./answer_cache.sqlite3"
+
+# Minimum cosine similarity between question embeddings for a cache hit
+DEFAULT_SIMILARITY_THRESHOLD = 0.95
+
+# Cached answers kept in total, the oldest are evicted first
+DEFAULT_MAX_ENTRIES = 1000
+
+
+def cosine_similarity(a: List[float], b: List[float]) -> float:
+    """Cosine similarity of two vectors (0.0 if either is all zeros)"""
+    dot = sum(x * y for x, y in zip(a, b))
+    norm = math.sqrt(sum(x * x for x in a)) * math.sqrt(sum(y * y for y in b))
+    return dot / norm if norm else 0.0
+
+
+def selection_key(documents: Iterable[str]) -> str:
+    """Order-independent key for a set of selected documents"""
+    return json.dumps(sorted(set(documents)))
+
+
+def retrieval_key(retrieval: Optional[Dict]) -> str:
+    """Key for the settings deciding which context an answer was generated from"""
+    return json.dumps(retrieval or {}, sort_keys=True)
+
+
+class AnswerCache:
+    """Persistent cache of answers looked up by question similarity"""
+
+    def __init__(self, path: str = ANSWER_CACHE_PATH, threshold: float = DEFAULT_SIMILARITY_THRESHOLD,
+                 max_entries: int = DEFAULT_MAX_ENTRIES):
+        """
+        Args:
+            path: SQLite file holding the cache (":memory:" for a temporary cache)
+            threshold: Minimum cosine similarity for a hit
+            max_entries: Number of answers kept before the oldest are evicted
+        """
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._db = open_cache_db(path)
+        self._db.executescript(
+            "CREATE TABLE IF NOT EXISTS answers ("
+            "id INTEGER PRIMARY KEY, model TEXT NOT NULL, documents TEXT NOT NULL, generation TEXT NOT NULL, "
+            "question TEXT NOT NULL, embedding BLOB NOT NULL, answer TEXT NOT NULL, sources TEXT NOT NULL, "
+            "created_at REAL NOT NULL);"
+            "CREATE INDEX IF NOT EXISTS answers_scope ON answers (model, documents, generation);"
+            "CREATE TABLE IF NOT EXISTS generations (document TEXT PRIMARY KEY, generation INTEGER NOT NULL);"
+        )
+        # Caches created before answers were scoped by retrieval configuration lack the column,
+        # their answers get an empty configuration that no lookup asks for
+        columns = [row[1] for row in self._db.execute("PRAGMA table_info(answers)")]
+        if "retrieval" not in columns:
+            self._db.execute("ALTER TABLE answers ADD COLUMN retrieval TEXT NOT NULL DEFAULT ''")
+        self._db.commit()
+
+    def _generation_key(self, documents: str) -> str:
+        """Current index generation of each selected document, called with the lock held"""
+        names = json.loads(documents)
+        if not names:
+            return "{}"
+        generations = dict(self._db.execute(
+            f"SELECT document, generation FROM generations WHERE document IN ({','.join('?' * len(names))})", names
+        ).fetchall())
+        return json.dumps({name: generations.get(name, 0) for name in names}, sort_keys=True)
+
+    def lookup(self, embedding: List[float], documents: Iterable[str], model: str,
+               retrieval: Optional[Dict] = None) -> Optional[Dict]:
+        """
+        Find the stored answer to the most similar question.
+
+        Args:
+            embedding: Embedding of the new question
+            documents: Selected document names
+            model: Model that would generate the answer
+            retrieval: Settings deciding the answer's context, e.g. retrieval and
+                index mode; only answers stored with the same settings match
+
+        Returns:
+            Dictionary with answer, source_documents, question (the cached
+            question) and similarity, or None if no stored question is similar enough
+        """
+        documents = selection_key(documents)
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT question, embedding, answer, sources FROM answers "
+                "WHERE model = ? AND documents = ? AND generation = ? AND retrieval = ?",
+                (model, documents, self._generation_key(documents), retrieval_key(retrieval))
+            ).fetchall()
+
+            best = None
+            best_similarity = self.threshold
+            for question, blob, answer, sources in rows:
+                similarity = cosine_similarity(embedding, decode_vector(blob))
+                if similarity >= best_similarity:
+                    best, best_similarity = (question, answer, sources), similarity
+
+            if best is None:
+                self._misses += 1
+                return None
+            self._hits += 1
+
+        question, answer, sources = best
+        return {
+            "answer": answer,
+            "source_documents": [Document(page_content=s["page_content"], metadata=s["metadata"])
+                                 for s in json.loads(sources)],
+            "question": question,
+            "similarity": best_similarity
+        }
+
+    def store(self, question: str, embedding: List[float], documents: Iterable[str], model: str,
+              answer: str, source_documents: List[Document], retrieval: Optional[Dict] = None) -> None:
+        """Cache an answer and the chunks it was generated from, under its retrieval settings"""
+        documents = selection_key(documents)
+        sources = json.dumps([{"page_content": doc.page_content, "metadata": doc.metadata} for doc in source_documents])
+        with self._lock:
+            self._db.execute(
+                "INSERT INTO answers (model, documents, generation, question, embedding, answer, sources, created_at, "
+                "retrieval) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (model, documents, self._generation_key(documents), question, encode_vector(embedding),
+                 answer, sources, time.time(), retrieval_key(retrieval))
+            )
+            self._db.execute(
+                "DELETE FROM answers WHERE id NOT IN (SELECT id FROM answers ORDER BY id DESC LIMIT ?)",
+                (self.max_entries,)
+            )
+            self._db.commit()
+
+    def invalidate(self, documents: Iterable[str]) -> None:
+        """
+        Drop answers involving re-indexed documents and bump their generation.
+
+        Args:
+            documents: Names of the documents whose index changed
+        """
+        documents = list(dict.fromkeys(documents))
+        if not documents:
+            return
+        with self._lock:
+            self._db.executemany(
+                "INSERT INTO generations (document, generation) VALUES (?, 1) "
+                "ON CONFLICT (document) DO UPDATE SET generation = generation + 1",
+                [(name,) for name in documents]
+            )
+            self._db.execute(
+                "DELETE FROM answers WHERE EXISTS (SELECT 1 FROM json_each(answers.documents) "
+                f"WHERE json_each.value IN ({','.join('?' * len(documents))}))",
+                documents
+            )
+            self._db.commit()
+
+    def clear(self) -> None:
+        """Remove every cached answer"""
+        with self._lock:
+            self._db.execute("DELETE FROM answers")
+            self._db.commit()
+
+    def stats(self) -> Dict[str, int]:
+        """Return hits, misses and the number of stored answers"""
+        with self._lock:
+            entries = self._db.execute("SELECT COUNT(*) FROM answers").fetchone()[0]
+            return {"hits": self._hits, "misses": self._misses, "entries": entries}
@@ -1,45 +1,126 @@
+import time
+script_started = time.perf_counter()  # for the startup report in the sidebar
+
 import os
 import streamlit as st
 from dotenv import load_dotenv
-from langchain_anthropic import ChatAnthropic
-from langchain_ollama import OllamaLLM, OllamaEmbeddings
-from langchain_community.document_loaders import PyPDFLoader
-try:
-    import fitz  # PyMuPDF
-    PYMUPDF_AVAILABLE = True
-except ImportError:
-    PYMUPDF_AVAILABLE = False
-from langchain_chroma import Chroma
 from langchain_core.prompts import PromptTemplate
-from langchain_core.runnables import RunnablePassthrough
-from operator import itemgetter
 import tempfile
 import shutil
-import chromadb
-from chromadb.config import Settings
-from models_config import get_model_list, get_model_display_names, get_model_config, EMBEDDING_MODEL
+from concurrent.futures import ThreadPoolExecutor
+# Provider, Chroma and PDF loader modules are imported on first use with
+# timed_import, they take seconds to import and would delay the first render
+from startup_timing import timed_import, import_report, format_import_report
+from chroma_registry import ChromaRegistry
+from vector_backends import open_backend, default_persist_directory
+from document_catalog import DocumentCatalog, catalog_path, content_hash
+from models_config import (
+    get_model_list, get_model_display_names, get_model_config, get_residency_policies,
+    get_default_model, get_context_budget, EMBEDDING_MODEL
+)
+from model_residency import ModelResidencyManager, DEFAULT_MIN_FREE_MEMORY_MB, EMBEDDING, LLM
+from embedding_cache import CachedQueryEmbeddings, ChunkEmbeddingStore
+from ingestion import (
+    stream_documents_to_vectorstore, update_vectorstore_incrementally, DEFAULT_EMBED_BATCH_SIZE,
+    DEFAULT_EMBED_CONCURRENCY
+)
+from ingestion_jobs import IngestionQueue, DEFAULT_INGEST_WORKERS, FAILED
+from pdf_extraction import iter_pdf_pages, PYMUPDF_AVAILABLE
+from retrieval import MMRRetriever, HybridRetriever, DEFAULT_TOP_K, create_retrieve_once_chain, stream_retrieve_once
+from lexical_index import LexicalIndex
+from context_packing import pack_context
+from answer_cache import AnswerCache, DEFAULT_SIMILARITY_THRESHOLD
+from latency_tracing import trace, span, bind, format_trace_report, QUESTION
+from latency_callbacks import LatencyCallbackHandler
+from unified_index import (
+    create_filtered_retriever, list_indexed_sources, count_source_chunks,
+    legacy_collection_names, legacy_source_name, migrate_legacy_collections,
+    source_filter, UNIFIED_COLLECTION_NAME
+)
 
 # Load environment variables
 load_dotenv()
 
-# Chroma persistent directory
-CHROMA_PERSIST_DIR = "./chroma_db"
+# Vector backend: "chroma", or "flat" for exact search over memory-mapped embeddings
+# (see vector_backends.py), which is faster for collections of a few thousand chunks
+VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "chroma")
 
-# Helper function to create ChromaDB client with proper settings
-def get_chroma_client():
-    """Get a ChromaDB client with proper settings for Streamlit"""
+# Chroma persistent directory (each backend keeps its collections separately)
+CHROMA_PERSIST_DIR = default_persist_directory(VECTOR_BACKEND)
+
+# Index layout: "per_file" keeps one collection per document, "unified" stores every
+# chunk in a single collection and filters the selected documents by source metadata
+INDEX_MODE = os.getenv("INDEX_MODE", "per_file")
+
+# Retrieval: "hybrid" fuses vector and BM25 keyword rankings, "vector" or "lexical"
+# use one of them ("lexical" never calls the embedding model)
+RETRIEVAL_MODE = os.getenv("RETRIEVAL_MODE", "hybrid")
+
+# Seconds to wait for the vector search in hybrid mode before answering from
+# keyword results alone (the embedding model may be cold or overloaded)
+VECTOR_SEARCH_TIMEOUT = float(os.getenv("VECTOR_SEARCH_TIMEOUT", "10"))
+
+# Ingestion embedding batch size and number of concurrent embedding requests
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", DEFAULT_EMBED_BATCH_SIZE))
+EMBED_CONCURRENCY = int(os.getenv("EMBED_CONCURRENCY", DEFAULT_EMBED_CONCURRENCY))
+
+# Uploaded files processed at the same time by the background ingestion workers
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", DEFAULT_INGEST_WORKERS))
+
+# PDF text extraction processes per file; above 1, PDFs are extracted with PyMuPDF
+# across a process pool instead of with PyPDFLoader
+PDF_EXTRACT_WORKERS = int(os.getenv("PDF_EXTRACT_WORKERS", "1"))
+
+# Questions whose embedding has at least this cosine similarity to an earlier question
+# over the same documents and model are answered from the answer cache
+ANSWER_CACHE_THRESHOLD = float(os.getenv("ANSWER_CACHE_THRESHOLD", DEFAULT_SIMILARITY_THRESHOLD))
+
+# Load the embedding model and the default Ollama model in the background at startup
+OLLAMA_PRELOAD = os.getenv("OLLAMA_PRELOAD", "true").lower() in ("1", "true", "yes")
+
+# Models with the "pressure" residency policy are unloaded when available memory
+# drops below this many MB (see models_config.py for the per-model policies)
+OLLAMA_MIN_FREE_MEMORY_MB = float(os.getenv("OLLAMA_MIN_FREE_MEMORY_MB", DEFAULT_MIN_FREE_MEMORY_MB))
+
+# Seconds between sidebar refreshes while uploads are being processed
+INGEST_REFRESH_SECONDS = 1.0
+
+# Per-stage latency histograms of questions and ingests, in the Prometheus text format
+# (an empty METRICS_FILE disables writing them)
+METRICS_FILE = os.getenv("METRICS_FILE", "./metrics/document_qa.prom")
+METRICS_LABELS = {"app": "document_qa"}
+
+# Chroma client and vectorstore handles shared by every session
+@st.cache_resource
+def open_chroma_registry(persist_dir, backend="chroma"):
+    """Open the vector backend's client for a directory, once per server process"""
+    return ChromaRegistry(open_backend(backend, persist_dir))
+
+def get_chroma_registry():
+    """Get the shared Chroma registry for the persist directory"""
     # Ensure directory exists with proper permissions
     if not os.path.exists(CHROMA_PERSIST_DIR):
         os.makedirs(CHROMA_PERSIST_DIR, mode=0o777, exist_ok=True)
+    return open_chroma_registry(CHROMA_PERSIST_DIR, VECTOR_BACKEND)
 
-    # Create client with explicit settings
-    return chromadb.PersistentClient(
-        path=CHROMA_PERSIST_DIR,
-        settings=Settings(
-            allow_reset=True,
-            anonymized_telemetry=False
-        )
-    )
+# Helper function to get the ChromaDB client with proper settings
+def get_chroma_client():
+    """Get the shared ChromaDB client with proper settings for Streamlit"""
+    return get_chroma_registry().client
+
+def get_vector_backend():
+    """Get the shared vector backend every store, load and search goes through"""
+    return get_chroma_registry().backend
+
+# Indexed documents and their details, kept next to the Chroma directory
+@st.cache_resource
+def open_document_catalog(path):
+    """Open the document catalog, once per server process"""
+    return DocumentCatalog(path)
+
+def get_document_catalog():
+    """Get the document catalog for the persist directory"""
+    return open_document_catalog(catalog_path(CHROMA_PERSIST_DIR))
 
 # Initialize session state (must be done early, before sidebar)
 if "messages" not in st.session_state:
@@ -60,64 +141,197 @@ if "db_cleared" not in st.session_state:
 if "uploader_key" not in st.session_state:
     st.session_state.uploader_key = 0  # Counter to reset file uploader
 
-# Populate indexed_pdfs from database on first load (but not after clearing)
-if not st.session_state.indexed_pdfs and not st.session_state.db_cleared:
-    db_pdfs = []
-    try:
-        if os.path.exists(CHROMA_PERSIST_DIR):
-            client = get_chroma_client()
-            collections = client.list_collections()
-            for collection in collections:
-                if collection.name.startswith("pdf_"):
-                    pdf_name = collection.name.replace("pdf_", "").replace("_", " ") + ".pdf"
-                    db_pdfs.append(pdf_name)
-                elif collection.name.startswith("md_"):
-                    md_name = collection.name.replace("md_", "").replace("_", " ") + ".md"
-                    db_pdfs.append(md_name)
-    except:
-        pass
-    st.session_state.indexed_pdfs = db_pdfs
-    # Also set selected_pdfs to all indexed PDFs by default
-    st.session_state.selected_pdfs = db_pdfs.copy()
+if "recently_uploaded" not in st.session_state:
+    st.session_state.recently_uploaded = []  # Files to show upload notifications for
+
+if "upload_hashes" not in st.session_state:
+    st.session_state.upload_hashes = {}  # Content hash per uploaded file id, to spot revised files
+
+if "ingestion_queue" not in st.session_state:
+    # Uploads are processed in background threads so the app stays usable
+    st.session_state.ingestion_queue = IngestionQueue(
+        max_workers=INGEST_WORKERS, metrics_path=METRICS_FILE, metrics_labels=METRICS_LABELS
+    )
+
+if "ingest_timings" not in st.session_state:
+    st.session_state.ingest_timings = {}  # Stage timings of the files ingested in this session
+
+if "legacy_collections" not in st.session_state:
+    # Per-file collections waiting to be migrated into the unified collection
+    st.session_state.legacy_collections = []
+    if INDEX_MODE == "unified" and os.path.exists(CHROMA_PERSIST_DIR):
+        try:
+            st.session_state.legacy_collections = legacy_collection_names(get_vector_backend())
+        except Exception:
+            pass
+
+# Keyword index shared by every session
+@st.cache_resource
+def get_lexical_index():
+    """Open the persistent BM25 index"""
+    return LexicalIndex()
+
+# Answers to earlier questions shared by every session
+@st.cache_resource
+def get_answer_cache():
+    """Open the persistent semantic answer cache"""
+    return AnswerCache(threshold=ANSWER_CACHE_THRESHOLD)
+
+# Ollama keep-alive policies and load/inference timings shared by every session
+@st.cache_resource
+def get_residency_manager():
+    """Create the model residency manager, once per server process"""
+    return ModelResidencyManager(get_residency_policies(), min_free_memory_mb=OLLAMA_MIN_FREE_MEMORY_MB)
+
+@st.cache_resource
+def preload_models():
+    """Load the embedding model and the default Ollama model in the background, once per server process"""
+    models = [(EMBEDDING_MODEL["name"], EMBEDDING)]
+    default_config = get_model_config(get_default_model())
+    if default_config and default_config["provider"] == "ollama":
+        models.append((default_config["name"], LLM))
+    return get_residency_manager().preload_in_background(models)
+
+# Documents indexed before the document catalog existed are found by scanning Chroma once
+def find_indexed_documents(backend, pending=()):
+    """Return catalog entries for the documents stored in the vector backend, skipping pending uploads"""
+    if INDEX_MODE == "unified":
+        # File names are stored verbatim in the chunks' source metadata
+        return [
+            {"file_name": name, "collection_name": UNIFIED_COLLECTION_NAME,
+             "chunk_count": count_source_chunks(backend, name)}
+            for name in list_indexed_sources(backend) if name not in pending
+        ]
+
+    pending_collections = {get_collection_name(name) for name in pending}
+    entries = []
+    for collection_name in legacy_collection_names(backend):
+        if collection_name in pending_collections:
+            continue
+        # Chunks carry the original file name, the collection name lost its spaces and dots
+        first = backend.get(collection_name, limit=1)
+        file_name = first[0]["metadata"].get("source") if first else None
+        entries.append({
+            "file_name": file_name or legacy_source_name(collection_name),
+            "collection_name": collection_name,
+            "chunk_count": backend.count(collection_name)
+        })
+    return entries
+
+# One-line summary of a document for the sidebar
+def describe_catalog_entry(entry):
+    """Describe a catalog entry's chunks, pages, size and indexing date"""
+    parts = [f"{entry['chunk_count']} chunks"]
+    if entry["page_count"]:
+        parts.append(f"{entry['page_count']} pages")
+    if entry["byte_size"]:
+        parts.append(f"{entry['byte_size'] / 1024:.0f} KB")
+    parts.append(f"indexed {time.strftime('%Y-%m-%d %H:%M', time.localtime(entry['last_indexed_at']))}")
+    return " · ".join(parts)
 
 # Helper function to get all indexed PDFs
 def get_indexed_pdfs_from_chroma():
-    """Get list of all PDF and Markdown collections in Chroma database"""
+    """Get list of all PDF and Markdown documents in the document catalog"""
     try:
         if os.path.exists(CHROMA_PERSIST_DIR):
-            client = get_chroma_client()
-            collections = client.list_collections()
-            # Extract file names from collection names (format: pdf_filename or md_filename)
-            file_names = []
-            for collection in collections:
-                if collection.name.startswith("pdf_"):
-                    # Convert collection name back to PDF filename
-                    file_name = collection.name.replace("pdf_", "").replace("_", " ") + ".pdf"
-                    file_names.append(file_name)
-                elif collection.name.startswith("md_"):
-                    # Convert collection name back to Markdown filename
-                    file_name = collection.name.replace("md_", "").replace("_", " ") + ".md"
-                    file_names.append(file_name)
-            return file_names
+            catalog = get_document_catalog()
+            # Documents still being ingested in the background, or whose ingest was
+            # interrupted, are not ready yet
+            pending = {job.name for job in st.session_state.ingestion_queue.jobs() if not job.finished}
+            pending.update(entry["file_name"] for entry in catalog.unfinished_ingests())
+            if not catalog.imported(INDEX_MODE):
+                catalog.import_existing(find_indexed_documents(get_vector_backend(), pending), INDEX_MODE)
+            # Entries of the other index layout (e.g. not yet migrated) are not searchable
+            return [
+                entry["file_name"] for entry in catalog.documents()
+                if entry["collection_name"] == get_collection_name(entry["file_name"])
+                and entry["file_name"] not in pending
+            ]
         return []
     except Exception as e:
         return []
 
+# Helper function to get the collection holding a document's chunks
+def get_collection_name(file_name):
+    """Get the Chroma collection name for a PDF or Markdown file in the configured index mode"""
+    if INDEX_MODE == "unified":
+        return UNIFIED_COLLECTION_NAME
+    if file_name.endswith('.pdf'):
+        return f"pdf_{file_name.replace('.pdf', '').replace(' ', '_').replace('.', '_')}"
+    elif file_name.endswith('.md'):
+        return f"md_{file_name.replace('.md', '').replace(' ', '_').replace('.', '_')}"
+    return None
+
+# Helper function to open the vectorstore holding a document's chunks
+def open_vectorstore(file_name, embeddings, registry):
+    """Get the shared Chroma vectorstore handle for a document"""
+    return registry.vectorstore(get_collection_name(file_name), embeddings)
+
+# Helper function to count the chunks already stored for a document
+def get_document_chunk_count(file_name, registry):
+    """Get the number of chunks indexed for a document"""
+    where = source_filter([file_name]) if INDEX_MODE == "unified" else None
+    return registry.backend.count(get_collection_name(file_name), where=where)
+
+# Populate indexed_pdfs from database on first load (but not after clearing)
+if not st.session_state.indexed_pdfs and not st.session_state.db_cleared:
+    db_pdfs = get_indexed_pdfs_from_chroma()
+    st.session_state.indexed_pdfs = db_pdfs
+    # Also set selected_pdfs to all indexed PDFs by default
+    st.session_state.selected_pdfs = db_pdfs.copy()
+
+# Move documents finished by the background ingestion workers into the session
+def collect_ingested_files():
+    """Add documents whose ingestion jobs have finished to this session, returns True if any were added"""
+    added = False
+    for job in st.session_state.ingestion_queue.collect_finished():
+        # The worker already recorded the document in the catalog
+        if job.timings:
+            st.session_state.ingest_timings[job.name] = job.timings
+        st.session_state.vectorstores[job.name] = job.result
+        if job.name not in st.session_state.indexed_pdfs:
+            st.session_state.indexed_pdfs.append(job.name)
+
+        # Add to selected PDFs automatically
+        if job.name not in st.session_state.selected_pdfs:
+            st.session_state.selected_pdfs.append(job.name)
+
+        # Add to recently uploaded for fade-out display
+        if job.name not in st.session_state.recently_uploaded:
+            st.session_state.recently_uploaded.append(job.name)
+        added = True
+    return added
+
+collect_ingested_files()
+
 # Helper function to clear database
 def clear_chroma_database():
     """Clear all data from Chroma database by deleting collections, not the database itself"""
     try:
+        # Cached answers are based on the chunks being deleted
+        get_answer_cache().clear()
         if os.path.exists(CHROMA_PERSIST_DIR):
-            # Get the client and delete all collections
-            client = get_chroma_client()
-            collections = client.list_collections()
+            # Get the shared registry and delete all collections with their handles
+            registry = get_chroma_registry()
+            collection_names = registry.backend.collection_names()
 
             # Delete each collection
-            for collection in collections:
+            deleted = set()
+            for collection_name in collection_names:
                 try:
-                    client.delete_collection(name=collection.name)
+                    registry.delete_collection(collection_name)
+                    deleted.add(collection_name)
                 except Exception as e:
-                    st.warning(f"Could not delete collection {collection.name}: {str(e)}")
+                    st.warning(f"Could not delete collection {collection_name}: {str(e)}")
+
+            # Documents whose collection could not be deleted stay in the catalog
+            catalog = get_document_catalog()
+            for entry in catalog.documents():
+                if entry["collection_name"] in deleted:
+                    catalog.remove(entry["file_name"])
+            for entry in catalog.unfinished_ingests():
+                if entry["collection_name"] in deleted:
+                    catalog.discard_ingest(entry["file_name"])
 
             return True
         else:
@@ -135,6 +349,10 @@ st.set_page_config(
     layout="wide"
 )
 
+# Only a running Streamlit server preloads models, not an import by the tests or benchmarks
+if OLLAMA_PRELOAD and st.runtime.exists():
+    preload_models()
+
 st.title("📄 Question & Answer Assistant")
 st.markdown("Upload a document and ask questions about its content!")
 
@@ -163,6 +381,18 @@ with st.sidebar:
     if model_config and model_config.get("description"):
         st.caption(model_config["description"])
 
+    retrieval_modes = {
+        "hybrid": "Hybrid (vector + keyword)",
+        "vector": "Vector",
+        "lexical": "Keyword only (no embedding)"
+    }
+    retrieval_mode = st.selectbox(
+        "Retrieval",
+        list(retrieval_modes),
+        index=list(retrieval_modes).index(RETRIEVAL_MODE) if RETRIEVAL_MODE in retrieval_modes else 0,
+        format_func=retrieval_modes.get
+    )
+
     st.markdown("---")
 
     # Indexed PDFs Section
@@ -187,14 +417,21 @@ with st.sidebar:
             )
             st.session_state.selected_pdfs = selected
 
-        # List all indexed PDFs
+        # List all indexed PDFs with their details from the document catalog
         with st.expander("View all indexed documents"):
+            catalog_entries = {entry["file_name"]: entry for entry in get_document_catalog().documents()}
             for pdf in indexed_pdfs:
                 st.markdown(f"• {pdf}")
+                entry = catalog_entries.get(pdf)
+                if entry:
+                    st.caption(describe_catalog_entry(entry))
 
         # Clear database button
         st.markdown("---")
-        if st.button("🗑️ Clear Database", type="secondary"):
+        # Workers still writing to Chroma would recreate cleared collections
+        uploads_pending = st.session_state.ingestion_queue.has_pending()
+        if st.button("🗑️ Clear Database", type="secondary", disabled=uploads_pending,
+                     help="Wait for uploads to finish" if uploads_pending else None):
             if st.session_state.get("confirm_clear", False):
                 # Clear session state first
                 st.session_state.vectorstores = {}
@@ -205,8 +442,12 @@ with st.sidebar:
                 st.session_state.confirm_clear = False
                 st.session_state.db_cleared = True  # Mark that DB was cleared
                 st.session_state.uploader_key += 1  # Reset file uploader
+                st.session_state.legacy_collections = []
+                st.session_state.ingest_timings = {}
+                st.session_state.ingestion_queue.clear_failed()
 
-                # Then clear the database
+                # Then clear the database (with the answers based on it) and the keyword index
+                get_lexical_index().clear()
                 if clear_chroma_database():
                     st.success("Database cleared successfully!")
                 else:
@@ -219,6 +460,60 @@ with st.sidebar:
     else:
         st.info("No documents indexed yet")
 
+    # Background ingestion status, refreshed while files are being processed
+    def show_ingestion_status():
+        ingestion_queue = st.session_state.ingestion_queue
+        if collect_ingested_files():
+            # Rerun the whole app so finished documents become selectable
+            st.rerun()
+
+        jobs = ingestion_queue.jobs()
+        if not jobs:
+            return
+
+        st.markdown("---")
+        st.markdown("### ⏳ Processing Uploads")
+        for job in jobs:
+            if job.status == FAILED:
+                st.error(f"{job.name}: {job.error}")
+            else:
+                st.progress(job.progress_fraction(), text=f"{job.name} · {job.describe()}")
+                if job.messages:
+                    st.caption(job.messages[-1][1])
+
+        if any(job.status == FAILED for job in jobs):
+            if st.button("Clear failed uploads"):
+                ingestion_queue.clear_failed()
+                st.session_state.uploader_key += 1  # Reset file uploader so files can be re-added
+                st.rerun()
+
+    refresh = INGEST_REFRESH_SECONDS if st.session_state.ingestion_queue.has_pending() else None
+    st.fragment(show_ingestion_status, run_every=refresh)()
+
+    # Offer to move per-file collections into the unified collection
+    if st.session_state.legacy_collections:
+        st.markdown("---")
+        st.info(f"{len(st.session_state.legacy_collections)} per-file collection(s) can be migrated to the unified index")
+        if st.button("📦 Migrate to unified index"):
+            with st.spinner("Migrating collections..."):
+                try:
+                    migrated = migrate_legacy_collections(get_vector_backend())
+                    # Migrated collections were deleted and the unified one was filled
+                    get_chroma_registry().clear()
+                    # Point the migrated documents' catalog entries at the unified collection
+                    catalog = get_document_catalog()
+                    unfinished = [entry["file_name"] for entry in catalog.unfinished_ingests()]
+                    catalog.import_existing(find_indexed_documents(get_vector_backend(), unfinished), INDEX_MODE)
+                    st.session_state.legacy_collections = []
+                    # Reload documents and vectorstores from the unified collection
+                    st.session_state.vectorstores = {}
+                    st.session_state.indexed_pdfs = get_indexed_pdfs_from_chroma()
+                    st.session_state.selected_pdfs = st.session_state.indexed_pdfs.copy()
+                    st.success(f"Migrated {len(migrated)} collection(s)")
+                    st.rerun()
+                except Exception as e:
+                    st.error(f"Error migrating collections: {str(e)}")
+
     st.markdown("---")
     st.markdown("### About")
     st.markdown("This app uses RAG (Retrieval-Augmented Generation) to answer questions about your documents.")
@@ -228,35 +523,33 @@ with st.sidebar:
     st.markdown("4. Ask questions!")
 
 # Extract text from image-based PDFs using PyMuPDF
+def iter_pages_with_pymupdf(pdf_path, filename):
+    """Yield PDF pages one at a time using PyMuPDF (better for image-based PDFs)"""
+    # Large PDFs are split across PDF_EXTRACT_WORKERS processes
+    return iter_pdf_pages(pdf_path, filename, workers=PDF_EXTRACT_WORKERS)
+
 def extract_text_with_pymupdf(pdf_path, filename):
     """Extract text from PDF using PyMuPDF (better for image-based PDFs)"""
-    from langchain_core.documents import Document
-    
-    doc = fitz.open(pdf_path)
-    pages = []
-    
-    for page_num in range(len(doc)):
-        page = doc[page_num]
-        text = page.get_text()
-        
-        # Create a LangChain Document for each page
-        pages.append(Document(
-            page_content=text,
-            metadata={
-                "source": filename,
-                "page": page_num
-            }
-        ))
-    
-    doc.close()
-    return pages
+    return list(iter_pages_with_pymupdf(pdf_path, filename))
 
 # Initialize model and embeddings
 @st.cache_resource
 def get_model_and_embeddings(model_name):
     """Initialize the language model and embeddings"""
-    # Get embeddings from config
-    embeddings = OllamaEmbeddings(model=EMBEDDING_MODEL["name"], keep_alive=0)
+    # How long each Ollama model stays loaded comes from its residency policy
+    residency = get_residency_manager()
+
+    # Get embeddings from config, caching query embeddings across sessions and restarts
+    # and reusing stored chunk embeddings when the same text is ingested again
+    langchain_ollama = timed_import("langchain_ollama")
+    embeddings = CachedQueryEmbeddings(
+        langchain_ollama.OllamaEmbeddings(
+            model=EMBEDDING_MODEL["name"],
+            keep_alive=residency.keep_alive(EMBEDDING_MODEL["name"], EMBEDDING)
+        ),
+        model_name=EMBEDDING_MODEL["name"],
+        chunk_store=ChunkEmbeddingStore()
+    )
 
     # Get model configuration
     model_config = get_model_config(model_name)
@@ -268,241 +561,460 @@ def get_model_and_embeddings(model_name):
         if not api_key:
             st.error("⚠️ ANTHROPIC_API_KEY not found in environment variables. Please add it to your .env file.")
             st.stop()
-        model = ChatAnthropic(model=model_name, anthropic_api_key=api_key)
+        ChatAnthropic = timed_import("langchain_anthropic").ChatAnthropic
+        model = ChatAnthropic(model=model_name, anthropic_api_key=api_key, callbacks=[LatencyCallbackHandler()])
     elif provider == "ollama":
-        # keep_alive=0 unloads the model from GPU memory immediately after use
-        model = OllamaLLM(model=model_name, keep_alive=0)
+        # The callbacks free memory held by other models under pressure, record how
+        # much of each request was spent loading the model and time the answer's stages
+        model = langchain_ollama.OllamaLLM(
+            model=model_name,
+            keep_alive=residency.keep_alive(model_name, LLM),
+            callbacks=[residency.callback_handler(model_name), LatencyCallbackHandler()]
+        )
     else:
         st.error(f"⚠️ Unknown provider: {provider}. Please update the get_model_and_embeddings function in app.py.")
         st.stop()
 
     return model, embeddings
 
-# Process markdown files
-def process_markdown(uploaded_file):
-    """Process uploaded Markdown file and create vector store"""
+# Split, embed and store pages in Chroma
+def ingest_pages(pages, text_splitter, collection_name, embeddings, registry, job, lexical_index, catalog, file_hash):
+    """Stream pages through splitting, batched embedding and storage, reporting progress on the job"""
+    vectorstore = registry.vectorstore(collection_name, embeddings)
+
+    # Chunks stored by an interrupted ingest of the same file are not embedded again
+    previous = catalog.unfinished_ingest(job.name)
+    resume = previous is not None and previous["content_hash"] == file_hash
+    catalog.start_ingest(job.name, collection_name, file_hash)
+    stored = 0
+
+    def store_batch(docs, ids):
+        nonlocal stored
+        # Keyword index is built alongside the vectors, under the uploaded file name
+        with span("keyword_index"):
+            lexical_index.add_documents(docs, ids, document_name=job.name)
+        stored += len(docs)
+        catalog.checkpoint(job.name, stored)
+
+    stats = stream_documents_to_vectorstore(
+        registry.backend,
+        collection_name,
+        embeddings,
+        pages,
+        text_splitter,
+        batch_size=EMBED_BATCH_SIZE,
+        max_concurrency=EMBED_CONCURRENCY,
+        progress_callback=job.report_progress,
+        on_stored=store_batch,
+        file_hash=file_hash,
+        resume=resume
+    )
+    if stats["resumed"]:
+        job.log(f"⏯️ Resumed interrupted ingest: {stats['resumed']} chunks were already stored")
+
+    return vectorstore, stats
+
+# Replace the temp file path in page metadata with the uploaded file name
+def set_page_source(pages, filename):
+    """Yield pages with their source metadata set to the original filename"""
+    for page in pages:
+        page.metadata['source'] = filename
+        yield page
+
+# Remove a collection left empty by a failed ingest
+def discard_empty_collection(file_name, registry, catalog):
+    """Delete a per-file collection that ended up without chunks, and its ingest checkpoint"""
+    catalog.discard_ingest(file_name)
+    if INDEX_MODE == "unified":
+        return
+    try:
+        registry.delete_collection(get_collection_name(file_name))
+    except Exception:
+        pass
+
+# Remove the chunks of a document, e.g. ones left by an interrupted ingest
+def discard_document_chunks(file_name, registry, lexical_index):
+    """Delete a document's chunks from the vector backend and the keyword index"""
+    if INDEX_MODE == "unified":
+        registry.backend.delete(UNIFIED_COLLECTION_NAME, where=source_filter([file_name]))
+    else:
+        registry.delete_collection(get_collection_name(file_name))
+    lexical_index.delete_document(file_name)
+
+# Add chunks stored before keyword search existed to the lexical index
+def backfill_lexical_index(file_name, registry, lexical_index):
+    """Index a document's stored chunks for keyword search, returns the number of chunks"""
+    where = source_filter([file_name]) if INDEX_MODE == "unified" else None
+    return lexical_index.backfill_from_collection(
+        registry.backend, get_collection_name(file_name), file_name, where=where
+    )
+
+# Open a document's collection if it has already been indexed
+def load_existing_vectorstore(file_name, file_hash, embeddings, registry, lexical_index, catalog, job):
+    """Return (vectorstore, chunk_count) for a completely indexed document, or (None, 0)"""
+    try:
+        with span("open_collection"):
+            vectorstore = open_vectorstore(file_name, embeddings, registry)
+            collection_count = get_document_chunk_count(file_name, registry)
+    except Exception:
+        # Collection doesn't exist yet, we'll create it
+        return None, 0
+    if collection_count == 0:
+        return None, 0
+    checkpoint = catalog.unfinished_ingest(file_name)
+    if checkpoint is None:
+        return vectorstore, collection_count
+
+    # A partially filled collection is never treated as finished: an interrupted ingest
+    # of the same file is resumed, chunks of another version are deleted first
+    if checkpoint["content_hash"] != file_hash or checkpoint["collection_name"] != get_collection_name(file_name):
+        job.log(f"Discarding {collection_count} chunks left by an interrupted ingest of another version",
+                level="warning")
+        discard_document_chunks(file_name, registry, lexical_index)
+        catalog.discard_ingest(file_name)
+    return None, 0
+
+# Re-index a revised version of an indexed document
+def update_document(chunks, file_name, file_hash, embeddings, registry, job, lexical_index):
+    """Replace a document's stored chunks, embedding only those whose text is new, returns the change counts"""
+    where = source_filter([file_name]) if INDEX_MODE == "unified" else None
+    changes = update_vectorstore_incrementally(
+        registry.backend,
+        get_collection_name(file_name),
+        embeddings,
+        chunks,
+        where=where,
+        batch_size=EMBED_BATCH_SIZE,
+        max_concurrency=EMBED_CONCURRENCY,
+        progress_callback=job.report_progress,
+        file_hash=file_hash
+    )
+    # Chunk ids changed, so the keyword index is rebuilt from the stored chunks (no embedding needed)
+    lexical_index.delete_document(file_name)
+    backfill_lexical_index(file_name, registry, lexical_index)
+    job.log(
+        f"♻️ Updated {file_name}: {changes['added']} new, {changes['deleted']} removed, "
+        f"{changes['moved']} moved and {changes['unchanged']} unchanged chunks"
+    )
+    return changes
+
+# Whether an in-place update wrote any chunks
+def chunks_changed(changes):
+    """True if update_document added, moved or deleted chunks"""
+    return bool(changes["added"] or changes["moved"] or changes["deleted"])
+
+# Details of an uploaded file recorded in the document catalog
+def document_details(data, chunk_count, page_count=None):
+    """Return the catalog fields of an ingested file besides its name and collection"""
+    return {
+        "chunk_count": chunk_count,
+        "content_hash": content_hash(data),
+        "byte_size": len(data),
+        "page_count": page_count
+    }
+
+# Process markdown files (runs in an ingestion worker thread, so no Streamlit calls)
+def process_markdown(job, file_name, data, embeddings, registry, lexical_index, catalog, update_existing=False):
+    """Process an uploaded Markdown file and create or update its vector store, returns (vectorstore, catalog details, chunks written)"""
     from langchain_core.documents import Document
     from langchain_text_splitters import RecursiveCharacterTextSplitter
 
     # Generate collection name from file name
-    collection_name = f"md_{uploaded_file.name.replace('.md', '').replace(' ', '_').replace('.', '_')}"
+    collection_name = get_collection_name(file_name)
 
-    # Get embeddings
-    _, embeddings = get_model_and_embeddings(model_choice)
+    # Try to load existing collection first (a revised version updates it instead)
+    file_hash = content_hash(data)
+    vectorstore, collection_count = load_existing_vectorstore(
+        file_name, file_hash, embeddings, registry, lexical_index, catalog, job
+    )
+    if vectorstore is not None and not update_existing:
+        if file_name not in lexical_index.documents():
+            backfill_lexical_index(file_name, registry, lexical_index)
+        job.log(f"📚 Loaded existing collection with {collection_count} chunks")
+        return vectorstore, document_details(data, collection_count), False
+
+    # Read the markdown content
+    content = data.decode('utf-8')
+
+    job.log(f"Loaded markdown file with {len(content)} characters")
+
+    # Create a document
+    doc = Document(
+        page_content=content,
+        metadata={
+            "source": file_name
+        }
+    )
 
-    # Get ChromaDB client
-    client = get_chroma_client()
+    # Split the document into chunks for better retrieval
+    text_splitter = RecursiveCharacterTextSplitter(
+        chunk_size=1000,
+        chunk_overlap=200,
+        length_function=len,
+        add_start_index=True,  # lets the context packer merge neighbouring chunks
+    )
 
-    # Try to load existing collection first
-    try:
-        vectorstore = Chroma(
-            collection_name=collection_name,
-            embedding_function=embeddings,
-            persist_directory=CHROMA_PERSIST_DIR,
-            client=client
-        )
-        
-        # Check if collection has documents
-        collection_count = vectorstore._collection.count()
-        if collection_count > 0:
-            st.info(f"📚 Loaded existing collection with {collection_count} chunks")
-            return vectorstore, collection_count
-    except Exception as e:
-        # Collection doesn't exist yet, we'll create it
-        pass
-    
-    # Process new markdown file
-    with st.spinner("Processing Markdown file..."):
-        # Read the markdown content
-        content = uploaded_file.getvalue().decode('utf-8')
-        
-        st.info(f"Loaded markdown file with {len(content)} characters")
-        
-        # Create a document
-        doc = Document(
-            page_content=content,
-            metadata={
-                "source": uploaded_file.name
-            }
-        )
-        
-        # Split the document into chunks for better retrieval
-        text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=1000,
-            chunk_overlap=200,
-            length_function=len,
-        )
+    if vectorstore is not None:
+        # Revised version of an indexed file: only chunks with new text are embedded
         chunks = text_splitter.split_documents([doc])
-        
-        st.info(f"Split into {len(chunks)} chunks")
-        
-        # Create vector store with Chroma (persistent)
-        st.info("Creating embeddings and storing in database...")
-        vectorstore = Chroma.from_documents(
-            documents=chunks,
-            embedding=embeddings,
-            persist_directory=CHROMA_PERSIST_DIR,
-            collection_name=collection_name,
-            client=client
-        )
+        if not chunks:
+            raise ValueError("No text content found in the revised Markdown file, the indexed version was kept.")
+        changes = update_document(chunks, file_name, file_hash, embeddings, registry, job, lexical_index)
+        return vectorstore, document_details(data, len(chunks)), chunks_changed(changes)
+
+    # Split, embed and store with Chroma (persistent)
+    vectorstore, stats = ingest_pages(
+        [doc], text_splitter, collection_name, embeddings, registry, job, lexical_index, catalog, file_hash
+    )
 
-        return vectorstore, len(chunks)
+    if stats["chunks"] == 0:
+        discard_empty_collection(file_name, registry, catalog)
+        raise ValueError("No text content found in the Markdown file.")
 
-# Load and process PDF
-def process_pdf(uploaded_file):
-    """Process uploaded PDF and create vector store"""
+    job.log(f"Split into {stats['chunks']} chunks")
+    return vectorstore, document_details(data, stats["chunks"]), True
+
+# Load and process PDF (runs in an ingestion worker thread, so no Streamlit calls)
+def process_pdf(job, file_name, data, embeddings, registry, lexical_index, catalog, update_existing=False):
+    """Process an uploaded PDF and create or update its vector store, returns (vectorstore, catalog details, chunks written)"""
     from langchain_text_splitters import RecursiveCharacterTextSplitter
-    
+
     # Generate collection name from file name
-    collection_name = f"pdf_{uploaded_file.name.replace('.pdf', '').replace(' ', '_').replace('.', '_')}"
+    collection_name = get_collection_name(file_name)
 
-    # Get embeddings
-    _, embeddings = get_model_and_embeddings(model_choice)
+    # Try to load existing collection first (a revised version updates it instead)
+    file_hash = content_hash(data)
+    vectorstore, collection_count = load_existing_vectorstore(
+        file_name, file_hash, embeddings, registry, lexical_index, catalog, job
+    )
+    if vectorstore is not None and not update_existing:
+        if file_name not in lexical_index.documents():
+            backfill_lexical_index(file_name, registry, lexical_index)
+        job.log(f"📚 Loaded existing collection with {collection_count} documents")
+        return vectorstore, document_details(data, collection_count), False
 
-    # Get ChromaDB client
-    client = get_chroma_client()
+    # Save uploaded file temporarily
+    with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as tmp_file:
+        tmp_file.write(data)
+        tmp_path = tmp_file.name
 
-    # Try to load existing collection first
     try:
-        vectorstore = Chroma(
-            collection_name=collection_name,
-            embedding_function=embeddings,
-            persist_directory=CHROMA_PERSIST_DIR,
-            client=client
+        # Split documents into chunks for better retrieval
+        # This is crucial for RAG to work well with large documents
+        text_splitter = RecursiveCharacterTextSplitter(
+            chunk_size=1000,
+            chunk_overlap=200,
+            length_function=len,
+            add_start_index=True,  # lets the context packer merge neighbouring chunks
         )
 
-        # Check if collection has documents
-        collection_count = vectorstore._collection.count()
-        if collection_count > 0:
-            st.info(f"📚 Loaded existing collection with {collection_count} documents")
-            return vectorstore, collection_count
-    except Exception as e:
-        # Collection doesn't exist yet, we'll create it
-        pass
-
-    # Process new PDF
-    with st.spinner("Processing PDF..."):
-        # Save uploaded file temporarily
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as tmp_file:
-            tmp_file.write(uploaded_file.getvalue())
-            tmp_path = tmp_file.name
-
-        try:
-            # Load PDF - use load() instead of load_and_split() for better reliability
+        # Stream pages from the PDF: each page is split, embedded and stored
+        # while the next ones are still being extracted
+        if PYMUPDF_AVAILABLE and PDF_EXTRACT_WORKERS > 1:
+            # Parallel extraction for large, extraction-bound documents
+            extractor = "PyMuPDF"
+            pages = iter_pages_with_pymupdf(tmp_path, file_name)
+        else:
+            extractor = "PyPDFLoader"
+            PyPDFLoader = timed_import("langchain_community.document_loaders").PyPDFLoader
             loader = PyPDFLoader(tmp_path)
-            pages = loader.load()
-
-            # Debug: Check if pages were loaded
-            st.info(f"Loaded {len(pages)} pages from PDF")
-            if len(pages) == 0:
-                st.error("No pages extracted from PDF. The PDF might be image-based or corrupted.")
-                return None, 0
-
-            # Check if pages have content
-            total_chars = sum(len(page.page_content) for page in pages)
-            st.info(f"Total text extracted with PyPDFLoader: {total_chars} characters")
-
-            # If no text extracted, try PyMuPDF as fallback
-            if total_chars == 0:
-                if PYMUPDF_AVAILABLE:
-                    st.warning("⚠️ PyPDFLoader extracted no text. Trying PyMuPDF...")
-                    pages = extract_text_with_pymupdf(tmp_path, uploaded_file.name)
-                    total_chars = sum(len(page.page_content) for page in pages)
-                    st.info(f"Total text extracted with PyMuPDF: {total_chars} characters")
-                    
-                    if total_chars == 0:
-                        st.error("No text content found with either method. The PDF might be image-based and requires OCR.")
-                        return None, 0
-                else:
-                    st.error("No text content found. Install PyMuPDF for better PDF support: pip install pymupdf")
-                    return None, 0
-            else:
-                # Update metadata to use actual filename instead of temp file path
-                for page in pages:
-                    page.metadata['source'] = uploaded_file.name
-
-            # Split documents into chunks for better retrieval
-            # This is crucial for RAG to work well with large documents
-            text_splitter = RecursiveCharacterTextSplitter(
-                chunk_size=1000,
-                chunk_overlap=200,
-                length_function=len,
-            )
+            pages = set_page_source(loader.lazy_load(), file_name)
+
+        if vectorstore is not None:
+            # Revised version of an indexed file: only chunks with new text are embedded
+            pages = list(pages)
             chunks = text_splitter.split_documents(pages)
-            
-            st.info(f"Split into {len(chunks)} chunks for better retrieval")
-
-            # Create vector store with Chroma (persistent)
-            st.info("Creating embeddings and storing in database...")
-            vectorstore = Chroma.from_documents(
-                documents=chunks,
-                embedding=embeddings,
-                persist_directory=CHROMA_PERSIST_DIR,
-                collection_name=collection_name,
-                client=client
+            if not chunks and extractor == "PyPDFLoader" and PYMUPDF_AVAILABLE:
+                job.log("⚠️ PyPDFLoader extracted no text. Trying PyMuPDF...", level="warning")
+                pages = list(iter_pages_with_pymupdf(tmp_path, file_name))
+                chunks = text_splitter.split_documents(pages)
+            if not chunks:
+                raise ValueError("No text content found in the revised PDF, the indexed version was kept.")
+            changes = update_document(chunks, file_name, file_hash, embeddings, registry, job, lexical_index)
+            return vectorstore, document_details(data, len(chunks), page_count=len(pages)), chunks_changed(changes)
+
+        vectorstore, stats = ingest_pages(
+            pages, text_splitter, collection_name, embeddings, registry, job, lexical_index, catalog, file_hash
+        )
+
+        job.log(f"Loaded {stats['pages']} pages from PDF")
+        if stats["pages"] == 0:
+            discard_empty_collection(file_name, registry, catalog)
+            raise ValueError("No pages extracted from PDF. The PDF might be image-based or corrupted.")
+
+        job.log(f"Total text extracted with {extractor}: {stats['chars']} characters")
+
+        # If no text extracted, try PyMuPDF as fallback
+        if stats["chunks"] == 0:
+            if extractor == "PyMuPDF":
+                discard_empty_collection(file_name, registry, catalog)
+                raise ValueError("No text content found. The PDF might be image-based and requires OCR.")
+            if not PYMUPDF_AVAILABLE:
+                discard_empty_collection(file_name, registry, catalog)
+                raise ValueError("No text content found. Install PyMuPDF for better PDF support: pip install pymupdf")
+
+            job.log("⚠️ PyPDFLoader extracted no text. Trying PyMuPDF...", level="warning")
+            pages = iter_pages_with_pymupdf(tmp_path, file_name)
+            vectorstore, stats = ingest_pages(
+                pages, text_splitter, collection_name, embeddings, registry, job, lexical_index, catalog, file_hash
             )
+            job.log(f"Total text extracted with PyMuPDF: {stats['chars']} characters")
 
-            return vectorstore, len(chunks)
+            if stats["chunks"] == 0:
+                discard_empty_collection(file_name, registry, catalog)
+                raise ValueError("No text content found with either method. The PDF might be image-based and requires OCR.")
 
-        finally:
-            # Clean up temp file
-            os.unlink(tmp_path)
+        job.log(f"Split into {stats['chunks']} chunks for better retrieval")
 
-# Create combined retriever from multiple vectorstores
-class CombinedRetriever:
-    """Custom retriever that searches across multiple vectorstores"""
-    def __init__(self, retrievers):
-        self.retrievers = retrievers
-
-    def invoke(self, query):
-        """Retrieve documents from all retrievers and combine results"""
-        # Handle both string queries and dict inputs
-        if isinstance(query, dict):
-            query = query.get("question", query.get("input", ""))
-        
-        all_docs = []
-        for retriever in self.retrievers:
-            try:
-                docs = retriever.invoke(query)
-                all_docs.extend(docs)
-            except:
-                pass
-        return all_docs
-
-    def get_relevant_documents(self, query):
-        """For compatibility with older LangChain versions"""
-        return self.invoke(query)
-    
-    def __or__(self, other):
-        """Support pipe operator for LangChain LCEL"""
-        from langchain_core.runnables import RunnableLambda
-        return RunnableLambda(self.invoke) | other
+        return vectorstore, document_details(data, stats["chunks"], page_count=stats["pages"]), True
+
+    finally:
+        # Clean up temp file
+        os.unlink(tmp_path)
+
+# Ingest an upload and record it (runs in an ingestion worker thread, so no Streamlit calls)
+def ingest_upload(job, process_file, file_name, data, embeddings, registry, lexical_index, catalog, answer_cache,
+                  update_existing=False):
+    """Process an uploaded file, record it in the document catalog and return its vectorstore"""
+    vectorstore, details, written = process_file(
+        job, file_name, data, embeddings, registry, lexical_index, catalog, update_existing=update_existing
+    )
+    # Recorded here rather than when the session collects the job, so the document
+    # is listed (and its ingest checkpoint dropped) even if that session has closed
+    catalog.record(file_name, get_collection_name(file_name), embedding_model=EMBEDDING_MODEL["name"], **details)
+    # Answers cached before this document was (re-)indexed are stale, loading
+    # an already indexed document leaves them valid
+    if written:
+        answer_cache.invalidate([file_name])
+    return vectorstore
 
+# Create combined retriever from multiple vectorstores
 def create_combined_retriever(vectorstores_dict, selected_pdf_names):
     """Create a retriever that searches across selected PDFs"""
     from langchain_core.runnables import RunnableLambda
     
-    retrievers = []
-    for pdf_name in selected_pdf_names:
-        if pdf_name in vectorstores_dict:
-            # Increase k to retrieve more chunks (default is 4, we use 15)
-            # Use MMR for better diversity of retrieved chunks
-            retrievers.append(vectorstores_dict[pdf_name].as_retriever(
-                search_type="mmr",
-                search_kwargs={"k": 15, "fetch_k": 30}
-            ))
-
-    if len(retrievers) == 0:
+    if INDEX_MODE == "unified":
+        # Every document shares one collection, so run a single filtered search
+        selected = [pdf_name for pdf_name in selected_pdf_names if pdf_name in vectorstores_dict]
+        if not selected:
+            return None
+        return create_filtered_retriever(vectorstores_dict[selected[0]], selected, k=DEFAULT_TOP_K)
+
+    selected = [pdf_name for pdf_name in selected_pdf_names if pdf_name in vectorstores_dict]
+
+    if len(selected) == 0:
+        return None
+
+    # Search all collections concurrently and run one MMR pass over the combined
+    # candidates, so the top-k is diverse across documents, not just within each
+    combined = MMRRetriever(
+        get_vector_backend(),
+        [get_collection_name(pdf_name) for pdf_name in selected],
+        vectorstores_dict[selected[0]].embeddings,
+        k=DEFAULT_TOP_K,
+        fetch_k=DEFAULT_TOP_K * 2
+    )
+    return RunnableLambda(combined.invoke)
+
+# Create the retriever for the chosen retrieval mode
+def create_retriever(vectorstores_dict, selected_pdf_names, mode, vector_deadline=None):
+    """Create a vector, keyword or hybrid retriever over the selected documents"""
+    if mode == "vector":
+        return create_combined_retriever(vectorstores_dict, selected_pdf_names)
+
+    selected = [pdf_name for pdf_name in selected_pdf_names if pdf_name in vectorstores_dict]
+    if not selected:
+        return None
+
+    lexical_index = get_lexical_index()
+
+    def lexical_search(query):
+        return lexical_index.retrieve(query, k=DEFAULT_TOP_K, documents=selected)
+
+    # Keyword-only mode answers without calling the embedding model
+    vector_retriever = create_combined_retriever(vectorstores_dict, selected) if mode == "hybrid" else None
+    return HybridRetriever(vector_retriever, lexical_search, k=DEFAULT_TOP_K, vector_timeout=VECTOR_SEARCH_TIMEOUT,
+                           vector_deadline=vector_deadline)
+
+# Show the documents and pages an answer is based on
+def display_sources(source_documents):
+    """Display retrieved chunks grouped by document, returns the sources for the chat history"""
+    # Group sources by PDF
+    sources_by_pdf = {}
+    for doc in source_documents:
+        if hasattr(doc, 'metadata') and 'source' in doc.metadata:
+            # Extract PDF filename from source path
+            source_path = doc.metadata['source']
+            pdf_name = os.path.basename(source_path)
+            page_num = doc.metadata.get('page', 0) + 1  # +1 for human-readable
+
+            if pdf_name not in sources_by_pdf:
+                sources_by_pdf[pdf_name] = {'pages': set(), 'docs': []}
+            sources_by_pdf[pdf_name]['pages'].add(page_num)
+            sources_by_pdf[pdf_name]['docs'].append(doc)
+
+    if not sources_by_pdf:
+        return []
+
+    st.markdown("---")
+    st.markdown("**📚 Sources:**")
+
+    # Display sources by PDF
+    for pdf_name, info in sources_by_pdf.items():
+        pages_list = sorted(list(info['pages']))
+        st.markdown(f"• *{pdf_name}* - Pages: {', '.join(map(str, pages_list))}")
+
+    # Show source snippets in expander
+    with st.expander("📄 View source excerpts"):
+        for pdf_name, info in sources_by_pdf.items():
+            st.markdown(f"**{pdf_name}**")
+            for i, doc in enumerate(info['docs'], 1):
+                page_num = doc.metadata.get('page', 0) + 1
+                st.markdown(f"*Page {page_num}:*")
+                st.markdown(f"> {doc.page_content[:300]}{'...' if len(doc.page_content) > 300 else ''}")
+                if i < len(info['docs']):
+                    st.markdown("")
+            if pdf_name != list(sources_by_pdf.keys())[-1]:
+                st.markdown("---")
+
+    return [
+        {"file": pdf_name, "pages": sorted(list(info['pages']))}
+        for pdf_name, info in sources_by_pdf.items()
+    ]
+
+# Stage timings of a question, below its answer
+def show_performance(timings):
+    """Show a question's stage timings (latency_tracing.Trace.summary) in an expander"""
+    with st.expander(f"⏱️ Performance · {timings['total_ms'] / 1000:.1f}s"):
+        st.text(format_trace_report(timings))
+        st.caption("Stages that run concurrently overlap, so they can add up to more than the total.")
+
+# Settings deciding which context an answer is generated from, part of the answer cache key
+def retrieval_settings(model_name, mode):
+    """Return the retrieval and index configuration an answer depends on"""
+    return {
+        "retrieval_mode": mode,
+        "index_mode": INDEX_MODE,
+        "vector_backend": VECTOR_BACKEND,
+        "top_k": DEFAULT_TOP_K,
+        "context_tokens": get_context_budget(model_name)
+    }
+
+# Embed a question for the answer cache lookup
+def embed_question(embeddings, question, deadline):
+    """Embed a question, returning None if the embedding model fails or misses the time.monotonic() deadline"""
+    # A late embedding is not requested again: the vector search waits for the same
+    # in-flight call, and the result lands in the query embedding cache
+    executor = ThreadPoolExecutor(max_workers=1)
+    future = executor.submit(bind(embeddings.embed_query, "embed_query"), question)
+    executor.shutdown(wait=False)
+    try:
+        return future.result(timeout=max(deadline - time.monotonic(), 0.0))
+    except Exception:
         return None
-    elif len(retrievers) == 1:
-        return retrievers[0]
-    else:
-        # Combine multiple retrievers and wrap in RunnableLambda
-        combined = CombinedRetriever(retrievers)
-        return RunnableLambda(combined.invoke)
 
 # Create RAG chain
-def create_rag_chain(retriever, model):
+def create_rag_chain(retriever, model, context_tokens):
     """Create the RAG chain for question answering with source tracking"""
     if retriever is None:
         return None
@@ -518,18 +1030,11 @@ Question: {question}
 
     prompt = PromptTemplate.from_template(template)
 
-    # Function to format documents for context
-    def format_docs(docs):
-        return "\n\n".join(doc.page_content for doc in docs)
-
-    # Chain that returns both answer and sources
-    chain = (
-        {
-            "context": itemgetter("question") | retriever | format_docs,
-            "question": itemgetter("question"),
-            "source_documents": itemgetter("question") | retriever
-        }
-        | RunnablePassthrough.assign(answer=prompt | model)
+    # Chain that retrieves once and returns both answer and sources. Overlapping chunks
+    # are merged, duplicates dropped and the rest packed into the model's context budget
+    chain = create_retrieve_once_chain(
+        retriever, prompt | model,
+        docs_packer=lambda docs: pack_context(docs, context_tokens)
     )
 
     return chain
@@ -567,10 +1072,6 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
-# Initialize upload state tracking
-if "recently_uploaded" not in st.session_state:
-    st.session_state.recently_uploaded = []
-
 # File upload section
 uploaded_files = st.file_uploader(
     "Upload your PDF(s) or Markdown file(s)",
@@ -594,79 +1095,75 @@ if st.session_state.get("clear_upload_messages", False) and not uploaded_files:
     st.session_state.recently_uploaded = []
     st.session_state.clear_upload_messages = False
 
-# Load existing vectorstores from Chroma
-if not st.session_state.vectorstores:
-    indexed_files = get_indexed_pdfs_from_chroma()
-    if indexed_files:
-        _, embeddings = get_model_and_embeddings(model_choice)
-        client = get_chroma_client()
-        for file_name in indexed_files:
-            # Determine collection prefix based on file extension
-            if file_name.endswith('.pdf'):
-                collection_name = f"pdf_{file_name.replace('.pdf', '').replace(' ', '_').replace('.', '_')}"
-            elif file_name.endswith('.md'):
-                collection_name = f"md_{file_name.replace('.md', '').replace(' ', '_').replace('.', '_')}"
-            else:
-                continue
-
-            try:
-                vectorstore = Chroma(
-                    collection_name=collection_name,
-                    embedding_function=embeddings,
-                    persist_directory=CHROMA_PERSIST_DIR,
-                    client=client
-                )
-                st.session_state.vectorstores[file_name] = vectorstore
-                if file_name not in st.session_state.indexed_pdfs:
-                    st.session_state.indexed_pdfs.append(file_name)
-                # Also add to selected PDFs if not already there
-                if file_name not in st.session_state.selected_pdfs:
-                    st.session_state.selected_pdfs.append(file_name)
-            except:
-                pass
-
-# Process uploaded files
+# Open the vectorstores of indexed documents when they are first searched, not at
+# first render, which would create the embedding model and open the vector backend
+def open_document_vectorstores(file_names, embeddings):
+    """Add shared vectorstore handles for the documents this session has not opened yet"""
+    missing = [
+        file_name for file_name in file_names
+        if file_name not in st.session_state.vectorstores and get_collection_name(file_name) is not None
+    ]
+    if not missing:
+        return
+    registry = get_chroma_registry()
+    lexical_index = get_lexical_index()
+    lexical_documents = set(lexical_index.documents())
+    for file_name in missing:
+        try:
+            # Handles are shared across sessions (and, in unified mode, across
+            # documents), so a new session does not re-open every collection
+            vectorstore = open_vectorstore(file_name, embeddings, registry)
+            if file_name not in lexical_documents:
+                backfill_lexical_index(file_name, registry, lexical_index)
+            st.session_state.vectorstores[file_name] = vectorstore
+        except Exception:
+            pass
+
+# Queue uploaded files for background processing
 if uploaded_files:
-    newly_uploaded = False
+    ingestion_queue = st.session_state.ingestion_queue
+    newly_queued = False
     for uploaded_file in uploaded_files:
-        # Check if this file is already processed
-        if uploaded_file.name not in st.session_state.indexed_pdfs:
-            # Reset the cleared flag since we're adding new content
-            st.session_state.db_cleared = False
-
-            # Determine file type and process accordingly
-            file_extension = uploaded_file.name.split('.')[-1].lower()
-            
-            if file_extension == 'md':
-                # Process markdown file
-                vectorstore, num_chunks = process_markdown(uploaded_file)
-            elif file_extension == 'pdf':
-                # Process PDF file
-                vectorstore, num_chunks = process_pdf(uploaded_file)
-            else:
-                st.error(f"Unsupported file type: {file_extension}")
-                continue
-            
-            # Check if processing was successful
-            if vectorstore is None:
-                st.error(f"Failed to process {uploaded_file.name}. Please check if it's a valid file with extractable text.")
+        # Skip files that are already queued (failed files stay until cleared)
+        if ingestion_queue.get(uploaded_file.name):
+            continue
+
+        # An indexed file is only processed again when its content changed, and then
+        # updated in place so only the changed chunks are embedded
+        update_existing = uploaded_file.name in st.session_state.indexed_pdfs
+        if update_existing:
+            if uploaded_file.file_id not in st.session_state.upload_hashes:
+                st.session_state.upload_hashes[uploaded_file.file_id] = content_hash(uploaded_file.getvalue())
+            entry = get_document_catalog().get(uploaded_file.name)
+            if entry and entry["content_hash"] == st.session_state.upload_hashes[uploaded_file.file_id]:
                 continue
-            
-            st.session_state.vectorstores[uploaded_file.name] = vectorstore
-            st.session_state.indexed_pdfs.append(uploaded_file.name)
 
-            # Add to selected PDFs automatically
-            if uploaded_file.name not in st.session_state.selected_pdfs:
-                st.session_state.selected_pdfs.append(uploaded_file.name)
+        # Reset the cleared flag since we're adding new content
+        st.session_state.db_cleared = False
 
-            # Add to recently uploaded for fade-out display
-            if uploaded_file.name not in st.session_state.recently_uploaded:
-                st.session_state.recently_uploaded.append(uploaded_file.name)
+        # Determine file type and process accordingly
+        file_extension = uploaded_file.name.split('.')[-1].lower()
 
-            newly_uploaded = True
+        if file_extension == 'md':
+            process_file = process_markdown
+        elif file_extension == 'pdf':
+            process_file = process_pdf
+        else:
+            st.error(f"Unsupported file type: {file_extension}")
+            continue
 
-    # Rerun to refresh sidebar with new PDFs and show fade-out messages
-    if newly_uploaded:
+        # Embeddings, the Chroma registry and the caches are created here: workers cannot use
+        # Streamlit caching, and opening clients from several threads at once races
+        _, embeddings = get_model_and_embeddings(model_choice)
+        ingestion_queue.submit(
+            uploaded_file.name, ingest_upload, process_file,
+            uploaded_file.name, uploaded_file.getvalue(), embeddings, get_chroma_registry(), get_lexical_index(),
+            get_document_catalog(), get_answer_cache(), update_existing=update_existing
+        )
+        newly_queued = True
+
+    # Rerun to show the queued files in the sidebar
+    if newly_queued:
         st.rerun()
 
 # Display chat interface if there are any indexed PDFs
@@ -687,6 +1184,8 @@ if st.session_state.indexed_pdfs:
     for message in st.session_state.messages:
         with st.chat_message(message["role"]):
             st.markdown(message["content"])
+            if message.get("cached_from"):
+                st.caption(f"⚡ Cached answer to a similar question: \"{message['cached_from']}\"")
 
             # Display sources if this is an assistant message with sources
             if message["role"] == "assistant" and "sources" in message:
@@ -697,6 +1196,8 @@ if st.session_state.indexed_pdfs:
                     for source in sources:
                         pages_str = ', '.join(map(str, source['pages']))
                         st.markdown(f"• *{source['file']}* - Pages: {pages_str}")
+            if message.get("timings"):
+                show_performance(message["timings"])
 
     # Chat input
     if prompt := st.chat_input("What would you like to know about these documents?"):
@@ -708,93 +1209,105 @@ if st.session_state.indexed_pdfs:
             st.markdown(prompt)
 
         with st.chat_message("assistant"):
-            with st.status("Thinking...", expanded=True) as status:
+            timings = None
+            with st.status("Searching documents...", expanded=True) as status:
+                answer = ""
+                sources_list = []
                 try:
-                    # Create combined retriever from selected PDFs
-                    model, _ = get_model_and_embeddings(model_choice)
-                    retriever = create_combined_retriever(st.session_state.vectorstores, st.session_state.selected_pdfs)
-                    chain = create_rag_chain(retriever, model)
-
-                    if chain is None:
-                        st.error("No documents selected. Please select at least one PDF in the sidebar.")
-                        st.stop()
-
-                    response = chain.invoke({"question": prompt})
-
-                    # Extract answer and sources
-                    answer_obj = response.get('answer')
-                    source_documents = response.get('source_documents', [])
-
-                    # Handle different response types for answer
-                    if hasattr(answer_obj, 'content'):
-                        answer = answer_obj.content
-                    else:
-                        answer = str(answer_obj)
-
-                    # Group sources by PDF
-                    sources_by_pdf = {}
-                    if source_documents:
-                        for doc in source_documents:
-                            if hasattr(doc, 'metadata') and 'source' in doc.metadata:
-                                # Extract PDF filename from source path
-                                source_path = doc.metadata['source']
-                                pdf_name = os.path.basename(source_path)
-                                page_num = doc.metadata.get('page', 0) + 1  # +1 for human-readable
-
-                                if pdf_name not in sources_by_pdf:
-                                    sources_by_pdf[pdf_name] = {'pages': set(), 'docs': []}
-                                sources_by_pdf[pdf_name]['pages'].add(page_num)
-                                sources_by_pdf[pdf_name]['docs'].append(doc)
-
-                    status.update(label="Complete!", state="complete")
-
-                    # Display answer (inside status block)
-                    st.markdown(answer)
-
-                    # Display sources grouped by PDF (inside status block)
-                    if source_documents:
-                        st.markdown("---")
-                        st.markdown("**📚 Sources:**")
-
-                        # Display sources by PDF
-                        for pdf_name, info in sources_by_pdf.items():
-                            pages_list = sorted(list(info['pages']))
-                            st.markdown(f"• *{pdf_name}* - Pages: {', '.join(map(str, pages_list))}")
-
-                        # Show source snippets in expander
-                        with st.expander("📄 View source excerpts"):
-                            for pdf_name, info in sources_by_pdf.items():
-                                st.markdown(f"**{pdf_name}**")
-                                for i, doc in enumerate(info['docs'], 1):
-                                    page_num = doc.metadata.get('page', 0) + 1
-                                    st.markdown(f"*Page {page_num}:*")
-                                    st.markdown(f"> {doc.page_content[:300]}{'...' if len(doc.page_content) > 300 else ''}")
-                                    if i < len(info['docs']):
-                                        st.markdown("")
-                                if pdf_name != list(sources_by_pdf.keys())[-1]:
-                                    st.markdown("---")
-
-                    # Store in session state
-                    sources_list = []
-                    if source_documents:
-                        for pdf_name, info in sources_by_pdf.items():
-                            sources_list.append({
-                                "file": pdf_name,
-                                "pages": sorted(list(info['pages']))
-                            })
-
+                    with trace(QUESTION, prompt, METRICS_FILE, METRICS_LABELS) as question_trace:
+                        model, embeddings = get_model_and_embeddings(model_choice)
+                        # The answer cache lookup and the vector search share one wait for the
+                        # embedding model, after which keyword results answer on their own
+                        vector_deadline = time.monotonic() + VECTOR_SEARCH_TIMEOUT
+
+                        # Reuse the answer to a near-identical earlier question over the same documents
+                        # (keyword-only mode skips the cache, which needs the embedding model)
+                        answer_cache = get_answer_cache()
+                        question_embedding = None
+                        cached = None
+                        if retrieval_mode != "lexical":
+                            question_embedding = embed_question(embeddings, prompt, vector_deadline)
+                        if question_embedding is not None:
+                            with span("answer_cache"):
+                                cached = answer_cache.lookup(
+                                    question_embedding, st.session_state.selected_pdfs, model_choice,
+                                    retrieval=retrieval_settings(model_choice, retrieval_mode)
+                                )
+
+                        if cached is not None:
+                            answer = cached["answer"]
+                            st.markdown(answer)
+                            st.caption(
+                                f"⚡ Cached answer to a similar question: \"{cached['question']}\" "
+                                f"(similarity {cached['similarity']:.2f})"
+                            )
+                            sources_list = display_sources(cached["source_documents"])
+                            status.update(label="Answered from cache", state="complete")
+                        else:
+                            # Create combined retriever from selected PDFs
+                            with span("open_collections"):
+                                open_document_vectorstores(st.session_state.selected_pdfs, embeddings)
+                            retriever = create_retriever(
+                                st.session_state.vectorstores, st.session_state.selected_pdfs, retrieval_mode,
+                                vector_deadline=vector_deadline
+                            )
+                            chain = create_rag_chain(retriever, model, get_context_budget(model_choice))
+
+                            if chain is None:
+                                st.error("No documents selected. Please select at least one PDF in the sidebar.")
+                                st.stop()
+
+                            # The answer streams into this placeholder, sources render below it
+                            answer_placeholder = st.empty()
+                            sources_container = st.container()
+                            retrieved_documents = []
+
+                            def show_sources(source_documents):
+                                """Render the retrieved sources before the first answer token arrives"""
+                                retrieved_documents.extend(source_documents)
+                                status.update(label="Generating answer...")
+                                with sources_container:
+                                    if isinstance(retriever, HybridRetriever) and retriever.used_lexical_fallback:
+                                        st.caption("⚡ Embedding model did not respond in time, answered from keyword search")
+                                    sources_list.extend(display_sources(source_documents))
+
+                            # Stream tokens into the message as the model produces them
+                            for token in stream_retrieve_once(chain, prompt, on_sources=show_sources):
+                                answer += token
+                                answer_placeholder.markdown(answer + "▌")
+                            answer_placeholder.markdown(answer)
+
+                            status.update(label="Complete!", state="complete")
+
+                            # Keyword-only fallback answers are not cached, the vector search may recover
+                            fell_back = isinstance(retriever, HybridRetriever) and retriever.used_lexical_fallback
+                            if question_embedding is not None and answer and not fell_back:
+                                with span("answer_cache"):
+                                    answer_cache.store(prompt, question_embedding, st.session_state.selected_pdfs,
+                                                       model_choice, answer, retrieved_documents,
+                                                       retrieval=retrieval_settings(model_choice, retrieval_mode))
+
+                    timings = question_trace.summary()
                     st.session_state.messages.append({
                         "role": "assistant",
                         "content": answer,
-                        "sources": sources_list
+                        "sources": sources_list,
+                        "cached_from": cached["question"] if cached else None,
+                        "timings": timings
                     })
 
                 except Exception as e:
                     error_msg = f"Error generating response: {str(e)}"
                     st.error(error_msg)
-                    st.session_state.messages.append({"role": "assistant", "content": error_msg})
+                    # Keep any partial answer that was streamed before the error
+                    content = f"{answer}\n\n{error_msg}" if answer else error_msg
+                    st.session_state.messages.append({"role": "assistant", "content": content, "sources": sources_list})
                     status.update(label="Error occurred", state="error")
 
+            # Where the time went: embedding, search, model load, generation...
+            if timings:
+                show_performance(timings)
+
     # Add a button to clear chat history
     if st.session_state.messages:
         if st.button("Clear Chat History"):
@@ -804,6 +1317,43 @@ if st.session_state.indexed_pdfs:
 else:
     st.info("👆 Please upload a PDF or Markdown file to get started!")
 
+# Query embedding cache counters (used to size the cache), once a question created the embedding model
+if st.session_state.vectorstores:
+    _, cached_embeddings = get_model_and_embeddings(model_choice)
+    cache_stats = cached_embeddings.stats()
+    st.sidebar.caption(
+        f"Query embedding cache: {cache_stats['hits']} hits / {cache_stats['misses']} misses "
+        f"({cache_stats['disk_entries']} stored) · "
+        f"Chunk embeddings reused: {cache_stats['chunk_hits']} / {cache_stats['chunk_hits'] + cache_stats['chunk_misses']}"
+    )
+    answer_stats = get_answer_cache().stats()
+    st.sidebar.caption(
+        f"Answer cache: {answer_stats['hits']} hits / {answer_stats['misses']} misses ({answer_stats['entries']} stored)"
+    )
+
+# Time the selected Ollama model spent loading versus answering
+model_stats = get_residency_manager().stats().get(model_choice)
+if model_stats and model_stats["calls"]:
+    st.sidebar.caption(
+        f"{model_choice} ({get_residency_manager().policy(model_choice)}): "
+        f"load {model_stats['load_seconds']:.1f}s ({model_stats['cold_loads']} cold) · "
+        f"inference {model_stats['inference_seconds'] / model_stats['calls']:.1f}s avg over {model_stats['calls']} answers"
+    )
+
+# Stage timings of the files ingested in this session
+if st.session_state.ingest_timings:
+    with st.sidebar.expander("⏱️ Ingestion performance"):
+        for file_name, timings in st.session_state.ingest_timings.items():
+            st.caption(file_name)
+            st.text(format_trace_report(timings))
+
+# Startup report: how long this session's first render took and the deferred imports so far
+if "first_render_ms" not in st.session_state:
+    st.session_state.first_render_ms = (time.perf_counter() - script_started) * 1000
+with st.sidebar.expander("⏱️ Startup"):
+    st.caption(f"First render: {st.session_state.first_render_ms:.0f} ms")
+    st.text(format_import_report(import_report()))
+
 # Footer
 st.markdown("---")
 st.markdown("Built with Streamlit, LangChain, Ollama and Chroma")
@@ -0,0 +1,363 @@
+"""
+Benchmark: end-to-end ingestion and chat turns with fake models
+
+Drives the apps' own code paths offline: process_pdf and process_markdown of
+the Document Q&A app (extraction, splitting, batched embedding, storage in
+the configured vector backend, keyword index and catalog), and
+create_time_based_chunks plus create_vector_store of the Time-Series app.
+Each ingested collection then answers chat turns through the apps' retriever
+and retrieve-once chain. The embedding model and the LLM are the
+deterministic fakes in benchmarks/fake_models.py with configurable latency,
+and the inputs are the synthetic documents in benchmarks/synthetic_data.py,
+so results are comparable across commits.
+
+Every scenario (document kind and size) runs in a fresh process from an
+empty working directory and reports
+
+- warmup_s: first-use imports and opening the vector backend, which the
+  first upload to a new server process pays (not part of ingest_s)
+- ingest_s, pages_per_s (PDF only), chunks_per_s, embeddings_per_s
+- chunking_s: create_time_based_chunks alone (CSV only)
+- retrieval_ms, first_token_ms, turn_ms: p50/p95/p99 of the chat turns
+- peak_rss_mb: peak resident memory of the scenario's process
+
+Usage:
+    python -m benchmarks.bench_end_to_end [--kinds pdf markdown csv] [--sizes small medium large]
+        [--questions 20] [--embed-request-ms 2] [--embed-text-ms 0.5] [--llm-first-token-ms 20]
+        [--llm-token-ms 2] [--backend chroma] [--json results.json] [--baseline previous.json]
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import multiprocessing
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from benchmarks.fake_models import FakeEmbeddings, FakeLLM
+from benchmarks.synthetic_data import (
+    make_markdown, make_pdf, make_questions, make_sensor_questions, write_sensor_csvs
+)
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Pages of PDF, sections of Markdown and days of five-minute CSV readings
+SIZES = {
+    "pdf": {"small": 5, "medium": 40, "large": 200},
+    "markdown": {"small": 10, "medium": 80, "large": 400},
+    "csv": {"small": 1, "medium": 7, "large": 30},
+}
+
+CSV_HOURS_PER_CHUNK = 2
+
+DEFAULT_SETTINGS = {
+    "questions": 20,
+    "embed_request_ms": 2.0,
+    "embed_text_ms": 0.5,
+    "llm_first_token_ms": 20.0,
+    "llm_token_ms": 2.0,
+    "backend": "chroma",
+    "retrieval_mode": "hybrid",
+}
+
+# Metrics compared against a baseline run, and whether higher is better
+COMPARED_METRICS = {
+    "ingest_s": False, "chunks_per_s": True, "embeddings_per_s": True,
+    "retrieval_ms.p50": False, "turn_ms.p50": False, "turn_ms.p95": False, "peak_rss_mb": False,
+}
+
+# Relative changes smaller than this are reported as unchanged (run-to-run noise)
+NOISE_THRESHOLD = 0.05
+
+
+def percentiles(values: List[float]) -> Optional[Dict[str, float]]:
+    """p50, p95 and p99 of a list of milliseconds"""
+    if not values:
+        return None
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return {"p50": round(float(p50), 2), "p95": round(float(p95), 2), "p99": round(float(p99), 2)}
+
+
+def peak_rss_mb() -> Optional[float]:
+    """Peak resident memory of this process in MB, or None where the resource module is missing"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Reported in bytes on macOS and in KB elsewhere
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def rate(count: Optional[int], seconds: float) -> Optional[float]:
+    return round(count / seconds, 1) if count and seconds > 0 else None
+
+
+def time_chat_turns(chain, questions: List[str]) -> Dict:
+    """Ask each question through a retrieve-once chain, timing retrieval, first token and the whole turn"""
+    from retrieval import stream_retrieve_once
+
+    retrieval, first_token, turn = [], [], []
+    for question in questions:
+        started = time.perf_counter()
+        retrieved_at = first_token_at = None
+
+        def on_sources(documents):
+            nonlocal retrieved_at
+            retrieved_at = time.perf_counter()
+
+        for _ in stream_retrieve_once(chain, question, on_sources=on_sources):
+            if first_token_at is None:
+                first_token_at = time.perf_counter()
+        finished = time.perf_counter()
+        if retrieved_at is not None:
+            retrieval.append((retrieved_at - started) * 1000)
+        if first_token_at is not None:
+            first_token.append((first_token_at - started) * 1000)
+        turn.append((finished - started) * 1000)
+    return {
+        "retrieval_ms": percentiles(retrieval),
+        "first_token_ms": percentiles(first_token),
+        "turn_ms": percentiles(turn)
+    }
+
+
+def run_document(kind: str, amount: int, settings: Dict, embeddings: FakeEmbeddings, llm: FakeLLM) -> Dict:
+    """Ingest a synthetic PDF or Markdown file with the Document Q&A app and chat about it"""
+    with contextlib.redirect_stdout(io.StringIO()):
+        import app
+    from embedding_cache import CachedQueryEmbeddings, ChunkEmbeddingStore
+    from ingestion_jobs import IngestionJob
+    from models_config import get_context_budget, get_default_model
+    from startup_timing import timed_import
+
+    started = time.perf_counter()
+    app.get_chroma_registry().backend.vectorstore_class()
+    if kind == "pdf":
+        timed_import("langchain_community.document_loaders")
+    warmup_s = time.perf_counter() - started
+
+    # Wrapped like the app wraps OllamaEmbeddings
+    cached_embeddings = CachedQueryEmbeddings(embeddings, model_name="fake-embed", chunk_store=ChunkEmbeddingStore())
+    if kind == "pdf":
+        file_name, data, process = "manual.pdf", make_pdf(amount), app.process_pdf
+    else:
+        file_name, data, process = "guide.md", make_markdown(amount), app.process_markdown
+
+    started = time.perf_counter()
+    vectorstore, details, _ = process(
+        IngestionJob(file_name), file_name, data, cached_embeddings,
+        app.get_chroma_registry(), app.get_lexical_index(), app.get_document_catalog()
+    )
+    ingest_s = time.perf_counter() - started
+    embedded = embeddings.texts
+
+    retriever = app.create_retriever({file_name: vectorstore}, [file_name], settings["retrieval_mode"])
+    chain = app.create_rag_chain(retriever, llm, get_context_budget(get_default_model()))
+    result = {
+        "bytes": len(data),
+        "pages": details["page_count"],
+        "chunks": details["chunk_count"],
+        "embedded": embedded,
+        "warmup_s": round(warmup_s, 3),
+        "ingest_s": round(ingest_s, 3),
+        "pages_per_s": rate(details["page_count"], ingest_s),
+        "chunks_per_s": rate(details["chunk_count"], ingest_s),
+        "embeddings_per_s": rate(embedded, ingest_s),
+        "chunking_s": None
+    }
+    result.update(time_chat_turns(chain, make_questions(settings["questions"])))
+    return result
+
+
+def run_csv(days: int, settings: Dict, embeddings: FakeEmbeddings, llm: FakeLLM) -> Dict:
+    """Chunk and store synthetic sensor CSVs with the Time-Series app and chat about them"""
+    with contextlib.redirect_stdout(io.StringIO()):
+        import csv_rag_app
+    from csv_processor import create_time_based_chunks
+    from embedding_cache import CachedQueryEmbeddings, ChunkEmbeddingStore
+    from models_config import get_context_budget, get_default_model
+
+    started = time.perf_counter()
+    csv_rag_app.get_vector_backend().vectorstore_class()
+    warmup_s = time.perf_counter() - started
+
+    # The app's cached Ollama embeddings are replaced by the fake model
+    cached_embeddings = CachedQueryEmbeddings(embeddings, model_name="fake-embed", chunk_store=ChunkEmbeddingStore())
+    csv_rag_app.get_embeddings = lambda: cached_embeddings
+    paths = write_sensor_csvs("sensor_data", days)
+
+    started = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        documents = [
+            document for path in paths
+            for document in create_time_based_chunks(path, hours_per_chunk=CSV_HOURS_PER_CHUNK)
+        ]
+    chunking_s = time.perf_counter() - started
+    vectorstore = csv_rag_app.create_vector_store(documents)
+    ingest_s = time.perf_counter() - started
+    embedded = embeddings.texts
+
+    chain = csv_rag_app.create_rag_chain(vectorstore, llm, get_context_budget(get_default_model()))
+    result = {
+        "bytes": sum(os.path.getsize(path) for path in paths),
+        "pages": None,
+        "chunks": len(documents),
+        "embedded": embedded,
+        "warmup_s": round(warmup_s, 3),
+        "ingest_s": round(ingest_s, 3),
+        "pages_per_s": None,
+        "chunks_per_s": rate(len(documents), ingest_s),
+        "embeddings_per_s": rate(embedded, ingest_s),
+        "chunking_s": round(chunking_s, 3)
+    }
+    result.update(time_chat_turns(chain, make_sensor_questions(settings["questions"])))
+    return result
+
+
+def run_scenario(kind: str, size: str, settings: Dict) -> Dict:
+    """Run one scenario from a fresh working directory (called in a new process)"""
+    os.environ.update(OLLAMA_PRELOAD="false", VECTOR_BACKEND=settings["backend"])
+    if REPO_DIR not in sys.path:
+        sys.path.insert(0, REPO_DIR)
+    # The apps are imported outside `streamlit run`, whose bare-mode warnings are not of interest here
+    from streamlit.logger import set_log_level
+    set_log_level("error")
+    embeddings = FakeEmbeddings(
+        request_latency=settings["embed_request_ms"] / 1000, text_latency=settings["embed_text_ms"] / 1000
+    )
+    llm = FakeLLM(
+        first_token_latency=settings["llm_first_token_ms"] / 1000, token_latency=settings["llm_token_ms"] / 1000
+    )
+    amount = SIZES[kind][size]
+    workdir = tempfile.mkdtemp(prefix="bench_e2e_")
+    previous_dir = os.getcwd()
+    os.chdir(workdir)
+    try:
+        if kind == "csv":
+            result = run_csv(amount, settings, embeddings, llm)
+        else:
+            result = run_document(kind, amount, settings, embeddings, llm)
+    finally:
+        os.chdir(previous_dir)
+        shutil.rmtree(workdir, ignore_errors=True)
+    return {"kind": kind, "size": size, "amount": amount, **result, "peak_rss_mb": peak_rss_mb()}
+
+
+def git_commit() -> Optional[str]:
+    """Commit of the working tree, or None outside a git checkout"""
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=REPO_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(kinds: List[str], sizes: List[str], settings: Optional[Dict] = None) -> Dict:
+    """Run every scenario in its own process, returns the report"""
+    settings = {**DEFAULT_SETTINGS, **(settings or {})}
+    context = multiprocessing.get_context("spawn")
+    results = []
+    for kind in kinds:
+        for size in sizes:
+            with context.Pool(1) as pool:
+                results.append(pool.apply(run_scenario, (kind, size, settings)))
+    return {
+        "commit": git_commit(),
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "settings": settings,
+        "results": results
+    }
+
+
+def metric(row: Dict, name: str) -> Optional[float]:
+    """Value of a metric such as "turn_ms.p50" in a result row"""
+    value = row
+    for part in name.split("."):
+        value = value.get(part) if isinstance(value, dict) else None
+    return value
+
+
+def compare(report: Dict, baseline: Dict) -> List[Dict]:
+    """Relative change of the compared metrics for scenarios present in both reports"""
+    previous = {(row["kind"], row["size"]): row for row in baseline["results"]}
+    changes = []
+    for row in report["results"]:
+        old = previous.get((row["kind"], row["size"]))
+        if old is None:
+            continue
+        for name, higher_is_better in COMPARED_METRICS.items():
+            before, after = metric(old, name), metric(row, name)
+            if not before or after is None:
+                continue
+            change = (after - before) / before
+            if abs(change) < NOISE_THRESHOLD:
+                verdict = "unchanged"
+            else:
+                verdict = "better" if (change > 0) == higher_is_better else "worse"
+            changes.append({
+                "kind": row["kind"], "size": row["size"], "metric": name, "before": before, "after": after,
+                "change": round(change, 3), "verdict": verdict
+            })
+    return changes
+
+
+def main():
+    parser = argparse.ArgumentParser(description="End-to-end ingestion and chat benchmark with fake models")
+    parser.add_argument("--kinds", nargs="+", default=list(SIZES), choices=list(SIZES))
+    parser.add_argument("--sizes", nargs="+", default=["small", "medium", "large"],
+                        choices=["small", "medium", "large"])
+    parser.add_argument("--questions", type=int, default=DEFAULT_SETTINGS["questions"])
+    parser.add_argument("--embed-request-ms", type=float, default=DEFAULT_SETTINGS["embed_request_ms"])
+    parser.add_argument("--embed-text-ms", type=float, default=DEFAULT_SETTINGS["embed_text_ms"])
+    parser.add_argument("--llm-first-token-ms", type=float, default=DEFAULT_SETTINGS["llm_first_token_ms"])
+    parser.add_argument("--llm-token-ms", type=float, default=DEFAULT_SETTINGS["llm_token_ms"])
+    parser.add_argument("--backend", default=DEFAULT_SETTINGS["backend"], help="VECTOR_BACKEND to benchmark")
+    parser.add_argument("--retrieval-mode", default=DEFAULT_SETTINGS["retrieval_mode"],
+                        choices=["hybrid", "vector", "lexical"])
+    parser.add_argument("--json", help="Write the report to this file")
+    parser.add_argument("--baseline", help="Report of an earlier run to compare with")
+    args = parser.parse_args()
+
+    settings = {
+        "questions": args.questions, "embed_request_ms": args.embed_request_ms, "embed_text_ms": args.embed_text_ms,
+        "llm_first_token_ms": args.llm_first_token_ms, "llm_token_ms": args.llm_token_ms,
+        "backend": args.backend, "retrieval_mode": args.retrieval_mode
+    }
+    report = run(args.kinds, args.sizes, settings)
+
+    print(f"{'kind':<9} {'size':<7} {'chunks':>6} {'ingest s':>9} {'pages/s':>8} {'chunks/s':>9} {'emb/s':>8} "
+          f"{'retr p50':>9} {'turn p50':>9} {'turn p95':>9} {'turn p99':>9} {'RSS MB':>7}")
+    for row in report["results"]:
+        turn = row["turn_ms"] or {}
+        print(f"{row['kind']:<9} {row['size']:<7} {row['chunks']:>6} {row['ingest_s']:>9} "
+              f"{str(row['pages_per_s'] or '-'):>8} {str(row['chunks_per_s']):>9} {str(row['embeddings_per_s']):>8} "
+              f"{str(metric(row, 'retrieval_ms.p50')):>9} {str(turn.get('p50')):>9} {str(turn.get('p95')):>9} "
+              f"{str(turn.get('p99')):>9} {str(row['peak_rss_mb']):>7}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        print(f"\nCompared with {args.baseline} (commit {baseline.get('commit')}):")
+        for change in compare(report, baseline):
+            print(f"  {change['kind']:<9} {change['size']:<7} {change['metric']:<18} "
+                  f"{change['before']:>10} -> {change['after']:>10} ({change['change']:+.1%}, {change['verdict']})")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+"""
+Benchmark: per-collection MMR versus one global MMR over all selected collections
+
+Builds synthetic manuals in a temporary Chroma database (every manual repeats
+the same safety and warranty boilerplate) and answers the same questions with
+
+- per_collection: MMR inside each collection (k, fetch_k per file) - the
+  previous behaviour. The merged list is unranked, so for the redundancy
+  metrics it is ranked by query similarity and cut to k outside the timing
+- global: MMRRetriever, one vectorized MMR over the combined candidates
+
+For each number of selected documents it reports latency and how redundant
+the returned top-k is. No Ollama is needed; the hashed bag-of-words
+FakeEmbeddings from fake_models stand in for the embedding model.
+
+Usage:
+    python -m benchmarks.bench_mmr [--documents 10 50 200] [--queries 20] [--json results.json]
+"""
+
+import argparse
+import json
+import random
+import statistics
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List
+
+import numpy as np
+from langchain_chroma import Chroma
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+
+from benchmarks.fake_models import FakeEmbeddings
+from retrieval import MMRRetriever, DEFAULT_TOP_K, DEFAULT_MAX_WORKERS
+from vector_backends import ChromaBackend, VectorBackend
+
+CHUNKS_PER_DOCUMENT = 20
+EMBEDDING_SIZE = 256
+
+BOILERPLATE = [
+    "Safety warning: disconnect power and release hydraulic pressure before servicing the pump.",
+    "Warranty: the manufacturer warranty is void if the pump is serviced by unqualified personnel.",
+    "Contact customer support with the serial number of the pump for replacement parts."
+]
+
+VOCABULARY = (
+    "pump valve pressure seal filter torque bolt gasket bearing motor impeller shaft coupling "
+    "hydraulic coolant flow sensor alarm calibration inspection lubrication vibration temperature"
+).split()
+
+
+def make_manual(index: int, rng: random.Random) -> List[Document]:
+    """Chunks of one synthetic manual: shared boilerplate plus topic chunks"""
+    source = f"manual_{index:03d}.pdf"
+    texts = list(BOILERPLATE)
+    while len(texts) < CHUNKS_PER_DOCUMENT:
+        words = rng.sample(VOCABULARY, 8)
+        texts.append(f"Procedure {len(texts)} for model M{index}: " + " ".join(words) + ".")
+    return [Document(page_content=text, metadata={"source": source, "page": page}) for page, text in enumerate(texts)]
+
+
+def build_stores(document_count: int, backend: VectorBackend, embeddings: Embeddings) -> List[Chroma]:
+    """Create one collection per synthetic manual"""
+    rng = random.Random(document_count)
+    stores = []
+    for i in range(document_count):
+        store = backend.vectorstore(f"pdf_manual_{i:03d}", embeddings)
+        store.add_documents(make_manual(i, rng))
+        stores.append(store)
+    return stores
+
+
+def per_collection_mmr(stores: List[Chroma], question: str, k: int = DEFAULT_TOP_K) -> List[Document]:
+    """Previous behaviour: MMR inside every collection, results concatenated"""
+    embedding = stores[0].embeddings.embed_query(question)
+
+    def search(store):
+        return store.max_marginal_relevance_search_by_vector(embedding, k=k, fetch_k=k * 2)
+
+    with ThreadPoolExecutor(max_workers=max(1, min(DEFAULT_MAX_WORKERS, len(stores)))) as executor:
+        return [doc for docs in executor.map(search, stores) for doc in docs]
+
+
+def top_k_by_similarity(docs: List[Document], question: str, embeddings: Embeddings,
+                        k: int = DEFAULT_TOP_K) -> List[Document]:
+    """Rank a merged result list by query similarity and keep k"""
+    if len(docs) <= k:
+        return docs
+    query = np.asarray(embeddings.embed_query(question))
+    vectors = np.asarray(embeddings.embed_documents([doc.page_content for doc in docs]))
+    order = np.argsort(-(vectors @ query), kind="stable")[:k]
+    return [docs[i] for i in order]
+
+
+def redundancy(docs: List[Document], embeddings: Embeddings) -> Dict[str, float]:
+    """Mean pairwise cosine similarity, duplicate chunks and distinct sources of a result"""
+    vectors = np.asarray(embeddings.embed_documents([doc.page_content for doc in docs]))
+    pairs = vectors @ vectors.T
+    upper = pairs[np.triu_indices(len(docs), k=1)]
+    texts = [doc.page_content for doc in docs]
+    return {
+        "mean_similarity": float(upper.mean()) if upper.size else 0.0,
+        "duplicates": len(texts) - len(set(texts)),
+        "sources": len({doc.metadata["source"] for doc in docs})
+    }
+
+
+def run(document_counts: List[int], query_count: int) -> List[Dict]:
+    """Benchmark both strategies at each document count"""
+    embeddings = FakeEmbeddings(dimension=EMBEDDING_SIZE)
+    rng = random.Random(0)
+    questions = [
+        "How do I service the pump safely?",
+        "Is the warranty void after servicing?",
+    ] + [" ".join(rng.sample(VOCABULARY, 3)) + "?" for _ in range(max(0, query_count - 2))]
+    questions = questions[:query_count]
+
+    results = []
+    for document_count in document_counts:
+        with tempfile.TemporaryDirectory() as path:
+            backend = ChromaBackend(path)
+            stores = build_stores(document_count, backend, embeddings)
+            global_retriever = MMRRetriever(backend, backend.collection_names(), embeddings,
+                                            k=DEFAULT_TOP_K, fetch_k=DEFAULT_TOP_K * 2)
+            strategies = {
+                "per_collection": lambda q: per_collection_mmr(stores, q),
+                "global": global_retriever.invoke
+            }
+            for name, retrieve in strategies.items():
+                retrieve(questions[0])  # warm-up
+                latencies, scores = [], []
+                for question in questions:
+                    started = time.perf_counter()
+                    docs = retrieve(question)
+                    latencies.append((time.perf_counter() - started) * 1000)
+                    scores.append(redundancy(top_k_by_similarity(docs, question, embeddings), embeddings))
+                results.append({
+                    "documents": document_count,
+                    "strategy": name,
+                    "median_ms": round(statistics.median(latencies), 2),
+                    "p95_ms": round(sorted(latencies)[int(0.95 * (len(latencies) - 1))], 2),
+                    "mean_similarity": round(statistics.mean(s["mean_similarity"] for s in scores), 3),
+                    "duplicates": round(statistics.mean(s["duplicates"] for s in scores), 2),
+                    "sources": round(statistics.mean(s["sources"] for s in scores), 2)
+                })
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare per-collection and global MMR retrieval")
+    parser.add_argument("--documents", type=int, nargs="+", default=[10, 50, 200])
+    parser.add_argument("--queries", type=int, default=20)
+    parser.add_argument("--json", help="Write the results to this file")
+    args = parser.parse_args()
+
+    results = run(args.documents, args.queries)
+    print(f"{'docs':>5} {'strategy':<15} {'median ms':>10} {'p95 ms':>8} {'mean sim':>9} {'dupes':>6} {'sources':>8}")
+    for row in results:
+        print(f"{row['documents']:>5} {row['strategy']:<15} {row['median_ms']:>10} {row['p95_ms']:>8} "
+              f"{row['mean_similarity']:>9} {row['duplicates']:>6} {row['sources']:>8}")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
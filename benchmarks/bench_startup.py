@@ -0,0 +1,99 @@
+"""
+Benchmark: cold start of the Streamlit apps
+
+Runs each app once with Streamlit's AppTest in a fresh Python process (so no
+module is already imported) from an empty working directory, and reports
+
+- first_render_ms: time from process start until the first script run has
+  finished, including importing Streamlit itself
+- script_ms: duration of the first script run alone
+- heavy_imports: provider, vector store and PDF modules that were imported
+
+No Ollama or Anthropic server is needed; model preloading fails quietly in
+the background.
+
+Usage:
+    python -m benchmarks.bench_startup [--apps app.py csv_rag_app.py] [--runs 3] [--json results.json]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+from typing import Dict, List
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+HEAVY_MODULES = [
+    "langchain_anthropic", "langchain_ollama", "ollama", "langchain_chroma", "chromadb",
+    "langchain_community.document_loaders", "fitz"
+]
+
+# Executed in a fresh interpreter for every run
+CHILD = """
+import json, sys, time
+started = time.perf_counter()
+from streamlit.testing.v1 import AppTest
+app = AppTest.from_file(sys.argv[1], default_timeout=300)
+script_started = time.perf_counter()
+app.run()
+finished = time.perf_counter()
+print(json.dumps({
+    "first_render_ms": (finished - started) * 1000,
+    "script_ms": (finished - script_started) * 1000,
+    "heavy_imports": [name for name in sys.argv[2:] if name in sys.modules],
+    "exception": [e.value for e in app.exception]
+}))
+"""
+
+
+def run_once(app_path: str) -> Dict:
+    """Start the app in a new process from an empty directory"""
+    with tempfile.TemporaryDirectory() as workdir:
+        env = dict(os.environ, PYTHONPATH=REPO_DIR)
+        output = subprocess.run(
+            [sys.executable, "-c", CHILD, app_path, *HEAVY_MODULES],
+            cwd=workdir, env=env, capture_output=True, text=True, check=True
+        ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def run(apps: List[str], runs: int) -> List[Dict]:
+    """Benchmark the cold start of each app"""
+    results = []
+    for app in apps:
+        samples = [run_once(os.path.join(REPO_DIR, app)) for _ in range(runs)]
+        results.append({
+            "app": app,
+            "first_render_ms": round(statistics.median(s["first_render_ms"] for s in samples), 1),
+            "script_ms": round(statistics.median(s["script_ms"] for s in samples), 1),
+            "heavy_imports": samples[-1]["heavy_imports"],
+            "exception": samples[-1]["exception"]
+        })
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure the cold start time of the Streamlit apps")
+    parser.add_argument("--apps", nargs="+", default=["app.py", "csv_rag_app.py"])
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--json", help="Write the results to this file")
+    args = parser.parse_args()
+
+    results = run(args.apps, args.runs)
+    print(f"{'app':<16} {'first render ms':>16} {'script ms':>10}  heavy imports")
+    for row in results:
+        print(f"{row['app']:<16} {row['first_render_ms']:>16} {row['script_ms']:>10}  "
+              f"{', '.join(row['heavy_imports']) or '-'}")
+        for message in row["exception"]:
+            print(f"  exception: {message}")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+"""
+Benchmark: the vector backends side by side
+
+Runs the same ingest and query workload against every backend registered in
+vector_backends.BACKENDS, through the VectorBackend interface the apps use.
+Random embeddings (768 dimensions, like nomic-embed-text) are stored in
+batches, then queried unfiltered and filtered to a third of the documents the
+way the unified index selects documents. For each backend and collection size
+it reports
+
+- ingest_s: storing every chunk
+- disk_mb: size of the persist directory afterwards
+- rss_mb: memory a fresh process gained by importing the backend, opening
+  the collection and answering the queries (Linux only)
+- open_ms: importing the backend, opening the collection and answering the
+  first query, as a new Streamlit worker process would
+- median_ms / p95_ms: query latency
+- recall: share of the brute-force top-k found (the flat index is exact,
+  Chroma's HNSW search is approximate)
+
+Queries run in a fresh process per backend so the memory figures are not
+shared. No Ollama is needed.
+
+Usage:
+    python -m benchmarks.bench_vector_backend [--chunks 1000 5000] [--queries 50] [--json results.json]
+"""
+
+import argparse
+import json
+import multiprocessing
+import statistics
+import tempfile
+import time
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from benchmarks.fake_models import random_vectors
+from retrieval import DEFAULT_TOP_K
+from unified_index import source_filter
+from vector_backends import BACKENDS, open_backend
+
+DOCUMENTS = 30
+WRITE_BATCH_SIZE = 500
+COLLECTION_NAME = "documents"
+
+
+def make_chunks(count: int, seed: int = 0):
+    """Random unit-length embeddings with ids and source metadata spread over DOCUMENTS files"""
+    # Unit length, so Chroma's L2 ranking matches cosine similarity
+    vectors = random_vectors(count, seed=seed)
+    ids = [f"chunk-{i}" for i in range(count)]
+    metadatas = [{"source": f"manual_{i % DOCUMENTS:02d}.pdf", "page": i} for i in range(count)]
+    return ids, vectors, metadatas
+
+
+def exact_top_k(vectors: np.ndarray, metadatas: List[dict], query: np.ndarray, where, k: int) -> List[str]:
+    scores = vectors @ query
+    if where:
+        allowed = set(where["source"]["$in"]) if isinstance(where["source"], dict) else {where["source"]}
+        scores = np.where([m["source"] in allowed for m in metadatas], scores, -np.inf)
+    return [f"chunk-{i}" for i in np.argsort(-scores)[:k]]
+
+
+def rss_mb() -> Optional[float]:
+    """Resident memory of this process in MB, or None where /proc is missing"""
+    try:
+        with open("/proc/self/status") as status:
+            for line in status:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+
+def ingest(backend, ids: List[str], vectors: np.ndarray, metadatas: List[dict]) -> float:
+    """Store every chunk in batches, returns the seconds taken"""
+    started = time.perf_counter()
+    for start in range(0, len(ids), WRITE_BATCH_SIZE):
+        end = start + WRITE_BATCH_SIZE
+        backend.upsert(COLLECTION_NAME, ids[start:end], vectors[start:end],
+                       [f"text of {i}" for i in ids[start:end]], metadatas[start:end])
+    return time.perf_counter() - started
+
+
+def measure_queries(name: str, path: str, queries: np.ndarray, filters: Dict, expected: Dict, k: int) -> Dict:
+    """Open a backend in this (fresh) process and time the queries of each filter"""
+    baseline = rss_mb()
+    started = time.perf_counter()
+    backend = open_backend(name, path)
+    backend.query(COLLECTION_NAME, queries[0], k)
+    open_ms = (time.perf_counter() - started) * 1000
+
+    results = {}
+    for filter_name, where in filters.items():
+        latencies, recalls = [], []
+        for query, wanted in zip(queries, expected[filter_name]):
+            started = time.perf_counter()
+            hits = backend.query(COLLECTION_NAME, query, k, where=where)
+            latencies.append((time.perf_counter() - started) * 1000)
+            recalls.append(len(set(wanted) & {hit["id"] for hit in hits}) / len(wanted))
+        results[filter_name] = {
+            "open_ms": round(open_ms, 2),
+            "median_ms": round(statistics.median(latencies), 3),
+            "p95_ms": round(sorted(latencies)[int(0.95 * (len(latencies) - 1))], 3),
+            "recall": round(statistics.mean(recalls), 3)
+        }
+    current = rss_mb()
+    rss = round(current - baseline, 1) if current is not None and baseline is not None else None
+    for row in results.values():
+        row["rss_mb"] = rss
+    return results
+
+
+def run(chunk_counts: List[int], query_count: int, backends: List[str], k: int = DEFAULT_TOP_K) -> List[Dict]:
+    """Benchmark each backend at each collection size"""
+    queries = random_vectors(query_count, seed=1)
+    filters = {"none": None, "third": source_filter([f"manual_{i:02d}.pdf" for i in range(0, DOCUMENTS, 3)])}
+    context = multiprocessing.get_context("spawn")
+    results = []
+    for count in chunk_counts:
+        ids, vectors, metadatas = make_chunks(count)
+        expected = {
+            filter_name: [exact_top_k(vectors, metadatas, query, where, k) for query in queries]
+            for filter_name, where in filters.items()
+        }
+        for name in backends:
+            with tempfile.TemporaryDirectory() as path:
+                backend = open_backend(name, path)
+                ingest_s = ingest(backend, ids, vectors, metadatas)
+                disk_mb = backend.disk_bytes() / 1024 / 1024
+                # A new process per backend, like a freshly started worker process
+                with context.Pool(1) as pool:
+                    measured = pool.apply(measure_queries, (name, path, queries, filters, expected, k))
+            for filter_name, row in measured.items():
+                results.append({
+                    "chunks": count, "filter": filter_name, "backend": name,
+                    "ingest_s": round(ingest_s, 2), "disk_mb": round(disk_mb, 1), **row
+                })
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the vector backends on the same workload")
+    parser.add_argument("--chunks", type=int, nargs="+", default=[1000, 5000])
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--backends", nargs="+", default=sorted(BACKENDS), choices=sorted(BACKENDS))
+    parser.add_argument("--json", help="Write the results to this file")
+    args = parser.parse_args()
+
+    results = run(args.chunks, args.queries, args.backends)
+    print(f"{'chunks':>6} {'filter':<6} {'backend':<7} {'ingest s':>9} {'disk MB':>8} {'RSS MB':>7} "
+          f"{'open ms':>8} {'median ms':>10} {'p95 ms':>8} {'recall':>7}")
+    for row in results:
+        print(f"{row['chunks']:>6} {row['filter']:<6} {row['backend']:<7} {row['ingest_s']:>9} "
+              f"{row['disk_mb']:>8} {str(row['rss_mb']):>7} {row['open_ms']:>8} "
+              f"{row['median_ms']:>10} {row['p95_ms']:>8} {row['recall']:>7}")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
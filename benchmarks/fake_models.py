@@ -0,0 +1,116 @@
+"""
+Deterministic stand-ins for the embedding model and the LLM
+
+The benchmarks drive the apps' real ingestion and retrieval code without
+Ollama or Anthropic. FakeEmbeddings hashes the words of a text into a fixed
+number of dimensions, so texts sharing words are close and retrieval
+behaves sensibly, and sleeps for a configurable time per request and per
+text. FakeLLM streams a fixed-length answer with a configurable delay before
+the first token and between tokens. Both count their calls.
+"""
+
+import hashlib
+import re
+import threading
+import time
+from typing import Any, Iterator, List, Optional
+
+import numpy as np
+from langchain_core.callbacks import CallbackManagerForLLMRun
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models.llms import LLM
+from langchain_core.outputs import GenerationChunk
+
+# nomic-embed-text, the apps' embedding model, returns 768 dimensions
+DEFAULT_DIMENSION = 768
+
+
+def hashed_vector(text: str, dimension: int = DEFAULT_DIMENSION) -> List[float]:
+    """Unit-length bag-of-words vector of a text, the same on every run"""
+    vector = np.zeros(dimension, dtype=np.float32)
+    for word in re.findall(r"\w+", text.lower()):
+        digest = hashlib.blake2b(word.encode("utf-8"), digest_size=8).digest()
+        bucket = int.from_bytes(digest[:4], "little") % dimension
+        vector[bucket] += 1.0 if digest[4] & 1 else -1.0
+    norm = np.linalg.norm(vector)
+    if norm == 0:
+        vector[0] = norm = 1.0
+    return (vector / norm).tolist()
+
+
+def random_vectors(count: int, dimension: int = DEFAULT_DIMENSION, seed: int = 0) -> np.ndarray:
+    """Random unit-length vectors, normalized like the embedding model's output"""
+    vectors = np.random.default_rng(seed).normal(size=(count, dimension))
+    return (vectors / np.linalg.norm(vectors, axis=1, keepdims=True)).astype(np.float32)
+
+
+def answer_tokens(prompt: str, count: int) -> List[str]:
+    """Deterministic answer of count tokens, echoing the words of the prompt's question"""
+    words = re.findall(r"\w+", prompt.rsplit("Question:", 1)[-1]) or ["answer"]
+    return [f"{words[i % len(words)]} " for i in range(count)]
+
+
+class FakeEmbeddings(Embeddings):
+    """Hashed bag-of-words embeddings with simulated model latency"""
+
+    def __init__(self, dimension: int = DEFAULT_DIMENSION, request_latency: float = 0.0,
+                 text_latency: float = 0.0):
+        """
+        Args:
+            dimension: Length of the vectors
+            request_latency: Seconds every embed_documents or embed_query call takes
+            text_latency: Additional seconds per text embedded
+        """
+        self.dimension = dimension
+        self.request_latency = request_latency
+        self.text_latency = text_latency
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.texts = 0
+
+    def _embed(self, texts: List[str]) -> List[List[float]]:
+        with self._lock:
+            self.requests += 1
+            self.texts += len(texts)
+        delay = self.request_latency + self.text_latency * len(texts)
+        if delay:
+            time.sleep(delay)
+        return [hashed_vector(text, self.dimension) for text in texts]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self._embed(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._embed([text])[0]
+
+
+class FakeLLM(LLM):
+    """Streams a deterministic answer with simulated time to first token and token rate"""
+
+    first_token_latency: float = 0.0
+    token_latency: float = 0.0
+    answer_tokens: int = 40
+    calls: int = 0
+    prompt_chars: int = 0
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-benchmark"
+
+    def _call(self, prompt: str, stop: Optional[List[str]] = None,
+              run_manager: Optional[CallbackManagerForLLMRun] = None, **kwargs: Any) -> str:
+        return "".join(chunk.text for chunk in self._stream(prompt, stop, run_manager, **kwargs))
+
+    def _stream(self, prompt: str, stop: Optional[List[str]] = None,
+                run_manager: Optional[CallbackManagerForLLMRun] = None, **kwargs: Any) -> Iterator[GenerationChunk]:
+        self.calls += 1
+        self.prompt_chars += len(prompt)
+        if self.first_token_latency:
+            time.sleep(self.first_token_latency)
+        for i, token in enumerate(answer_tokens(prompt, self.answer_tokens)):
+            if i and self.token_latency:
+                time.sleep(self.token_latency)
+            chunk = GenerationChunk(text=token)
+            if run_manager:
+                run_manager.on_llm_new_token(token, chunk=chunk)
+            yield chunk
@@ -0,0 +1,552 @@
+"""
+Local stand-in for the Ollama and Anthropic HTTP APIs
+
+Serves the endpoints the apps use, so the real clients (ollama,
+langchain_ollama, langchain_anthropic) can run against it without a GPU, a
+model download or an API key:
+
+- Ollama: /api/embed (and the older /api/embeddings), /api/generate,
+  /api/chat, /api/tags, /api/ps and /api/version. Streaming responses are
+  newline-delimited JSON, as Ollama sends them. Empty embed, generate or chat
+  requests load a model, and keep_alive 0 unloads it, which is how
+  ModelResidencyManager preloads and releases models.
+- Anthropic: /v1/messages, with and without server-sent event streaming.
+
+Embeddings are the hashed bag-of-words vectors of benchmarks/fake_models.py
+and answers echo the question, so results are the same on every run. Latency
+is injectable: a fixed delay per request, per embedded text, before the first
+token, a token rate, the time to load a model that is not loaded (or whose
+keep_alive has expired), and a limit on requests served in parallel, with
+the rest queuing like Ollama's OLLAMA_NUM_PARALLEL. Counters are available
+from stats() or GET /_stand_in/stats.
+
+Point the apps at it with OLLAMA_HOST, and ANTHROPIC_BASE_URL plus any
+ANTHROPIC_API_KEY.
+
+Usage:
+    python -m benchmarks.stand_in_server [--host 127.0.0.1] [--port 11434] [--request-ms 0]
+        [--embed-text-ms 0] [--load-ms 0] [--first-token-ms 0] [--tokens-per-second 0]
+        [--max-parallel 0] [--answer-tokens 40] [--dimension 768]
+"""
+
+import argparse
+import json
+import re
+import threading
+import time
+import uuid
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Iterator, List, Optional
+
+from benchmarks.fake_models import DEFAULT_DIMENSION, answer_tokens, hashed_vector
+from models_config import EMBEDDING_MODEL, MODELS
+
+# Ollama keeps a model loaded for five minutes after a request unless told otherwise
+DEFAULT_KEEP_ALIVE_SECONDS = 300
+OLLAMA_VERSION = "0.0.0-stand-in"
+DURATION_PATTERN = re.compile(r"(\d+(?:\.\d+)?)(ms|s|m|h)")
+DURATION_UNITS = {"ms": 0.001, "s": 1, "m": 60, "h": 3600}
+
+
+def default_models() -> List[str]:
+    """The Ollama models of models_config, listed by /api/tags"""
+    return [model["name"] for model in MODELS if model["provider"] == "ollama"] + [EMBEDDING_MODEL["name"]]
+
+
+def keep_alive_seconds(keep_alive: Any) -> Optional[float]:
+    """
+    Seconds a model stays loaded after a request, None for forever.
+
+    Accepts what Ollama accepts: seconds as a number, a duration such as
+    "5m" or "1h30m", and any negative value to keep the model loaded.
+    """
+    if keep_alive is None or keep_alive == "":
+        return DEFAULT_KEEP_ALIVE_SECONDS
+    if isinstance(keep_alive, str):
+        value = keep_alive.strip()
+        magnitude = value.lstrip("-")
+        if magnitude and DURATION_PATTERN.sub("", magnitude) == "":
+            seconds = sum(float(number) * DURATION_UNITS[unit] for number, unit in DURATION_PATTERN.findall(magnitude))
+            return None if value.startswith("-") else seconds
+        keep_alive = float(value)
+    return None if keep_alive < 0 else float(keep_alive)
+
+
+def timestamp(when: Optional[datetime] = None) -> str:
+    """RFC 3339 time in UTC, as Ollama formats created_at"""
+    return (when or datetime.now(timezone.utc)).strftime("%Y-%m-%dT%H:%M:%S.%fZ")
+
+
+def prompt_text(content: Any) -> str:
+    """Text of an Anthropic or Ollama message content, which is a string or a list of blocks"""
+    if isinstance(content, str):
+        return content
+    return "\n".join(block.get("text", "") for block in content or [] if isinstance(block, dict))
+
+
+class StandInServer:
+    """Threaded HTTP server answering Ollama and Anthropic API requests with deterministic fakes"""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, request_latency: float = 0.0,
+                 embed_text_latency: float = 0.0, load_delay: float = 0.0, first_token_latency: float = 0.0,
+                 tokens_per_second: float = 0.0, max_parallel: int = 0, answer_tokens: int = 40,
+                 dimension: int = DEFAULT_DIMENSION, models: Optional[List[str]] = None):
+        """
+        Args:
+            host: Interface to listen on
+            port: Port to listen on, 0 for any free port
+            request_latency: Seconds every API request takes before it is answered
+            embed_text_latency: Additional seconds per text embedded
+            load_delay: Seconds to load an Ollama model that is not loaded
+            first_token_latency: Seconds from the start of a generation to its first token
+            tokens_per_second: Rate of the following tokens, 0 for no delay
+            max_parallel: Requests served at the same time, 0 for no limit
+            answer_tokens: Length of every answer, Anthropic's max_tokens permitting
+            dimension: Length of the embedding vectors
+            models: Ollama models listed by /api/tags (any model name is served)
+        """
+        self.request_latency = request_latency
+        self.embed_text_latency = embed_text_latency
+        self.load_delay = load_delay
+        self.first_token_latency = first_token_latency
+        self.tokens_per_second = tokens_per_second
+        self.answer_tokens = answer_tokens
+        self.dimension = dimension
+        self.models = list(models) if models is not None else default_models()
+        self._parallel = threading.BoundedSemaphore(max_parallel) if max_parallel > 0 else None
+        self._lock = threading.Lock()
+        self._model_locks: Dict[str, threading.Lock] = {}
+        # Loaded model -> monotonic time its keep_alive expires, None for never
+        self._loaded: Dict[str, Optional[float]] = {}
+        self._requests: Counter = Counter()
+        self._loads: Counter = Counter()
+        self._active = 0
+        self._peak_active = 0
+        self._embedded = 0
+        self._tokens = 0
+        self._thread: Optional[threading.Thread] = None
+        self._httpd = ThreadingHTTPServer((host, port), _make_handler(self))
+        self._httpd.daemon_threads = True
+
+    @property
+    def url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "StandInServer":
+        """Serve requests on a background thread"""
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name="stand-in-server", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        """Stop serving and close the listening socket"""
+        if self._thread is not None:
+            self._httpd.shutdown()
+            self._thread.join()
+            self._thread = None
+        self._httpd.server_close()
+
+    def __enter__(self) -> "StandInServer":
+        return self.start()
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
+
+    def serve_forever(self) -> None:
+        """Serve requests on the calling thread until interrupted"""
+        try:
+            self._httpd.serve_forever()
+        finally:
+            self._httpd.server_close()
+
+    # Model residency
+
+    def loaded_models(self) -> Dict[str, Optional[float]]:
+        """Loaded models and the monotonic time their keep_alive expires, dropping expired ones"""
+        now = time.monotonic()
+        with self._lock:
+            for model, expires in list(self._loaded.items()):
+                if expires is not None and expires <= now:
+                    del self._loaded[model]
+            return dict(self._loaded)
+
+    def ensure_loaded(self, model: str) -> float:
+        """Load a model if it is not loaded, returns the seconds spent loading it"""
+        with self._lock:
+            model_lock = self._model_locks.setdefault(model, threading.Lock())
+        # Requests arriving during a load wait for it rather than loading again
+        with model_lock:
+            if model in self.loaded_models():
+                return 0.0
+            if self.load_delay:
+                time.sleep(self.load_delay)
+            with self._lock:
+                self._loaded[model] = None
+                self._loads[model] += 1
+            return self.load_delay
+
+    def release(self, model: str, keep_alive: Any) -> None:
+        """Apply a request's keep_alive to a model after the request"""
+        seconds = keep_alive_seconds(keep_alive)
+        with self._lock:
+            if seconds == 0:
+                self._loaded.pop(model, None)
+            elif model in self._loaded:
+                self._loaded[model] = None if seconds is None else time.monotonic() + seconds
+
+    # Request accounting
+
+    def count(self, endpoint: str) -> None:
+        with self._lock:
+            self._requests[endpoint] += 1
+
+    def begin(self, endpoint: str) -> None:
+        """Count a model request, waiting for a free slot if parallelism is limited"""
+        if self._parallel is not None:
+            self._parallel.acquire()
+        self.count(endpoint)
+        with self._lock:
+            self._active += 1
+            self._peak_active = max(self._peak_active, self._active)
+        if self.request_latency:
+            time.sleep(self.request_latency)
+
+    def end(self) -> None:
+        with self._lock:
+            self._active -= 1
+        if self._parallel is not None:
+            self._parallel.release()
+
+    def stats(self) -> Dict[str, Any]:
+        """Requests per endpoint, loads per model, peak concurrent requests, texts embedded and tokens sent"""
+        loaded = sorted(self.loaded_models())
+        with self._lock:
+            return {
+                "requests": dict(self._requests),
+                "loads": dict(self._loads),
+                "loaded": loaded,
+                "peak_parallel": self._peak_active,
+                "embedded_texts": self._embedded,
+                "generated_tokens": self._tokens,
+            }
+
+    # Fake models
+
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        if self.embed_text_latency and texts:
+            time.sleep(self.embed_text_latency * len(texts))
+        with self._lock:
+            self._embedded += len(texts)
+        return [hashed_vector(text, self.dimension) for text in texts]
+
+    def generate(self, prompt: str, limit: Optional[int] = None) -> Iterator[str]:
+        """Answer tokens, paced by the first token latency and the token rate"""
+        count = self.answer_tokens if limit is None else min(self.answer_tokens, limit)
+        if self.first_token_latency:
+            time.sleep(self.first_token_latency)
+        for i, token in enumerate(answer_tokens(prompt, count)):
+            if i and self.tokens_per_second:
+                time.sleep(1.0 / self.tokens_per_second)
+            with self._lock:
+                self._tokens += 1
+            yield token
+
+
+def _make_handler(server: StandInServer):
+    class Handler(_StandInHandler):
+        stand_in = server
+    return Handler
+
+
+class _StandInHandler(BaseHTTPRequestHandler):
+    """Routes requests to the Ollama and Anthropic handlers"""
+
+    protocol_version = "HTTP/1.1"
+    server_version = "StandIn/1.0"
+    stand_in: StandInServer
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        path = self.path.split("?", 1)[0]
+        if path == "/":
+            return self._send_text("Ollama is running")
+        if path == "/api/version":
+            return self._send_json({"version": OLLAMA_VERSION})
+        if path == "/_stand_in/stats":
+            return self._send_json(self.stand_in.stats())
+        if path in ("/api/tags", "/api/ps"):
+            self.stand_in.count(path)
+        if path == "/api/tags":
+            return self._send_json({"models": [self._model_info(name) for name in self.stand_in.models]})
+        if path == "/api/ps":
+            return self._send_json({"models": [
+                dict(self._model_info(name), expires_at=self._expires_at(expires), size_vram=0)
+                for name, expires in sorted(self.stand_in.loaded_models().items())
+            ]})
+        self._send_error(404, f"{path} not found")
+
+    def do_POST(self):
+        path = self.path.split("?", 1)[0]
+        routes = {
+            "/api/embed": self._ollama_embed,
+            "/api/embeddings": self._ollama_embeddings,
+            "/api/generate": self._ollama_generate,
+            "/api/chat": self._ollama_chat,
+            "/v1/messages": self._anthropic_messages,
+        }
+        if path not in routes:
+            self._read_body()
+            return self._send_error(404, f"{path} not found")
+        try:
+            request = json.loads(self._read_body() or b"{}")
+        except ValueError as e:
+            return self._send_error(400, f"invalid JSON: {e}")
+        self.stand_in.begin(path)
+        try:
+            routes[path](request)
+        finally:
+            self.stand_in.end()
+
+    # Ollama
+
+    def _ollama_embed(self, request):
+        started = time.perf_counter()
+        model = request.get("model", "")
+        texts = request.get("input") or []
+        if isinstance(texts, str):
+            texts = [texts]
+        load = self.stand_in.ensure_loaded(model)
+        embeddings = self.stand_in.embed(texts)
+        self.stand_in.release(model, request.get("keep_alive"))
+        self._send_json({
+            "model": model,
+            "embeddings": embeddings,
+            "total_duration": _ns(time.perf_counter() - started),
+            "load_duration": _ns(load),
+            "prompt_eval_count": sum(len(text.split()) for text in texts),
+        })
+
+    def _ollama_embeddings(self, request):
+        model = request.get("model", "")
+        self.stand_in.ensure_loaded(model)
+        embedding = self.stand_in.embed([request.get("prompt", "")])[0]
+        self.stand_in.release(model, request.get("keep_alive"))
+        self._send_json({"embedding": embedding})
+
+    def _ollama_generate(self, request):
+        self._ollama_completion(request, request.get("prompt") or "", chat=False)
+
+    def _ollama_chat(self, request):
+        prompt = "\n".join(prompt_text(message.get("content")) for message in request.get("messages") or [])
+        self._ollama_completion(request, prompt, chat=True)
+
+    def _ollama_completion(self, request, prompt: str, chat: bool):
+        started = time.perf_counter()
+        model = request.get("model", "")
+        load = self.stand_in.ensure_loaded(model)
+
+        def message(text: str, done: bool, **fields) -> Dict[str, Any]:
+            body = {"model": model, "created_at": timestamp()}
+            if chat:
+                body["message"] = {"role": "assistant", "content": text}
+            else:
+                body["response"] = text
+            body["done"] = done
+            body.update(fields)
+            return body
+
+        # An empty prompt only loads, or with keep_alive 0 unloads, the model
+        if not prompt:
+            self.stand_in.release(model, request.get("keep_alive"))
+            unload = keep_alive_seconds(request.get("keep_alive")) == 0
+            return self._send_json(message(
+                "", True, done_reason="unload" if unload else "load",
+                total_duration=_ns(time.perf_counter() - started), load_duration=_ns(load)
+            ))
+
+        generating = time.perf_counter()
+        tokens = self.stand_in.generate(prompt)
+        if request.get("stream", True):
+            self._start_stream("application/x-ndjson")
+            count = 0
+            for token in tokens:
+                count += 1
+                self._write_chunk(json.dumps(message(token, False)).encode() + b"\n")
+            final = message("", True, **self._completion_timings(started, load, generating, prompt, count))
+            self._write_chunk(json.dumps(final).encode() + b"\n")
+            self._end_stream()
+        else:
+            tokens = list(tokens)
+            self._send_json(message("".join(tokens), True, **self._completion_timings(
+                started, load, generating, prompt, len(tokens)
+            )))
+        self.stand_in.release(model, request.get("keep_alive"))
+
+    @staticmethod
+    def _completion_timings(started: float, load: float, generating: float, prompt: str, count: int):
+        now = time.perf_counter()
+        return {
+            "done_reason": "stop",
+            "total_duration": _ns(now - started),
+            "load_duration": _ns(load),
+            "prompt_eval_count": len(prompt.split()),
+            "prompt_eval_duration": 0,
+            "eval_count": count,
+            "eval_duration": _ns(now - generating),
+        }
+
+    def _model_info(self, name: str) -> Dict[str, Any]:
+        return {
+            "name": name,
+            "model": name,
+            "modified_at": timestamp(),
+            "size": 0,
+            "digest": uuid.uuid5(uuid.NAMESPACE_URL, name).hex,
+            "details": {"format": "gguf", "family": "stand-in"},
+        }
+
+    @staticmethod
+    def _expires_at(expires: Optional[float]) -> str:
+        if expires is None:
+            # Ollama reports models kept loaded forever as expiring in the distant future
+            return timestamp(datetime(2318, 1, 1, tzinfo=timezone.utc))
+        return timestamp(datetime.now(timezone.utc) + timedelta(seconds=expires - time.monotonic()))
+
+    # Anthropic
+
+    def _anthropic_messages(self, request):
+        model = request.get("model", "")
+        max_tokens = request.get("max_tokens")
+        if not isinstance(max_tokens, int) or max_tokens < 1:
+            return self._send_json({"type": "error", "error": {
+                "type": "invalid_request_error", "message": "max_tokens: field required"
+            }}, status=400)
+        prompt = "\n".join(prompt_text(message.get("content")) for message in request.get("messages") or [])
+        input_tokens = len(prompt_text(request.get("system")).split()) + len(prompt.split())
+        stop_reason = "max_tokens" if max_tokens < self.stand_in.answer_tokens else "end_turn"
+        message = {
+            "id": f"msg_{uuid.uuid4().hex[:24]}",
+            "type": "message",
+            "role": "assistant",
+            "model": model,
+            "content": [],
+            "stop_reason": None,
+            "stop_sequence": None,
+            "usage": {"input_tokens": input_tokens, "output_tokens": 0},
+        }
+        tokens = self.stand_in.generate(prompt, limit=max_tokens)
+
+        if not request.get("stream"):
+            tokens = list(tokens)
+            message["content"] = [{"type": "text", "text": "".join(tokens)}]
+            message["stop_reason"] = stop_reason
+            message["usage"]["output_tokens"] = len(tokens)
+            return self._send_json(message)
+
+        self._start_stream("text/event-stream")
+        self._send_event("message_start", {"type": "message_start", "message": message})
+        self._send_event("content_block_start", {
+            "type": "content_block_start", "index": 0, "content_block": {"type": "text", "text": ""}
+        })
+        self._send_event("ping", {"type": "ping"})
+        count = 0
+        for token in tokens:
+            count += 1
+            self._send_event("content_block_delta", {
+                "type": "content_block_delta", "index": 0, "delta": {"type": "text_delta", "text": token}
+            })
+        self._send_event("content_block_stop", {"type": "content_block_stop", "index": 0})
+        self._send_event("message_delta", {
+            "type": "message_delta",
+            "delta": {"stop_reason": stop_reason, "stop_sequence": None},
+            "usage": {"output_tokens": count},
+        })
+        self._send_event("message_stop", {"type": "message_stop"})
+        self._end_stream()
+
+    # HTTP
+
+    def _read_body(self) -> bytes:
+        length = int(self.headers.get("Content-Length") or 0)
+        return self.rfile.read(length) if length else b""
+
+    def _send_bytes(self, body: bytes, content_type: str, status: int = 200) -> None:
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_text(self, text: str) -> None:
+        self._send_bytes(text.encode(), "text/plain; charset=utf-8")
+
+    def _send_json(self, body: Any, status: int = 200) -> None:
+        self._send_bytes(json.dumps(body).encode(), "application/json; charset=utf-8", status)
+
+    def _send_error(self, status: int, message: str) -> None:
+        self._send_json({"error": message}, status)
+
+    def _start_stream(self, content_type: str) -> None:
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Transfer-Encoding", "chunked")
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+
+    def _write_chunk(self, data: bytes) -> None:
+        self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+        self.wfile.flush()
+
+    def _send_event(self, event: str, data: Dict[str, Any]) -> None:
+        self._write_chunk(f"event: {event}\ndata: {json.dumps(data)}\n\n".encode())
+
+    def _end_stream(self) -> None:
+        self.wfile.write(b"0\r\n\r\n")
+        self.wfile.flush()
+
+
+def _ns(seconds: float) -> int:
+    return int(seconds * 1e9)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local stand-in for the Ollama and Anthropic APIs")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11434)
+    parser.add_argument("--request-ms", type=float, default=0.0, help="Delay of every request")
+    parser.add_argument("--embed-text-ms", type=float, default=0.0, help="Additional delay per embedded text")
+    parser.add_argument("--load-ms", type=float, default=0.0, help="Time to load a model that is not loaded")
+    parser.add_argument("--first-token-ms", type=float, default=0.0)
+    parser.add_argument("--tokens-per-second", type=float, default=0.0, help="Token rate, 0 for no limit")
+    parser.add_argument("--max-parallel", type=int, default=0, help="Requests served at once, 0 for no limit")
+    parser.add_argument("--answer-tokens", type=int, default=40)
+    parser.add_argument("--dimension", type=int, default=DEFAULT_DIMENSION)
+    args = parser.parse_args()
+
+    server = StandInServer(
+        args.host, args.port,
+        request_latency=args.request_ms / 1000,
+        embed_text_latency=args.embed_text_ms / 1000,
+        load_delay=args.load_ms / 1000,
+        first_token_latency=args.first_token_ms / 1000,
+        tokens_per_second=args.tokens_per_second,
+        max_parallel=args.max_parallel,
+        answer_tokens=args.answer_tokens,
+        dimension=args.dimension,
+    )
+    print(f"Serving the Ollama and Anthropic APIs at {server.url}")
+    print(f"  OLLAMA_HOST={server.url}")
+    print(f"  ANTHROPIC_BASE_URL={server.url} ANTHROPIC_API_KEY=stand-in")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
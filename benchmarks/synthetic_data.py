@@ -0,0 +1,149 @@
+"""
+Synthetic documents for the benchmarks
+
+Generates PDFs, Markdown files and LoRa sensor CSVs of a chosen size from a
+seeded random generator, so every run and every commit ingests exactly the
+same bytes. The text mixes a maintenance-manual vocabulary with part
+numbers and error codes, which gives both the vector and the keyword search
+something to find. PDFs are written directly (one Helvetica text page per
+page), so no PDF library is needed.
+"""
+
+import os
+import random
+from datetime import date, timedelta
+from typing import List
+
+VOCABULARY = (
+    "pump valve seal bearing turbine impeller shaft coupling filter gasket motor sensor "
+    "pressure temperature flow voltage torque lubricant housing inlet outlet bracket "
+    "inspect replace tighten calibrate drain prime flush align lubricate reset check "
+    "monthly weekly annual before after during startup shutdown maintenance warning "
+    "the a of to and with for on in at by from until every each"
+).split()
+
+VERBS = ["inspect", "replace", "tighten", "calibrate", "drain", "prime", "flush", "align", "lubricate", "reset"]
+NOUNS = ["pump", "valve", "seal", "bearing", "turbine", "impeller", "shaft", "coupling", "filter", "gasket", "motor"]
+
+PAGE_LINES = 36
+LINE_WORDS = 13
+
+
+def sentence(rng: random.Random) -> str:
+    """One sentence of manual text, sometimes naming a part number or error code"""
+    words = [rng.choice(VOCABULARY) for _ in range(rng.randint(8, 16))]
+    if rng.random() < 0.3:
+        words.insert(rng.randrange(len(words)), f"P-{rng.randint(1000, 9999)}")
+    if rng.random() < 0.15:
+        words.insert(rng.randrange(len(words)), f"E{rng.randint(100, 999)}")
+    words[0] = words[0].capitalize()
+    return " ".join(words) + "."
+
+
+def page_lines(rng: random.Random, number: int) -> List[str]:
+    """Lines of one manual page"""
+    words = f"Section {number}.".split()
+    while len(words) < PAGE_LINES * LINE_WORDS:
+        words.extend(sentence(rng).split())
+    return [" ".join(words[i:i + LINE_WORDS]) for i in range(0, PAGE_LINES * LINE_WORDS, LINE_WORDS)]
+
+
+def _pdf_string(text: str) -> str:
+    return "(" + text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)") + ")"
+
+
+def make_pdf(pages: int, seed: int = 0) -> bytes:
+    """A text PDF with the given number of pages"""
+    rng = random.Random(seed)
+    objects = ["<< /Type /Catalog /Pages 2 0 R >>", None, "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    kids = []
+    for number in range(1, pages + 1):
+        content = "BT /F1 9 Tf 12 TL 40 760 Td " + " T* ".join(
+            f"{_pdf_string(line)} Tj" for line in page_lines(rng, number)
+        ) + " ET"
+        objects.append(f"<< /Length {len(content)} >>\nstream\n{content}\nendstream")
+        objects.append(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {len(objects)} 0 R >>"
+        )
+        kids.append(f"{len(objects)} 0 R")
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {pages} >>"
+
+    output = b"%PDF-1.4\n"
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(output))
+        output += f"{number} 0 obj\n{body}\nendobj\n".encode("latin-1")
+    xref = len(output)
+    output += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode("latin-1")
+    output += "".join(f"{offset:010d} 00000 n \n" for offset in offsets).encode("latin-1")
+    output += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode("latin-1")
+    return output
+
+
+def make_markdown(sections: int, seed: int = 0) -> bytes:
+    """A Markdown manual with the given number of sections of a few paragraphs each"""
+    rng = random.Random(seed)
+    parts = ["# Maintenance Guide\n"]
+    for number in range(1, sections + 1):
+        parts.append(f"## {rng.choice(VERBS).capitalize()} the {rng.choice(NOUNS)} ({number})\n")
+        for _ in range(rng.randint(2, 4)):
+            parts.append(" ".join(sentence(rng) for _ in range(rng.randint(3, 6))) + "\n")
+        if rng.random() < 0.3:
+            parts.append("\n".join(f"- {sentence(rng)}" for _ in range(3)) + "\n")
+    return "\n".join(parts).encode("utf-8")
+
+
+def write_sensor_csvs(directory: str, days: int, interval_minutes: int = 5, seed: int = 0,
+                      start: date = date(2025, 1, 1)) -> List[str]:
+    """Write one lora_data_<date>.csv file per day of readings, returns their paths"""
+    rng = random.Random(seed)
+    os.makedirs(directory, exist_ok=True)
+    paths = []
+    temperature, humidity, pressure, battery = 18.0, 60.0, 1013.0, 4.1
+    for day in range(days):
+        path = os.path.join(directory, f"lora_data_{start + timedelta(days=day)}.csv")
+        lines = ["timestamp,temperature,humidity,pressure,battery,charging,interval,rssi,snr"]
+        for minute in range(0, 24 * 60, interval_minutes):
+            temperature = min(max(temperature + rng.uniform(-0.3, 0.3), -5.0), 35.0)
+            humidity = min(max(humidity + rng.uniform(-1.0, 1.0), 20.0), 95.0)
+            pressure = min(max(pressure + rng.uniform(-0.2, 0.2), 990.0), 1030.0)
+            charging = int(7 * 60 <= minute < 17 * 60)
+            battery = min(max(battery + (0.002 if charging else -0.001), 3.5), 4.2)
+            lines.append(
+                f"{minute // 60:02d}:{minute % 60:02d}:00,{temperature:.1f},{humidity:.1f},{pressure:.1f},"
+                f"{battery:.2f},{charging},{interval_minutes * 60},{rng.randint(-95, -75)},{rng.uniform(5, 10):.1f}"
+            )
+        with open(path, "w") as f:
+            f.write("\n".join(lines) + "\n")
+        paths.append(path)
+    return paths
+
+
+def make_questions(count: int, seed: int = 0) -> List[str]:
+    """Questions about the synthetic manuals"""
+    rng = random.Random(seed)
+    templates = [
+        "How do I {verb} the {noun}?",
+        "How often should I {verb} the {noun}?",
+        "What does error E{code} mean for the {noun}?",
+        "Which part number fits the {noun} {other}?",
+    ]
+    return [
+        rng.choice(templates).format(verb=rng.choice(VERBS), noun=rng.choice(NOUNS),
+                                     other=rng.choice(NOUNS), code=rng.randint(100, 999))
+        for _ in range(count)
+    ]
+
+
+def make_sensor_questions(count: int, seed: int = 0) -> List[str]:
+    """Questions about the synthetic sensor readings"""
+    rng = random.Random(seed)
+    templates = [
+        "What was the temperature trend on day {day}?",
+        "When was the coldest period?",
+        "What was the average humidity overnight?",
+        "How did atmospheric pressure change around day {day}?",
+        "Were there any battery issues?",
+    ]
+    return [rng.choice(templates).format(day=rng.randint(1, 7)) for _ in range(count)]
@@ -0,0 +1,71 @@
+"""
+Shared Chroma client and vectorstore handles for the Document Q&A app
+Every session used to open its own PersistentClient and wrap every indexed
+collection in a new Chroma vectorstore. The registry is created once per
+server process and hands out one client and one vectorstore handle per
+collection. A handle is dropped when its collection is deleted or replaced,
+so no session keeps searching a collection that no longer exists.
+
+The client and vectorstores come from a vector_backends.VectorBackend, so
+the registry works the same for Chroma and the flat index.
+"""
+
+import threading
+from typing import Dict, Tuple
+
+from vector_backends import VectorBackend
+
+
+class ChromaRegistry:
+    """One vector backend and cached vectorstore handles for a persist directory"""
+
+    def __init__(self, backend: VectorBackend):
+        """
+        Args:
+            backend: Vector backend opened on the persist directory
+        """
+        self.backend = backend
+        self.client = backend.client
+        self.persist_directory = backend.persist_directory
+        self._handles: Dict[str, Tuple[object, object]] = {}
+        self._lock = threading.Lock()
+        self._opened = 0
+        self._reused = 0
+
+    def vectorstore(self, collection_name: str, embeddings):
+        """
+        Get the vectorstore handle for a collection, creating the collection if needed.
+
+        A handle is reused while the collection exists and is searched with the
+        same embeddings object; otherwise a new handle is opened.
+        """
+        with self._lock:
+            cached = self._handles.get(collection_name)
+            if cached is not None and cached[0] is embeddings:
+                self._reused += 1
+                return cached[1]
+
+            vectorstore = self.backend.vectorstore(collection_name, embeddings)
+            self._handles[collection_name] = (embeddings, vectorstore)
+            self._opened += 1
+            return vectorstore
+
+    def invalidate(self, collection_name: str):
+        """Drop the cached handle of a collection that was deleted or replaced"""
+        with self._lock:
+            self._handles.pop(collection_name, None)
+
+    def delete_collection(self, collection_name: str):
+        """Delete a collection and its cached handle"""
+        self.invalidate(collection_name)
+        self.backend.drop(collection_name)
+
+    def clear(self):
+        """Drop every cached handle, e.g. after collections were deleted or migrated"""
+        with self._lock:
+            self._handles.clear()
+
+    def stats(self) -> Dict[str, int]:
+        """Number of cached handles, handles opened and handles reused"""
+        with self._lock:
+            return {"handles": len(self._handles), "opened": self._opened, "reused": self._reused}
@@ -0,0 +1,195 @@
+"""
+Context assembly for the RAG apps
+Turns the ranked chunks returned by retrieval into the documents placed in
+the prompt: chunks that overlap on the same page (the splitters use a
+200-character overlap) are merged into one passage, near-duplicate passages
+are dropped, chunks scoring far below the best one are cut, and passages are
+packed best-first into a token budget so the low-ranked tail is dropped
+instead of overflowing the model's context window.
+"""
+
+import math
+import re
+from typing import Iterable, List, Optional, Set, Tuple
+
+from langchain_core.documents import Document
+
+# Rough characters per token for English prose, used when no tokenizer is available
+CHARS_PER_TOKEN = 4
+
+# Shortest shared text treated as splitter overlap rather than a coincidence
+MIN_OVERLAP_CHARS = 20
+
+# Passages whose word shingles overlap at least this much are near-duplicates
+DUPLICATE_SIMILARITY = 0.9
+
+# Words per shingle for near-duplicate detection
+SHINGLE_SIZE = 3
+
+WORD_PATTERN = re.compile(r"\w+")
+
+# Metadata holding a chunk's similarity to the question (higher is better), set by retrievers
+RELEVANCE_SCORE_KEY = "relevance_score"
+
+# Chunks scoring below this fraction of the best chunk's relevance score are dropped
+DEFAULT_MIN_RELATIVE_SCORE = 0.5
+
+
+def estimate_tokens(text: str) -> int:
+    """Approximate token count of a text"""
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def page_key(doc: Document) -> Tuple[str, object]:
+    """Identify the page a chunk was split from"""
+    return doc.metadata.get("source", ""), doc.metadata.get("page")
+
+
+def overlap_length(first: str, second: str) -> int:
+    """Length of the longest suffix of first that is a prefix of second"""
+    longest = min(len(first), len(second))
+    for size in range(longest, MIN_OVERLAP_CHARS - 1, -1):
+        if first.endswith(second[:size]):
+            return size
+    return 0
+
+
+def merge_pair(first: Document, second: Document) -> Optional[Document]:
+    """
+    Merge two chunks from the same page if their text overlaps or one contains the other.
+
+    Chunks stored with ``start_index`` metadata are merged by position,
+    others by matching the end of one chunk with the start of the other.
+
+    Returns:
+        The merged chunk (keeping the first chunk's metadata), or None
+    """
+    a, b = first.page_content, second.page_content
+    if b in a:
+        return first
+    if a in b:
+        return Document(page_content=b, metadata=first.metadata)
+
+    start_a, start_b = first.metadata.get("start_index"), second.metadata.get("start_index")
+    if isinstance(start_a, int) and isinstance(start_b, int):
+        if start_b < start_a:
+            (a, start_a), (b, start_b) = (b, start_b), (a, start_a)
+        if start_b > start_a + len(a):
+            return None
+        text = a + b[start_a + len(a) - start_b:]
+        metadata = dict(first.metadata, start_index=start_a)
+        return Document(page_content=text, metadata=metadata)
+
+    size = overlap_length(a, b)
+    if size:
+        return Document(page_content=a + b[size:], metadata=first.metadata)
+    size = overlap_length(b, a)
+    if size:
+        return Document(page_content=b + a[size:], metadata=first.metadata)
+    return None
+
+
+def merge_overlapping(docs: List[Document]) -> List[Document]:
+    """
+    Merge overlapping chunks from the same page into single passages.
+
+    A merged passage takes the rank of its best-ranked chunk.
+    """
+    merged: List[Document] = []
+    for doc in docs:
+        for i, passage in enumerate(merged):
+            if page_key(passage) != page_key(doc):
+                continue
+            combined = merge_pair(passage, doc)
+            if combined is not None:
+                merged[i] = combined
+                break
+        else:
+            merged.append(doc)
+
+    # A merge can make a passage overlap another one from the same page
+    if len(merged) < len(docs):
+        return merge_overlapping(merged)
+    return merged
+
+
+def shingles(text: str) -> Set[Tuple[str, ...]]:
+    """Word shingles of a text, ignoring case and punctuation"""
+    words = WORD_PATTERN.findall(text.casefold())
+    if len(words) < SHINGLE_SIZE:
+        return {tuple(words)}
+    return {tuple(words[i:i + SHINGLE_SIZE]) for i in range(len(words) - SHINGLE_SIZE + 1)}
+
+
+def drop_near_duplicates(docs: List[Document], threshold: float = DUPLICATE_SIMILARITY) -> List[Document]:
+    """
+    Drop passages that repeat a better-ranked passage almost verbatim.
+
+    Similarity is the Jaccard overlap of word shingles, or how much of the
+    shorter passage is contained in the longer one, whichever is higher.
+    """
+    kept: List[Tuple[Document, Set[Tuple[str, ...]]]] = []
+    for doc in docs:
+        doc_shingles = shingles(doc.page_content)
+        duplicate = False
+        for _, other in kept:
+            shared = len(doc_shingles & other)
+            smaller = min(len(doc_shingles), len(other)) or 1
+            jaccard = shared / (len(doc_shingles | other) or 1)
+            if max(jaccard, shared / smaller) >= threshold:
+                duplicate = True
+                break
+        if not duplicate:
+            kept.append((doc, doc_shingles))
+    return [doc for doc, _ in kept]
+
+
+def drop_low_scores(docs: List[Document], min_relative_score: float = DEFAULT_MIN_RELATIVE_SCORE) -> List[Document]:
+    """
+    Drop chunks whose relevance score is far below the best chunk's.
+
+    Chunks without a score (e.g. keyword search hits) are kept, and nothing
+    is dropped unless the best score is positive.
+    """
+    scores = [doc.metadata.get(RELEVANCE_SCORE_KEY) for doc in docs]
+    best = max((score for score in scores if score is not None), default=None)
+    if best is None or best <= 0:
+        return docs
+    cutoff = min_relative_score * best
+    return [doc for doc, score in zip(docs, scores) if score is None or score >= cutoff]
+
+
+def pack_to_budget(docs: Iterable[Document], token_budget: int) -> List[Document]:
+    """
+    Keep passages in rank order while they fit in the token budget.
+
+    A passage that does not fit is skipped, so a shorter lower-ranked passage
+    can still use the remaining budget; the best-ranked passage is always kept.
+    """
+    packed = []
+    used = 0
+    for doc in docs:
+        tokens = estimate_tokens(doc.page_content)
+        if packed and used + tokens > token_budget:
+            continue
+        packed.append(doc)
+        used += tokens
+    return packed
+
+
+def pack_context(docs: List[Document], token_budget: int,
+                 min_relative_score: float = DEFAULT_MIN_RELATIVE_SCORE) -> List[Document]:
+    """
+    Assemble ranked chunks into the passages placed in the prompt.
+
+    Args:
+        docs: Retrieved chunks, best first
+        token_budget: Approximate number of tokens available for context
+        min_relative_score: Fraction of the best relevance score a chunk needs
+            to be kept, 0 to keep every chunk
+
+    Returns:
+        Merged, deduplicated passages that fit the budget, best first
+    """
+    docs = drop_low_scores(docs, min_relative_score)
+    return pack_to_budget(drop_near_duplicates(merge_overlapping(docs)), token_budget)
@@ -11,6 +11,8 @@ import glob
 import os
 import warnings
 
+from latency_tracing import span
+
 # Try to import LangChain Document for compatibility
 try:
     from langchain_core.documents import Document
@@ -577,14 +579,16 @@ def process_csv_file(csv_path: str, hours_per_chunk: int = 24) -> List[Dict]:
         List of dictionaries containing chunk data and descriptions
     """
     # Read the CSV file
-    df = read_mixed_format_csv(csv_path)
+    with span("read_csv"):
+        df = read_mixed_format_csv(csv_path)
     
     if df is None or df.empty:
         print(f"⚠️  No valid data in {csv_path}")
         return []
     
     # Chunk the data
-    chunks = chunk_csv_data(df, hours_per_chunk)
+    with span("chunk"):
+        chunks = chunk_csv_data(df, hours_per_chunk)
     
     if not chunks:
         print(f"⚠️  No chunks created from {csv_path}")
@@ -593,17 +597,18 @@ def process_csv_file(csv_path: str, hours_per_chunk: int = 24) -> List[Dict]:
     # Generate descriptions for each chunk
     processed_chunks = []
     
-    for i, chunk in enumerate(chunks):
-        description = generate_chunk_description(chunk)
-        stats = calculate_statistics(chunk)
-        
-        processed_chunks.append({
-            'chunk_id': i,
-            'source_file': csv_path,
-            'description': description,
-            'statistics': stats,
-            'raw_data': chunk
-        })
+    with span("describe"):
+        for i, chunk in enumerate(chunks):
+            description = generate_chunk_description(chunk)
+            stats = calculate_statistics(chunk)
+            
+            processed_chunks.append({
+                'chunk_id': i,
+                'source_file': csv_path,
+                'description': description,
+                'statistics': stats,
+                'raw_data': chunk
+            })
     
     print(f"✅ Processed {csv_path}: {len(chunks)} chunks created")
     
@@ -770,7 +775,8 @@ def create_time_based_chunks(df_or_path, hours_per_chunk: int = 24):
         
         # Convert to LangChain Documents
         if LANGCHAIN_AVAILABLE:
-            documents = chunks_to_documents(chunk_dicts)
+            with span("to_documents"):
+                documents = chunks_to_documents(chunk_dicts)
             print(f"✅ Created {len(documents)} LangChain Documents")
             return documents
         else:
@@ -782,28 +788,31 @@ def create_time_based_chunks(df_or_path, hours_per_chunk: int = 24):
         df = df_or_path
         
         # Chunk the data
-        dataframe_chunks = chunk_csv_data(df, hours_per_chunk)
+        with span("chunk"):
+            dataframe_chunks = chunk_csv_data(df, hours_per_chunk)
         
         if not dataframe_chunks:
             return []
         
         # Convert DataFrame chunks to dictionaries with descriptions
         chunk_dicts = []
-        for i, chunk in enumerate(dataframe_chunks):
-            description = generate_chunk_description(chunk)
-            stats = calculate_statistics(chunk)
-            
-            chunk_dicts.append({
-                'chunk_id': i,
-                'source_file': 'dataframe_input',
-                'description': description,
-                'statistics': stats,
-                'raw_data': chunk
-            })
+        with span("describe"):
+            for i, chunk in enumerate(dataframe_chunks):
+                description = generate_chunk_description(chunk)
+                stats = calculate_statistics(chunk)
+                
+                chunk_dicts.append({
+                    'chunk_id': i,
+                    'source_file': 'dataframe_input',
+                    'description': description,
+                    'statistics': stats,
+                    'raw_data': chunk
+                })
         
         # Convert to LangChain Documents
         if LANGCHAIN_AVAILABLE:
-            documents = chunks_to_documents(chunk_dicts)
+            with span("to_documents"):
+                documents = chunks_to_documents(chunk_dicts)
             return documents
         else:
             return chunk_dicts
@@ -845,7 +854,8 @@ def load_multiple_csv_files(directory_path: str, hours_per_chunk: int = 24,
     # Convert to Documents if requested
     if return_documents and LANGCHAIN_AVAILABLE:
         try:
-            result = chunks_to_documents(all_chunks)
+            with span("to_documents"):
+                result = chunks_to_documents(all_chunks)
             print(f"✅ Converted {len(all_chunks)} chunks to {len(result)} LangChain Documents")
         except Exception as e:
             print(f"⚠️ Failed to convert to Documents: {e}")
@@ -1,55 +1,75 @@
+import time
+script_started = time.perf_counter()  # for the startup report in the sidebar
+
 import streamlit as st
 import os
 import pandas as pd
 from datetime import datetime
 from dotenv import load_dotenv
-import subprocess
 import json
 import tempfile
+import urllib.request
 
 # LangChain imports - using modern approach (no deprecated imports)
-from langchain_chroma import Chroma
-from langchain_ollama import OllamaEmbeddings
-from langchain_anthropic import ChatAnthropic
-from langchain_ollama import ChatOllama
+# Provider and Chroma modules are imported on first use with timed_import,
+# they take seconds to import and would delay the first render
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import StrOutputParser
-from langchain_core.runnables import RunnablePassthrough
 
 # Custom CSV processor
 from csv_processor import create_time_based_chunks, load_multiple_csv_files, get_data_summary
+from retrieval import create_retrieve_once_chain, stream_retrieve_once
+from context_packing import pack_context
+from embedding_cache import CachedQueryEmbeddings, ChunkEmbeddingStore
+from model_residency import ModelResidencyManager, EMBEDDING, LLM
+from models_config import get_residency_policies, get_context_budget
+from ingestion import add_documents_in_batches, format_progress, DEFAULT_EMBED_BATCH_SIZE, DEFAULT_EMBED_CONCURRENCY
+from startup_timing import timed_import, import_report, format_import_report
+from vector_backends import open_backend, default_persist_directory, DEFAULT_COLLECTION_NAME
+from latency_tracing import trace, format_trace_report, QUESTION, INGEST
+from latency_callbacks import LatencyCallbackHandler
 
 # Load environment variables
 load_dotenv()
 
+# Ollama server, the same variable the ollama CLI and client read
+OLLAMA_HOST = os.getenv("OLLAMA_HOST", "http://127.0.0.1:11434")
+if "://" not in OLLAMA_HOST:
+    OLLAMA_HOST = f"http://{OLLAMA_HOST}"
+
 # Function to get available Ollama models
 @st.cache_data(ttl=60)  # Cache for 60 seconds
 def get_ollama_models():
-    """Fetch list of installed Ollama models"""
+    """Fetch list of installed Ollama models from the Ollama server"""
     try:
-        result = subprocess.run(
-            ['ollama', 'list'],
-            capture_output=True,
-            text=True,
-            timeout=5
-        )
-        if result.returncode == 0:
-            lines = result.stdout.strip().split('\n')[1:]  # Skip header
-            models = []
-            for line in lines:
-                if line.strip():
-                    # Extract model name (first column)
-                    model_name = line.split()[0]
-                    models.append(model_name)
-            return models if models else ["No models found"]
-        else:
-            return ["Ollama not available"]
+        with urllib.request.urlopen(f"{OLLAMA_HOST.rstrip('/')}/api/tags", timeout=5) as response:
+            models = [model["name"] for model in json.load(response).get("models", [])]
+        return models if models else ["No models found"]
+    except OSError:
+        return ["Ollama not available"]
     except Exception as e:
         return [f"Error: {str(e)}"]
 
 # Configuration
-CHROMA_DB_PATH = "./chroma_db_timeseries"
+# Vector backend: "chroma", or "flat" for exact search over memory-mapped embeddings (see vector_backends.py)
+VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "chroma")
+CHROMA_DB_PATH = default_persist_directory(VECTOR_BACKEND, "_timeseries")
 OLLAMA_EMBEDDING_MODEL = "nomic-embed-text"
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", DEFAULT_EMBED_BATCH_SIZE))
+EMBED_CONCURRENCY = int(os.getenv("EMBED_CONCURRENCY", DEFAULT_EMBED_CONCURRENCY))
+# Per-stage latency histograms in the Prometheus text format (empty to disable)
+METRICS_FILE = os.getenv("METRICS_FILE", "./metrics/timeseries.prom")
+METRICS_LABELS = {"app": "timeseries"}
+
+# Vector backend client, shared by every session
+@st.cache_resource
+def open_vector_backend(persist_dir, backend):
+    """Open the configured vector backend for a directory, once per server process"""
+    return open_backend(backend, persist_dir)
+
+def get_vector_backend():
+    """Get the shared vector backend for the time-series database"""
+    return open_vector_backend(CHROMA_DB_PATH, VECTOR_BACKEND)
 
 st.set_page_config(page_title="Time-Series RAG", page_icon="📊", layout="wide")
 st.title("📊 Time-Series Data RAG System")
@@ -123,15 +143,12 @@ with st.sidebar:
     if st.button("🗑️ Clear Database", type="secondary", use_container_width=True):
         if 'vectorstore' in st.session_state:
             try:
-                # Get the collection and delete all documents
-                collection = st.session_state['vectorstore']._collection
-                # Get all IDs and delete them
-                result = collection.get()
-                all_ids = result['ids'] if result else []
+                # Delete all documents, keeping the collection
+                backend = get_vector_backend()
+                count = backend.count(DEFAULT_COLLECTION_NAME)
                 
-                if all_ids:
-                    collection.delete(ids=all_ids)
-                    count = len(all_ids)
+                if count:
+                    backend.delete(DEFAULT_COLLECTION_NAME)
                     # Clear session state
                     del st.session_state['vectorstore']
                     if 'conversation_history' in st.session_state:
@@ -159,6 +176,12 @@ with st.sidebar:
             st.warning("No database loaded to clear")
 
 
+# Ollama keep-alive policies, shared with the Document Q&A app's models_config
+@st.cache_resource
+def get_residency_manager():
+    """Create the model residency manager"""
+    return ModelResidencyManager(get_residency_policies(), host=OLLAMA_HOST)
+
 # Initialize LLM based on selection
 @st.cache_resource
 def get_llm(provider, model_name):
@@ -168,24 +191,36 @@ def get_llm(provider, model_name):
         if not api_key:
             st.error("ANTHROPIC_API_KEY not found in environment variables!")
             st.stop()
+        ChatAnthropic = timed_import("langchain_anthropic").ChatAnthropic
         return ChatAnthropic(
             model=model_name,
             anthropic_api_key=api_key,
-            max_tokens=2000
+            max_tokens=2000,
+            callbacks=[LatencyCallbackHandler()]
         )
     else:  # Ollama
+        residency = get_residency_manager()
+        ChatOllama = timed_import("langchain_ollama").ChatOllama
         return ChatOllama(
             model=model_name,
-            base_url="http://127.0.0.1:11434"
+            base_url=OLLAMA_HOST,
+            keep_alive=residency.keep_alive(model_name, LLM),
+            callbacks=[residency.callback_handler(model_name), LatencyCallbackHandler()]
         )
 
 # Initialize embeddings
 @st.cache_resource
 def get_embeddings():
-    """Initialize Ollama embeddings"""
-    return OllamaEmbeddings(
-        model=OLLAMA_EMBEDDING_MODEL,
-        base_url="http://127.0.0.1:11434"
+    """Initialize Ollama embeddings with persistent query and chunk embedding caches"""
+    OllamaEmbeddings = timed_import("langchain_ollama").OllamaEmbeddings
+    return CachedQueryEmbeddings(
+        OllamaEmbeddings(
+            model=OLLAMA_EMBEDDING_MODEL,
+            base_url=OLLAMA_HOST,
+            keep_alive=get_residency_manager().keep_alive(OLLAMA_EMBEDDING_MODEL, EMBEDDING)
+        ),
+        model_name=OLLAMA_EMBEDDING_MODEL,
+        chunk_store=ChunkEmbeddingStore()
     )
 
 # Create or load vector store
@@ -193,11 +228,22 @@ def create_vector_store(documents):
     """Create a vector store from documents"""
     embeddings = get_embeddings()
     
-    # Create new vector store
-    vectorstore = Chroma.from_documents(
-        documents=documents,
-        embedding=embeddings,
-        persist_directory=CHROMA_DB_PATH
+    # Create new vector store, embedding chunks in concurrent batches
+    backend = get_vector_backend()
+    vectorstore = backend.vectorstore(DEFAULT_COLLECTION_NAME, embeddings)
+    progress_bar = st.progress(0.0, text="Creating embeddings...")
+
+    def show_progress(done, total, elapsed):
+        progress_bar.progress(done / total, text=format_progress(done, total, elapsed))
+
+    add_documents_in_batches(
+        backend,
+        DEFAULT_COLLECTION_NAME,
+        embeddings,
+        documents,
+        batch_size=EMBED_BATCH_SIZE,
+        max_concurrency=EMBED_CONCURRENCY,
+        progress_callback=show_progress
     )
     
     return vectorstore
@@ -205,16 +251,12 @@ def create_vector_store(documents):
 # Load existing vector store
 def load_vector_store():
     """Load existing vector store"""
-    embeddings = get_embeddings()
-    
     if os.path.exists(CHROMA_DB_PATH):
-        vectorstore = Chroma(
-            persist_directory=CHROMA_DB_PATH,
-            embedding_function=embeddings
-        )
+        backend = get_vector_backend()
+        vectorstore = backend.vectorstore(DEFAULT_COLLECTION_NAME, get_embeddings())
         # Check if it has any documents
         try:
-            doc_count = vectorstore._collection.count()
+            doc_count = backend.count(DEFAULT_COLLECTION_NAME)
             if doc_count > 0:
                 return vectorstore, doc_count
             else:
@@ -224,7 +266,7 @@ def load_vector_store():
     return None, 0
 
 # Create RAG chain using modern LCEL approach
-def create_rag_chain(vectorstore, llm):
+def create_rag_chain(vectorstore, llm, context_tokens):
     """Create a RAG chain using the vector store and LLM"""
     
     # Create retriever with MMR search
@@ -258,27 +300,37 @@ Answer:"""
 
     prompt = ChatPromptTemplate.from_template(template)
     
-    # Format documents function
-    def format_docs(docs):
-        return "\n\n".join(doc.page_content for doc in docs)
-    
     # Create the chain using LCEL (LangChain Expression Language)
-    chain = (
-        {
-            "context": retriever | format_docs,
-            "question": RunnablePassthrough()
-        }
-        | prompt
-        | llm
-        | StrOutputParser()
+    # Retrieval runs once and the same chunks feed the prompt and the source display,
+    # after dropping duplicates and the low-ranked tail that does not fit the model's budget
+    chain = create_retrieve_once_chain(
+        retriever, prompt | llm | StrOutputParser(),
+        docs_packer=lambda docs: pack_context(docs, context_tokens)
     )
     
-    return chain, retriever
+    return chain
+
+# Show the time-series chunks an answer is based on
+def show_source_chunks(docs, label):
+    """Display source chunks with their time range in an expander"""
+    with st.expander(label):
+        for j, doc in enumerate(docs, 1):
+            st.markdown(f"**Chunk {j}:**")
+            st.markdown(f"- **Time Range:** {doc.metadata.get('start_time', 'N/A')} to {doc.metadata.get('end_time', 'N/A')}")
+            st.markdown(f"- **Date:** {doc.metadata.get('date', 'N/A')}")
+            st.text(doc.page_content[:500] + "..." if len(doc.page_content) > 500 else doc.page_content)
+            if j < len(docs):
+                st.divider()
+
+# Show where the time of a question or an ingest went
+def show_performance(timings):
+    """Display stage timings (latency_tracing.Trace.summary) in an expander"""
+    with st.expander(f"⏱️ Performance · {timings['total_ms'] / 1000:.1f}s"):
+        st.text(format_trace_report(timings))
+        st.caption("Stages that run concurrently overlap, so they can add up to more than the total.")
 
 # Main app logic
 def main():
-    llm = get_llm(llm_provider, selected_model)
-    
     # Data loading section
     if data_mode == "Upload Single CSV":
         st.header("📤 Upload CSV File")
@@ -306,20 +358,22 @@ def main():
             
             # Process button
             if st.button("🔄 Process and Index Data", type="primary"):
-                with st.spinner("Processing CSV file..."):
-                    # Create chunks
-                    documents = create_time_based_chunks(temp_path, hours_per_chunk=hours_per_chunk)
-                    
-                    if documents:
-                        st.success(f"✅ Created {len(documents)} time-based chunks")
+                with trace(INGEST, uploaded_file.name, METRICS_FILE, METRICS_LABELS) as ingest_trace:
+                    with st.spinner("Processing CSV file..."):
+                        # Create chunks
+                        documents = create_time_based_chunks(temp_path, hours_per_chunk=hours_per_chunk)
                         
-                        # Create vector store
-                        with st.spinner("Creating vector store..."):
-                            vectorstore = create_vector_store(documents)
-                            st.session_state['vectorstore'] = vectorstore
-                            st.success("✅ Vector store created successfully!")
-                    else:
-                        st.error("❌ Failed to create chunks from CSV")
+                        if documents:
+                            st.success(f"✅ Created {len(documents)} time-based chunks")
+                            
+                            # Create vector store
+                            with st.spinner("Creating vector store..."):
+                                vectorstore = create_vector_store(documents)
+                                st.session_state['vectorstore'] = vectorstore
+                                st.success("✅ Vector store created successfully!")
+                        else:
+                            st.error("❌ Failed to create chunks from CSV")
+                show_performance(ingest_trace.summary())
     
     else:  # Process Directory
         st.header("📁 Process Multiple CSV Files")
@@ -330,24 +384,26 @@ def main():
         
         if directory_path and st.button("🔄 Process Directory", type="primary"):
             if os.path.exists(directory_path):
-                with st.spinner("Processing multiple CSV files..."):
-                    documents = load_multiple_csv_files(directory_path, hours_per_chunk=hours_per_chunk)
-                    
-                    if documents:
-                        st.success(f"✅ Created {len(documents)} chunks from directory")
-                        
-                        # Show summary
-                        summary = get_data_summary(documents)
-                        st.subheader("📊 Data Summary")
-                        st.text(summary)
+                with trace(INGEST, directory_path, METRICS_FILE, METRICS_LABELS) as ingest_trace:
+                    with st.spinner("Processing multiple CSV files..."):
+                        documents = load_multiple_csv_files(directory_path, hours_per_chunk=hours_per_chunk)
                         
-                        # Create vector store
-                        with st.spinner("Creating vector store..."):
-                            vectorstore = create_vector_store(documents)
-                            st.session_state['vectorstore'] = vectorstore
-                            st.success("✅ Vector store created successfully!")
-                    else:
-                        st.error("❌ No valid CSV files found in directory")
+                        if documents:
+                            st.success(f"✅ Created {len(documents)} chunks from directory")
+                            
+                            # Show summary
+                            summary = get_data_summary(documents)
+                            st.subheader("📊 Data Summary")
+                            st.text(summary)
+                            
+                            # Create vector store
+                            with st.spinner("Creating vector store..."):
+                                vectorstore = create_vector_store(documents)
+                                st.session_state['vectorstore'] = vectorstore
+                                st.success("✅ Vector store created successfully!")
+                        else:
+                            st.error("❌ No valid CSV files found in directory")
+                show_performance(ingest_trace.summary())
             else:
                 st.error("❌ Directory does not exist")
     
@@ -366,27 +422,25 @@ def main():
         if 'conversation_history' not in st.session_state:
             st.session_state['conversation_history'] = []
         
-        # Create RAG chain
-        chain, retriever = create_rag_chain(st.session_state['vectorstore'], llm)
+        # Create RAG chain (the model is only created once there is data to ask about)
+        llm = get_llm(llm_provider, selected_model)
+        chain = create_rag_chain(st.session_state['vectorstore'], llm, get_context_budget(selected_model))
         
         # Display conversation history
         if st.session_state['conversation_history']:
             st.subheader("📜 Conversation History")
             
-            for i, (q, a, docs) in enumerate(st.session_state['conversation_history']):
+            # Entries stored before stage timings were recorded have no fourth field
+            for i, (q, a, docs, *rest) in enumerate(st.session_state['conversation_history']):
+                timings = rest[0] if rest else None
                 with st.container():
                     st.markdown(f"**Q{i+1}:** {q}")
                     st.markdown(f"**A{i+1}:** {a}")
                     
-                    # Show source documents for this Q&A
-                    with st.expander(f"📄 Source Data for Q{i+1}"):
-                        for j, doc in enumerate(docs, 1):
-                            st.markdown(f"**Chunk {j}:**")
-                            st.markdown(f"- **Time Range:** {doc.metadata.get('start_time', 'N/A')} to {doc.metadata.get('end_time', 'N/A')}")
-                            st.markdown(f"- **Date:** {doc.metadata.get('date', 'N/A')}")
-                            st.text(doc.page_content[:500] + "..." if len(doc.page_content) > 500 else doc.page_content)
-                            if j < len(docs):
-                                st.divider()
+                    # Show source documents and stage timings for this Q&A
+                    show_source_chunks(docs, f"📄 Source Data for Q{i+1}")
+                    if timings:
+                        show_performance(timings)
                     
                     st.markdown("---")
             
@@ -422,25 +476,59 @@ def main():
                 # Set processing flag to hide this section during rerun
                 st.session_state['processing_query'] = True
                 
-                with st.spinner("Analyzing data..."):
-                    # Get answer and source docs
-                    answer = chain.invoke(query)
-                    docs = retriever.invoke(query)
-                    
-                    # Add to conversation history
-                    st.session_state['conversation_history'].append((query, answer, docs))
-                    
-                    # Increment counter to create new widget with fresh key
-                    st.session_state['query_counter'] += 1
-                    
-                    # Clear processing flag
-                    st.session_state['processing_query'] = False
-                    
-                    # Rerun to show updated history
-                    st.rerun()
+                question_number = len(st.session_state['conversation_history']) + 1
+                st.markdown(f"**Q{question_number}:** {query}")
+                answer_placeholder = st.empty()
+                sources_placeholder = st.empty()
+                docs = []
+
+                def show_sources(found_docs):
+                    """Show the retrieved chunks while the answer is generated"""
+                    docs.extend(found_docs)
+                    with sources_placeholder.container():
+                        show_source_chunks(docs, f"📄 Source Data for Q{question_number}")
+
+                # Retrieval runs once, then the answer streams in token by token
+                answer = ""
+                timings = None
+                try:
+                    with trace(QUESTION, query, METRICS_FILE, METRICS_LABELS) as question_trace:
+                        with st.spinner("Analyzing data..."):
+                            tokens = stream_retrieve_once(chain, query, on_sources=show_sources)
+                            first_token = next(tokens, "")
+                        answer = first_token
+                        answer_placeholder.markdown(f"**A{question_number}:** {answer}▌")
+                        for token in tokens:
+                            answer += token
+                            answer_placeholder.markdown(f"**A{question_number}:** {answer}▌")
+                    timings = question_trace.summary()
+                except Exception as e:
+                    answer = f"{answer}\n\nError generating response: {str(e)}".strip()
+                
+                # Add to conversation history
+                st.session_state['conversation_history'].append((query, answer, docs, timings))
+                
+                # Increment counter to create new widget with fresh key
+                st.session_state['query_counter'] += 1
+                
+                # Clear processing flag
+                st.session_state['processing_query'] = False
+                
+                # Rerun to show updated history
+                st.rerun()
         else:
             # Show processing message if flag is set
             st.info("Processing your question...")
 
+# Startup report: how long this session's first render took and the deferred imports so far
+def show_startup_report():
+    """Show first render time and per-import timings in the sidebar"""
+    if 'first_render_ms' not in st.session_state:
+        st.session_state['first_render_ms'] = (time.perf_counter() - script_started) * 1000
+    with st.sidebar.expander("⏱️ Startup"):
+        st.caption(f"First render: {st.session_state['first_render_ms']:.0f} ms")
+        st.text(format_import_report(import_report()))
+
 if __name__ == "__main__":
     main()
+    show_startup_report()
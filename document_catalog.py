@@ -0,0 +1,207 @@
+"""
+Catalog of indexed documents for the Document Q&A app
+Records every indexed document under its original file name, with the
+collection holding its chunks, a hash of its content, its size, page and
+chunk counts, the embedding model and when it was indexed. The sidebar and
+the vectorstore loading read the document list from here in one query
+instead of listing Chroma collections and turning their names back into
+file names (which loses underscores, "my_file.pdf" became "my file.pdf").
+
+Ingests that have started but not finished keep a checkpoint here, so a
+collection left partially filled by an interrupted ingest is resumed rather
+than mistaken for a finished one.
+"""
+
+import hashlib
+import threading
+import time
+from typing import Dict, Iterable, List, Optional
+
+from embedding_cache import open_cache_db
+
+# Columns of a catalog entry, in table order
+FIELDS = [
+    "file_name", "collection_name", "content_hash", "chunk_count", "byte_size", "page_count",
+    "embedding_model", "first_indexed_at", "last_indexed_at"
+]
+
+# Columns of an ingest checkpoint, in table order
+CHECKPOINT_FIELDS = ["file_name", "collection_name", "content_hash", "chunks_stored", "started_at", "updated_at"]
+
+
+def catalog_path(persist_directory: str) -> str:
+    """SQLite file of the catalog kept next to a Chroma persist directory"""
+    return persist_directory.rstrip("/\\") + "_catalog.sqlite3"
+
+
+def content_hash(data: bytes) -> str:
+    """SHA-256 hex digest of an uploaded file's bytes"""
+    return hashlib.sha256(data).hexdigest()
+
+
+class DocumentCatalog:
+    """Persistent list of indexed documents and their details"""
+
+    def __init__(self, path: str):
+        """
+        Args:
+            path: SQLite file holding the catalog (":memory:" for a temporary catalog)
+        """
+        self._lock = threading.Lock()
+        self._db = open_cache_db(path)
+        self._db.executescript(
+            "CREATE TABLE IF NOT EXISTS documents ("
+            "file_name TEXT PRIMARY KEY, collection_name TEXT NOT NULL, content_hash TEXT, "
+            "chunk_count INTEGER NOT NULL, byte_size INTEGER, page_count INTEGER, embedding_model TEXT, "
+            "first_indexed_at REAL NOT NULL, last_indexed_at REAL NOT NULL);"
+            "CREATE TABLE IF NOT EXISTS catalog_meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);"
+            "CREATE TABLE IF NOT EXISTS ingest_checkpoints ("
+            "file_name TEXT PRIMARY KEY, collection_name TEXT NOT NULL, content_hash TEXT NOT NULL, "
+            "chunks_stored INTEGER NOT NULL, started_at REAL NOT NULL, updated_at REAL NOT NULL);"
+        )
+        self._db.commit()
+
+    def record(self, file_name: str, collection_name: str, chunk_count: int, content_hash: Optional[str] = None,
+               byte_size: Optional[int] = None, page_count: Optional[int] = None,
+               embedding_model: Optional[str] = None):
+        """
+        Add or update a document after it was indexed.
+
+        Details passed as None keep the value recorded earlier, and the
+        first indexing time is kept when a document is indexed again. The
+        document's ingest checkpoint is dropped, its ingest is complete.
+        """
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT INTO documents VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT(file_name) DO UPDATE SET collection_name = excluded.collection_name, "
+                "content_hash = COALESCE(excluded.content_hash, content_hash), chunk_count = excluded.chunk_count, "
+                "byte_size = COALESCE(excluded.byte_size, byte_size), "
+                "page_count = COALESCE(excluded.page_count, page_count), "
+                "embedding_model = COALESCE(excluded.embedding_model, embedding_model), "
+                "last_indexed_at = excluded.last_indexed_at",
+                (file_name, collection_name, content_hash, chunk_count, byte_size, page_count, embedding_model,
+                 now, now)
+            )
+            self._db.execute("DELETE FROM ingest_checkpoints WHERE file_name = ?", (file_name,))
+            self._db.commit()
+
+    def documents(self) -> List[Dict]:
+        """Every catalog entry, in the order the documents were first indexed"""
+        with self._lock:
+            rows = self._db.execute(
+                f"SELECT {', '.join(FIELDS)} FROM documents ORDER BY first_indexed_at, file_name"
+            ).fetchall()
+        return [dict(zip(FIELDS, row)) for row in rows]
+
+    def names(self) -> List[str]:
+        """File names of the indexed documents, in the order they were first indexed"""
+        return [entry["file_name"] for entry in self.documents()]
+
+    def get(self, file_name: str) -> Optional[Dict]:
+        """Catalog entry of a document, or None if it is not indexed"""
+        with self._lock:
+            row = self._db.execute(
+                f"SELECT {', '.join(FIELDS)} FROM documents WHERE file_name = ?", (file_name,)
+            ).fetchone()
+        return dict(zip(FIELDS, row)) if row else None
+
+    def remove(self, file_name: str):
+        """Forget a document whose chunks were deleted"""
+        with self._lock:
+            self._db.execute("DELETE FROM documents WHERE file_name = ?", (file_name,))
+            self._db.execute("DELETE FROM ingest_checkpoints WHERE file_name = ?", (file_name,))
+            self._db.commit()
+
+    def clear(self):
+        """Forget every document, e.g. after the database was cleared"""
+        with self._lock:
+            self._db.execute("DELETE FROM documents")
+            self._db.execute("DELETE FROM ingest_checkpoints")
+            self._db.commit()
+
+    def start_ingest(self, file_name: str, collection_name: str, content_hash: str) -> Dict:
+        """
+        Record that a document's ingest has started, before its first chunk is stored.
+
+        An unfinished checkpoint for the same content is kept, so its stored
+        chunk count carries over when the ingest is resumed.
+
+        Returns:
+            The document's checkpoint
+        """
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT INTO ingest_checkpoints VALUES (?, ?, ?, 0, ?, ?) "
+                "ON CONFLICT(file_name) DO UPDATE SET collection_name = excluded.collection_name, "
+                "chunks_stored = CASE WHEN content_hash = excluded.content_hash THEN chunks_stored ELSE 0 END, "
+                "started_at = CASE WHEN content_hash = excluded.content_hash THEN started_at "
+                "ELSE excluded.started_at END, "
+                "content_hash = excluded.content_hash, updated_at = excluded.updated_at",
+                (file_name, collection_name, content_hash, now, now)
+            )
+            self._db.commit()
+        return self.unfinished_ingest(file_name)
+
+    def checkpoint(self, file_name: str, chunks_stored: int):
+        """Record the number of chunks stored so far by a document's ingest"""
+        with self._lock:
+            self._db.execute(
+                "UPDATE ingest_checkpoints SET chunks_stored = ?, updated_at = ? WHERE file_name = ?",
+                (chunks_stored, time.time(), file_name)
+            )
+            self._db.commit()
+
+    def unfinished_ingest(self, file_name: str) -> Optional[Dict]:
+        """Checkpoint of a document whose ingest started but did not finish, or None"""
+        with self._lock:
+            row = self._db.execute(
+                f"SELECT {', '.join(CHECKPOINT_FIELDS)} FROM ingest_checkpoints WHERE file_name = ?", (file_name,)
+            ).fetchone()
+        return dict(zip(CHECKPOINT_FIELDS, row)) if row else None
+
+    def unfinished_ingests(self) -> List[Dict]:
+        """Checkpoints of every ingest that started but did not finish"""
+        with self._lock:
+            rows = self._db.execute(
+                f"SELECT {', '.join(CHECKPOINT_FIELDS)} FROM ingest_checkpoints ORDER BY started_at"
+            ).fetchall()
+        return [dict(zip(CHECKPOINT_FIELDS, row)) for row in rows]
+
+    def discard_ingest(self, file_name: str):
+        """Drop a document's checkpoint after its partial chunks were deleted"""
+        with self._lock:
+            self._db.execute("DELETE FROM ingest_checkpoints WHERE file_name = ?", (file_name,))
+            self._db.commit()
+
+    def imported(self, layout: str) -> bool:
+        """Whether documents indexed before the catalog existed have been imported for an index layout"""
+        with self._lock:
+            row = self._db.execute("SELECT 1 FROM catalog_meta WHERE key = ?", (f"imported:{layout}",)).fetchone()
+        return row is not None
+
+    def import_existing(self, entries: Iterable[Dict], layout: str):
+        """
+        Record documents found in Chroma, e.g. ones indexed before the catalog existed.
+
+        Documents already in the catalog keep their details, only their
+        collection and chunk count are updated (they change on migration).
+
+        Args:
+            entries: Dicts with file_name, collection_name and chunk_count
+            layout: Index layout the entries were found in
+        """
+        now = time.time()
+        with self._lock:
+            for entry in entries:
+                self._db.execute(
+                    "INSERT INTO documents (file_name, collection_name, chunk_count, first_indexed_at, "
+                    "last_indexed_at) VALUES (?, ?, ?, ?, ?) "
+                    "ON CONFLICT(file_name) DO UPDATE SET collection_name = excluded.collection_name, "
+                    "chunk_count = excluded.chunk_count",
+                    (entry["file_name"], entry["collection_name"], entry["chunk_count"], now, now)
+                )
+            self._db.execute("INSERT OR REPLACE INTO catalog_meta VALUES (?, ?)", (f"imported:{layout}", str(now)))
+            self._db.commit()
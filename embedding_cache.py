@@ -0,0 +1,281 @@
+"""
+Embedding caches for the RAG apps
+Wraps an embeddings object so repeated questions skip the embedding model,
+using an in-memory LRU in front of a small SQLite store that survives restarts.
+Chunk embeddings are stored content-addressed, so re-ingesting text that was
+already embedded (renamed uploads, new revisions) only embeds the new chunks.
+"""
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+import unicodedata
+from array import array
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Dict, List, Optional
+
+from langchain_core.embeddings import Embeddings
+
+# SQLite file shared by the embedding caches
+EMBEDDING_CACHE_PATH = "./embedding_cache.sqlite3"
+
+# Number of query embeddings kept in memory
+DEFAULT_MEMORY_ENTRIES = 1024
+
+# Keys per SQLite lookup, kept below the bound-parameter limit
+LOOKUP_BATCH_SIZE = 500
+
+
+def normalize_query(text: str) -> str:
+    """
+    Normalize a question so trivially different spellings share a cache entry.
+
+    Applies Unicode NFKC normalization, case folding and whitespace collapsing.
+    """
+    text = unicodedata.normalize("NFKC", text)
+    return " ".join(text.casefold().split())
+
+
+def make_cache_key(model_name: str, text: str) -> str:
+    """Build a cache key from the embedding model name and the text"""
+    return hashlib.sha256(f"{model_name}\x00{text}".encode("utf-8")).hexdigest()
+
+
+def encode_vector(vector: List[float]) -> bytes:
+    """Serialize an embedding for storage in SQLite"""
+    return array("d", vector).tobytes()
+
+
+def decode_vector(blob: bytes) -> List[float]:
+    """Deserialize an embedding stored by encode_vector"""
+    values = array("d")
+    values.frombytes(blob)
+    return values.tolist()
+
+
+def open_cache_db(path: str) -> sqlite3.Connection:
+    """Open the cache database, creating the directory if needed"""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    # Streamlit runs each session in its own thread, access is guarded by a lock
+    connection = sqlite3.connect(path, check_same_thread=False)
+    connection.execute("PRAGMA journal_mode=WAL")
+    return connection
+
+
+class ChunkEmbeddingStore:
+    """Content-addressed store of chunk embeddings keyed by text hash and model"""
+
+    def __init__(self, path: str = EMBEDDING_CACHE_PATH):
+        """
+        Args:
+            path: SQLite file holding the chunk embeddings
+        """
+        self._lock = threading.Lock()
+        self._db = open_cache_db(path)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS chunk_embeddings ("
+            "key TEXT PRIMARY KEY, model TEXT NOT NULL, embedding BLOB NOT NULL, created_at REAL NOT NULL)"
+        )
+        self._db.commit()
+
+    def get_many(self, model_name: str, texts: List[str]) -> List[Optional[List[float]]]:
+        """
+        Look up stored embeddings for a list of chunk texts.
+
+        Args:
+            model_name: Embedding model the vectors were produced with
+            texts: Chunk texts
+
+        Returns:
+            List aligned with texts holding the stored vector or None
+        """
+        keys = [make_cache_key(model_name, text) for text in texts]
+        found = {}
+        unique_keys = list(dict.fromkeys(keys))
+        with self._lock:
+            for start in range(0, len(unique_keys), LOOKUP_BATCH_SIZE):
+                batch = unique_keys[start:start + LOOKUP_BATCH_SIZE]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._db.execute(
+                    f"SELECT key, embedding FROM chunk_embeddings WHERE key IN ({placeholders})", batch
+                ).fetchall()
+                for key, blob in rows:
+                    found[key] = decode_vector(blob)
+        return [found.get(key) for key in keys]
+
+    def put_many(self, model_name: str, texts: List[str], vectors: List[List[float]]) -> None:
+        """Store embeddings for chunk texts"""
+        now = time.time()
+        rows = [
+            (make_cache_key(model_name, text), model_name, encode_vector(vector), now)
+            for text, vector in zip(texts, vectors)
+        ]
+        with self._lock:
+            self._db.executemany(
+                "INSERT OR REPLACE INTO chunk_embeddings (key, model, embedding, created_at) VALUES (?, ?, ?, ?)",
+                rows
+            )
+            self._db.commit()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM chunk_embeddings").fetchone()[0]
+
+
+class CachedQueryEmbeddings(Embeddings):
+    """Embeddings wrapper caching query embeddings and, optionally, chunk embeddings"""
+
+    def __init__(self, embeddings: Embeddings, model_name: str,
+                 cache_path: Optional[str] = EMBEDDING_CACHE_PATH,
+                 max_memory_entries: int = DEFAULT_MEMORY_ENTRIES,
+                 chunk_store: Optional[ChunkEmbeddingStore] = None):
+        """
+        Args:
+            embeddings: Underlying embeddings object (e.g. OllamaEmbeddings)
+            model_name: Embedding model name, part of every cache key
+            cache_path: SQLite file for the persistent cache, or None for memory only
+            max_memory_entries: Capacity of the in-memory LRU
+            chunk_store: Content-addressed store consulted by embed_documents,
+                or None to always embed documents with the underlying model
+        """
+        self.embeddings = embeddings
+        self.model_name = model_name
+        self.max_memory_entries = max_memory_entries
+        self.chunk_store = chunk_store
+        self._memory = OrderedDict()
+        # Query embeddings being computed, keyed like the cache, so concurrent
+        # requests for the same question share one model call
+        self._in_flight: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+        self._memory_hits = 0
+        self._disk_hits = 0
+        self._misses = 0
+        self._chunk_hits = 0
+        self._chunk_misses = 0
+
+        self._db = None
+        if cache_path:
+            self._db = open_cache_db(cache_path)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS query_embeddings ("
+                "key TEXT PRIMARY KEY, model TEXT NOT NULL, embedding BLOB NOT NULL, created_at REAL NOT NULL)"
+            )
+            self._db.commit()
+
+    def _remember(self, key: str, vector: List[float]) -> None:
+        """Insert into the in-memory LRU, evicting the least recently used entry"""
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_entries:
+            self._memory.popitem(last=False)
+
+    def embed_query(self, text: str) -> List[float]:
+        """Embed a query, returning a cached vector when available"""
+        # The normalized text is embedded too, so every spelling sharing a key gets the same vector
+        text = normalize_query(text)
+        key = make_cache_key(self.model_name, text)
+
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                self._memory_hits += 1
+                return list(self._memory[key])
+
+            if self._db is not None:
+                row = self._db.execute(
+                    "SELECT embedding FROM query_embeddings WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None:
+                    vector = decode_vector(row[0])
+                    self._remember(key, vector)
+                    self._disk_hits += 1
+                    return list(vector)
+
+            pending = self._in_flight.get(key)
+            if pending is None:
+                self._in_flight[key] = Future()
+
+        if pending is not None:
+            # Another caller is embedding the same question, wait for its vector
+            vector = pending.result()
+            with self._lock:
+                self._memory_hits += 1
+            return list(vector)
+
+        # Call the model outside the lock so other sessions are not blocked
+        try:
+            vector = list(self.embeddings.embed_query(text))
+        except Exception as e:
+            with self._lock:
+                self._in_flight.pop(key).set_exception(e)
+            raise
+
+        with self._lock:
+            self._misses += 1
+            self._remember(key, vector)
+            self._in_flight.pop(key).set_result(vector)
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO query_embeddings (key, model, embedding, created_at) VALUES (?, ?, ?, ?)",
+                    (key, self.model_name, encode_vector(vector), time.time())
+                )
+                self._db.commit()
+
+        return list(vector)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Embed documents, only sending chunk text missing from the chunk store to the model"""
+        if self.chunk_store is None:
+            return self.embeddings.embed_documents(texts)
+
+        vectors = self.chunk_store.get_many(self.model_name, texts)
+        # Embed each distinct missing text once, even if it repeats in the batch
+        missing = list(dict.fromkeys(text for text, vector in zip(texts, vectors) if vector is None))
+        new_vectors = {}
+        if missing:
+            embedded = self.embeddings.embed_documents(missing)
+            self.chunk_store.put_many(self.model_name, missing, embedded)
+            new_vectors = dict(zip(missing, embedded))
+
+        with self._lock:
+            self._chunk_hits += len(texts) - len(missing)
+            self._chunk_misses += len(missing)
+
+        return [list(vector) if vector is not None else list(new_vectors[text]) for text, vector in zip(texts, vectors)]
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Return cache counters for sizing the cache.
+
+        Returns:
+            Dictionary with hits, memory_hits, disk_hits, misses,
+            memory_entries and disk_entries for queries, plus chunk_hits
+            and chunk_misses for document embeddings
+        """
+        with self._lock:
+            disk_entries = 0
+            if self._db is not None:
+                disk_entries = self._db.execute("SELECT COUNT(*) FROM query_embeddings").fetchone()[0]
+            return {
+                "hits": self._memory_hits + self._disk_hits,
+                "memory_hits": self._memory_hits,
+                "disk_hits": self._disk_hits,
+                "misses": self._misses,
+                "memory_entries": len(self._memory),
+                "disk_entries": disk_entries,
+                "chunk_hits": self._chunk_hits,
+                "chunk_misses": self._chunk_misses
+            }
+
+    def clear(self) -> None:
+        """Remove every cached query embedding for this model"""
+        with self._lock:
+            self._memory.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM query_embeddings WHERE model = ?", (self.model_name,))
+                self._db.commit()
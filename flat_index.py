@@ -0,0 +1,666 @@
+"""
+Memory-mapped flat vector index, an in-process alternative to Chroma
+For collections of a few thousand chunks, the Chroma round-trip and HNSW
+graph walk cost more than simply scoring every chunk. Each collection here is
+a directory holding normalized float32 embeddings in one flat file and an
+SQLite table mapping chunk ids to their row, text and metadata. A search is a
+single matrix-vector product over the memory-mapped file followed by an exact
+top-k, so results never suffer from approximate-search misses.
+
+The vectors file is mapped read-only, so every Streamlit worker process
+shares the same page-cache pages and a process opening a collection reads
+nothing up front. Writes append rows (or overwrite an existing chunk's row)
+inside an SQLite write transaction, which serializes writers across
+processes; readers notice the new version number and re-map the file.
+
+FlatClient and FlatCollection implement the subset of Chroma's client and
+collection API the apps use (get, upsert, update, delete, count, query with
+``where`` filters), and FlatVectorStore is a LangChain vectorstore taking the
+same arguments as ``langchain_chroma.Chroma``, so it plugs in wherever the
+apps build a Chroma vectorstore.
+"""
+
+import json
+import os
+import shutil
+import threading
+import uuid
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.vectorstores import VectorStore
+
+from embedding_cache import open_cache_db
+from retrieval import maximal_marginal_relevance
+from vector_backends import DEFAULT_COLLECTION_NAME
+
+# Dead rows (deleted or replaced chunks) tolerated before the vectors file is rewritten
+COMPACT_MIN_DEAD_ROWS = 1024
+
+# Cached ``where`` filter masks per collection version
+MAX_CACHED_MASKS = 32
+
+# Fields a get or query can include, as in Chroma
+DEFAULT_GET_INCLUDE = ["metadatas", "documents"]
+DEFAULT_QUERY_INCLUDE = ["metadatas", "documents", "distances"]
+
+
+def normalize_rows(vectors) -> np.ndarray:
+    """Scale float32 vectors to unit length, leaving all-zero vectors unchanged"""
+    matrix = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix / np.where(norms == 0, 1.0, norms)
+
+
+def matches_where(metadata: Optional[dict], where: Optional[dict]) -> bool:
+    """
+    Evaluate a Chroma ``where`` filter against one chunk's metadata.
+
+    Supports field equality, the $eq, $ne, $in, $nin, $gt, $gte, $lt and $lte
+    operators, and $and / $or combinations.
+    """
+    if not where:
+        return True
+    metadata = metadata or {}
+    for key, condition in where.items():
+        if key == "$and":
+            if not all(matches_where(metadata, clause) for clause in condition):
+                return False
+        elif key == "$or":
+            if not any(matches_where(metadata, clause) for clause in condition):
+                return False
+        elif isinstance(condition, dict):
+            value = metadata.get(key)
+            for operator, operand in condition.items():
+                if not _compare(value, operator, operand, key in metadata):
+                    return False
+        elif metadata.get(key) != condition or key not in metadata:
+            return False
+    return True
+
+
+def _compare(value, operator: str, operand, present: bool) -> bool:
+    """Apply one Chroma comparison operator"""
+    if operator == "$eq":
+        return present and value == operand
+    if operator == "$ne":
+        return not present or value != operand
+    if operator == "$in":
+        return present and value in operand
+    if operator == "$nin":
+        return not present or value not in operand
+    if not present or value is None:
+        return False
+    if operator == "$gt":
+        return value > operand
+    if operator == "$gte":
+        return value >= operand
+    if operator == "$lt":
+        return value < operand
+    if operator == "$lte":
+        return value <= operand
+    raise ValueError(f"Unsupported where operator: {operator}")
+
+
+def _as_matrix(vectors, count: int) -> np.ndarray:
+    """Vectors as a (count, dimension) float32 array, also when there are none"""
+    if count == 0:
+        return np.empty((0, 0), dtype=np.float32)
+    return np.asarray(vectors, dtype=np.float32).reshape(count, -1)
+
+
+class _Snapshot:
+    """Read-only view of a collection at one version"""
+
+    def __init__(self, version: int, dimension: int, matrix: Optional[np.ndarray], slots: np.ndarray,
+                 raw_metadatas: List[Optional[str]]):
+        self.version = version
+        self.dimension = dimension
+        # Every row of the vectors file, including rows of deleted chunks
+        self.matrix = matrix
+        # Rows of the live chunks and their raw JSON metadata, in insertion order
+        self.slots = slots
+        self.raw_metadatas = raw_metadatas
+        self.metadatas: Optional[List[dict]] = None
+        self.masks: Dict[str, np.ndarray] = {}
+
+
+class FlatCollection:
+    """One flat index: memory-mapped vectors plus an SQLite id/metadata table"""
+
+    def __init__(self, name: str, directory: str):
+        """
+        Args:
+            name: Collection name
+            directory: Directory holding the collection's files
+        """
+        self.name = name
+        self.directory = directory
+        self._lock = threading.Lock()
+        self._db = open_cache_db(os.path.join(directory, "rows.sqlite3"))
+        self._db.executescript(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            "seq INTEGER PRIMARY KEY AUTOINCREMENT, id TEXT NOT NULL UNIQUE, slot INTEGER NOT NULL UNIQUE, "
+            "document TEXT, metadata TEXT);"
+            "CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);"
+        )
+        self._db.commit()
+        self._snapshot: Optional[_Snapshot] = None
+
+    # -- storage ---------------------------------------------------------
+
+    def _meta(self) -> Dict[str, str]:
+        return dict(self._db.execute("SELECT key, value FROM meta").fetchall())
+
+    def _set_meta(self, **values):
+        self._db.executemany("INSERT OR REPLACE INTO meta VALUES (?, ?)",
+                             [(key, str(value)) for key, value in values.items()])
+
+    def _vectors_path(self, meta: Dict[str, str]) -> str:
+        return os.path.join(self.directory, meta.get("vectors_file", "vectors-0.f32"))
+
+    def _write_rows(self, meta: Dict[str, str], slots: Sequence[int], vectors: np.ndarray):
+        """Write vectors to their rows of the vectors file"""
+        path = self._vectors_path(meta)
+        row_bytes = vectors.shape[1] * 4
+        with open(path, "r+b" if os.path.exists(path) else "w+b") as f:
+            # New chunks get consecutive rows, so runs of rows are written at once
+            start = 0
+            while start < len(slots):
+                end = start + 1
+                while end < len(slots) and slots[end] == slots[end - 1] + 1:
+                    end += 1
+                f.seek(slots[start] * row_bytes)
+                f.write(vectors[start:end].tobytes())
+                start = end
+
+    def _current(self) -> _Snapshot:
+        """Snapshot of the collection, re-mapping the vectors file after writes"""
+        with self._lock:
+            self._db.execute("BEGIN")
+            try:
+                meta = self._meta()
+                version = int(meta.get("version", 0))
+                if self._snapshot is not None and self._snapshot.version == version:
+                    return self._snapshot
+                entries = self._db.execute("SELECT slot, metadata FROM entries ORDER BY seq").fetchall()
+            finally:
+                self._db.commit()
+            slots = np.fromiter((slot for slot, _ in entries), dtype=np.int64, count=len(entries))
+            dimension = int(meta.get("dimension", 0))
+            rows = int(meta.get("rows", 0))
+            matrix = None
+            if rows and dimension:
+                matrix = np.memmap(self._vectors_path(meta), dtype=np.float32, mode="r", shape=(rows, dimension))
+            self._snapshot = _Snapshot(version, dimension, matrix, slots, [metadata for _, metadata in entries])
+            return self._snapshot
+
+    def _read_version(self, query: str, params: Sequence) -> Tuple[int, list]:
+        """Run a read query together with the version it reflects"""
+        with self._lock:
+            self._db.execute("BEGIN")
+            try:
+                version = int(self._meta().get("version", 0))
+                return version, self._db.execute(query, list(params)).fetchall()
+            finally:
+                self._db.commit()
+
+    def _write(self, operation: Callable[[Dict[str, str]], Optional[str]]):
+        """
+        Run a write in an SQLite write transaction and publish a new version.
+
+        The operation may return a file that is no longer used, it is removed
+        once the transaction is committed.
+        """
+        with self._lock:
+            # BEGIN IMMEDIATE takes the write lock, serializing writers across processes
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                meta = self._meta()
+                obsolete = operation(meta)
+                self._set_meta(version=int(meta.get("version", 0)) + 1)
+                self._db.commit()
+            except BaseException:
+                self._db.rollback()
+                raise
+        if obsolete and os.path.exists(obsolete):
+            os.remove(obsolete)
+
+    def _check_dimension(self, meta: Dict[str, str], vectors: np.ndarray):
+        dimension = int(meta.get("dimension", 0))
+        if dimension and vectors.shape[1] != dimension:
+            raise ValueError(f"Collection expecting embedding with dimension of {dimension}, got {vectors.shape[1]}")
+        if not dimension:
+            self._set_meta(dimension=vectors.shape[1])
+            meta["dimension"] = str(vectors.shape[1])
+
+    # -- Chroma collection API -------------------------------------------
+
+    def count(self) -> int:
+        """Number of chunks stored"""
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+
+    def upsert(self, ids: List[str], embeddings, documents: Optional[List[Optional[str]]] = None,
+               metadatas: Optional[List[Optional[dict]]] = None, **kwargs):
+        """Add chunks, replacing the vector, text and metadata of ids already stored"""
+        if not ids:
+            return
+        if embeddings is None:
+            raise ValueError("FlatCollection needs precomputed embeddings")
+        vectors = normalize_rows(embeddings)
+        documents = documents if documents is not None else [None] * len(ids)
+        metadatas = metadatas if metadatas is not None else [None] * len(ids)
+
+        def operation(meta):
+            self._check_dimension(meta, vectors)
+            rows = int(meta.get("rows", 0))
+            placeholders = ", ".join("?" * len(ids))
+            existing = dict(self._db.execute(
+                f"SELECT id, slot FROM entries WHERE id IN ({placeholders})", list(ids)
+            ).fetchall())
+            slots = []
+            for chunk_id in ids:
+                if chunk_id not in existing:
+                    existing[chunk_id] = rows
+                    rows += 1
+                slots.append(existing[chunk_id])
+            self._write_rows(meta, slots, vectors)
+            self._db.executemany(
+                "INSERT INTO entries (id, slot, document, metadata) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(id) DO UPDATE SET document = excluded.document, metadata = excluded.metadata",
+                [(chunk_id, slot, document, json.dumps(metadata) if metadata else None)
+                 for chunk_id, slot, document, metadata in zip(ids, slots, documents, metadatas)]
+            )
+            self._set_meta(rows=rows)
+
+        self._write(operation)
+
+    add = upsert
+
+    def update(self, ids: List[str], embeddings=None, documents: Optional[List[Optional[str]]] = None,
+               metadatas: Optional[List[Optional[dict]]] = None, **kwargs):
+        """
+        Change stored chunks. Metadata is merged into the stored metadata, and
+        keys set to None are removed, as in Chroma.
+        """
+        if not ids:
+            return
+        vectors = normalize_rows(embeddings) if embeddings is not None else None
+
+        def operation(meta):
+            placeholders = ", ".join("?" * len(ids))
+            stored = {
+                chunk_id: (slot, document, json.loads(metadata) if metadata else {})
+                for chunk_id, slot, document, metadata in self._db.execute(
+                    f"SELECT id, slot, document, metadata FROM entries WHERE id IN ({placeholders})", list(ids)
+                )
+            }
+            known = [i for i, chunk_id in enumerate(ids) if chunk_id in stored]
+            if vectors is not None and known:
+                self._check_dimension(meta, vectors)
+                self._write_rows(meta, [stored[ids[i]][0] for i in known], vectors[known])
+            rows = []
+            for i in known:
+                slot, document, metadata = stored[ids[i]]
+                if documents is not None:
+                    document = documents[i]
+                if metadatas is not None and metadatas[i]:
+                    metadata = {**metadata, **metadatas[i]}
+                    metadata = {key: value for key, value in metadata.items() if value is not None}
+                rows.append((document, json.dumps(metadata) if metadata else None, ids[i]))
+            self._db.executemany("UPDATE entries SET document = ?, metadata = ? WHERE id = ?", rows)
+
+        self._write(operation)
+
+    def delete(self, ids: Optional[List[str]] = None, where: Optional[dict] = None, **kwargs):
+        """Delete chunks by id and/or metadata filter"""
+        if ids is None and not where:
+            return
+        doomed = self.get(ids=ids, where=where, include=[])["ids"]
+        if not doomed:
+            return
+
+        def operation(meta):
+            self._db.executemany("DELETE FROM entries WHERE id = ?", [(chunk_id,) for chunk_id in doomed])
+            live = self._db.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+            dead = int(meta.get("rows", 0)) - live
+            if dead >= max(COMPACT_MIN_DEAD_ROWS, live):
+                return self._compact(meta)
+            return None
+
+        self._write(operation)
+
+    def _compact(self, meta: Dict[str, str]) -> str:
+        """
+        Rewrite the vectors file without the rows of deleted chunks.
+
+        The new file gets a new name and the old one is removed after the
+        commit, so processes still mapping the old file keep valid pages.
+
+        Returns:
+            Path of the old vectors file
+        """
+        old_path = self._vectors_path(meta)
+        generation = int(meta.get("generation", 0)) + 1
+        new_name = f"vectors-{generation}.f32"
+        entries = self._db.execute("SELECT id, slot FROM entries ORDER BY seq").fetchall()
+        dimension = int(meta.get("dimension", 0))
+        rows = int(meta.get("rows", 0))
+        if entries and dimension:
+            old = np.memmap(old_path, dtype=np.float32, mode="r", shape=(rows, dimension))
+            with open(os.path.join(self.directory, new_name), "wb") as f:
+                for start in range(0, len(entries), COMPACT_MIN_DEAD_ROWS):
+                    batch = [slot for _, slot in entries[start:start + COMPACT_MIN_DEAD_ROWS]]
+                    f.write(np.ascontiguousarray(old[batch]).tobytes())
+            del old
+        # Slots are unique, so move them out of the way before renumbering
+        self._db.execute("UPDATE entries SET slot = -slot - 1")
+        self._db.executemany("UPDATE entries SET slot = ? WHERE id = ?",
+                             [(index, chunk_id) for index, (chunk_id, _) in enumerate(entries)])
+        self._set_meta(rows=len(entries), generation=generation, vectors_file=new_name)
+        return old_path
+
+    def get(self, ids: Optional[List[str]] = None, where: Optional[dict] = None, limit: Optional[int] = None,
+            offset: Optional[int] = None, include: Optional[List[str]] = None, **kwargs) -> Dict:
+        """Read stored chunks in insertion order, optionally by id, metadata filter and page"""
+        include = DEFAULT_GET_INCLUDE if include is None else include
+        query = "SELECT id, slot, document, metadata FROM entries"
+        params: list = []
+        if ids is not None:
+            if not ids:
+                return self._result([], [], [], [], include)
+            query += f" WHERE id IN ({', '.join('?' * len(ids))})"
+            params = list(ids)
+        query += " ORDER BY seq"
+        snapshot = None
+        while True:
+            # Rows and vectors have to come from the same version
+            if "embeddings" in include:
+                snapshot = self._current()
+            version, rows = self._read_version(query, params)
+            if snapshot is None or snapshot.version == version:
+                break
+        rows = [(chunk_id, slot, document, json.loads(metadata) if metadata else None)
+                for chunk_id, slot, document, metadata in rows]
+        if where:
+            rows = [row for row in rows if matches_where(row[3], where)]
+        start = offset or 0
+        rows = rows[start:start + limit] if limit is not None else rows[start:]
+        vectors = []
+        if snapshot is not None and rows:
+            vectors = np.asarray(snapshot.matrix[[row[1] for row in rows]])
+        return self._result([row[0] for row in rows], [row[2] for row in rows], [row[3] for row in rows],
+                            vectors, include)
+
+    @staticmethod
+    def _result(ids, documents, metadatas, vectors, include) -> Dict:
+        return {
+            "ids": ids,
+            "documents": documents if "documents" in include else None,
+            "metadatas": metadatas if "metadatas" in include else None,
+            "embeddings": _as_matrix(vectors, len(ids)) if "embeddings" in include else None,
+            "include": list(include)
+        }
+
+    def _mask(self, snapshot: _Snapshot, where: dict) -> np.ndarray:
+        """Which live chunks match a filter, cached per collection version"""
+        key = json.dumps(where, sort_keys=True)
+        mask = snapshot.masks.get(key)
+        if mask is None:
+            if snapshot.metadatas is None:
+                snapshot.metadatas = [json.loads(metadata) if metadata else None
+                                      for metadata in snapshot.raw_metadatas]
+            mask = np.fromiter((matches_where(metadata, where) for metadata in snapshot.metadatas),
+                               dtype=bool, count=len(snapshot.metadatas))
+            if len(snapshot.masks) >= MAX_CACHED_MASKS:
+                snapshot.masks.clear()
+            snapshot.masks[key] = mask
+        return mask
+
+    def search(self, snapshot: _Snapshot, query_embedding, k: int,
+               where: Optional[dict] = None) -> List[Tuple[int, float]]:
+        """
+        Exact top-k by cosine similarity.
+
+        Returns:
+            (row, similarity) pairs of the best k live chunks, best first
+        """
+        if snapshot.matrix is None or len(snapshot.slots) == 0 or k < 1:
+            return []
+        query = normalize_rows(query_embedding)[0]
+        if query.shape[0] != snapshot.dimension:
+            raise ValueError(f"Collection expecting embedding with dimension of {snapshot.dimension}, "
+                             f"got {query.shape[0]}")
+        # One matrix-vector product over every row, dead rows are dropped afterwards
+        scores = (snapshot.matrix @ query)[snapshot.slots]
+        slots = snapshot.slots
+        if where:
+            mask = self._mask(snapshot, where)
+            scores, slots = scores[mask], slots[mask]
+        if len(scores) > k:
+            best = np.argpartition(-scores, k - 1)[:k]
+        else:
+            best = np.arange(len(scores))
+        best = best[np.argsort(-scores[best], kind="stable")]
+        return [(int(slots[i]), float(scores[i])) for i in best]
+
+    def query(self, query_embeddings, n_results: int = 10, where: Optional[dict] = None,
+              include: Optional[List[str]] = None, **kwargs) -> Dict:
+        """
+        Chroma-style query. Distances are squared L2 distances between the
+        normalized vectors (2 - 2 * cosine similarity), so lower is closer as
+        with Chroma's default space.
+        """
+        include = DEFAULT_QUERY_INCLUDE if include is None else include
+        result = {"ids": [], "documents": [], "metadatas": [], "distances": [], "embeddings": []}
+        for query_embedding in np.atleast_2d(np.asarray(query_embeddings, dtype=np.float32)):
+            while True:
+                snapshot = self._current()
+                hits = self.search(snapshot, query_embedding, n_results, where)
+                found = self._rows([slot for slot, _ in hits], snapshot.version)
+                # A concurrent write renumbered the rows, search the new version
+                if found is not None:
+                    break
+            result["ids"].append([found[slot][0] for slot, _ in hits])
+            result["documents"].append([found[slot][1] for slot, _ in hits])
+            result["metadatas"].append([found[slot][2] for slot, _ in hits])
+            result["distances"].append([2.0 - 2.0 * similarity for _, similarity in hits])
+            vectors = np.asarray(snapshot.matrix[[slot for slot, _ in hits]]) if "embeddings" in include and hits \
+                else []
+            result["embeddings"].append(_as_matrix(vectors, len(hits)))
+        for field in ("documents", "metadatas", "distances", "embeddings"):
+            if field not in include:
+                result[field] = None
+        result["include"] = list(include)
+        return result
+
+    def _rows(self, slots: List[int], version: int) -> Optional[Dict[int, Tuple[str, Optional[str], Optional[dict]]]]:
+        """Ids, texts and metadata of the chunks stored in some rows, None if the version changed"""
+        if not slots:
+            return {}
+        current, rows = self._read_version(
+            f"SELECT slot, id, document, metadata FROM entries WHERE slot IN ({', '.join('?' * len(slots))})", slots
+        )
+        if current != version:
+            return None
+        return {slot: (chunk_id, document, json.loads(metadata) if metadata else None)
+                for slot, chunk_id, document, metadata in rows}
+
+    def close(self):
+        """Close the SQLite connection and drop the memory map"""
+        with self._lock:
+            self._snapshot = None
+            self._db.close()
+
+
+class FlatClient:
+    """Directory of flat collections with the parts of Chroma's client API the apps use"""
+
+    def __init__(self, path: str):
+        """
+        Args:
+            path: Directory holding one subdirectory per collection
+        """
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+        self._collections: Dict[str, FlatCollection] = {}
+        self._lock = threading.Lock()
+
+    def _directory(self, name: str) -> str:
+        if not name or name.startswith(".") or os.sep in name or (os.altsep and os.altsep in name):
+            raise ValueError(f"Invalid collection name: {name!r}")
+        return os.path.join(self.path, name)
+
+    def list_collections(self) -> List[FlatCollection]:
+        """Every collection in the directory"""
+        names = sorted(
+            entry for entry in os.listdir(self.path)
+            if os.path.exists(os.path.join(self.path, entry, "rows.sqlite3"))
+        )
+        return [self.get_collection(name) for name in names]
+
+    def get_collection(self, name: str, **kwargs) -> FlatCollection:
+        """Open an existing collection"""
+        directory = self._directory(name)
+        with self._lock:
+            collection = self._collections.get(name)
+            if collection is None:
+                if not os.path.exists(os.path.join(directory, "rows.sqlite3")):
+                    raise ValueError(f"Collection {name} does not exist.")
+                collection = self._collections[name] = FlatCollection(name, directory)
+            return collection
+
+    def get_or_create_collection(self, name: str, embedding_function=None, metadata=None,
+                                 **kwargs) -> FlatCollection:
+        """Open a collection, creating it if needed (embedding_function and metadata are ignored)"""
+        directory = self._directory(name)
+        with self._lock:
+            collection = self._collections.get(name)
+            if collection is None:
+                os.makedirs(directory, exist_ok=True)
+                collection = self._collections[name] = FlatCollection(name, directory)
+            return collection
+
+    create_collection = get_or_create_collection
+
+    def delete_collection(self, name: str):
+        """Delete a collection and its files"""
+        directory = self._directory(name)
+        with self._lock:
+            collection = self._collections.pop(name, None)
+            if collection is not None:
+                collection.close()
+            elif not os.path.exists(directory):
+                raise ValueError(f"Collection {name} does not exist.")
+            shutil.rmtree(directory, ignore_errors=True)
+
+
+class FlatVectorStore(VectorStore):
+    """LangChain vectorstore over a flat collection, built like langchain_chroma.Chroma"""
+
+    def __init__(self, collection_name: str = DEFAULT_COLLECTION_NAME, embedding_function=None,
+                 persist_directory: Optional[str] = None, client: Optional[FlatClient] = None, **kwargs):
+        """
+        Args:
+            collection_name: Collection to open or create
+            embedding_function: LangChain embeddings
+            persist_directory: Directory of the collections, used when no client is given
+            client: Shared FlatClient
+        """
+        if client is None:
+            if persist_directory is None:
+                raise ValueError("FlatVectorStore needs a persist_directory or a client")
+            client = FlatClient(persist_directory)
+        self._client = client
+        self._embedding_function = embedding_function
+        self._collection = client.get_or_create_collection(collection_name)
+
+    @property
+    def embeddings(self):
+        return self._embedding_function
+
+    def add_texts(self, texts: Iterable[str], metadatas: Optional[List[dict]] = None,
+                  ids: Optional[List[str]] = None, **kwargs) -> List[str]:
+        texts = list(texts)
+        if ids is None:
+            ids = [str(uuid.uuid4()) for _ in texts]
+        vectors = self._embedding_function.embed_documents(texts)
+        self._collection.upsert(ids=ids, embeddings=vectors, documents=texts, metadatas=metadatas)
+        return ids
+
+    def add_documents(self, documents: List[Document], **kwargs) -> List[str]:
+        ids = kwargs.pop("ids", None)
+        if ids is None and all(doc.id for doc in documents):
+            ids = [doc.id for doc in documents]
+        return self.add_texts([doc.page_content for doc in documents],
+                              [doc.metadata or None for doc in documents], ids=ids, **kwargs)
+
+    def delete(self, ids: Optional[List[str]] = None, **kwargs) -> None:
+        self._collection.delete(ids=ids)
+
+    def get_by_ids(self, ids: Sequence[str], /) -> List[Document]:
+        result = self._collection.get(ids=list(ids))
+        return [Document(id=chunk_id, page_content=text or "", metadata=metadata or {})
+                for chunk_id, text, metadata in zip(result["ids"], result["documents"], result["metadatas"])]
+
+    def similarity_search_by_vector_with_relevance_scores(self, embedding: List[float], k: int = 4,
+                                                          filter: Optional[dict] = None,
+                                                          **kwargs) -> List[Tuple[Document, float]]:
+        """Closest chunks with their distances (lower is closer), as langchain_chroma returns them"""
+        result = self._collection.query(query_embeddings=[embedding], n_results=k, where=filter)
+        return [
+            (Document(id=chunk_id, page_content=text or "", metadata=metadata or {}), distance)
+            for chunk_id, text, metadata, distance in zip(
+                result["ids"][0], result["documents"][0], result["metadatas"][0], result["distances"][0]
+            )
+        ]
+
+    def similarity_search_by_vector(self, embedding: List[float], k: int = 4, filter: Optional[dict] = None,
+                                    **kwargs) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_by_vector_with_relevance_scores(embedding, k, filter)]
+
+    def similarity_search_with_score(self, query: str, k: int = 4, filter: Optional[dict] = None,
+                                     **kwargs) -> List[Tuple[Document, float]]:
+        embedding = self._embedding_function.embed_query(query)
+        return self.similarity_search_by_vector_with_relevance_scores(embedding, k, filter)
+
+    def similarity_search(self, query: str, k: int = 4, filter: Optional[dict] = None,
+                          **kwargs) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_with_score(query, k, filter)]
+
+    def _select_relevance_score_fn(self) -> Callable[[float], float]:
+        # Distances are 2 - 2 * cosine similarity
+        return lambda distance: 1.0 - distance / 2.0
+
+    def max_marginal_relevance_search_by_vector(self, embedding: List[float], k: int = 4, fetch_k: int = 20,
+                                                lambda_mult: float = 0.5, filter: Optional[dict] = None,
+                                                **kwargs) -> List[Document]:
+        result = self._collection.query(
+            query_embeddings=[embedding], n_results=fetch_k, where=filter,
+            include=["documents", "metadatas", "embeddings"]
+        )
+        if not result["ids"][0]:
+            return []
+        picked = maximal_marginal_relevance(embedding, result["embeddings"][0], k=k, lambda_mult=lambda_mult)
+        return [
+            Document(id=result["ids"][0][i], page_content=result["documents"][0][i] or "",
+                     metadata=result["metadatas"][0][i] or {})
+            for i in picked
+        ]
+
+    def max_marginal_relevance_search(self, query: str, k: int = 4, fetch_k: int = 20, lambda_mult: float = 0.5,
+                                      filter: Optional[dict] = None, **kwargs) -> List[Document]:
+        embedding = self._embedding_function.embed_query(query)
+        return self.max_marginal_relevance_search_by_vector(embedding, k, fetch_k, lambda_mult, filter)
+
+    @classmethod
+    def from_texts(cls, texts: List[str], embedding, metadatas: Optional[List[dict]] = None,
+                   ids: Optional[List[str]] = None, collection_name: str = DEFAULT_COLLECTION_NAME,
+                   persist_directory: Optional[str] = None, client: Optional[FlatClient] = None,
+                   **kwargs) -> "FlatVectorStore":
+        vectorstore = cls(collection_name=collection_name, embedding_function=embedding,
+                          persist_directory=persist_directory, client=client)
+        vectorstore.add_texts(texts, metadatas=metadatas, ids=ids)
+        return vectorstore
@@ -0,0 +1,491 @@
+"""
+Ingestion helpers shared by the Document Q&A and Time-Series RAG apps
+Embeds chunks in fixed-size batches with a bounded number of concurrent
+requests to the embedding model, writes each batch to a collection of the
+vector backend (see vector_backends.py) as soon as it is ready and reports
+progress (chunks/s, ETA) through a callback.
+
+stream_documents_to_vectorstore runs extraction, splitting, embedding and
+upserting as overlapping stages connected by bounded queues, so memory stays
+flat regardless of document size. Given the file's content hash, chunks get
+deterministic ids, so an interrupted ingest can be resumed: batches already
+stored are recognised by their ids and not embedded again.
+
+update_vectorstore_incrementally re-indexes a revised document by comparing
+its chunks with the stored ones, so only chunks with new text are embedded.
+
+The stages are timed as extract, split, embed and upsert spans of the
+current latency trace (see latency_tracing.py), if there is one.
+"""
+
+import hashlib
+import queue
+import threading
+import time
+import uuid
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, as_completed, wait
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from langchain_core.documents import Document
+
+from latency_tracing import bind, span, timed_iter
+
+# Chunks sent to the embedding model per request
+DEFAULT_EMBED_BATCH_SIZE = 32
+
+# Maximum embedding requests in flight at the same time
+DEFAULT_EMBED_CONCURRENCY = 4
+
+# Chunk batches buffered between the splitting and embedding stages
+DEFAULT_QUEUE_BATCHES = 4
+
+# Stored chunks read per request when comparing a revised document
+STORED_READ_BATCH_SIZE = 500
+
+# Progress callback: (chunks_done, chunks_total, elapsed_seconds)
+# chunks_total is an estimate (or None) while a streaming ingest is running
+ProgressCallback = Callable[[int, Optional[int], float], None]
+
+
+def split_batches(items: List, batch_size: int) -> List[List]:
+    """Split a list into consecutive batches of at most batch_size items"""
+    if batch_size < 1:
+        raise ValueError("batch_size must be at least 1")
+    return [items[start:start + batch_size] for start in range(0, len(items), batch_size)]
+
+
+def format_progress(done: int, total: int, elapsed: float) -> str:
+    """
+    Format ingestion progress for display.
+
+    Args:
+        done: Number of chunks embedded so far
+        total: Total (or estimated) number of chunks, None if unknown
+        elapsed: Seconds since embedding started
+
+    Returns:
+        Human-readable status such as "64/500 chunks · 21.3 chunks/s · ETA 20s"
+    """
+    rate = done / elapsed if elapsed > 0 else 0.0
+    if total is None:
+        return f"{done} chunks · {rate:.1f} chunks/s"
+    text = f"{done}/{total} chunks · {rate:.1f} chunks/s"
+    if 0 < done < total and rate > 0:
+        text += f" · ETA {(total - done) / rate:.0f}s"
+    return text
+
+
+def chunk_id(file_hash: str, chunk: Document, ordinal: int) -> str:
+    """
+    Deterministic id of a chunk, derived from its file's content hash, page and offset.
+
+    The offset is the chunk's start_index when the splitter records it,
+    otherwise its position in the document. The chunk's source is part of the
+    key, so the same file indexed under two names in a shared collection
+    keeps two sets of chunks.
+    """
+    metadata = chunk.metadata or {}
+    offset = metadata.get("start_index", f"#{ordinal}")
+    key = f"{file_hash}:{metadata.get('source', '')}:{metadata.get('page', '')}:{offset}"
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()[:32]
+
+
+def chunk_ids(chunks: List[Document], file_hash: Optional[str] = None) -> List[str]:
+    """Deterministic ids of a document's chunks, or random UUIDs without a file hash"""
+    if file_hash is None:
+        return [str(uuid.uuid4()) for _ in chunks]
+    return [chunk_id(file_hash, chunk, ordinal) for ordinal, chunk in enumerate(chunks)]
+
+
+def stored_ids(backend, collection_name: str, ids: List[str]) -> set:
+    """Subset of ids already stored in a collection"""
+    return set(backend.get_ids(collection_name, ids=ids))
+
+
+def upsert_batch(backend, collection_name: str, documents: List[Document], vectors: List[List[float]],
+                 ids: List[str]) -> None:
+    """Write a batch of embedded chunks to a collection"""
+    with span("upsert"):
+        backend.upsert(
+            collection_name,
+            ids=ids,
+            embeddings=vectors,
+            documents=[doc.page_content for doc in documents],
+            # Chroma rejects empty metadata dicts, None is accepted
+            metadatas=[doc.metadata or None for doc in documents]
+        )
+
+
+def embed_in_batches(embeddings, texts: List[str],
+                     batch_size: int = DEFAULT_EMBED_BATCH_SIZE,
+                     max_concurrency: int = DEFAULT_EMBED_CONCURRENCY,
+                     progress_callback: Optional[ProgressCallback] = None,
+                     on_batch: Optional[Callable[[int, List[List[float]]], None]] = None) -> List[List[float]]:
+    """
+    Embed texts in batches with a bounded number of concurrent requests.
+
+    Callbacks run in the calling thread, so they may safely update Streamlit
+    elements or write to the vector store.
+
+    Args:
+        embeddings: Embeddings object providing embed_documents
+        texts: Texts to embed
+        batch_size: Number of texts per embed_documents call
+        max_concurrency: Maximum number of batches embedded at the same time
+        progress_callback: Called after each finished batch with (done, total, elapsed)
+        on_batch: Called with (batch_start_index, vectors) as each batch finishes
+
+    Returns:
+        Embeddings in the same order as texts
+    """
+    total = len(texts)
+    vectors: List[Optional[List[float]]] = [None] * total
+    if total == 0:
+        return []
+
+    batches = split_batches(list(range(total)), batch_size)
+    start_time = time.perf_counter()
+    done = 0
+
+    embed = bind(embeddings.embed_documents, "embed")
+    with ThreadPoolExecutor(max_workers=max(1, min(max_concurrency, len(batches)))) as executor:
+        futures = {
+            executor.submit(embed, [texts[i] for i in batch]): batch
+            for batch in batches
+        }
+        for future in as_completed(futures):
+            batch = futures[future]
+            batch_vectors = future.result()
+            for index, vector in zip(batch, batch_vectors):
+                vectors[index] = vector
+
+            if on_batch is not None:
+                on_batch(batch[0], batch_vectors)
+            done += len(batch)
+            if progress_callback is not None:
+                progress_callback(done, total, time.perf_counter() - start_time)
+
+    return vectors
+
+
+def add_documents_in_batches(backend, collection_name: str, embeddings, documents: List[Document],
+                             batch_size: int = DEFAULT_EMBED_BATCH_SIZE,
+                             max_concurrency: int = DEFAULT_EMBED_CONCURRENCY,
+                             progress_callback: Optional[ProgressCallback] = None,
+                             ids: Optional[List[str]] = None) -> List[str]:
+    """
+    Embed documents and store them in a collection batch by batch.
+
+    Each batch is upserted as soon as its embeddings arrive, so storage
+    overlaps with the remaining embedding requests.
+
+    Args:
+        backend: VectorBackend holding the collection
+        collection_name: Collection to store the chunks in, created if needed
+        embeddings: Embeddings object providing embed_documents
+        documents: Chunks to store
+        batch_size: Number of chunks per embedding request
+        max_concurrency: Maximum number of embedding requests in flight
+        progress_callback: Called after each batch with (done, total, elapsed)
+        ids: Optional chunk ids (random UUIDs by default)
+
+    Returns:
+        Ids of the stored chunks
+    """
+    if ids is None:
+        ids = [str(uuid.uuid4()) for _ in documents]
+    texts = [doc.page_content for doc in documents]
+
+    def store_batch(start: int, batch_vectors: List[List[float]]) -> None:
+        end = start + len(batch_vectors)
+        upsert_batch(backend, collection_name, documents[start:end], batch_vectors, ids[start:end])
+
+    embed_in_batches(
+        embeddings,
+        texts,
+        batch_size=batch_size,
+        max_concurrency=max_concurrency,
+        progress_callback=progress_callback,
+        on_batch=store_batch
+    )
+    return ids
+
+
+def iter_split_documents(pages: Iterable[Document], text_splitter) -> Iterator[Document]:
+    """Split pages one at a time, yielding chunks as soon as each page is split"""
+    # Pages usually come from a lazy loader, so producing the next one is the extraction
+    for page in timed_iter(pages, "extract"):
+        with span("split"):
+            chunks = text_splitter.split_documents([page])
+        yield from chunks
+
+
+def stream_documents_to_vectorstore(backend, collection_name: str, embeddings, pages: Iterable[Document],
+                                    text_splitter,
+                                    batch_size: int = DEFAULT_EMBED_BATCH_SIZE,
+                                    max_concurrency: int = DEFAULT_EMBED_CONCURRENCY,
+                                    queue_batches: int = DEFAULT_QUEUE_BATCHES,
+                                    progress_callback: Optional[ProgressCallback] = None,
+                                    total_pages: Optional[int] = None,
+                                    on_stored: Optional[Callable[[List[Document], List[str]], None]] = None,
+                                    file_hash: Optional[str] = None,
+                                    resume: bool = False) -> Dict[str, int]:
+    """
+    Stream pages through splitting, batched embedding and upserting.
+
+    A background thread pulls pages from the (lazy) page iterator, splits them
+    and queues batches of chunks. The calling thread keeps up to
+    max_concurrency embedding requests in flight and upserts each batch as it
+    finishes. The queue between the stages is bounded, so at most
+    queue_batches + max_concurrency batches are held in memory at any time.
+
+    Args:
+        backend: VectorBackend holding the collection
+        collection_name: Collection to store the chunks in, created if needed
+        embeddings: Embeddings object providing embed_documents
+        pages: Iterable of page documents, ideally a generator
+        text_splitter: LangChain text splitter
+        batch_size: Number of chunks per embedding request
+        max_concurrency: Maximum number of embedding requests in flight
+        queue_batches: Maximum number of split batches waiting to be embedded
+        progress_callback: Called after each stored batch with
+            (done, estimated_total, elapsed)
+        total_pages: Page count used to estimate the total number of chunks,
+            read from the pages' ``total_pages`` metadata when not given
+        on_stored: Called with (documents, ids) after each batch is upserted,
+            e.g. to update a keyword index
+        file_hash: Content hash of the file, gives the chunks deterministic
+            ids (see chunk_id) instead of random UUIDs
+        resume: Skip embedding chunks whose ids are already stored, e.g. when
+            restarting an interrupted ingest with the same file_hash; skipped
+            chunks are still passed to on_stored and counted as progress
+
+    Returns:
+        Dictionary with the number of pages, characters and chunks processed,
+        and the number of chunks found already stored ("resumed")
+    """
+    batch_queue = queue.Queue(maxsize=max(1, queue_batches))
+    stop = threading.Event()
+    finished = object()
+    counts = {"pages": 0, "chars": 0, "chunks": 0, "resumed": 0}
+    page_total = {"value": total_pages}
+
+    def counted_pages():
+        for page in pages:
+            counts["pages"] += 1
+            counts["chars"] += len(page.page_content)
+            if page_total["value"] is None:
+                page_total["value"] = page.metadata.get("total_pages")
+            yield page
+
+    def put(item) -> bool:
+        # Wait for room in the queue, giving up if the consumer has stopped
+        while not stop.is_set():
+            try:
+                batch_queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce() -> None:
+        try:
+            batch, ids = [], []
+            for chunk in iter_split_documents(counted_pages(), text_splitter):
+                ids.append(chunk_id(file_hash, chunk, counts["chunks"]) if file_hash else str(uuid.uuid4()))
+                counts["chunks"] += 1
+                batch.append(chunk)
+                if len(batch) >= batch_size:
+                    if not put((batch, ids)):
+                        return
+                    batch, ids = [], []
+            if batch and not put((batch, ids)):
+                return
+            put(finished)
+        except BaseException as error:
+            put(error)
+
+    def estimated_total() -> Optional[int]:
+        if page_total["value"] and counts["pages"] < page_total["value"]:
+            if counts["pages"] == 0:
+                return None
+            return max(counts["chunks"], round(counts["chunks"] / counts["pages"] * page_total["value"]))
+        if producer.is_alive():
+            return None
+        return counts["chunks"]
+
+    producer = threading.Thread(target=bind(produce), name="ingest-split", daemon=True)
+    embed = bind(embeddings.embed_documents, "embed")
+    start_time = time.perf_counter()
+    stored = 0
+    in_flight = {}
+
+    def report_stored(batch: List[Document], ids: List[str]) -> None:
+        nonlocal stored
+        if on_stored is not None:
+            on_stored(batch, ids)
+        stored += len(batch)
+        if progress_callback is not None:
+            progress_callback(stored, estimated_total(), time.perf_counter() - start_time)
+
+    def store_finished(done_futures) -> None:
+        for future in done_futures:
+            batch, ids = in_flight.pop(future)
+            upsert_batch(backend, collection_name, batch, future.result(), ids)
+            report_stored(batch, ids)
+
+    producer.start()
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, max_concurrency)) as executor:
+            while True:
+                item = batch_queue.get()
+                if item is finished:
+                    break
+                if isinstance(item, BaseException):
+                    raise item
+
+                batch, ids = item
+                if resume:
+                    # Chunks stored before the ingest was interrupted are not embedded again
+                    existing = stored_ids(backend, collection_name, ids)
+                    if existing:
+                        counts["resumed"] += len(existing)
+                        report_stored([doc for doc, i in zip(batch, ids) if i in existing],
+                                      [i for i in ids if i in existing])
+                        batch = [doc for doc, i in zip(batch, ids) if i not in existing]
+                        ids = [i for i in ids if i not in existing]
+                        if not batch:
+                            continue
+
+                future = executor.submit(embed, [doc.page_content for doc in batch])
+                in_flight[future] = (batch, ids)
+                # Keep the number of outstanding embedding requests bounded
+                while len(in_flight) >= max_concurrency:
+                    done_futures, _ = wait(list(in_flight), return_when=FIRST_COMPLETED)
+                    store_finished(done_futures)
+
+            while in_flight:
+                done_futures, _ = wait(list(in_flight), return_when=FIRST_COMPLETED)
+                store_finished(done_futures)
+    finally:
+        stop.set()
+        producer.join()
+
+    return dict(counts)
+
+
+def text_hash(text: str) -> str:
+    """SHA-256 hex digest of a chunk's text"""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def read_stored_chunks(backend, collection_name: str,
+                       where: Optional[dict] = None) -> Tuple[List[str], List[str], List[dict]]:
+    """
+    Read the ids, texts and metadata of stored chunks (no embeddings).
+
+    Args:
+        backend: VectorBackend holding the collection
+        collection_name: Collection to read
+        where: Optional metadata filter, e.g. {"source": name} for the unified collection
+
+    Returns:
+        (ids, texts, metadatas)
+    """
+    ids, texts, metadatas = [], [], []
+    while True:
+        batch = backend.get(collection_name, where=where, limit=STORED_READ_BATCH_SIZE, offset=len(ids))
+        if not batch:
+            return ids, texts, metadatas
+        ids.extend(chunk["id"] for chunk in batch)
+        texts.extend(chunk["document"] for chunk in batch)
+        metadatas.extend(chunk["metadata"] for chunk in batch)
+
+
+def diff_chunks(stored_ids: List[str], stored_texts: List[str], stored_metadatas: List[dict],
+                chunks: List[Document]) -> Dict[str, list]:
+    """
+    Match a revised document's chunks with its stored chunks by text hash.
+
+    A stored chunk with the same text is reused; when the same text appears
+    more than once, a stored chunk with identical metadata is preferred.
+
+    Returns:
+        Dictionary with
+        - "unchanged": ids of stored chunks whose text and metadata are the same
+        - "moved": (id, metadata) pairs for stored chunks whose text is kept
+          but whose metadata changed, e.g. the page or start_index after an
+          insertion; keys that were dropped are set to None (Chroma's update
+          deletes them)
+        - "added": chunks whose text is not stored and has to be embedded
+        - "deleted": ids of stored chunks that are no longer in the document
+    """
+    stored: Dict[str, List[Tuple[str, dict]]] = {}
+    for chunk_id, text, metadata in zip(stored_ids, stored_texts, stored_metadatas):
+        stored.setdefault(text_hash(text), []).append((chunk_id, metadata))
+
+    changes = {"unchanged": [], "moved": [], "added": [], "deleted": []}
+    for chunk in chunks:
+        candidates = stored.get(text_hash(chunk.page_content))
+        if not candidates:
+            changes["added"].append(chunk)
+            continue
+        metadata = chunk.metadata or {}
+        match = next((i for i, (_, stored_metadata) in enumerate(candidates) if stored_metadata == metadata), None)
+        if match is not None:
+            changes["unchanged"].append(candidates.pop(match)[0])
+        else:
+            chunk_id, stored_metadata = candidates.pop(0)
+            dropped = {key: None for key in stored_metadata if key not in metadata}
+            changes["moved"].append((chunk_id, {**dropped, **metadata}))
+
+    changes["deleted"] = [chunk_id for candidates in stored.values() for chunk_id, _ in candidates]
+    return changes
+
+
+def update_vectorstore_incrementally(backend, collection_name: str, embeddings, chunks: List[Document],
+                                     where: Optional[dict] = None,
+                                     batch_size: int = DEFAULT_EMBED_BATCH_SIZE,
+                                     max_concurrency: int = DEFAULT_EMBED_CONCURRENCY,
+                                     progress_callback: Optional[ProgressCallback] = None,
+                                     file_hash: Optional[str] = None) -> Dict[str, int]:
+    """
+    Replace a document's stored chunks with a revised version's chunks.
+
+    Only chunks whose text is not stored yet are embedded. Chunks that kept
+    their text but moved get their metadata updated, and stored chunks that
+    disappeared are deleted. New chunks are written first and old ones
+    deleted last, so searches during the update never miss content.
+
+    Args:
+        backend: VectorBackend holding the collection
+        collection_name: Collection holding the document
+        embeddings: Embeddings object providing embed_documents
+        chunks: All chunks of the revised document
+        where: Metadata filter selecting the document's chunks in a shared collection
+        batch_size: Number of chunks per embedding request
+        max_concurrency: Maximum number of embedding requests in flight
+        progress_callback: Called after each embedded batch with (done, total, elapsed)
+        file_hash: Content hash of the revised file, gives new chunks
+            deterministic ids; stored chunks keep their ids
+
+    Returns:
+        Number of unchanged, moved, added and deleted chunks
+    """
+    with span("diff"):
+        changes = diff_chunks(*read_stored_chunks(backend, collection_name, where), chunks)
+
+    if changes["added"]:
+        # Ids follow the chunks' positions in the whole revised document
+        ids_by_chunk = {id(chunk): chunk_id for chunk, chunk_id in zip(chunks, chunk_ids(chunks, file_hash))}
+        add_documents_in_batches(backend, collection_name, embeddings, changes["added"], batch_size=batch_size,
+                                 max_concurrency=max_concurrency, progress_callback=progress_callback,
+                                 ids=[ids_by_chunk[id(chunk)] for chunk in changes["added"]])
+    with span("upsert"):
+        for batch in split_batches(changes["moved"], STORED_READ_BATCH_SIZE):
+            backend.update(collection_name, ids=[chunk_id for chunk_id, _ in batch],
+                           metadatas=[metadata for _, metadata in batch])
+        for batch in split_batches(changes["deleted"], STORED_READ_BATCH_SIZE):
+            backend.delete(collection_name, ids=batch)
+
+    return {name: len(items) for name, items in changes.items()}
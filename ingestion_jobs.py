@@ -0,0 +1,187 @@
+"""
+Background ingestion jobs for the Document Q&A app
+Uploaded files are queued and processed by a small pool of worker threads, so
+the Streamlit script keeps running (and questions can be asked) while
+documents are embedded. Each job records its status, progress and messages
+for display in the sidebar, and the stage timings of its latency trace.
+"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from ingestion import format_progress
+from latency_tracing import INGEST, trace
+
+# Files ingested at the same time
+DEFAULT_INGEST_WORKERS = 2
+
+# Job states
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+
+class IngestionJob:
+    """Status of one queued file, updated by the worker thread processing it"""
+
+    def __init__(self, name: str):
+        """
+        Args:
+            name: File name, unique within the queue
+        """
+        self.name = name
+        self.status = QUEUED
+        self.result = None
+        self.error: Optional[str] = None
+        self.messages: List[Tuple[str, str]] = []
+        self.progress: Optional[Tuple[int, Optional[int], float]] = None
+        # Stage timings (latency_tracing.Trace.summary), set when the job finishes
+        self.timings: Optional[Dict[str, Any]] = None
+
+    @property
+    def finished(self) -> bool:
+        return self.status in (DONE, FAILED)
+
+    def log(self, text: str, level: str = "info") -> None:
+        """Record a status message ("info", "warning" or "error") for display"""
+        self.messages.append((level, text))
+
+    def report_progress(self, done: int, total: Optional[int], elapsed: float) -> None:
+        """Progress callback for the ingestion pipeline"""
+        self.progress = (done, total, elapsed)
+
+    def progress_fraction(self) -> float:
+        """Fraction of chunks stored, 0.0 while the total is unknown"""
+        if self.status == DONE:
+            return 1.0
+        if self.progress is None:
+            return 0.0
+        done, total, _ = self.progress
+        return min(done / total, 1.0) if total else 0.0
+
+    def describe(self) -> str:
+        """Short status line such as "running · 64/500 chunks · 21.3 chunks/s" """
+        if self.status == RUNNING and self.progress is not None:
+            return f"{self.status} · {format_progress(*self.progress)}"
+        if self.status == FAILED:
+            return f"{self.status} · {self.error}"
+        return self.status
+
+
+class IngestionQueue:
+    """Queue of ingestion jobs processed by a bounded pool of worker threads"""
+
+    def __init__(self, max_workers: int = DEFAULT_INGEST_WORKERS, metrics_path: Optional[str] = None,
+                 metrics_labels: Optional[Dict[str, str]] = None):
+        """
+        Args:
+            max_workers: Maximum number of files processed at the same time
+            metrics_path: Prometheus text file updated after every job, None to skip
+            metrics_labels: Extra labels for the metrics, e.g. {"app": "document_qa"}
+        """
+        self.metrics_path = metrics_path
+        self.metrics_labels = metrics_labels
+        self._executor = ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix="ingest")
+        self._jobs = {}
+        self._futures = {}
+        self._lock = threading.Lock()
+
+    def submit(self, name: str, func: Callable, *args, **kwargs) -> IngestionJob:
+        """
+        Queue a file for ingestion.
+
+        func is called in a worker thread as func(job, *args, **kwargs); it
+        reports progress and messages through the job and returns the result
+        (or raises to mark the job failed). Submitting a name that is already
+        queued, running or done returns the existing job; a failed job is
+        replaced, so re-submitting retries it.
+
+        Args:
+            name: File name identifying the job
+            func: Processing function
+            *args, **kwargs: Passed to func after the job
+
+        Returns:
+            The job tracking this file
+        """
+        with self._lock:
+            existing = self._jobs.get(name)
+            if existing is not None and existing.status != FAILED:
+                return existing
+            job = IngestionJob(name)
+            self._jobs[name] = job
+            self._futures[name] = self._executor.submit(self._run, job, func, args, kwargs)
+            return job
+
+    def _run(self, job: IngestionJob, func: Callable, args, kwargs) -> None:
+        job.status = RUNNING
+        ingest_trace = None
+        try:
+            with trace(INGEST, job.name, self.metrics_path, self.metrics_labels) as ingest_trace:
+                result = func(job, *args, **kwargs)
+            job.timings = ingest_trace.summary()
+            job.result = result
+            job.status = DONE
+        except Exception as e:
+            if ingest_trace is not None:
+                job.timings = ingest_trace.summary()
+            job.error = str(e) or type(e).__name__
+            job.status = FAILED
+
+    def jobs(self) -> List[IngestionJob]:
+        """All tracked jobs in submission order"""
+        with self._lock:
+            return list(self._jobs.values())
+
+    def get(self, name: str) -> Optional[IngestionJob]:
+        with self._lock:
+            return self._jobs.get(name)
+
+    def has_pending(self) -> bool:
+        """True while any job is queued or running"""
+        return any(not job.finished for job in self.jobs())
+
+    def collect_finished(self) -> List[IngestionJob]:
+        """
+        Return jobs that completed successfully since the last call.
+
+        Collected jobs are removed from the queue; failed jobs stay until
+        cleared so their errors remain visible.
+        """
+        with self._lock:
+            finished = [job for job in self._jobs.values() if job.status == DONE]
+            for job in finished:
+                del self._jobs[job.name]
+                self._futures.pop(job.name, None)
+            return finished
+
+    def clear_failed(self) -> None:
+        """Forget failed jobs so their files can be submitted again"""
+        with self._lock:
+            for name in [name for name, job in self._jobs.items() if job.status == FAILED]:
+                del self._jobs[name]
+                self._futures.pop(name, None)
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """
+        Block until every submitted job has finished.
+
+        Returns:
+            True if all jobs finished within the timeout
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self.has_pending():
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            time.sleep(0.01)
+        return True
+
+    def shutdown(self, wait: bool = True) -> None:
+        """Cancel jobs that have not started yet and stop the worker threads"""
+        with self._lock:
+            for future in self._futures.values():
+                future.cancel()
+        self._executor.shutdown(wait=wait)
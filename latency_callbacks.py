@@ -0,0 +1,66 @@
+"""
+LangChain callback recording LLM stages in the current latency trace
+Kept apart from latency_tracing.py, which only needs the standard library,
+so modules that trace their stages do not depend on LangChain.
+"""
+
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+from latency_tracing import current_trace
+
+
+def ollama_load_seconds(info: Dict[str, Any]) -> Optional[float]:
+    """Model load time reported in an Ollama response's metadata, None if absent"""
+    load_ns = info.get("load_duration")
+    return load_ns / 1e9 if load_ns else None
+
+
+class LatencyCallbackHandler(BaseCallbackHandler):
+    """Records model load, time to first token and generation of LLM calls in the current trace"""
+
+    def __init__(self):
+        # run_id -> (trace, start time, first token time)
+        self._runs: Dict[Any, List] = {}
+        self._lock = threading.Lock()
+
+    def on_llm_start(self, serialized, prompts, *, run_id=None, **kwargs) -> None:
+        current = current_trace()
+        if current is not None:
+            with self._lock:
+                self._runs[run_id] = [current, time.perf_counter(), None]
+
+    def on_chat_model_start(self, serialized, messages, *, run_id=None, **kwargs) -> None:
+        self.on_llm_start(serialized, [], run_id=run_id, **kwargs)
+
+    def on_llm_new_token(self, token, *, run_id=None, **kwargs) -> None:
+        with self._lock:
+            run = self._runs.get(run_id)
+        if run is not None and run[2] is None:
+            run[2] = time.perf_counter()
+            run[0].add("first_token", run[2] - run[1], run[1])
+
+    def on_llm_end(self, response, *, run_id=None, **kwargs) -> None:
+        with self._lock:
+            run = self._runs.pop(run_id, None)
+        if run is None:
+            return
+        current, started, first_token = run
+        generating = first_token if first_token is not None else started
+        current.add("generation", time.perf_counter() - generating, generating)
+        for generations in response.generations:
+            for generation in generations:
+                info = dict(generation.generation_info or {})
+                message = getattr(generation, "message", None)
+                if message is not None:
+                    info.update(getattr(message, "response_metadata", None) or {})
+                load_seconds = ollama_load_seconds(info)
+                if load_seconds:
+                    current.add("model_load", load_seconds, started)
+
+    def on_llm_error(self, error, *, run_id=None, **kwargs) -> None:
+        with self._lock:
+            self._runs.pop(run_id, None)
@@ -0,0 +1,275 @@
+"""
+Per-stage latency tracing for ingestion and question answering
+A trace covers one question or one ingested file. Code along the way wraps
+its stages in span(), e.g. query embedding, collection search, MMR, prompt
+assembly, extraction, embedding and upsert, and LatencyCallbackHandler
+(latency_callbacks.py) records model load, time to first token and
+generation of the LLM call. Spans outside a trace cost a context variable
+lookup and are not recorded. This module only needs the standard library,
+so the CSV processor can use it without LangChain installed.
+
+Worker threads do not inherit the trace (LangChain's own executors do), so
+functions handed to a thread pool are wrapped with bind(). Finished traces
+are added to cumulative histograms per operation and stage, which are
+written to a file in the Prometheus text format, e.g. for node_exporter's
+textfile collector.
+"""
+
+import contextvars
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+# Histogram bucket upper bounds in seconds, from cache hits up to large ingests
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0)
+
+# Operations traced by the apps
+QUESTION = "question"
+INGEST = "ingest"
+
+# Stage recorded for the wall-clock time of a whole trace
+TOTAL = "total"
+
+METRIC_NAME = "rag_stage_duration_seconds"
+
+_current: contextvars.ContextVar[Optional["Trace"]] = contextvars.ContextVar("latency_trace", default=None)
+
+
+class Trace:
+    """Stage timings of one question or one ingested file"""
+
+    def __init__(self, operation: str, name: str = ""):
+        """
+        Args:
+            operation: What is traced, e.g. QUESTION or INGEST
+            name: The question or file name, for display
+        """
+        self.operation = operation
+        self.name = name
+        self.started = time.perf_counter()
+        self.total_seconds: Optional[float] = None
+        # (stage, seconds) in the order the stages finished
+        self.spans: List[Tuple[str, float]] = []
+        # First start of each stage, to list stages in the order they began
+        self._first_start: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def add(self, stage: str, seconds: float, started: Optional[float] = None) -> None:
+        """Record a stage duration; spans finishing after the trace are ignored"""
+        with self._lock:
+            if self.total_seconds is not None:
+                return
+            self.spans.append((stage, seconds))
+            start = started if started is not None else time.perf_counter() - seconds
+            self._first_start[stage] = min(self._first_start.get(stage, start), start)
+
+    def finish(self) -> float:
+        """Stop the trace, returns its wall-clock seconds"""
+        with self._lock:
+            if self.total_seconds is None:
+                self.total_seconds = time.perf_counter() - self.started
+            return self.total_seconds
+
+    def summary(self) -> Dict[str, Any]:
+        """
+        Milliseconds per stage, in the order the stages began.
+
+        Stages that ran several times (e.g. one search per collection) are
+        summed and counted. Stages run concurrently, so they can add up to
+        more than the total.
+        """
+        with self._lock:
+            stages: Dict[str, Dict[str, Any]] = {}
+            for stage, seconds in self.spans:
+                entry = stages.setdefault(stage, {"stage": stage, "ms": 0.0, "count": 0})
+                entry["ms"] += seconds * 1000
+                entry["count"] += 1
+            total = self.total_seconds if self.total_seconds is not None else time.perf_counter() - self.started
+            return {
+                "operation": self.operation,
+                "name": self.name,
+                "total_ms": total * 1000,
+                "stages": sorted(stages.values(), key=lambda entry: self._first_start[entry["stage"]]),
+            }
+
+
+class LatencyHistograms:
+    """Cumulative histograms of stage durations, labelled by operation and stage"""
+
+    def __init__(self, buckets: Iterable[float] = DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        # (operation, stage) -> [per-bucket counts..., +Inf count], sum
+        self._counts: Dict[Tuple[str, str], List[int]] = {}
+        self._sums: Dict[Tuple[str, str], float] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, operation: str, stage: str, seconds: float) -> None:
+        key = (operation, stage)
+        with self._lock:
+            counts = self._counts.setdefault(key, [0] * (len(self.buckets) + 1))
+            for i, bound in enumerate(self.buckets):
+                if seconds <= bound:
+                    counts[i] += 1
+                    break
+            else:
+                counts[-1] += 1
+            self._sums[key] = self._sums.get(key, 0.0) + seconds
+
+    def observe_trace(self, trace: "Trace") -> None:
+        """Add every span of a finished trace, and its total"""
+        for stage, seconds in list(trace.spans):
+            self.observe(trace.operation, stage, seconds)
+        self.observe(trace.operation, TOTAL, trace.finish())
+
+    def count(self, operation: str, stage: str) -> int:
+        with self._lock:
+            return sum(self._counts.get((operation, stage), []))
+
+    def render(self, labels: Optional[Dict[str, str]] = None) -> str:
+        """Prometheus text exposition of the histograms, with optional extra labels such as the app"""
+        extra = "".join(f'{name}="{_escape(value)}",' for name, value in (labels or {}).items())
+        lines = [
+            f"# HELP {METRIC_NAME} Time spent in each stage of ingestion and question answering.",
+            f"# TYPE {METRIC_NAME} histogram",
+        ]
+        with self._lock:
+            for (operation, stage), counts in sorted(self._counts.items()):
+                series = f'{extra}operation="{_escape(operation)}",stage="{_escape(stage)}"'
+                cumulative = 0
+                for bound, count in zip(self.buckets, counts):
+                    cumulative += count
+                    lines.append(f'{METRIC_NAME}_bucket{{{series},le="{bound:g}"}} {cumulative}')
+                cumulative += counts[-1]
+                lines.append(f'{METRIC_NAME}_bucket{{{series},le="+Inf"}} {cumulative}')
+                lines.append(f"{METRIC_NAME}_sum{{{series}}} {self._sums[(operation, stage)]:.6f}")
+                lines.append(f"{METRIC_NAME}_count{{{series}}} {cumulative}")
+        return "\n".join(lines) + "\n"
+
+    def write(self, path: str, labels: Optional[Dict[str, str]] = None) -> None:
+        """Replace the metrics file atomically, so a scraper never reads a partial file"""
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temp_path, "w") as f:
+            f.write(self.render(labels))
+        os.replace(temp_path, path)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._counts.clear()
+            self._sums.clear()
+
+
+# Histograms of every trace finished in this process
+HISTOGRAMS = LatencyHistograms()
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def current_trace() -> Optional[Trace]:
+    """The trace of the running question or ingest, None outside a trace"""
+    return _current.get()
+
+
+@contextmanager
+def trace(operation: str, name: str = "", metrics_path: Optional[str] = None,
+          labels: Optional[Dict[str, str]] = None) -> Iterator[Trace]:
+    """
+    Trace a question or an ingest: spans inside the block are recorded in the yielded Trace.
+
+    When the block exits (also on errors) the trace is added to HISTOGRAMS and,
+    given a metrics_path, the histograms are written to that file.
+
+    Args:
+        operation: What is traced, e.g. QUESTION or INGEST
+        name: The question or file name, for display
+        metrics_path: Prometheus text file to update, None to skip writing
+        labels: Extra labels for every series in the file, e.g. {"app": "document_qa"}
+    """
+    current = Trace(operation, name)
+    token = _current.set(current)
+    try:
+        yield current
+    finally:
+        _current.reset(token)
+        HISTOGRAMS.observe_trace(current)
+        if metrics_path:
+            try:
+                HISTOGRAMS.write(metrics_path, labels)
+            except OSError:
+                # Metrics are best effort, a read-only directory must not fail the question
+                pass
+
+
+@contextmanager
+def span(stage: str) -> Iterator[None]:
+    """Time a stage of the current trace"""
+    current = _current.get()
+    if current is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        current.add(stage, time.perf_counter() - started, started)
+
+
+def record(stage: str, seconds: float) -> None:
+    """Record a stage measured elsewhere, e.g. a model load reported by Ollama"""
+    current = _current.get()
+    if current is not None:
+        current.add(stage, seconds)
+
+
+def bind(func: Callable, stage: Optional[str] = None) -> Callable:
+    """
+    Wrap a function to run in the current trace from another thread.
+
+    Call it in the thread that owns the trace, e.g. when submitting to a
+    ThreadPoolExecutor. Outside a trace the function is returned unchanged.
+
+    Args:
+        func: Function run in the worker thread
+        stage: Optional stage name timing each call
+    """
+    current = _current.get()
+    if current is None:
+        return func
+
+    def run(*args, **kwargs):
+        token = _current.set(current)
+        try:
+            if stage is None:
+                return func(*args, **kwargs)
+            with span(stage):
+                return func(*args, **kwargs)
+        finally:
+            _current.reset(token)
+
+    return run
+
+
+def timed_iter(items: Iterable, stage: str) -> Iterator:
+    """Iterate, timing how long producing each item takes, e.g. extracting the pages of a lazy loader"""
+    iterator = iter(items)
+    while True:
+        with span(stage):
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+        yield item
+
+
+def format_trace_report(summary: Dict[str, Any]) -> str:
+    """Render a Trace.summary() as one line per stage"""
+    lines = [f"Total: {summary['total_ms']:.0f} ms"]
+    for entry in summary["stages"]:
+        repeated = f" ({entry['count']}×)" if entry["count"] > 1 else ""
+        lines.append(f"{entry['stage']}: {entry['ms']:.0f} ms{repeated}")
+    return "\n".join(lines)
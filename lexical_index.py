@@ -0,0 +1,221 @@
+"""
+BM25 lexical index for the Document Q&A app
+A persistent inverted index stored in SQLite next to the embedding caches.
+Chunks are added as they are stored in Chroma, so keyword search needs no
+embedding call and finds exact identifiers (part numbers, error codes) that
+vector search tends to miss.
+"""
+
+import json
+import math
+import re
+import threading
+import unicodedata
+from collections import Counter, defaultdict
+from typing import Iterable, List, Optional, Tuple
+
+from langchain_core.documents import Document
+
+from embedding_cache import open_cache_db
+from retrieval import DEFAULT_TOP_K
+
+# SQLite file holding the inverted index
+LEXICAL_INDEX_PATH = "./lexical_index.sqlite3"
+
+# BM25 term frequency saturation and length normalization
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# Words too common to help ranking
+STOPWORDS = frozenset(
+    "a an and are as at be but by for from has have if in into is it its no not of on or "
+    "that the their then there these they this to was were what when where which who will with".split()
+)
+
+# Words, numbers and identifiers such as "E-1042", "M8x1.25" or "v2.3.1"
+TOKEN_PATTERN = re.compile(r"[0-9a-z]+(?:[-_./:][0-9a-z]+)*")
+TOKEN_SEPARATORS = re.compile(r"[-_./:]")
+
+# Chunks written per SQLite transaction when backfilling from Chroma
+BACKFILL_BATCH_SIZE = 500
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Split text into lowercase search terms.
+
+    Identifiers joined by "-", "_", ".", "/" or ":" are kept whole and also
+    split into their parts, so "E-1042" matches both "e-1042" and "1042".
+    """
+    text = unicodedata.normalize("NFKC", text).casefold()
+    terms = []
+    for token in TOKEN_PATTERN.findall(text):
+        if token not in STOPWORDS:
+            terms.append(token)
+        if TOKEN_SEPARATORS.search(token):
+            terms.extend(part for part in TOKEN_SEPARATORS.split(token) if part and part not in STOPWORDS)
+    return terms
+
+
+class LexicalIndex:
+    """Persistent BM25 index of chunk text, grouped by document name"""
+
+    def __init__(self, path: str = LEXICAL_INDEX_PATH):
+        """
+        Args:
+            path: SQLite file holding the index (":memory:" for a temporary index)
+        """
+        self._lock = threading.Lock()
+        self._db = open_cache_db(path)
+        self._db.executescript(
+            "CREATE TABLE IF NOT EXISTS chunks ("
+            "id TEXT PRIMARY KEY, document TEXT NOT NULL, length INTEGER NOT NULL, "
+            "content TEXT NOT NULL, metadata TEXT NOT NULL);"
+            "CREATE INDEX IF NOT EXISTS chunks_document ON chunks (document);"
+            "CREATE TABLE IF NOT EXISTS postings ("
+            "term TEXT NOT NULL, chunk_id TEXT NOT NULL, tf INTEGER NOT NULL, "
+            "PRIMARY KEY (term, chunk_id)) WITHOUT ROWID;"
+            "CREATE INDEX IF NOT EXISTS postings_chunk ON postings (chunk_id);"
+        )
+        self._db.commit()
+
+    def add_documents(self, documents: List[Document], ids: List[str], document_name: Optional[str] = None) -> None:
+        """
+        Index chunks, replacing any chunk already stored under the same id.
+
+        Args:
+            documents: Chunks to index
+            ids: Chunk ids, the same ones used in Chroma
+            document_name: Document the chunks belong to, defaults to each
+                chunk's ``source`` metadata
+        """
+        chunk_rows = []
+        posting_rows = []
+        for chunk_id, doc in zip(ids, documents):
+            terms = Counter(tokenize(doc.page_content))
+            name = document_name or doc.metadata.get("source", "")
+            chunk_rows.append((chunk_id, name, sum(terms.values()), doc.page_content, json.dumps(doc.metadata)))
+            posting_rows.extend((term, chunk_id, tf) for term, tf in terms.items())
+
+        with self._lock:
+            self._db.executemany("DELETE FROM postings WHERE chunk_id = ?", [(row[0],) for row in chunk_rows])
+            self._db.executemany(
+                "INSERT OR REPLACE INTO chunks (id, document, length, content, metadata) VALUES (?, ?, ?, ?, ?)",
+                chunk_rows
+            )
+            self._db.executemany("INSERT INTO postings (term, chunk_id, tf) VALUES (?, ?, ?)", posting_rows)
+            self._db.commit()
+
+    def search(self, query: str, k: int = DEFAULT_TOP_K,
+               documents: Optional[Iterable[str]] = None) -> List[Tuple[Document, float]]:
+        """
+        Rank chunks against a query with BM25.
+
+        Args:
+            query: Question text
+            k: Maximum number of chunks returned
+            documents: Only search these document names (all documents if None)
+
+        Returns:
+            (document, score) pairs, highest score first
+        """
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms or k < 1:
+            return []
+        documents = None if documents is None else list(documents)
+        if documents is not None and not documents:
+            return []
+
+        term_marks = ",".join("?" * len(terms))
+        with self._lock:
+            chunk_count, average_length = self._db.execute("SELECT COUNT(*), AVG(length) FROM chunks").fetchone()
+            if not chunk_count:
+                return []
+            frequencies = dict(self._db.execute(
+                f"SELECT term, COUNT(*) FROM postings WHERE term IN ({term_marks}) GROUP BY term", terms
+            ).fetchall())
+
+            sql = (
+                "SELECT p.term, p.chunk_id, p.tf, c.length FROM postings p JOIN chunks c ON c.id = p.chunk_id "
+                f"WHERE p.term IN ({term_marks})"
+            )
+            params = list(terms)
+            if documents is not None:
+                sql += f" AND c.document IN ({','.join('?' * len(documents))})"
+                params.extend(documents)
+            rows = self._db.execute(sql, params).fetchall()
+
+        average_length = average_length or 1.0
+        scores = defaultdict(float)
+        for term, chunk_id, tf, length in rows:
+            df = frequencies[term]
+            idf = math.log(1 + (chunk_count - df + 0.5) / (df + 0.5))
+            norm = BM25_K1 * (1 - BM25_B + BM25_B * length / average_length)
+            scores[chunk_id] += idf * tf * (BM25_K1 + 1) / (tf + norm)
+
+        top = sorted(scores.items(), key=lambda item: (-item[1], item[0]))[:k]
+        if not top:
+            return []
+
+        with self._lock:
+            stored = {
+                chunk_id: (content, metadata)
+                for chunk_id, content, metadata in self._db.execute(
+                    f"SELECT id, content, metadata FROM chunks WHERE id IN ({','.join('?' * len(top))})",
+                    [chunk_id for chunk_id, _ in top]
+                ).fetchall()
+            }
+        return [
+            (Document(id=chunk_id, page_content=stored[chunk_id][0], metadata=json.loads(stored[chunk_id][1])), score)
+            for chunk_id, score in top
+        ]
+
+    def retrieve(self, query: str, k: int = DEFAULT_TOP_K, documents: Optional[Iterable[str]] = None) -> List[Document]:
+        """Return the top-k chunks for a query without scores"""
+        return [doc for doc, _ in self.search(query, k=k, documents=documents)]
+
+    def documents(self) -> List[str]:
+        """Names of the indexed documents"""
+        with self._lock:
+            return [row[0] for row in self._db.execute("SELECT DISTINCT document FROM chunks ORDER BY document")]
+
+    def delete_document(self, document_name: str) -> None:
+        """Remove every chunk of a document"""
+        with self._lock:
+            self._db.execute(
+                "DELETE FROM postings WHERE chunk_id IN (SELECT id FROM chunks WHERE document = ?)", (document_name,)
+            )
+            self._db.execute("DELETE FROM chunks WHERE document = ?", (document_name,))
+            self._db.commit()
+
+    def clear(self) -> None:
+        """Remove every indexed chunk"""
+        with self._lock:
+            self._db.execute("DELETE FROM postings")
+            self._db.execute("DELETE FROM chunks")
+            self._db.commit()
+
+    def backfill_from_collection(self, backend, collection_name: str, document_name: str,
+                                 where: Optional[dict] = None) -> int:
+        """
+        Index chunks already stored in a vector collection (no embedding needed).
+
+        Args:
+            backend: VectorBackend holding the collection
+            collection_name: Collection holding the document's chunks
+            document_name: Document name the chunks are indexed under
+            where: Optional metadata filter, e.g. {"source": name} for the unified collection
+
+        Returns:
+            Number of chunks indexed
+        """
+        total = 0
+        offset = 0
+        while True:
+            batch = backend.get(collection_name, where=where, limit=BACKFILL_BATCH_SIZE, offset=offset)
+            if not batch:
+                return total
+            docs = [Document(page_content=chunk["document"], metadata=chunk["metadata"]) for chunk in batch]
+            self.add_documents(docs, [chunk["id"] for chunk in batch], document_name=document_name)
+            total += len(batch)
+            offset += len(batch)
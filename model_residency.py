@@ -0,0 +1,293 @@
+"""
+Ollama model residency for the RAG apps
+Decides how long each Ollama model stays loaded after a request instead of
+unloading it after every call. Each model gets a keep-alive policy:
+
+- "pinned": stay loaded until the Ollama server stops
+- "idle:<duration>": unload after being idle that long, e.g. "idle:10m"
+- "pressure": stay loaded, but unload when available memory runs low
+- "unload": unload right after every request
+
+Models can be preloaded at startup, and the load time Ollama reports for
+each request is recorded separately from inference time.
+"""
+
+import re
+import threading
+import time
+from collections import defaultdict
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+from startup_timing import timed_import
+
+PINNED = "pinned"
+IDLE = "idle"
+PRESSURE = "pressure"
+UNLOAD = "unload"
+
+# Policy for models without a "residency" entry in models_config
+DEFAULT_POLICY = "idle:5m"
+
+# "pressure" models are unloaded when available system memory drops below this
+DEFAULT_MIN_FREE_MEMORY_MB = 2048
+
+# Load times above this count as a cold load (a warm model still reports a few ms)
+COLD_LOAD_SECONDS = 0.25
+
+# Model kinds, which decide how a model is preloaded and unloaded
+LLM = "llm"
+EMBEDDING = "embedding"
+
+# Idle TTLs such as "90s", "10m" or "1h30m"
+DURATION_PATTERN = re.compile(r"(\d+)([hms])")
+DURATION_SECONDS = {"h": 3600, "m": 60, "s": 1}
+
+
+def parse_policy(policy: str) -> Tuple[str, Optional[str]]:
+    """
+    Parse a residency policy string.
+
+    Args:
+        policy: "pinned", "pressure", "unload" or "idle:<duration>"
+            (a bare duration such as "10m" is read as an idle TTL)
+
+    Returns:
+        (kind, idle_ttl) where idle_ttl is only set for idle policies
+    """
+    policy = policy.strip().lower()
+    if policy in (PINNED, PRESSURE, UNLOAD):
+        return policy, None
+    if policy.startswith(IDLE + ":"):
+        ttl = policy[len(IDLE) + 1:].strip()
+    else:
+        ttl = policy
+    if not ttl or DURATION_PATTERN.sub("", ttl) != "":
+        raise ValueError(f"Unknown residency policy: {policy!r}")
+    return IDLE, ttl
+
+
+def duration_seconds(duration: str) -> int:
+    """Convert a duration such as "1h30m" to seconds"""
+    return sum(int(value) * DURATION_SECONDS[unit] for value, unit in DURATION_PATTERN.findall(duration))
+
+
+def keep_alive_for(policy: str) -> int:
+    """
+    Ollama keep_alive value in seconds for a policy.
+
+    -1 keeps the model loaded and 0 unloads it after the request. Seconds are
+    used rather than duration strings because OllamaEmbeddings only accepts ints.
+    """
+    kind, ttl = parse_policy(policy)
+    if kind == UNLOAD:
+        return 0
+    if kind == IDLE:
+        return duration_seconds(ttl)
+    return -1
+
+
+def available_memory_mb() -> Optional[float]:
+    """Available system memory in MB, or None where /proc/meminfo is missing"""
+    try:
+        with open("/proc/meminfo") as meminfo:
+            for line in meminfo:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+
+def same_model(a: str, b: str) -> bool:
+    """Compare Ollama model names, treating "name" and "name:latest" as equal"""
+    def normalize(name):
+        return name if ":" in name else f"{name}:latest"
+    return normalize(a) == normalize(b)
+
+
+class ModelResidencyManager:
+    """Keep-alive policies, preloading, pressure unloading and timing for Ollama models"""
+
+    def __init__(self, policies: Optional[Dict[str, str]] = None, default_policy: str = DEFAULT_POLICY,
+                 min_free_memory_mb: float = DEFAULT_MIN_FREE_MEMORY_MB, host: Optional[str] = None,
+                 client=None, memory_probe: Callable[[], Optional[float]] = available_memory_mb):
+        """
+        Args:
+            policies: Residency policy per model name
+            default_policy: Policy for models not listed in policies
+            min_free_memory_mb: Memory threshold for "pressure" models
+            host: Ollama server URL (OLLAMA_HOST or the local default if None)
+            client: Ollama client (created from host on first use if None)
+            memory_probe: Returns available memory in MB
+        """
+        for policy in [default_policy, *(policies or {}).values()]:
+            parse_policy(policy)
+        self.host = host
+        self._client = client
+        self.policies = dict(policies or {})
+        self.default_policy = default_policy
+        self.min_free_memory_mb = min_free_memory_mb
+        self.memory_probe = memory_probe
+        self._kinds: Dict[str, str] = {}
+        self._lock = threading.Lock()
+        self._stats = defaultdict(lambda: {
+            "calls": 0, "cold_loads": 0, "load_seconds": 0.0, "inference_seconds": 0.0, "unloads": 0
+        })
+
+    @property
+    def client(self):
+        """Ollama client, importing the ollama package on first use (it is slow to import)"""
+        with self._lock:
+            if self._client is None:
+                self._client = timed_import("ollama").Client(host=self.host)
+            return self._client
+
+    def policy(self, model: str) -> str:
+        """Residency policy for a model"""
+        for name, policy in self.policies.items():
+            if same_model(name, model):
+                return policy
+        return self.default_policy
+
+    def keep_alive(self, model: str, kind: str = LLM) -> int:
+        """Ollama keep_alive value for a model, remembering how the model is used"""
+        self._kinds[model] = kind
+        return keep_alive_for(self.policy(model))
+
+    def preload(self, model: str, kind: str = LLM) -> Optional[float]:
+        """
+        Load a model into memory with its policy's keep_alive.
+
+        Returns:
+            Load time in seconds, or None if the model is not preloaded
+            ("unload" policy) or Ollama could not be reached
+        """
+        keep_alive = self.keep_alive(model, kind)
+        if keep_alive == 0:
+            return None
+        started = time.perf_counter()
+        try:
+            # An empty request only loads the model
+            if kind == EMBEDDING:
+                response = self.client.embed(model=model, input=[], keep_alive=keep_alive)
+            else:
+                response = self.client.generate(model=model, prompt="", keep_alive=keep_alive)
+        except Exception:
+            return None
+        load_ns = getattr(response, "load_duration", None)
+        load_seconds = load_ns / 1e9 if load_ns else time.perf_counter() - started
+        self.record(model, load_seconds, 0.0, calls=0)
+        return load_seconds
+
+    def preload_in_background(self, models: Iterable[Tuple[str, str]]) -> threading.Thread:
+        """Preload (model, kind) pairs one after another in a daemon thread"""
+        models = list(models)
+
+        def run():
+            for model, kind in models:
+                self.preload(model, kind)
+
+        thread = threading.Thread(target=run, name="ollama-preload", daemon=True)
+        thread.start()
+        return thread
+
+    def unload(self, model: str) -> bool:
+        """Ask Ollama to unload a model now, returning False if the request failed"""
+        try:
+            if self._kinds.get(model) == EMBEDDING:
+                self.client.embed(model=model, input=[], keep_alive=0)
+            else:
+                self.client.generate(model=model, prompt="", keep_alive=0)
+        except Exception:
+            return False
+        with self._lock:
+            self._stats[model]["unloads"] += 1
+        return True
+
+    def loaded_models(self) -> List[str]:
+        """Names of the models Ollama currently has in memory"""
+        try:
+            return [m.model for m in self.client.ps().models]
+        except Exception:
+            return []
+
+    def release_under_pressure(self, keep: Optional[str] = None) -> List[str]:
+        """
+        Unload loaded "pressure" models while available memory is below the threshold.
+
+        Args:
+            keep: Model about to be used, which is never unloaded
+
+        Returns:
+            Names of the unloaded models
+        """
+        available = self.memory_probe()
+        if available is None or available >= self.min_free_memory_mb:
+            return []
+        unloaded = []
+        for loaded in self.loaded_models():
+            if keep is not None and same_model(loaded, keep):
+                continue
+            if parse_policy(self.policy(loaded))[0] != PRESSURE:
+                continue
+            name = next((m for m in self._kinds if same_model(m, loaded)), loaded)
+            if self.unload(name):
+                unloaded.append(name)
+        return unloaded
+
+    def record(self, model: str, load_seconds: float, inference_seconds: float, calls: int = 1) -> None:
+        """Add one request's load and inference time to a model's totals"""
+        with self._lock:
+            stats = self._stats[model]
+            stats["calls"] += calls
+            stats["load_seconds"] += load_seconds
+            stats["inference_seconds"] += inference_seconds
+            if load_seconds > COLD_LOAD_SECONDS:
+                stats["cold_loads"] += 1
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        """Load and inference totals per model"""
+        with self._lock:
+            return {model: dict(stats) for model, stats in self._stats.items()}
+
+    def callback_handler(self, model: str) -> "ResidencyCallbackHandler":
+        """LangChain callback recording timings for a model"""
+        return ResidencyCallbackHandler(self, model)
+
+
+def response_timings(info: Dict[str, Any]) -> Optional[Tuple[float, float]]:
+    """
+    Split an Ollama response's durations into (load_seconds, inference_seconds).
+
+    Returns:
+        None if the response carries no timing information
+    """
+    total_ns = info.get("total_duration")
+    if not total_ns:
+        return None
+    load_ns = info.get("load_duration") or 0
+    return load_ns / 1e9, max(total_ns - load_ns, 0) / 1e9
+
+
+class ResidencyCallbackHandler(BaseCallbackHandler):
+    """Frees memory before an Ollama request and records its load and inference time"""
+
+    def __init__(self, manager: ModelResidencyManager, model: str):
+        self.manager = manager
+        self.model = model
+
+    def on_llm_start(self, serialized, prompts, **kwargs) -> None:
+        self.manager.release_under_pressure(keep=self.model)
+
+    def on_llm_end(self, response, **kwargs) -> None:
+        for generations in response.generations:
+            for generation in generations:
+                info = dict(generation.generation_info or {})
+                message = getattr(generation, "message", None)
+                if message is not None:
+                    info.update(getattr(message, "response_metadata", None) or {})
+                timings = response_timings(info)
+                if timings:
+                    self.manager.record(self.model, *timings)
@@ -11,6 +11,10 @@ Model configuration fields:
 - display_name: Human-readable name shown in the UI
 - provider: 'ollama' or 'anthropic' (or custom provider)
 - description: Optional description of the model
+- residency: Optional Ollama keep-alive policy, see model_residency.py
+  ("pinned", "idle:<duration>", "pressure" or "unload")
+- context_tokens: Optional token budget for retrieved context in the prompt
+  (defaults to DEFAULT_CONTEXT_TOKENS)
 """
 
 MODELS = [
@@ -18,19 +22,25 @@ MODELS = [
         "name": "granite4:small-h",
         "display_name": "Granite 4 Small (Local)",
         "provider": "ollama",
-        "description": "Balanced performance, runs locally via Ollama"
+        "description": "Balanced performance, runs locally via Ollama",
+        "residency": "pressure",
+        # Ollama's default 4096-token window, minus room for the prompt and answer
+        "context_tokens": 3000
     },
     {
         "name": "granite4:tiny-h",
         "display_name": "Granite 4 Tiny (Local)",
         "provider": "ollama",
-        "description": "Smaller and faster, runs locally via Ollama"
+        "description": "Smaller and faster, runs locally via Ollama",
+        "residency": "idle:10m",
+        "context_tokens": 3000
     },
     {
         "name": "claude-sonnet-4-20250514",
         "display_name": "Claude Sonnet 4",
         "provider": "anthropic",
-        "description": "Anthropic's Claude Sonnet 4 (requires API key)"
+        "description": "Anthropic's Claude Sonnet 4 (requires API key)",
+        "context_tokens": 12000
     },
     # Add more models below:
     # {
@@ -53,10 +63,15 @@ MODELS = [
     # },
 ]
 
+# Context token budget for models without a "context_tokens" entry
+DEFAULT_CONTEXT_TOKENS = 3000
+
 # Embedding model configuration
 EMBEDDING_MODEL = {
     "name": "nomic-embed-text",
-    "provider": "ollama"
+    "provider": "ollama",
+    # Small and used by every question and upload, so it stays loaded
+    "residency": "pinned"
 }
 
 def get_model_list():
@@ -74,6 +89,22 @@ def get_model_config(model_name):
             return model
     return None
 
+def get_residency_policies():
+    """Returns dict mapping Ollama model names to their residency policies"""
+    models = MODELS + [EMBEDDING_MODEL]
+    return {
+        model["name"]: model["residency"]
+        for model in models
+        if model["provider"] == "ollama" and "residency" in model
+    }
+
+def get_context_budget(model_name):
+    """Returns the token budget for retrieved context in the model's prompt"""
+    config = get_model_config(model_name)
+    if config and config.get("context_tokens"):
+        return config["context_tokens"]
+    return DEFAULT_CONTEXT_TOKENS
+
 def get_default_model():
     """Returns the default model name"""
     return MODELS[0]["name"] if MODELS else None
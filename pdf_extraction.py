@@ -0,0 +1,110 @@
+"""
+PDF text extraction for the Document Q&A app
+Extracts pages with PyMuPDF, either in the calling process or across a pool of
+worker processes for large documents. Each worker opens the PDF itself and
+extracts a contiguous range of pages; results are yielded in page order with
+the same source/page metadata as single-process extraction.
+"""
+
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from importlib.util import find_spec
+from typing import Iterator, List, Tuple
+
+from langchain_core.documents import Document
+
+# PyMuPDF is imported when a PDF is first opened, not when the app starts
+PYMUPDF_AVAILABLE = find_spec("fitz") is not None
+
+# Pages extracted by a worker process per task
+DEFAULT_PAGES_PER_TASK = 16
+
+# Documents shorter than this are extracted in-process (pool start-up dominates)
+MIN_PARALLEL_PAGES = 32
+
+
+def page_ranges(page_count: int, pages_per_task: int) -> List[Tuple[int, int]]:
+    """Split range(page_count) into consecutive (start, stop) ranges"""
+    if pages_per_task < 1:
+        raise ValueError("pages_per_task must be at least 1")
+    return [(start, min(start + pages_per_task, page_count)) for start in range(0, page_count, pages_per_task)]
+
+
+def count_pages(pdf_path: str) -> int:
+    """Number of pages in a PDF"""
+    import fitz  # PyMuPDF
+    with fitz.open(pdf_path) as doc:
+        return len(doc)
+
+
+def extract_page_range(pdf_path: str, start: int, stop: int) -> List[str]:
+    """Extract the text of pages [start, stop), run inside a worker process"""
+    import fitz  # PyMuPDF
+    with fitz.open(pdf_path) as doc:
+        return [doc[page_num].get_text() for page_num in range(start, stop)]
+
+
+def make_page(text: str, filename: str, page_num: int) -> Document:
+    """Create a LangChain Document for one page"""
+    return Document(
+        page_content=text,
+        metadata={
+            "source": filename,
+            "page": page_num
+        }
+    )
+
+
+def iter_pdf_pages(pdf_path: str, filename: str, workers: int = 1,
+                   pages_per_task: int = DEFAULT_PAGES_PER_TASK) -> Iterator[Document]:
+    """
+    Yield PDF pages in order, extracting them in parallel for large documents.
+
+    With workers > 1 and at least MIN_PARALLEL_PAGES pages, page ranges are
+    extracted by a pool of worker processes. At most 2 * workers ranges are in
+    flight, so memory stays bounded while the consumer embeds earlier pages.
+
+    Args:
+        pdf_path: Path to the PDF file
+        filename: Original file name stored as source metadata
+        workers: Number of extraction processes (1 extracts in-process)
+        pages_per_task: Pages extracted per worker task
+
+    Returns:
+        Iterator of page documents with source and page metadata
+    """
+    page_count = count_pages(pdf_path)
+
+    if workers <= 1 or page_count < MIN_PARALLEL_PAGES:
+        import fitz  # PyMuPDF
+        with fitz.open(pdf_path) as doc:
+            for page_num in range(page_count):
+                yield make_page(doc[page_num].get_text(), filename, page_num)
+        return
+
+    ranges = iter(page_ranges(page_count, pages_per_task))
+    # Spawn rather than fork: the Streamlit server process runs many threads
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context) as executor:
+        pending = deque()
+
+        def submit_next() -> None:
+            next_range = next(ranges, None)
+            if next_range is not None:
+                pending.append((next_range[0], executor.submit(extract_page_range, pdf_path, *next_range)))
+
+        for _ in range(workers * 2):
+            submit_next()
+
+        try:
+            while pending:
+                start, future = pending.popleft()
+                texts = future.result()
+                submit_next()
+                for offset, text in enumerate(texts):
+                    yield make_page(text, filename, start + offset)
+        finally:
+            # Consumer stopped early or a worker failed
+            for _, future in pending:
+                future.cancel()
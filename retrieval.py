@@ -0,0 +1,359 @@
+"""
+Retrieval helpers shared by the Document Q&A and Time-Series RAG apps
+Searches the per-document collections concurrently, runs one MMR pass
+over the candidates of every collection, fuses vector and
+keyword rankings and builds query pipelines that retrieve once per question
+and stream the answer. Each step is a span of the current latency trace.
+"""
+
+import heapq
+import time
+from concurrent.futures import ThreadPoolExecutor
+from operator import itemgetter
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.runnables import RunnableLambda, RunnablePassthrough
+
+from context_packing import RELEVANCE_SCORE_KEY
+from latency_tracing import bind, span
+
+# Number of chunks handed to the prompt, however many documents are selected
+DEFAULT_TOP_K = 15
+
+# Upper bound on concurrent collection searches per question
+DEFAULT_MAX_WORKERS = 8
+
+# Reciprocal rank fusion constant, dampens the weight of the top ranks
+DEFAULT_RRF_K = 60
+
+# MMR trade-off between relevance (1.0) and diversity (0.0), LangChain's default
+DEFAULT_MMR_LAMBDA = 0.5
+
+
+def maximal_marginal_relevance(query_embedding: Sequence[float], embeddings, k: int = DEFAULT_TOP_K,
+                               lambda_mult: float = DEFAULT_MMR_LAMBDA) -> List[int]:
+    """
+    Select a relevant but diverse subset of candidates with maximal marginal relevance.
+
+    Each step picks the candidate maximizing
+    lambda_mult * sim(query, c) - (1 - lambda_mult) * max(sim(c, selected)),
+    using cosine similarity. The similarity of every candidate to the selected
+    set is kept as a running maximum, so a step costs one matrix-vector
+    product instead of rebuilding the pairwise similarity matrix.
+
+    Args:
+        query_embedding: Question embedding
+        embeddings: Candidate embeddings, one row per candidate
+        k: Number of candidates selected
+        lambda_mult: Relevance/diversity trade-off
+
+    Returns:
+        Indices of the selected candidates, in selection order
+    """
+    candidates = np.asarray(embeddings, dtype=np.float32)
+    if k < 1 or candidates.size == 0:
+        return []
+    norms = np.linalg.norm(candidates, axis=1, keepdims=True)
+    candidates = candidates / np.where(norms == 0, 1.0, norms)
+    query = np.asarray(query_embedding, dtype=np.float32)
+    query_norm = np.linalg.norm(query)
+    relevance = candidates @ (query / query_norm if query_norm else query)
+
+    redundancy = np.full(len(candidates), -np.inf, dtype=np.float32)
+    available = np.ones(len(candidates), dtype=bool)
+    selected: List[int] = []
+    for _ in range(min(k, len(candidates))):
+        if selected:
+            scores = lambda_mult * relevance - (1 - lambda_mult) * redundancy
+        else:
+            scores = relevance.copy()
+        scores[~available] = -np.inf
+        best = int(np.argmax(scores))
+        selected.append(best)
+        available[best] = False
+        redundancy = np.maximum(redundancy, candidates @ candidates[best])
+    return selected
+
+
+def cosine_similarities(query_embedding: Sequence[float], embeddings) -> np.ndarray:
+    """Cosine similarity of each embedding (one per row) to the query embedding"""
+    vectors = np.asarray(embeddings, dtype=np.float32)
+    query = np.asarray(query_embedding, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1) * np.linalg.norm(query)
+    return (vectors @ query) / np.where(norms == 0, 1.0, norms)
+
+
+class MMRRetriever:
+    """Retriever running a single MMR pass over candidates from several collections"""
+
+    def __init__(self, backend, collection_names: List[str], embeddings, k: int = DEFAULT_TOP_K,
+                 fetch_k: Optional[int] = None, lambda_mult: float = DEFAULT_MMR_LAMBDA,
+                 max_workers: int = DEFAULT_MAX_WORKERS, where: Optional[dict] = None):
+        """
+        Args:
+            backend: VectorBackend holding the collections
+            collection_names: Collections to search, embedded with the same model
+            embeddings: Embeddings object providing embed_query
+            k: Number of documents returned
+            fetch_k: MMR candidates, taken as the globally closest chunks (defaults to 2 * k)
+            lambda_mult: Relevance/diversity trade-off
+            max_workers: Maximum number of collections searched at the same time
+            where: Optional metadata filter applied to every collection
+        """
+        self.backend = backend
+        self.collection_names = list(collection_names)
+        self.embeddings = embeddings
+        self.k = k
+        self.fetch_k = fetch_k or k * 2
+        self.lambda_mult = lambda_mult
+        self.max_workers = max_workers
+        self.where = where
+
+    def _candidates(self, collection_name: str, embedding: List[float]) -> List[Tuple[float, Document, list]]:
+        """Fetch the closest chunks of one collection with their embeddings"""
+        try:
+            found = self.backend.query(collection_name, embedding, self.fetch_k, where=self.where,
+                                       include_embeddings=True)
+        except Exception:
+            return []
+        return [
+            (chunk["distance"], Document(id=chunk["id"], page_content=chunk["document"], metadata=chunk["metadata"]),
+             chunk["embedding"])
+            for chunk in found
+        ]
+
+    def invoke(self, query):
+        """Gather candidates from all collections and select a diverse global top-k"""
+        if isinstance(query, dict):
+            query = query.get("question", query.get("input", ""))
+
+        if not self.collection_names:
+            return []
+
+        # Embed once and reuse the vector for every collection
+        with span("embed_query"):
+            embedding = self.embeddings.embed_query(query)
+
+        workers = max(1, min(self.max_workers, len(self.collection_names)))
+        search = bind(lambda name: self._candidates(name, embedding), "search")
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            results = executor.map(search, self.collection_names)
+            candidates = [candidate for found in results for candidate in found]
+
+        # The same fetch_k closest chunks a single collection would consider
+        candidates = heapq.nsmallest(self.fetch_k, candidates, key=lambda candidate: candidate[0])
+        if not candidates:
+            return []
+        with span("mmr"):
+            picked = maximal_marginal_relevance(
+                embedding, [vector for _, _, vector in candidates], k=self.k, lambda_mult=self.lambda_mult
+            )
+            # The context packer drops chunks far less relevant than the best one
+            relevance = cosine_similarities(embedding, [candidates[i][2] for i in picked])
+        docs = [candidates[i][1] for i in picked]
+        for doc, score in zip(docs, relevance):
+            doc.metadata[RELEVANCE_SCORE_KEY] = float(score)
+        return docs
+
+    def get_relevant_documents(self, query):
+        """For compatibility with older LangChain versions"""
+        return self.invoke(query)
+
+    def __or__(self, other):
+        """Support pipe operator for LangChain LCEL"""
+        return RunnableLambda(self.invoke) | other
+
+
+def fusion_key(doc: Document) -> Tuple[str, str]:
+    """Identify a chunk across retrievers by its source and text"""
+    return doc.metadata.get("source", ""), doc.page_content
+
+
+def reciprocal_rank_fusion(rankings: List[List[Document]], k: int = DEFAULT_TOP_K,
+                           rrf_k: int = DEFAULT_RRF_K) -> List[Document]:
+    """
+    Merge ranked result lists with reciprocal rank fusion.
+
+    Each chunk scores sum(1 / (rrf_k + rank)) over the lists it appears in,
+    so chunks ranked well by both retrievers come first.
+
+    Args:
+        rankings: Ranked document lists, best first
+        k: Number of documents returned
+        rrf_k: Fusion constant
+
+    Returns:
+        Top-k fused documents
+    """
+    scores: Dict[Tuple[str, str], float] = {}
+    docs: Dict[Tuple[str, str], Document] = {}
+    for ranking in rankings:
+        for rank, doc in enumerate(ranking, start=1):
+            key = fusion_key(doc)
+            scores[key] = scores.get(key, 0.0) + 1.0 / (rrf_k + rank)
+            docs.setdefault(key, doc)
+    # Ties keep first-seen order, so the first ranking breaks them
+    top = sorted(scores, key=lambda key: -scores[key])[:k]
+    return [docs[key] for key in top]
+
+
+class HybridRetriever:
+    """Retriever fusing vector search with BM25 keyword search"""
+
+    def __init__(self, vector_retriever, lexical_search: Callable[[str], List[Document]],
+                 k: int = DEFAULT_TOP_K, rrf_k: int = DEFAULT_RRF_K,
+                 vector_timeout: Optional[float] = None, vector_deadline: Optional[float] = None):
+        """
+        Args:
+            vector_retriever: Runnable vector retriever, or None for keyword search only
+            lexical_search: Function mapping a question to ranked documents
+            k: Number of documents returned
+            rrf_k: Reciprocal rank fusion constant
+            vector_timeout: Seconds to wait for the vector search (which needs the
+                embedding model) before answering from keyword results alone
+            vector_deadline: time.monotonic() value after which the vector search is
+                no longer waited for, shared with earlier steps of the question that
+                already waited on the embedding model
+        """
+        self.vector_retriever = vector_retriever
+        self.lexical_search = lexical_search
+        self.k = k
+        self.rrf_k = rrf_k
+        self.vector_timeout = vector_timeout
+        self.vector_deadline = vector_deadline
+        # Set when the last query was answered from keyword results only
+        self.used_lexical_fallback = False
+
+    def invoke(self, query):
+        """Retrieve documents from both retrievers and fuse the rankings"""
+        if isinstance(query, dict):
+            query = query.get("question", query.get("input", ""))
+
+        self.used_lexical_fallback = False
+        if self.vector_retriever is None:
+            with span("keyword_search"):
+                return self.lexical_search(query)[:self.k]
+
+        # Start the vector search first, keyword search runs meanwhile
+        executor = ThreadPoolExecutor(max_workers=1)
+        future = executor.submit(bind(self.vector_retriever.invoke, "vector_search"), query)
+        executor.shutdown(wait=False)
+        with span("keyword_search"):
+            lexical_docs = self.lexical_search(query)
+
+        try:
+            # Without keyword hits there is nothing to fall back on, so keep waiting
+            vector_docs = future.result(timeout=self._vector_wait() if lexical_docs else None)
+        except Exception:
+            # Embedding model cold, overloaded or down: keyword results still answer
+            if not lexical_docs:
+                raise
+            self.used_lexical_fallback = True
+            return lexical_docs[:self.k]
+
+        with span("fusion"):
+            return reciprocal_rank_fusion([vector_docs, lexical_docs], k=self.k, rrf_k=self.rrf_k)
+
+    def _vector_wait(self) -> Optional[float]:
+        """Seconds left to wait for the vector search, None to wait indefinitely"""
+        if self.vector_deadline is None:
+            return self.vector_timeout
+        remaining = max(self.vector_deadline - time.monotonic(), 0.0)
+        return remaining if self.vector_timeout is None else min(remaining, self.vector_timeout)
+
+    def get_relevant_documents(self, query):
+        """For compatibility with older LangChain versions"""
+        return self.invoke(query)
+
+
+def format_docs(docs: List[Document]) -> str:
+    """Join retrieved documents into a single context string"""
+    return "\n\n".join(doc.page_content for doc in docs)
+
+
+def create_retrieve_once_chain(retriever, answer_chain, docs_formatter=format_docs,
+                               docs_packer: Optional[Callable[[List[Document]], List[Document]]] = None):
+    """
+    Build a chain that runs retrieval once per question and shares the documents.
+
+    The retrieved documents are stored under ``source_documents`` and the same
+    list is formatted into ``context`` for the prompt, so the query is embedded
+    and searched a single time for both the answer and the source display.
+
+    Args:
+        retriever: Runnable (or object with an ``invoke`` method) mapping a
+            question string to a list of documents
+        answer_chain: Runnable consuming a dict with ``context`` and ``question``
+        docs_formatter: Function turning the documents into the context string
+        docs_packer: Optional function selecting the passages given to the prompt
+            (e.g. context_packing.pack_context), whose output also becomes
+            ``source_documents`` so the sources shown match the prompt
+
+    Returns:
+        Runnable taking ``{"question": ...}`` and returning a dict with
+        ``question``, ``source_documents``, ``context`` and ``answer``
+    """
+    def retrieve(question: str) -> List[Document]:
+        with span("retrieval"):
+            docs = retriever.invoke(question)
+        if docs_packer is not None:
+            with span("pack_context"):
+                docs = docs_packer(docs)
+        return docs
+
+    def assemble_context(inputs: dict) -> str:
+        with span("prompt_assembly"):
+            return docs_formatter(inputs["source_documents"])
+
+    return (
+        RunnablePassthrough.assign(source_documents=itemgetter("question") | RunnableLambda(retrieve))
+        | RunnablePassthrough.assign(context=assemble_context)
+        | RunnablePassthrough.assign(answer=answer_chain)
+    )
+
+
+def message_text(chunk) -> str:
+    """
+    Extract the text of a model output chunk.
+
+    LLMs (OllamaLLM) stream plain strings, chat models (ChatOllama,
+    ChatAnthropic) stream message chunks whose content is a string or a list
+    of content blocks.
+    """
+    content = getattr(chunk, "content", chunk)
+    if isinstance(content, str):
+        return content
+    if isinstance(content, list):
+        return "".join(
+            part if isinstance(part, str) else part.get("text", "")
+            for part in content
+            if isinstance(part, (str, dict))
+        )
+    return str(content)
+
+
+def stream_retrieve_once(chain, question: str,
+                         on_sources: Optional[Callable[[List[Document]], None]] = None) -> Iterator[str]:
+    """
+    Stream the answer of a chain built by create_retrieve_once_chain.
+
+    Retrieval completes before the model is called, so on_sources receives the
+    retrieved documents before the first answer token is yielded.
+
+    Args:
+        chain: Retrieve-once chain
+        question: Question text
+        on_sources: Called once with the retrieved documents
+
+    Returns:
+        Iterator of answer text fragments as the model produces them
+    """
+    for chunk in chain.stream({"question": question}):
+        if "source_documents" in chunk and on_sources is not None:
+            on_sources(chunk["source_documents"])
+        if "answer" in chunk:
+            text = message_text(chunk["answer"])
+            if text:
+                yield text
@@ -0,0 +1,57 @@
+"""
+Startup timing for the RAG apps
+Provider, vector store and PDF loader modules take seconds to import, so the
+apps import them on first use instead of at start-up. timed_import records
+how long each of those imports took, and the apps show the timings together
+with how long their first render took.
+"""
+
+import importlib
+import sys
+import threading
+import time
+from types import ModuleType
+from typing import Dict, List, Tuple
+
+# Milliseconds spent importing each module through timed_import, in import order
+IMPORT_TIMES: Dict[str, float] = {}
+
+_lock = threading.Lock()
+
+
+def timed_import(name: str) -> ModuleType:
+    """
+    Import a module on first use, recording how long the import took.
+
+    Modules that were already imported (by the app or as a dependency of an
+    earlier import) cost nothing and are not recorded.
+
+    Args:
+        name: Dotted module name, e.g. "langchain_ollama"
+
+    Returns:
+        The imported module
+    """
+    module = sys.modules.get(name)
+    if module is not None:
+        return module
+
+    started = time.perf_counter()
+    module = importlib.import_module(name)
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    with _lock:
+        IMPORT_TIMES.setdefault(name, elapsed_ms)
+    return module
+
+
+def import_report() -> List[Tuple[str, float]]:
+    """Recorded (module, milliseconds) imports, slowest first"""
+    with _lock:
+        return sorted(IMPORT_TIMES.items(), key=lambda item: item[1], reverse=True)
+
+
+def format_import_report(report: List[Tuple[str, float]]) -> str:
+    """Render an import report as one line per module"""
+    if not report:
+        return "No deferred imports yet"
+    return "\n".join(f"{name}: {ms:.0f} ms" for name, ms in report)
@@ -0,0 +1,106 @@
+"""
+Integration tests for benchmarks/bench_end_to_end.py
+
+Runs the end-to-end benchmark offline at its smallest size:
+- Synthetic PDFs, Markdown and CSVs are readable by the apps' loaders
+- Fake embeddings are deterministic and count their calls
+- Every scenario ingests through the apps and answers chat turns
+- Reports are JSON-serializable and comparable with a baseline
+"""
+import json
+
+import pytest
+
+from benchmarks.bench_end_to_end import SIZES, compare, run
+from benchmarks.fake_models import FakeEmbeddings, FakeLLM, hashed_vector
+from benchmarks.synthetic_data import make_pdf, make_questions, write_sensor_csvs
+
+
+class TestFakeModels:
+    """Tests for the fake embedding model and LLM"""
+
+    def test_embeddings_are_deterministic_and_counted(self):
+        embeddings = FakeEmbeddings(dimension=32)
+
+        first = embeddings.embed_documents(["Prime the pump.", "Check the seal."])
+        second = embeddings.embed_query("Prime the pump.")
+
+        assert first[0] == second == hashed_vector("Prime the pump.", 32)
+        assert embeddings.requests == 2
+        assert embeddings.texts == 3
+
+    def test_shared_words_are_closer(self):
+        pump, pump_again, seal = (hashed_vector(text) for text in ("prime the pump", "pump priming", "seal gasket"))
+
+        assert sum(a * b for a, b in zip(pump, pump_again)) > sum(a * b for a, b in zip(pump, seal))
+
+    def test_llm_streams_fixed_number_of_tokens(self):
+        llm = FakeLLM(answer_tokens=5)
+
+        tokens = list(llm.stream("Context: ...\nQuestion: How do I prime the pump?"))
+
+        assert len(tokens) == 5
+        assert llm.calls == 1
+
+
+class TestSyntheticData:
+    """Tests for the synthetic inputs"""
+
+    def test_pdf_pages_are_extracted(self, tmp_path):
+        from langchain_community.document_loaders import PyPDFLoader
+
+        path = tmp_path / "manual.pdf"
+        path.write_bytes(make_pdf(3))
+        pages = PyPDFLoader(str(path)).load()
+
+        assert len(pages) == 3
+        assert pages[2].page_content.startswith("Section 3.")
+
+    def test_same_seed_same_bytes(self):
+        assert make_pdf(2, seed=4) == make_pdf(2, seed=4)
+        assert make_questions(5) == make_questions(5)
+
+    def test_csv_days(self, tmp_path):
+        from csv_processor import create_time_based_chunks
+
+        paths = write_sensor_csvs(str(tmp_path), days=2, interval_minutes=30)
+
+        assert len(paths) == 2
+        assert len(create_time_based_chunks(paths[0], hours_per_chunk=6)) == 4
+
+
+@pytest.mark.integration
+@pytest.mark.slow
+class TestEndToEnd:
+    """Tests for running the benchmark scenarios"""
+
+    @pytest.fixture(scope="class")
+    def report(self):
+        settings = {"questions": 2, "embed_request_ms": 0, "embed_text_ms": 0,
+                    "llm_first_token_ms": 0, "llm_token_ms": 0}
+        return run(list(SIZES), ["small"], settings)
+
+    def test_every_scenario_reports(self, report):
+        assert [(row["kind"], row["size"]) for row in report["results"]] == [
+            ("pdf", "small"), ("markdown", "small"), ("csv", "small")
+        ]
+        for row in report["results"]:
+            assert row["chunks"] > 0
+            assert row["embedded"] >= row["chunks"]
+            assert row["chunks_per_s"] > 0
+            assert row["turn_ms"]["p99"] >= row["turn_ms"]["p50"] >= row["retrieval_ms"]["p50"] > 0
+
+    def test_pdf_pages_per_second(self, report):
+        pdf = report["results"][0]
+
+        assert pdf["pages"] == SIZES["pdf"]["small"]
+        assert pdf["pages_per_s"] > 0
+
+    def test_report_is_json(self, report):
+        assert json.loads(json.dumps(report))["settings"]["questions"] == 2
+
+    def test_compare_with_itself(self, report):
+        changes = compare(report, report)
+
+        assert changes
+        assert {change["verdict"] for change in changes} == {"unchanged"}
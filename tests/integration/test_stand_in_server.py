@@ -0,0 +1,222 @@
+"""
+Integration tests for benchmarks/stand_in_server.py
+
+Runs the real Ollama and Anthropic clients against the stand-in server:
+- Embeddings and answers are deterministic and match the fake models
+- Streaming works for Ollama generate and chat, and Anthropic messages
+- ModelResidencyManager preloads, lists and unloads models through it
+- Injected request, load and token latency and the parallel limit apply
+"""
+import json
+import threading
+import time
+import urllib.error
+import urllib.request
+
+import pytest
+
+from benchmarks.fake_models import answer_tokens, hashed_vector
+from benchmarks.stand_in_server import StandInServer, default_models, keep_alive_seconds
+from model_residency import EMBEDDING, LLM, ModelResidencyManager
+
+pytestmark = pytest.mark.integration
+
+
+@pytest.fixture
+def server():
+    with StandInServer(answer_tokens=6, dimension=64) as server:
+        yield server
+
+
+def get_json(url):
+    with urllib.request.urlopen(url, timeout=5) as response:
+        return json.load(response)
+
+
+class TestKeepAlive:
+    """Tests for parsing Ollama keep_alive values"""
+
+    @pytest.mark.parametrize("value,seconds", [
+        (None, 300), (0, 0), (30, 30), ("10s", 10), ("5m", 300), ("1h30m", 5400), ("250ms", 0.25), ("45", 45),
+    ])
+    def test_durations(self, value, seconds):
+        assert keep_alive_seconds(value) == seconds
+
+    @pytest.mark.parametrize("value", [-1, "-1", "-1m"])
+    def test_negative_is_forever(self, value):
+        assert keep_alive_seconds(value) is None
+
+
+class TestOllama:
+    """Tests for the Ollama endpoints with the ollama and langchain_ollama clients"""
+
+    def test_embeddings_match_fake_model(self, server):
+        from langchain_ollama import OllamaEmbeddings
+
+        embeddings = OllamaEmbeddings(model="nomic-embed-text", base_url=server.url)
+
+        assert embeddings.embed_documents(["Prime the pump.", "Check the seal."])[1] == pytest.approx(
+            hashed_vector("Check the seal.", 64)
+        )
+        assert embeddings.embed_query("Prime the pump.") == pytest.approx(hashed_vector("Prime the pump.", 64))
+        assert server.stats()["embedded_texts"] == 3
+
+    def test_generate_streams_tokens(self, server):
+        from langchain_ollama import OllamaLLM
+
+        prompt = "Context: ...\nQuestion: How do I prime the pump?"
+        chunks = list(OllamaLLM(model="granite4:tiny-h", base_url=server.url).stream(prompt))
+
+        assert [chunk for chunk in chunks if chunk] == answer_tokens(prompt, 6)
+
+    def test_chat_answers(self, server):
+        from langchain_ollama import ChatOllama
+
+        message = ChatOllama(model="granite4:tiny-h", base_url=server.url).invoke("Question: seal gasket")
+
+        assert message.content == "seal gasket seal gasket seal gasket "
+        assert message.usage_metadata["output_tokens"] == 6
+
+    def test_tags_list_configured_models(self, server):
+        import ollama
+
+        assert [model.model for model in ollama.Client(host=server.url).list().models] == default_models()
+
+    def test_version_and_root(self, server):
+        with urllib.request.urlopen(server.url, timeout=5) as response:
+            assert response.read() == b"Ollama is running"
+        assert "version" in get_json(f"{server.url}/api/version")
+
+    def test_unknown_endpoint(self, server):
+        with pytest.raises(urllib.error.HTTPError) as error:
+            urllib.request.urlopen(f"{server.url}/api/pull", data=b"{}", timeout=5)
+
+        assert error.value.code == 404
+
+
+class TestResidency:
+    """Tests for loading and unloading models through ModelResidencyManager"""
+
+    def test_preload_and_unload(self):
+        with StandInServer(load_delay=0.05) as server:
+            manager = ModelResidencyManager({"granite4:tiny-h": "idle:10m", "nomic-embed-text": "pinned"},
+                                            host=server.url)
+
+            assert manager.preload("nomic-embed-text", EMBEDDING) == pytest.approx(0.05, abs=0.02)
+            assert manager.preload("granite4:tiny-h", LLM) == pytest.approx(0.05, abs=0.02)
+            assert sorted(manager.loaded_models()) == ["granite4:tiny-h", "nomic-embed-text"]
+
+            assert manager.unload("granite4:tiny-h")
+            assert manager.loaded_models() == ["nomic-embed-text"]
+            assert server.stats()["loads"] == {"nomic-embed-text": 1, "granite4:tiny-h": 1}
+
+    def test_expired_keep_alive_reloads(self):
+        import ollama
+
+        with StandInServer(load_delay=0.01) as server:
+            client = ollama.Client(host=server.url)
+            client.embed(model="nomic-embed-text", input=["pump"], keep_alive="100ms")
+            client.embed(model="nomic-embed-text", input=["pump"], keep_alive="100ms")
+            time.sleep(0.15)
+
+            assert client.ps().models == []
+            client.embed(model="nomic-embed-text", input=["pump"])
+            assert server.stats()["loads"] == {"nomic-embed-text": 2}
+
+    def test_pinned_models_report_distant_expiry(self, server):
+        import ollama
+
+        client = ollama.Client(host=server.url)
+        client.generate(model="granite4:tiny-h", prompt="", keep_alive=-1)
+
+        assert client.ps().models[0].expires_at.year > 2100
+
+
+class TestAnthropic:
+    """Tests for the Anthropic messages endpoint with langchain_anthropic"""
+
+    def llm(self, server, max_tokens=100):
+        from langchain_anthropic import ChatAnthropic
+
+        return ChatAnthropic(model="claude-sonnet-4-20250514", anthropic_api_url=server.url,
+                             anthropic_api_key="stand-in", max_tokens=max_tokens)
+
+    def test_invoke(self, server):
+        message = self.llm(server).invoke("Question: valve check")
+
+        assert message.content == "valve check valve check valve check "
+        assert message.response_metadata["stop_reason"] == "end_turn"
+        assert message.usage_metadata["output_tokens"] == 6
+
+    def test_stream(self, server):
+        chunks = [chunk.content for chunk in self.llm(server).stream("Question: valve check")]
+
+        assert "".join(chunks) == "valve check valve check valve check "
+        assert len([chunk for chunk in chunks if chunk]) == 6
+
+    def test_max_tokens_caps_answer(self, server):
+        message = self.llm(server, max_tokens=2).invoke("Question: valve check")
+
+        assert message.content == "valve check "
+        assert message.response_metadata["stop_reason"] == "max_tokens"
+
+
+class TestLatency:
+    """Tests for the injected latency and parallelism limits"""
+
+    def test_concurrent_requests_share_one_load(self):
+        import ollama
+
+        with StandInServer(load_delay=0.2) as server:
+            client = ollama.Client(host=server.url)
+            threads = [threading.Thread(target=client.embed, kwargs={"model": "nomic-embed-text", "input": ["a"]})
+                       for _ in range(4)]
+            started = time.perf_counter()
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+            assert time.perf_counter() - started < 0.4
+            assert server.stats()["loads"] == {"nomic-embed-text": 1}
+
+    def test_max_parallel_queues_requests(self):
+        import ollama
+
+        with StandInServer(request_latency=0.05, max_parallel=2) as server:
+            client = ollama.Client(host=server.url)
+            threads = [threading.Thread(target=client.embed, kwargs={"model": "nomic-embed-text", "input": ["a"]})
+                       for _ in range(6)]
+            started = time.perf_counter()
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+            assert time.perf_counter() - started >= 0.15
+            assert server.stats()["peak_parallel"] == 2
+
+    def test_first_token_and_token_rate(self):
+        from langchain_ollama import OllamaLLM
+
+        with StandInServer(first_token_latency=0.1, tokens_per_second=50, answer_tokens=6) as server:
+            llm = OllamaLLM(model="granite4:tiny-h", base_url=server.url)
+            llm.invoke("warm")
+            started = time.perf_counter()
+            stream = llm.stream("Question: pump")
+            next(stream)
+            first_token = time.perf_counter() - started
+            list(stream)
+            total = time.perf_counter() - started
+
+        assert 0.1 <= first_token < 0.2
+        assert total >= 0.1 + 5 / 50
+
+    def test_stats_endpoint(self, server):
+        import ollama
+
+        ollama.Client(host=server.url).embed(model="nomic-embed-text", input=["a", "b"])
+
+        stats = get_json(f"{server.url}/_stand_in/stats")
+        assert stats["requests"] == {"/api/embed": 1}
+        assert stats["embedded_texts"] == 2
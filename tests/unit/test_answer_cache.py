@@ -0,0 +1,127 @@
+"""
+Unit tests for answer_cache.py
+
+Tests the semantic answer cache including:
+- Hits for similar questions and misses below the threshold
+- Scoping by document selection, model and retrieval configuration
+- Invalidation when documents are re-indexed or the database is cleared
+- Persistence and eviction
+"""
+import pytest
+from langchain_core.documents import Document
+
+from answer_cache import AnswerCache, cosine_similarity, selection_key
+
+SOURCES = [Document(page_content="Torque the bolts to 40 Nm.", metadata={"source": "manual.pdf", "page": 3})]
+
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = AnswerCache(str(tmp_path / "answers.sqlite3"), threshold=0.9)
+    cache.store("What torque for the bolts?", [1.0, 0.0, 0.0], ["manual.pdf", "notes.md"], "granite",
+                "40 Nm.", SOURCES)
+    return cache
+
+
+class TestHelpers:
+    """Tests for cosine_similarity and selection_key"""
+
+    def test_cosine_similarity(self):
+        assert cosine_similarity([1.0, 0.0], [2.0, 0.0]) == pytest.approx(1.0)
+        assert cosine_similarity([1.0, 0.0], [0.0, 1.0]) == pytest.approx(0.0)
+        assert cosine_similarity([0.0, 0.0], [1.0, 0.0]) == 0.0
+
+    def test_selection_key_ignores_order_and_duplicates(self):
+        assert selection_key(["b.pdf", "a.pdf", "b.pdf"]) == selection_key(["a.pdf", "b.pdf"])
+
+
+class TestAnswerCache:
+    """Tests for AnswerCache"""
+
+    def test_similar_question_hits(self, cache):
+        hit = cache.lookup([0.98, 0.1, 0.0], ["notes.md", "manual.pdf"], "granite")
+
+        assert hit["answer"] == "40 Nm."
+        assert hit["question"] == "What torque for the bolts?"
+        assert hit["similarity"] > 0.9
+        assert hit["source_documents"][0].metadata == {"source": "manual.pdf", "page": 3}
+        assert cache.stats() == {"hits": 1, "misses": 0, "entries": 1}
+
+    def test_dissimilar_question_misses(self, cache):
+        assert cache.lookup([0.5, 0.8, 0.0], ["manual.pdf", "notes.md"], "granite") is None
+        assert cache.stats()["misses"] == 1
+
+    def test_most_similar_answer_wins(self, cache):
+        cache.store("Bolt torque?", [0.0, 1.0, 0.0], ["manual.pdf", "notes.md"], "granite", "Other.", [])
+
+        assert cache.lookup([0.1, 0.99, 0.0], ["manual.pdf", "notes.md"], "granite")["answer"] == "Other."
+
+    def test_scoped_to_document_selection(self, cache):
+        assert cache.lookup([1.0, 0.0, 0.0], ["manual.pdf"], "granite") is None
+
+    def test_scoped_to_model(self, cache):
+        assert cache.lookup([1.0, 0.0, 0.0], ["manual.pdf", "notes.md"], "claude") is None
+
+    def test_scoped_to_retrieval_configuration(self, tmp_path):
+        cache = AnswerCache(str(tmp_path / "answers.sqlite3"), threshold=0.9)
+        hybrid = {"retrieval_mode": "hybrid", "index_mode": "per_file", "context_tokens": 3000}
+        cache.store("Torque?", [1.0, 0.0], ["manual.pdf"], "granite", "40 Nm.", SOURCES, retrieval=hybrid)
+
+        assert cache.lookup([1.0, 0.0], ["manual.pdf"], "granite", retrieval=dict(hybrid))["answer"] == "40 Nm."
+        assert cache.lookup([1.0, 0.0], ["manual.pdf"], "granite", retrieval={**hybrid, "retrieval_mode": "vector"}) is None
+        assert cache.lookup([1.0, 0.0], ["manual.pdf"], "granite", retrieval={**hybrid, "index_mode": "unified"}) is None
+
+    def test_answers_without_retrieval_configuration_are_not_returned(self, tmp_path):
+        """Test that answers cached before the configuration was part of the key are never hits"""
+        import sqlite3
+
+        path = str(tmp_path / "answers.sqlite3")
+        db = sqlite3.connect(path)
+        db.execute(
+            "CREATE TABLE answers (id INTEGER PRIMARY KEY, model TEXT NOT NULL, documents TEXT NOT NULL, "
+            "generation TEXT NOT NULL, question TEXT NOT NULL, embedding BLOB NOT NULL, answer TEXT NOT NULL, "
+            "sources TEXT NOT NULL, created_at REAL NOT NULL)"
+        )
+        db.commit()
+        db.close()
+        cache = AnswerCache(path, threshold=0.9)
+
+        assert cache.lookup([1.0, 0.0], ["manual.pdf"], "granite", retrieval={"retrieval_mode": "hybrid"}) is None
+        cache.store("Torque?", [1.0, 0.0], ["manual.pdf"], "granite", "40 Nm.", SOURCES)
+        assert cache.lookup([1.0, 0.0], ["manual.pdf"], "granite")["answer"] == "40 Nm."
+
+    def test_reindexing_invalidates(self, cache):
+        cache.invalidate(["notes.md"])
+
+        assert cache.lookup([1.0, 0.0, 0.0], ["manual.pdf", "notes.md"], "granite") is None
+        assert cache.stats()["entries"] == 0
+
+    def test_answers_after_reindex_are_cached(self, cache):
+        cache.invalidate(["manual.pdf"])
+        cache.store("Torque?", [1.0, 0.0, 0.0], ["manual.pdf"], "granite", "45 Nm.", SOURCES)
+
+        assert cache.lookup([1.0, 0.0, 0.0], ["manual.pdf"], "granite")["answer"] == "45 Nm."
+
+    def test_invalidating_other_documents_keeps_answers(self, cache):
+        cache.invalidate(["other.pdf"])
+
+        assert cache.lookup([1.0, 0.0, 0.0], ["manual.pdf", "notes.md"], "granite") is not None
+
+    def test_clear(self, cache):
+        cache.clear()
+
+        assert cache.lookup([1.0, 0.0, 0.0], ["manual.pdf", "notes.md"], "granite") is None
+        assert cache.stats()["entries"] == 0
+
+    def test_persists_across_instances(self, cache, tmp_path):
+        reopened = AnswerCache(str(tmp_path / "answers.sqlite3"), threshold=0.9)
+
+        assert reopened.lookup([1.0, 0.0, 0.0], ["manual.pdf", "notes.md"], "granite")["answer"] == "40 Nm."
+
+    def test_evicts_oldest_entries(self, tmp_path):
+        cache = AnswerCache(str(tmp_path / "answers.sqlite3"), max_entries=2)
+        for i in range(3):
+            cache.store(f"q{i}", [float(i), 1.0], ["a.pdf"], "granite", f"a{i}", [])
+
+        assert cache.stats()["entries"] == 2
+        assert cache.lookup([0.0, 1.0], ["a.pdf"], "granite") is None
@@ -22,6 +22,16 @@ import sys
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
 
 
+@pytest.fixture(autouse=True)
+def answer_cache(monkeypatch):
+    """Keep the answer cache cleared with the database out of the working directory"""
+    from answer_cache import AnswerCache
+
+    cache = AnswerCache(":memory:")
+    monkeypatch.setattr('app.get_answer_cache', lambda: cache)
+    return cache
+
+
 class TestGetChromaClient:
     """Tests for get_chroma_client function"""
 
@@ -117,6 +127,14 @@ class TestGetChromaClient:
         assert client1 is not None
         assert client2 is not None
 
+    def test_client_is_shared(self, tmp_path, monkeypatch):
+        """Test that every call returns the process-wide client for the directory"""
+        from app import get_chroma_client
+
+        monkeypatch.setattr('app.CHROMA_PERSIST_DIR', str(tmp_path / "test_chroma"))
+
+        assert get_chroma_client() is get_chroma_client()
+
 
 class TestGetIndexedPdfsFromChroma:
     """Tests for get_indexed_pdfs_from_chroma function"""
@@ -219,6 +237,45 @@ class TestGetIndexedPdfsFromChroma:
 
         assert "my test file.pdf" in result
 
+    def test_uses_source_metadata_for_existing_collections(self, tmp_path, monkeypatch):
+        """Test that collections with chunks keep their original filename"""
+        from app import get_indexed_pdfs_from_chroma, get_chroma_client
+
+        monkeypatch.setattr('app.CHROMA_PERSIST_DIR', str(tmp_path / "test_chroma"))
+
+        collection = get_chroma_client().get_or_create_collection("pdf_my_file")
+        collection.add(ids=["1"], documents=["Prime the pump."], embeddings=[[0.1, 0.2]],
+                       metadatas=[{"source": "my_file.pdf", "page": 0}])
+
+        assert get_indexed_pdfs_from_chroma() == ["my_file.pdf"]
+
+    def test_reads_document_catalog(self, tmp_path, monkeypatch):
+        """Test that documents recorded in the catalog are listed without scanning collections"""
+        from app import get_indexed_pdfs_from_chroma, get_chroma_client, get_document_catalog
+
+        monkeypatch.setattr('app.CHROMA_PERSIST_DIR', str(tmp_path / "test_chroma"))
+
+        get_chroma_client()
+        assert get_indexed_pdfs_from_chroma() == []
+
+        # Collections created after the first listing are only known through the catalog
+        get_chroma_client().get_or_create_collection("pdf_untracked")
+        get_document_catalog().record("my_file.pdf", "pdf_my_file", 4)
+
+        assert get_indexed_pdfs_from_chroma() == ["my_file.pdf"]
+
+    def test_skips_interrupted_ingests(self, tmp_path, monkeypatch):
+        """Test that a collection left partially filled by an interrupted ingest is not listed"""
+        from app import get_indexed_pdfs_from_chroma, get_chroma_client, get_document_catalog
+
+        monkeypatch.setattr('app.CHROMA_PERSIST_DIR', str(tmp_path / "test_chroma"))
+
+        collection = get_chroma_client().get_or_create_collection("pdf_manual")
+        collection.add(ids=["1"], documents=["Page 1"], embeddings=[[0.1, 0.2]], metadatas=[{"source": "manual.pdf"}])
+        get_document_catalog().start_ingest("manual.pdf", "pdf_manual", "h1")
+
+        assert get_indexed_pdfs_from_chroma() == []
+
     def test_handles_exceptions_gracefully(self, tmp_path, monkeypatch):
         """Test that function handles exceptions without crashing"""
         from app import get_indexed_pdfs_from_chroma
@@ -230,7 +287,7 @@ class TestGetIndexedPdfsFromChroma:
         os.makedirs(test_dir, exist_ok=True)
 
         # Should return empty list on error
-        with patch('app.get_chroma_client', side_effect=Exception("Test error")):
+        with patch('app.get_vector_backend', side_effect=Exception("Test error")):
             result = get_indexed_pdfs_from_chroma()
             assert result == []
 
@@ -261,6 +318,21 @@ class TestClearChromaDatabase:
         # Collections should be gone
         assert len(get_indexed_pdfs_from_chroma()) == 0
 
+    def test_drops_shared_vectorstore_handles(self, tmp_path, monkeypatch):
+        """Test that handles of cleared collections are not handed out again"""
+        from langchain_core.embeddings import DeterministicFakeEmbedding
+        from app import clear_chroma_database, get_chroma_registry
+
+        monkeypatch.setattr('app.CHROMA_PERSIST_DIR', str(tmp_path / "test_chroma"))
+        registry = get_chroma_registry()
+        embeddings = DeterministicFakeEmbedding(size=8)
+        old_handle = registry.vectorstore("pdf_test", embeddings)
+
+        clear_chroma_database()
+
+        assert registry.stats()["handles"] == 0
+        assert registry.vectorstore("pdf_test", embeddings) is not old_handle
+
     def test_creates_directory_if_not_exists(self, tmp_path, monkeypatch):
         """Test that function creates directory if it doesn't exist"""
         from app import clear_chroma_database
@@ -334,6 +406,69 @@ class TestClearChromaDatabase:
             # Function should still return True (best effort)
             # Note: Actual behavior depends on implementation
 
+    def test_drops_ingest_checkpoints(self, tmp_path, monkeypatch):
+        """Test that checkpoints of interrupted ingests are dropped with their collections"""
+        from app import clear_chroma_database, get_chroma_client, get_document_catalog
+
+        monkeypatch.setattr('app.CHROMA_PERSIST_DIR', str(tmp_path / "test_chroma"))
+        get_chroma_client().get_or_create_collection("pdf_manual")
+        get_document_catalog().start_ingest("manual.pdf", "pdf_manual", "h1")
+
+        assert clear_chroma_database() is True
+        assert get_document_catalog().unfinished_ingests() == []
+
+
+    def test_clears_answer_cache(self, tmp_path, monkeypatch, answer_cache):
+        """Test that cached answers based on the deleted chunks are dropped"""
+        from app import clear_chroma_database
+
+        monkeypatch.setattr('app.CHROMA_PERSIST_DIR', str(tmp_path / "test_chroma"))
+        answer_cache.store("question", [1.0, 0.0], ["manual.pdf"], "llama3", "answer", [])
+
+        assert clear_chroma_database() is True
+        assert answer_cache.stats()["entries"] == 0
+
+
+class TestIngestUpload:
+    """Tests for ingest_upload, run by the ingestion workers"""
+
+    @pytest.fixture
+    def catalog(self):
+        from document_catalog import DocumentCatalog
+        return DocumentCatalog(":memory:")
+
+    def fake_process(self, written):
+        def process(job, file_name, data, embeddings, registry, lexical_index, catalog, update_existing=False):
+            return "vectorstore", {"chunk_count": 3, "content_hash": "h1", "byte_size": len(data)}, written
+        return process
+
+    def test_records_document_without_the_session(self, catalog, answer_cache):
+        """Test that the document is recorded even if no session collects the job"""
+        from app import ingest_upload, get_collection_name
+        from ingestion_jobs import IngestionJob
+
+        catalog.start_ingest("manual.pdf", get_collection_name("manual.pdf"), "h1")
+
+        result = ingest_upload(IngestionJob("manual.pdf"), self.fake_process(True), "manual.pdf", b"pdf",
+                               None, None, None, catalog, answer_cache)
+
+        assert result == "vectorstore"
+        assert catalog.get("manual.pdf")["chunk_count"] == 3
+        assert catalog.unfinished_ingests() == []
+
+    def test_invalidates_answers_only_when_chunks_were_written(self, catalog, answer_cache):
+        from app import ingest_upload
+        from ingestion_jobs import IngestionJob
+
+        answer_cache.store("question", [1.0, 0.0], ["manual.pdf"], "llama3", "answer", [])
+        ingest_upload(IngestionJob("manual.pdf"), self.fake_process(False), "manual.pdf", b"pdf",
+                      None, None, None, catalog, answer_cache)
+        assert answer_cache.stats()["entries"] == 1
+
+        ingest_upload(IngestionJob("manual.pdf"), self.fake_process(True), "manual.pdf", b"pdf",
+                      None, None, None, catalog, answer_cache)
+        assert answer_cache.stats()["entries"] == 0
+
 
 class TestCollectionNameGeneration:
     """Tests for collection name generation logic"""
@@ -0,0 +1,94 @@
+"""
+Unit tests for chroma_registry.py
+
+Tests the shared Chroma client and vectorstore handles including:
+- Reusing a handle per collection and embeddings
+- Dropping handles when collections are deleted or replaced
+- Handle counters
+"""
+import pytest
+from langchain_core.documents import Document
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+from chroma_registry import ChromaRegistry
+from vector_backends import ChromaBackend
+
+
+@pytest.fixture
+def registry(tmp_path):
+    return ChromaRegistry(ChromaBackend(str(tmp_path)))
+
+
+@pytest.fixture
+def embeddings():
+    return DeterministicFakeEmbedding(size=8)
+
+
+class TestHandles:
+    """Tests for handing out vectorstore handles"""
+
+    def test_handle_is_reused(self, registry, embeddings):
+        first = registry.vectorstore("pdf_manual", embeddings)
+        second = registry.vectorstore("pdf_manual", embeddings)
+
+        assert first is second
+        assert registry.stats() == {"handles": 1, "opened": 1, "reused": 1}
+
+    def test_collections_get_separate_handles(self, registry, embeddings):
+        first = registry.vectorstore("pdf_manual", embeddings)
+        second = registry.vectorstore("md_notes", embeddings)
+
+        assert first is not second
+        assert {c.name for c in registry.client.list_collections()} == {"pdf_manual", "md_notes"}
+
+    def test_other_embeddings_open_new_handle(self, registry, embeddings):
+        first = registry.vectorstore("pdf_manual", embeddings)
+        second = registry.vectorstore("pdf_manual", DeterministicFakeEmbedding(size=8))
+
+        assert first is not second
+        assert registry.stats()["handles"] == 1
+
+    def test_handle_sees_documents_added_through_another(self, registry, embeddings):
+        registry.vectorstore("pdf_manual", embeddings).add_documents(
+            [Document(page_content="Prime the pump.", metadata={"source": "manual.pdf"})]
+        )
+
+        assert registry.vectorstore("pdf_manual", embeddings)._collection.count() == 1
+
+
+class TestInvalidation:
+    """Tests for dropping handles of deleted or replaced collections"""
+
+    def test_delete_collection_drops_handle(self, registry, embeddings):
+        first = registry.vectorstore("pdf_manual", embeddings)
+
+        registry.delete_collection("pdf_manual")
+
+        assert registry.stats()["handles"] == 0
+        assert "pdf_manual" not in {c.name for c in registry.client.list_collections()}
+        assert registry.vectorstore("pdf_manual", embeddings) is not first
+
+    def test_recreated_collection_is_searchable(self, registry, embeddings):
+        registry.vectorstore("pdf_manual", embeddings)
+        registry.delete_collection("pdf_manual")
+
+        vectorstore = registry.vectorstore("pdf_manual", embeddings)
+        vectorstore.add_documents([Document(page_content="Replace the seal.", metadata={"source": "manual.pdf"})])
+
+        assert vectorstore.similarity_search("seal", k=1)[0].page_content == "Replace the seal."
+
+    def test_invalidate(self, registry, embeddings):
+        first = registry.vectorstore("pdf_manual", embeddings)
+
+        registry.invalidate("pdf_manual")
+        registry.invalidate("never_opened")
+
+        assert registry.vectorstore("pdf_manual", embeddings) is not first
+
+    def test_clear(self, registry, embeddings):
+        registry.vectorstore("pdf_manual", embeddings)
+        registry.vectorstore("md_notes", embeddings)
+
+        registry.clear()
+
+        assert registry.stats()["handles"] == 0
@@ -0,0 +1,200 @@
+"""
+Unit tests for context_packing.py
+
+Tests context assembly including:
+- Merging overlapping chunks from the same page, with and without start_index
+- Near-duplicate removal
+- Relative relevance score cutoff
+- Packing to a token budget in rank order
+- The full pipeline on real splitter output
+"""
+from langchain_core.documents import Document
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+from context_packing import (
+    estimate_tokens,
+    overlap_length,
+    merge_pair,
+    merge_overlapping,
+    drop_near_duplicates,
+    drop_low_scores,
+    pack_to_budget,
+    pack_context
+)
+
+PAGE_TEXT = " ".join(f"Step {i}: inspect valve V-{i} and record the pressure reading." for i in range(40))
+
+
+def chunk(text, source="manual.pdf", page=0, **metadata):
+    return Document(page_content=text, metadata={"source": source, "page": page, **metadata})
+
+
+def split_page(text=PAGE_TEXT, add_start_index=False):
+    splitter = RecursiveCharacterTextSplitter(chunk_size=300, chunk_overlap=60, add_start_index=add_start_index)
+    return splitter.split_documents([chunk(text)])
+
+
+class TestMerging:
+    """Tests for overlap detection and merging"""
+
+    def test_overlap_length(self):
+        assert overlap_length("x" * 10 + "shared overlap text here", "shared overlap text here and more") == 24
+
+    def test_short_coincidences_are_not_overlap(self):
+        assert overlap_length("ends with the", "the start") == 0
+
+    def test_merge_pair_by_text(self):
+        first = chunk("The pump must be primed before start. Check the seals weekly.")
+        second = chunk("Check the seals weekly. Replace them every year.")
+
+        merged = merge_pair(first, second)
+
+        assert merged.page_content == "The pump must be primed before start. Check the seals weekly. Replace them every year."
+
+    def test_merge_pair_in_either_order(self):
+        first = chunk("Check the seals weekly. Replace them every year.")
+        second = chunk("The pump must be primed before start. Check the seals weekly.")
+
+        assert merge_pair(first, second).page_content.startswith("The pump must")
+
+    def test_merge_pair_containment(self):
+        outer = chunk("A long passage that contains the short sentence inside it.")
+        inner = chunk("the short sentence")
+
+        assert merge_pair(outer, inner) is outer
+        assert merge_pair(inner, outer).page_content == outer.page_content
+
+    def test_merge_pair_by_start_index(self):
+        first = chunk("0123456789", start_index=10)
+        second = chunk("6789abcdef", start_index=16)
+
+        merged = merge_pair(first, second)
+
+        assert merged.page_content == "0123456789abcdef"
+        assert merged.metadata["start_index"] == 10
+
+    def test_adjacent_chunks_merge_by_start_index(self):
+        merged = merge_pair(chunk("abc", start_index=0), chunk("def", start_index=3))
+
+        assert merged.page_content == "abcdef"
+
+    def test_distant_chunks_do_not_merge(self):
+        assert merge_pair(chunk("abc", start_index=0), chunk("xyz", start_index=100)) is None
+
+    def test_split_page_reassembles(self):
+        for add_start_index in (False, True):
+            chunks = split_page(add_start_index=add_start_index)
+
+            merged = merge_overlapping(list(reversed(chunks)))
+
+            assert len(chunks) > 3
+            assert [d.page_content for d in merged] == [PAGE_TEXT]
+
+    def test_different_pages_are_not_merged(self):
+        first = chunk("Check the seals weekly. Replace them every year.", page=1)
+        second = chunk("Check the seals weekly. Replace them every year.", page=2)
+
+        assert len(merge_overlapping([first, second])) == 2
+
+    def test_merged_passage_keeps_best_rank(self):
+        chunks = split_page()
+        other = chunk("Unrelated note about the budget.", source="notes.md")
+
+        merged = merge_overlapping([chunks[2], other, chunks[1]])
+
+        assert merged[1] is other
+        assert len(merged) == 2
+
+
+class TestNearDuplicates:
+    """Tests for drop_near_duplicates"""
+
+    def test_drops_whitespace_and_case_variants(self):
+        docs = [chunk("Torque the M8 bolts to 40 Nm in a cross pattern."),
+                chunk("torque the  M8 bolts to 40 Nm in a cross pattern", source="copy.pdf")]
+
+        assert drop_near_duplicates(docs) == docs[:1]
+
+    def test_drops_contained_passage(self):
+        long_text = "Torque the M8 bolts to 40 Nm in a cross pattern. Then check the gasket for leaks."
+        docs = [chunk(long_text), chunk("Torque the M8 bolts to 40 Nm in a cross pattern.", page=4)]
+
+        assert drop_near_duplicates(docs) == docs[:1]
+
+    def test_keeps_distinct_passages(self):
+        docs = [chunk("Torque the M8 bolts to 40 Nm."), chunk("Replace the filter every 500 hours.")]
+
+        assert drop_near_duplicates(docs) == docs
+
+
+class TestScoreCutoff:
+    """Tests for dropping chunks far less relevant than the best one"""
+
+    def test_drops_low_scoring_tail(self):
+        docs = [chunk("best", relevance_score=0.8), chunk("close", relevance_score=0.5),
+                chunk("tail", relevance_score=0.3)]
+
+        assert [d.page_content for d in drop_low_scores(docs, 0.5)] == ["best", "close"]
+
+    def test_unscored_chunks_are_kept(self):
+        docs = [chunk("vector", relevance_score=0.8), chunk("keyword")]
+
+        assert len(drop_low_scores(docs, 0.9)) == 2
+
+    def test_without_positive_scores_nothing_is_dropped(self):
+        docs = [chunk("a", relevance_score=-0.2), chunk("b", relevance_score=-0.9)]
+
+        assert drop_low_scores(docs, 0.5) == docs
+
+    def test_pack_context_applies_cutoff(self):
+        docs = [chunk("pump pressure limits", relevance_score=0.9), chunk("unrelated appendix", relevance_score=0.1)]
+
+        assert [d.page_content for d in pack_context(docs, 1000)] == ["pump pressure limits"]
+        assert len(pack_context(docs, 1000, min_relative_score=0)) == 2
+
+
+class TestPacking:
+    """Tests for token budgeting"""
+
+    def test_estimate_tokens(self):
+        assert estimate_tokens("") == 0
+        assert estimate_tokens("abcde") == 2
+
+    def test_packs_in_rank_order(self):
+        docs = [chunk("a" * 400), chunk("b" * 400), chunk("c" * 400)]
+
+        assert pack_to_budget(docs, 250) == docs[:2]
+
+    def test_skips_passage_that_does_not_fit(self):
+        docs = [chunk("a" * 400), chunk("b" * 800), chunk("c" * 40)]
+
+        assert pack_to_budget(docs, 120) == [docs[0], docs[2]]
+
+    def test_best_passage_always_kept(self):
+        docs = [chunk("a" * 4000)]
+
+        assert pack_to_budget(docs, 10) == docs
+
+
+class TestPackContext:
+    """Tests for the full context assembly"""
+
+    def test_split_chunks_fit_smaller_prompt(self):
+        chunks = split_page(add_start_index=True)
+        duplicate = chunk(chunks[0].page_content.upper(), source="copy.pdf")
+        retrieved = chunks + [duplicate]
+
+        packed = pack_context(retrieved, token_budget=10_000)
+
+        assert [d.page_content for d in packed] == [PAGE_TEXT]
+        assert sum(len(d.page_content) for d in packed) < sum(len(d.page_content) for d in retrieved)
+
+    def test_budget_drops_tail(self):
+        docs = [chunk(f"Passage {i} " + "word " * 100, page=i) for i in range(10)]
+
+        packed = pack_context(docs, token_budget=400)
+
+        assert [d.metadata["page"] for d in packed] == [0, 1, 2]
+
+    def test_empty(self):
+        assert pack_context([], 100) == []
@@ -0,0 +1,164 @@
+"""
+Unit tests for document_catalog.py
+
+Tests the catalog of indexed documents including:
+- Recording documents with their details
+- Updating a re-indexed document
+- Importing documents found in Chroma once per index layout
+- Checkpoints of unfinished ingests
+- Persistence
+"""
+import pytest
+
+from document_catalog import DocumentCatalog, catalog_path, content_hash
+
+
+@pytest.fixture
+def catalog(tmp_path):
+    return DocumentCatalog(str(tmp_path / "catalog.sqlite3"))
+
+
+class TestHelpers:
+    """Tests for catalog_path and content_hash"""
+
+    def test_catalog_path_is_next_to_persist_directory(self):
+        assert catalog_path("./chroma_db") == "./chroma_db_catalog.sqlite3"
+        assert catalog_path("/data/chroma_db/") == "/data/chroma_db_catalog.sqlite3"
+
+    def test_content_hash(self):
+        assert content_hash(b"abc") == content_hash(b"abc")
+        assert content_hash(b"abc") != content_hash(b"abd")
+
+
+class TestRecord:
+    """Tests for recording indexed documents"""
+
+    def test_record_keeps_original_file_name(self, catalog):
+        catalog.record("my_file.pdf", "pdf_my_file", 12, content_hash="h1", byte_size=2048, page_count=3,
+                       embedding_model="nomic-embed-text")
+
+        entry = catalog.get("my_file.pdf")
+
+        assert catalog.names() == ["my_file.pdf"]
+        assert entry["collection_name"] == "pdf_my_file"
+        assert (entry["chunk_count"], entry["byte_size"], entry["page_count"]) == (12, 2048, 3)
+        assert entry["embedding_model"] == "nomic-embed-text"
+        assert entry["first_indexed_at"] == entry["last_indexed_at"]
+
+    def test_documents_in_indexing_order(self, catalog):
+        catalog.record("b.pdf", "pdf_b", 1)
+        catalog.record("a.md", "md_a", 1)
+
+        assert catalog.names() == ["b.pdf", "a.md"]
+
+    def test_reindex_updates_details(self, catalog):
+        catalog.record("manual.pdf", "pdf_manual", 10, content_hash="old", page_count=4)
+        first = catalog.get("manual.pdf")
+
+        catalog.record("manual.pdf", "pdf_manual", 14, content_hash="new")
+        entry = catalog.get("manual.pdf")
+
+        assert entry["chunk_count"] == 14
+        assert entry["content_hash"] == "new"
+        assert entry["page_count"] == 4
+        assert entry["first_indexed_at"] == first["first_indexed_at"]
+        assert entry["last_indexed_at"] >= first["last_indexed_at"]
+
+    def test_get_missing(self, catalog):
+        assert catalog.get("missing.pdf") is None
+
+    def test_remove_and_clear(self, catalog):
+        catalog.record("a.pdf", "pdf_a", 1)
+        catalog.record("b.pdf", "pdf_b", 1)
+
+        catalog.remove("a.pdf")
+        assert catalog.names() == ["b.pdf"]
+
+        catalog.clear()
+        assert catalog.documents() == []
+
+    def test_persists(self, tmp_path):
+        path = str(tmp_path / "catalog.sqlite3")
+        DocumentCatalog(path).record("a.pdf", "pdf_a", 5)
+
+        assert DocumentCatalog(path).get("a.pdf")["chunk_count"] == 5
+
+
+class TestImport:
+    """Tests for importing documents indexed before the catalog existed"""
+
+    def test_import_once_per_layout(self, catalog):
+        assert not catalog.imported("per_file")
+
+        catalog.import_existing([{"file_name": "a.pdf", "collection_name": "pdf_a", "chunk_count": 3}], "per_file")
+
+        assert catalog.imported("per_file")
+        assert not catalog.imported("unified")
+        assert catalog.names() == ["a.pdf"]
+
+    def test_empty_import_is_remembered(self, catalog):
+        catalog.import_existing([], "per_file")
+
+        assert catalog.imported("per_file")
+
+    def test_import_updates_collection_and_keeps_details(self, catalog):
+        catalog.record("a.pdf", "pdf_a", 3, content_hash="h1", byte_size=100)
+
+        catalog.import_existing([{"file_name": "a.pdf", "collection_name": "documents", "chunk_count": 3}], "unified")
+
+        entry = catalog.get("a.pdf")
+        assert entry["collection_name"] == "documents"
+        assert (entry["content_hash"], entry["byte_size"]) == ("h1", 100)
+
+
+class TestIngestCheckpoints:
+    """Tests for checkpoints of ingests that have not finished"""
+
+    def test_checkpoint_until_recorded(self, catalog):
+        catalog.start_ingest("manual.pdf", "pdf_manual", "h1")
+        catalog.checkpoint("manual.pdf", 64)
+
+        checkpoint = catalog.unfinished_ingest("manual.pdf")
+        assert (checkpoint["collection_name"], checkpoint["content_hash"], checkpoint["chunks_stored"]) == (
+            "pdf_manual", "h1", 64
+        )
+        assert catalog.names() == []
+
+        catalog.record("manual.pdf", "pdf_manual", 100, content_hash="h1")
+
+        assert catalog.unfinished_ingest("manual.pdf") is None
+        assert catalog.unfinished_ingests() == []
+
+    def test_restart_with_same_content_keeps_progress(self, catalog):
+        first = catalog.start_ingest("manual.pdf", "pdf_manual", "h1")
+        catalog.checkpoint("manual.pdf", 64)
+
+        resumed = catalog.start_ingest("manual.pdf", "pdf_manual", "h1")
+
+        assert resumed["chunks_stored"] == 64
+        assert resumed["started_at"] == first["started_at"]
+
+    def test_restart_with_other_content_resets_progress(self, catalog):
+        catalog.start_ingest("manual.pdf", "pdf_manual", "h1")
+        catalog.checkpoint("manual.pdf", 64)
+
+        restarted = catalog.start_ingest("manual.pdf", "pdf_manual", "h2")
+
+        assert (restarted["content_hash"], restarted["chunks_stored"]) == ("h2", 0)
+
+    def test_discard_remove_and_clear(self, catalog):
+        for name in ("a.pdf", "b.pdf", "c.pdf"):
+            catalog.start_ingest(name, "documents", "h")
+
+        catalog.discard_ingest("a.pdf")
+        catalog.remove("b.pdf")
+        assert [entry["file_name"] for entry in catalog.unfinished_ingests()] == ["c.pdf"]
+
+        catalog.clear()
+        assert catalog.unfinished_ingests() == []
+
+    def test_checkpoint_persists(self, tmp_path):
+        path = str(tmp_path / "catalog.sqlite3")
+        DocumentCatalog(path).start_ingest("manual.pdf", "pdf_manual", "h1")
+
+        assert DocumentCatalog(path).unfinished_ingest("manual.pdf")["content_hash"] == "h1"
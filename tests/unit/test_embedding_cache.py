@@ -0,0 +1,275 @@
+"""
+Unit tests for embedding_cache.py
+
+Tests the embedding caches including:
+- Query normalization and cache keys
+- In-memory LRU hits and eviction
+- Persistence across instances
+- Hit/miss counters
+- Content-addressed chunk embedding store
+"""
+import threading
+
+import pytest
+from langchain_core.embeddings import Embeddings
+
+from embedding_cache import (
+    CachedQueryEmbeddings,
+    ChunkEmbeddingStore,
+    normalize_query,
+    make_cache_key,
+    encode_vector,
+    decode_vector
+)
+
+
+class CountingEmbeddings(Embeddings):
+    """Fake embedder that records every call"""
+
+    def __init__(self):
+        self.query_calls = []
+        self.document_calls = []
+
+    def embed_query(self, text):
+        self.query_calls.append(text)
+        return [float(len(text)), 0.5, -1.25]
+
+    def embed_documents(self, texts):
+        self.document_calls.append(texts)
+        return [[float(len(t))] for t in texts]
+
+
+@pytest.fixture
+def cache_path(tmp_path):
+    return str(tmp_path / "cache" / "embeddings.sqlite3")
+
+
+class TestHelpers:
+    """Tests for normalization and serialization helpers"""
+
+    def test_normalize_collapses_whitespace_and_case(self):
+        assert normalize_query("  What IS   the\ttemperature?\n") == "what is the temperature?"
+
+    def test_normalize_unicode(self):
+        assert normalize_query("ﬁle") == normalize_query("file")
+
+    def test_cache_key_depends_on_model(self):
+        assert make_cache_key("model-a", "q") != make_cache_key("model-b", "q")
+
+    def test_vector_roundtrip(self):
+        vector = [0.1, -2.5, 3.0000001]
+        assert decode_vector(encode_vector(vector)) == vector
+
+
+class TestCachedQueryEmbeddings:
+    """Tests for CachedQueryEmbeddings"""
+
+    def test_repeated_query_hits_memory(self, cache_path):
+        inner = CountingEmbeddings()
+        cache = CachedQueryEmbeddings(inner, "nomic-embed-text", cache_path=cache_path)
+
+        first = cache.embed_query("What is the pressure?")
+        second = cache.embed_query("what is   the pressure?")
+
+        assert first == second
+        assert len(inner.query_calls) == 1
+        stats = cache.stats()
+        assert stats["misses"] == 1
+        assert stats["memory_hits"] == 1
+        assert stats["hits"] == 1
+
+    def test_embeds_normalized_query(self, cache_path):
+        """Test that the cached vector does not depend on which spelling came first"""
+        inner = CountingEmbeddings()
+        cache = CachedQueryEmbeddings(inner, "nomic-embed-text", cache_path=cache_path)
+
+        cache.embed_query("  What IS the Pressure?")
+
+        assert inner.query_calls == ["what is the pressure?"]
+
+    def test_concurrent_queries_share_one_model_call(self, cache_path):
+        """Test that a question being embedded is not sent to the model a second time"""
+        started = threading.Event()
+        release = threading.Event()
+
+        class SlowEmbeddings(CountingEmbeddings):
+            def embed_query(self, text):
+                started.set()
+                release.wait(5)
+                return super().embed_query(text)
+
+        inner = SlowEmbeddings()
+        cache = CachedQueryEmbeddings(inner, "nomic-embed-text", cache_path=cache_path)
+        results = []
+        first = threading.Thread(target=lambda: results.append(cache.embed_query("question")))
+        first.start()
+        started.wait(5)
+        second = threading.Thread(target=lambda: results.append(cache.embed_query("Question")))
+        second.start()
+        release.set()
+        first.join(5)
+        second.join(5)
+
+        assert len(inner.query_calls) == 1
+        assert results[0] == results[1]
+
+    def test_failed_query_is_not_left_in_flight(self, cache_path):
+        class FailingEmbeddings(CountingEmbeddings):
+            def embed_query(self, text):
+                super().embed_query(text)
+                raise ConnectionError("embedding model down")
+
+        inner = FailingEmbeddings()
+        cache = CachedQueryEmbeddings(inner, "nomic-embed-text", cache_path=cache_path)
+
+        for _ in range(2):
+            with pytest.raises(ConnectionError):
+                cache.embed_query("question")
+        assert len(inner.query_calls) == 2
+
+    def test_persists_across_instances(self, cache_path):
+        """Test that a new instance (app restart) reads from disk"""
+        CachedQueryEmbeddings(CountingEmbeddings(), "nomic-embed-text", cache_path=cache_path).embed_query("question")
+
+        inner = CountingEmbeddings()
+        cache = CachedQueryEmbeddings(inner, "nomic-embed-text", cache_path=cache_path)
+        vector = cache.embed_query("Question")
+
+        assert vector == [8.0, 0.5, -1.25]
+        assert inner.query_calls == []
+        assert cache.stats()["disk_hits"] == 1
+        assert cache.stats()["disk_entries"] == 1
+
+    def test_different_models_do_not_share_entries(self, cache_path):
+        CachedQueryEmbeddings(CountingEmbeddings(), "model-a", cache_path=cache_path).embed_query("question")
+
+        inner = CountingEmbeddings()
+        CachedQueryEmbeddings(inner, "model-b", cache_path=cache_path).embed_query("question")
+
+        assert inner.query_calls == ["question"]
+
+    def test_lru_eviction(self):
+        inner = CountingEmbeddings()
+        cache = CachedQueryEmbeddings(inner, "m", cache_path=None, max_memory_entries=2)
+
+        cache.embed_query("a")
+        cache.embed_query("b")
+        cache.embed_query("a")  # refresh "a"
+        cache.embed_query("c")  # evicts "b"
+        cache.embed_query("a")
+        cache.embed_query("b")
+
+        assert inner.query_calls == ["a", "b", "c", "b"]
+        assert cache.stats()["memory_entries"] == 2
+
+    def test_memory_only_mode(self):
+        cache = CachedQueryEmbeddings(CountingEmbeddings(), "m", cache_path=None)
+
+        cache.embed_query("q")
+
+        assert cache.stats()["disk_entries"] == 0
+
+    def test_returned_vectors_are_copies(self):
+        cache = CachedQueryEmbeddings(CountingEmbeddings(), "m", cache_path=None)
+
+        cache.embed_query("q").append(99.0)
+
+        assert cache.embed_query("q") == [1.0, 0.5, -1.25]
+
+    def test_embed_documents_delegates(self):
+        inner = CountingEmbeddings()
+        cache = CachedQueryEmbeddings(inner, "m", cache_path=None)
+
+        assert cache.embed_documents(["ab", "c"]) == [[2.0], [1.0]]
+        assert inner.document_calls == [["ab", "c"]]
+
+    def test_clear(self, cache_path):
+        inner = CountingEmbeddings()
+        cache = CachedQueryEmbeddings(inner, "m", cache_path=cache_path)
+        cache.embed_query("q")
+
+        cache.clear()
+        cache.embed_query("q")
+
+        assert len(inner.query_calls) == 2
+
+    def test_works_with_chroma(self, tmp_path, cache_path):
+        """Test the wrapper as a Chroma embedding function"""
+        import chromadb
+        from langchain_chroma import Chroma
+        from langchain_core.embeddings import DeterministicFakeEmbedding
+
+        cache = CachedQueryEmbeddings(DeterministicFakeEmbedding(size=8), "fake", cache_path=cache_path)
+        store = Chroma(
+            collection_name="pdf_test",
+            embedding_function=cache,
+            client=chromadb.PersistentClient(path=str(tmp_path / "chroma"))
+        )
+        store.add_texts(["alpha", "beta"])
+
+        store.similarity_search("alpha", k=1)
+        store.similarity_search("alpha", k=1)
+
+        assert cache.stats()["hits"] == 1
+
+
+class TestChunkEmbeddingStore:
+    """Tests for ChunkEmbeddingStore and cached embed_documents"""
+
+    def test_get_many_returns_none_for_unknown(self, cache_path):
+        store = ChunkEmbeddingStore(cache_path)
+        store.put_many("m", ["known"], [[1.0, 2.0]])
+
+        assert store.get_many("m", ["known", "unknown"]) == [[1.0, 2.0], None]
+
+    def test_keys_include_model(self, cache_path):
+        store = ChunkEmbeddingStore(cache_path)
+        store.put_many("model-a", ["text"], [[1.0]])
+
+        assert store.get_many("model-b", ["text"]) == [None]
+
+    def test_large_lookup_is_batched(self, cache_path):
+        store = ChunkEmbeddingStore(cache_path)
+        texts = [f"chunk {i}" for i in range(1200)]
+        store.put_many("m", texts, [[float(i)] for i in range(1200)])
+
+        vectors = store.get_many("m", texts)
+
+        assert len(store) == 1200
+        assert vectors[1199] == [1199.0]
+
+    def test_only_new_chunks_are_embedded(self, cache_path):
+        """Test that a revised document only embeds its changed chunks"""
+        inner = CountingEmbeddings()
+        cache = CachedQueryEmbeddings(inner, "m", cache_path=None, chunk_store=ChunkEmbeddingStore(cache_path))
+
+        first = cache.embed_documents(["intro", "body", "summary"])
+        second = cache.embed_documents(["intro", "revised body", "summary"])
+
+        assert inner.document_calls == [["intro", "body", "summary"], ["revised body"]]
+        assert second[0] == first[0]
+        assert second[1] == [12.0]
+        stats = cache.stats()
+        assert stats["chunk_hits"] == 2
+        assert stats["chunk_misses"] == 4
+
+    def test_renamed_upload_reuses_everything(self, cache_path):
+        """Test that the store survives a restart and is independent of file names"""
+        CachedQueryEmbeddings(
+            CountingEmbeddings(), "m", cache_path=None, chunk_store=ChunkEmbeddingStore(cache_path)
+        ).embed_documents(["a", "b"])
+
+        inner = CountingEmbeddings()
+        cache = CachedQueryEmbeddings(inner, "m", cache_path=None, chunk_store=ChunkEmbeddingStore(cache_path))
+
+        assert cache.embed_documents(["a", "b"]) == [[1.0], [1.0]]
+        assert inner.document_calls == []
+
+    def test_duplicate_texts_embedded_once(self, cache_path):
+        inner = CountingEmbeddings()
+        cache = CachedQueryEmbeddings(inner, "m", cache_path=None, chunk_store=ChunkEmbeddingStore(cache_path))
+
+        vectors = cache.embed_documents(["same", "same", "other"])
+
+        assert inner.document_calls == [["same", "other"]]
+        assert vectors == [[4.0], [4.0], [5.0]]
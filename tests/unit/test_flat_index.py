@@ -0,0 +1,338 @@
+"""
+Unit tests for flat_index.py
+
+Tests the memory-mapped flat vector index including:
+- Chroma-compatible collection reads and writes
+- Exact top-k search with metadata filters
+- Compaction of deleted rows
+- Sharing a collection between clients
+- The LangChain vectorstore and the shared ingestion and retrieval helpers
+"""
+from pathlib import Path
+
+import numpy as np
+import pytest
+from langchain_core.documents import Document
+from langchain_core.embeddings import DeterministicFakeEmbedding
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+import flat_index
+from flat_index import FlatClient, FlatVectorStore, matches_where, normalize_rows
+from ingestion import stream_documents_to_vectorstore, update_vectorstore_incrementally
+from retrieval import MMRRetriever
+from unified_index import count_source_chunks, list_indexed_sources, migrate_legacy_collections
+from vector_backends import FlatBackend
+
+
+@pytest.fixture
+def client(tmp_path):
+    return FlatClient(str(tmp_path / "flat"))
+
+
+@pytest.fixture
+def collection(client):
+    return client.get_or_create_collection("pdf_manual")
+
+
+def random_vectors(count, size=16, seed=0):
+    return np.random.default_rng(seed).normal(size=(count, size)).astype(np.float32)
+
+
+def fill(collection, count=50, size=16):
+    vectors = random_vectors(count, size)
+    collection.upsert(
+        ids=[f"c{i}" for i in range(count)],
+        embeddings=vectors,
+        documents=[f"chunk {i}" for i in range(count)],
+        metadatas=[{"source": f"doc{i % 3}.pdf", "page": i} for i in range(count)]
+    )
+    return vectors
+
+
+class TestWhere:
+    """Tests for matches_where"""
+
+    def test_equality_and_operators(self):
+        metadata = {"source": "a.pdf", "page": 3}
+
+        assert matches_where(metadata, {"source": "a.pdf"})
+        assert not matches_where(metadata, {"source": "b.pdf"})
+        assert matches_where(metadata, {"source": {"$in": ["a.pdf", "b.pdf"]}})
+        assert matches_where(metadata, {"source": {"$nin": ["b.pdf"]}})
+        assert matches_where(metadata, {"page": {"$gte": 3}})
+        assert not matches_where(metadata, {"page": {"$lt": 3}})
+        assert not matches_where(metadata, {"missing": {"$gt": 1}})
+
+    def test_and_or(self):
+        metadata = {"source": "a.pdf", "page": 3}
+
+        assert matches_where(metadata, {"$and": [{"source": "a.pdf"}, {"page": 3}]})
+        assert not matches_where(metadata, {"$and": [{"source": "a.pdf"}, {"page": 4}]})
+        assert matches_where(metadata, {"$or": [{"source": "b.pdf"}, {"page": 3}]})
+
+    def test_no_filter(self):
+        assert matches_where(None, None)
+
+
+class TestCollection:
+    """Tests for the Chroma-compatible collection API"""
+
+    def test_upsert_and_get(self, collection):
+        fill(collection, 10)
+
+        result = collection.get(ids=["c3"], include=["documents", "metadatas"])
+
+        assert collection.count() == 10
+        assert result["ids"] == ["c3"]
+        assert result["documents"] == ["chunk 3"]
+        assert result["metadatas"] == [{"source": "doc0.pdf", "page": 3}]
+
+    def test_get_pages_in_insertion_order(self, collection):
+        fill(collection, 10)
+
+        first = collection.get(limit=4, offset=0, include=[])
+        rest = collection.get(limit=20, offset=4, include=[])
+
+        assert first["ids"] + rest["ids"] == [f"c{i}" for i in range(10)]
+        assert first["documents"] is None
+
+    def test_get_with_where_and_embeddings(self, collection):
+        vectors = fill(collection, 9)
+
+        result = collection.get(where={"source": "doc1.pdf"}, include=["embeddings"])
+
+        assert result["ids"] == ["c1", "c4", "c7"]
+        np.testing.assert_allclose(result["embeddings"], normalize_rows(vectors[[1, 4, 7]]), rtol=1e-5)
+
+    def test_upsert_replaces_existing(self, collection):
+        fill(collection, 5)
+
+        collection.upsert(ids=["c2"], embeddings=random_vectors(1, seed=9), documents=["revised"],
+                          metadatas=[{"source": "doc2.pdf"}])
+
+        assert collection.count() == 5
+        assert collection.get(ids=["c2"])["documents"] == ["revised"]
+
+    def test_update_merges_metadata(self, collection):
+        fill(collection, 3)
+
+        collection.update(ids=["c1", "unknown"], metadatas=[{"page": 10, "source": None}, {"page": 1}])
+
+        assert collection.get(ids=["c1"])["metadatas"] == [{"page": 10}]
+        assert collection.count() == 3
+
+    def test_delete_by_id_and_where(self, collection):
+        fill(collection, 9)
+
+        collection.delete(ids=["c0"])
+        collection.delete(where={"source": "doc1.pdf"})
+
+        assert collection.count() == 5
+        assert set(collection.get(include=[])["ids"]) == {"c2", "c3", "c5", "c6", "c8"}
+
+    def test_dimension_mismatch(self, collection):
+        fill(collection, 2, size=16)
+
+        with pytest.raises(ValueError, match="dimension"):
+            collection.upsert(ids=["x"], embeddings=random_vectors(1, size=8))
+
+    def test_empty_collection(self, collection):
+        assert collection.count() == 0
+        assert collection.query(query_embeddings=[[1.0, 0.0]], n_results=3)["ids"] == [[]]
+
+
+class TestQuery:
+    """Tests for exact top-k search"""
+
+    def test_exact_top_k(self, collection):
+        vectors = fill(collection, 200)
+        query = random_vectors(1, seed=5)[0]
+
+        result = collection.query(query_embeddings=[query], n_results=5, include=["distances"])
+
+        expected = np.argsort(-(normalize_rows(vectors) @ normalize_rows(query)[0]))[:5]
+        assert result["ids"] == [[f"c{i}" for i in expected]]
+        assert result["distances"][0] == sorted(result["distances"][0])
+        assert result["documents"] is None
+
+    def test_identical_vector_has_zero_distance(self, collection):
+        vectors = fill(collection, 20)
+
+        result = collection.query(query_embeddings=[vectors[7] * 3], n_results=1)
+
+        assert result["ids"] == [["c7"]]
+        assert result["distances"][0][0] == pytest.approx(0.0, abs=1e-5)
+
+    def test_where_filter(self, collection):
+        fill(collection, 60)
+
+        result = collection.query(query_embeddings=random_vectors(1, seed=3), n_results=50,
+                                  where={"source": {"$in": ["doc0.pdf", "doc2.pdf"]}})
+
+        assert len(result["ids"][0]) == 40
+        assert {m["source"] for m in result["metadatas"][0]} == {"doc0.pdf", "doc2.pdf"}
+
+    def test_deleted_chunks_are_not_returned(self, collection):
+        vectors = fill(collection, 20)
+        collection.delete(ids=["c7"])
+
+        result = collection.query(query_embeddings=[vectors[7]], n_results=20)
+
+        assert "c7" not in result["ids"][0]
+        assert len(result["ids"][0]) == 19
+
+    def test_returns_embeddings_for_mmr(self, collection):
+        fill(collection, 20)
+
+        result = collection.query(query_embeddings=random_vectors(1, seed=2), n_results=4,
+                                  include=["embeddings", "documents", "metadatas", "distances"])
+
+        assert result["embeddings"][0].shape == (4, 16)
+
+
+class TestCompaction:
+    """Tests for rewriting the vectors file without deleted rows"""
+
+    def test_compaction_keeps_search_results(self, collection, monkeypatch):
+        monkeypatch.setattr(flat_index, "COMPACT_MIN_DEAD_ROWS", 4)
+        vectors = fill(collection, 30)
+        query = random_vectors(1, seed=8)[0]
+
+        collection.delete(ids=[f"c{i}" for i in range(20)])
+
+        collection_dir = Path(collection.directory)
+        assert sorted(path.name for path in collection_dir.glob("*.f32")) == ["vectors-1.f32"]
+        assert (collection_dir / "vectors-1.f32").stat().st_size == 10 * 16 * 4
+        expected = 20 + np.argsort(-(normalize_rows(vectors[20:]) @ normalize_rows(query)[0]))[:3]
+        assert collection.query(query_embeddings=[query], n_results=3)["ids"] == [[f"c{i}" for i in expected]]
+
+    def test_writes_after_compaction(self, collection, monkeypatch):
+        monkeypatch.setattr(flat_index, "COMPACT_MIN_DEAD_ROWS", 2)
+        fill(collection, 6)
+        collection.delete(ids=["c0", "c1", "c2", "c3"])
+
+        collection.upsert(ids=["new"], embeddings=random_vectors(1, seed=4), documents=["new chunk"])
+
+        assert collection.get(include=[])["ids"] == ["c4", "c5", "new"]
+        assert collection.query(query_embeddings=random_vectors(1, seed=4), n_results=1)["ids"] == [["new"]]
+
+
+class TestClient:
+    """Tests for the collection directory"""
+
+    def test_list_get_and_delete(self, client):
+        client.get_or_create_collection("pdf_a")
+        client.get_or_create_collection("md_b")
+
+        assert [c.name for c in client.list_collections()] == ["md_b", "pdf_a"]
+        assert client.get_collection("pdf_a") is client.get_or_create_collection("pdf_a")
+
+        client.delete_collection("pdf_a")
+
+        assert [c.name for c in client.list_collections()] == ["md_b"]
+        with pytest.raises(ValueError):
+            client.get_collection("pdf_a")
+        with pytest.raises(ValueError):
+            client.delete_collection("pdf_a")
+
+    def test_rejects_path_names(self, client):
+        with pytest.raises(ValueError):
+            client.get_or_create_collection("../outside")
+
+    def test_persists(self, tmp_path, collection):
+        fill(collection, 10)
+
+        reopened = FlatClient(str(tmp_path / "flat")).get_collection("pdf_manual")
+
+        assert reopened.count() == 10
+        assert reopened.get(ids=["c4"])["documents"] == ["chunk 4"]
+
+    def test_other_client_sees_writes(self, tmp_path, collection):
+        """A second client stands in for another Streamlit worker process"""
+        other = FlatClient(str(tmp_path / "flat")).get_collection("pdf_manual")
+        fill(collection, 10)
+        assert other.count() == 10
+        assert len(other.query(query_embeddings=random_vectors(1), n_results=20)["ids"][0]) == 10
+
+        collection.delete(where={"source": "doc0.pdf"})
+
+        assert len(other.query(query_embeddings=random_vectors(1), n_results=20)["ids"][0]) == 6
+
+
+class TestVectorStore:
+    """Tests for FlatVectorStore with the apps' ingestion and retrieval helpers"""
+
+    @pytest.fixture
+    def embeddings(self):
+        return DeterministicFakeEmbedding(size=16)
+
+    @pytest.fixture
+    def backend(self, tmp_path):
+        return FlatBackend(str(tmp_path / "flat"))
+
+    @pytest.fixture
+    def store(self, backend, embeddings):
+        return backend.vectorstore("documents", embeddings)
+
+    def test_add_and_search(self, store):
+        store.add_documents([Document(page_content=f"chunk {i}", metadata={"source": "a.pdf"}) for i in range(5)])
+
+        assert store.similarity_search("chunk 3", k=1)[0].page_content == "chunk 3"
+        doc, distance = store.similarity_search_with_score("chunk 3", k=1)[0]
+        assert distance == pytest.approx(0.0, abs=1e-5)
+
+    def test_persist_directory_like_chroma(self, tmp_path, embeddings):
+        store = FlatVectorStore(persist_directory=str(tmp_path / "csv"), embedding_function=embeddings)
+        store.add_texts(["row 1", "row 2"])
+
+        assert store._collection.name == "langchain"
+        assert FlatVectorStore(persist_directory=str(tmp_path / "csv"),
+                               embedding_function=embeddings)._collection.count() == 2
+
+    def test_mmr_retriever_with_filter(self, store):
+        store.add_documents([
+            Document(page_content=f"{source} chunk {i}", metadata={"source": source})
+            for source in ("a.pdf", "b.pdf") for i in range(5)
+        ])
+
+        retriever = store.as_retriever(search_type="mmr", search_kwargs={"k": 3, "fetch_k": 6,
+                                                                          "filter": {"source": "b.pdf"}})
+        docs = retriever.invoke("b.pdf chunk 1")
+
+        assert len(docs) == 3
+        assert {doc.metadata["source"] for doc in docs} == {"b.pdf"}
+
+    def test_shared_retrievers(self, backend, embeddings):
+        for name in ("a", "b"):
+            backend.vectorstore(f"pdf_{name}", embeddings).add_texts(
+                [f"{name} text {i}" for i in range(4)], metadatas=[{"source": f"{name}.pdf"}] * 4
+            )
+
+        assert len(MMRRetriever(backend, ["pdf_a", "pdf_b"], embeddings, k=3).invoke("a text 2")) == 3
+        assert MMRRetriever(backend, ["pdf_a", "pdf_b"], embeddings, k=2).invoke("b text 1")[0].page_content == "b text 1"
+
+    def test_streaming_ingest_and_incremental_update(self, backend, embeddings):
+        splitter = RecursiveCharacterTextSplitter(chunk_size=40, chunk_overlap=0, add_start_index=True)
+        pages = [Document(page_content=f"Page {i} explains the valve. Torque {i} Nm.",
+                          metadata={"source": "manual.pdf", "page": i}) for i in range(6)]
+
+        stats = stream_documents_to_vectorstore(backend, "documents", embeddings, iter(pages), splitter,
+                                                batch_size=4, file_hash="h1")
+        assert backend.count("documents") == stats["chunks"]
+
+        pages[2] = Document(page_content="Page 2 was revised.", metadata={"source": "manual.pdf", "page": 2})
+        changes = update_vectorstore_incrementally(backend, "documents", embeddings, splitter.split_documents(pages),
+                                                   file_hash="h2")
+
+        assert changes["added"] == 1
+        assert backend.count("documents") == len(splitter.split_documents(pages))
+
+    def test_unified_index_helpers(self, backend, embeddings):
+        legacy = backend.vectorstore("pdf_manual", embeddings)
+        legacy.add_texts(["one", "two"], metadatas=[{"source": "manual.pdf"}, {"page": 1}])
+
+        assert migrate_legacy_collections(backend) == {"pdf_manual": 2}
+
+        assert backend.collection_names() == ["documents"]
+        assert list_indexed_sources(backend) == ["manual.pdf"]
+        assert count_source_chunks(backend, "manual.pdf") == 2
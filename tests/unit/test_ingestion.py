@@ -0,0 +1,522 @@
+"""
+Unit tests for ingestion.py
+
+Tests the ingestion embedding stage including:
+- Batch splitting and progress formatting
+- Bounded concurrent embedding
+- Order preservation and progress callbacks
+- Batched storage through the vector backend
+- Streaming page-to-vector pipeline with bounded queues
+- Incremental re-indexing of revised documents
+- Deterministic chunk ids and resuming interrupted ingests
+"""
+import threading
+import time
+import pytest
+from langchain_core.documents import Document
+from langchain_core.embeddings import DeterministicFakeEmbedding, Embeddings
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+from ingestion import (
+    split_batches,
+    format_progress,
+    embed_in_batches,
+    add_documents_in_batches,
+    iter_split_documents,
+    stream_documents_to_vectorstore,
+    diff_chunks,
+    update_vectorstore_incrementally,
+    chunk_id,
+    chunk_ids
+)
+from vector_backends import ChromaBackend
+
+
+class SlowEmbeddings(Embeddings):
+    """Fake embedder tracking batch sizes and concurrent requests"""
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.batches = []
+        self.active = 0
+        self.max_active = 0
+        self._lock = threading.Lock()
+
+    def embed_documents(self, texts):
+        with self._lock:
+            self.batches.append(list(texts))
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        time.sleep(self.delay)
+        with self._lock:
+            self.active -= 1
+        return [[float(len(t)), 1.0] for t in texts]
+
+    def embed_query(self, text):
+        return [float(len(text)), 1.0]
+
+
+@pytest.fixture
+def backend(tmp_path):
+    return ChromaBackend(str(tmp_path / "chroma"))
+
+
+class TestHelpers:
+    """Tests for split_batches and format_progress"""
+
+    def test_split_batches(self):
+        assert split_batches(list(range(5)), 2) == [[0, 1], [2, 3], [4]]
+
+    def test_split_batches_rejects_zero(self):
+        with pytest.raises(ValueError):
+            split_batches([1], 0)
+
+    def test_format_progress_with_eta(self):
+        assert format_progress(50, 150, 5.0) == "50/150 chunks · 10.0 chunks/s · ETA 10s"
+
+    def test_format_progress_complete(self):
+        assert format_progress(10, 10, 2.0) == "10/10 chunks · 5.0 chunks/s"
+
+    def test_format_progress_no_elapsed(self):
+        assert format_progress(0, 10, 0.0) == "0/10 chunks · 0.0 chunks/s"
+
+    def test_format_progress_unknown_total(self):
+        assert format_progress(20, None, 4.0) == "20 chunks · 5.0 chunks/s"
+
+
+class TestEmbedInBatches:
+    """Tests for embed_in_batches"""
+
+    def test_respects_batch_size(self):
+        embeddings = SlowEmbeddings()
+
+        embed_in_batches(embeddings, [f"t{i}" for i in range(10)], batch_size=4, max_concurrency=1)
+
+        assert sorted(len(b) for b in embeddings.batches) == [2, 4, 4]
+
+    def test_preserves_order(self):
+        texts = ["a" * i for i in range(1, 20)]
+
+        vectors = embed_in_batches(SlowEmbeddings(), texts, batch_size=3, max_concurrency=4)
+
+        assert [v[0] for v in vectors] == [float(i) for i in range(1, 20)]
+
+    def test_concurrency_is_bounded(self):
+        embeddings = SlowEmbeddings(delay=0.05)
+
+        embed_in_batches(embeddings, [f"t{i}" for i in range(40)], batch_size=2, max_concurrency=3)
+
+        assert 1 < embeddings.max_active <= 3
+
+    def test_progress_callback(self):
+        updates = []
+
+        embed_in_batches(
+            SlowEmbeddings(),
+            [f"t{i}" for i in range(7)],
+            batch_size=3,
+            max_concurrency=1,
+            progress_callback=lambda done, total, elapsed: updates.append((done, total))
+        )
+
+        assert updates == [(3, 7), (6, 7), (7, 7)]
+
+    def test_callbacks_run_in_calling_thread(self):
+        threads = set()
+
+        embed_in_batches(
+            SlowEmbeddings(delay=0.01),
+            [f"t{i}" for i in range(8)],
+            batch_size=2,
+            max_concurrency=4,
+            progress_callback=lambda *args: threads.add(threading.get_ident())
+        )
+
+        assert threads == {threading.get_ident()}
+
+    def test_empty_input(self):
+        embeddings = SlowEmbeddings()
+        assert embed_in_batches(embeddings, []) == []
+        assert embeddings.batches == []
+
+    def test_errors_propagate(self):
+        class FailingEmbeddings(SlowEmbeddings):
+            def embed_documents(self, texts):
+                raise ConnectionError("ollama down")
+
+        with pytest.raises(ConnectionError):
+            embed_in_batches(FailingEmbeddings(), ["a", "b"], batch_size=1)
+
+
+class TestAddDocumentsInBatches:
+    """Tests for add_documents_in_batches"""
+
+    @pytest.fixture
+    def embeddings(self):
+        return DeterministicFakeEmbedding(size=8)
+
+    def test_stores_all_chunks(self, backend, embeddings):
+        docs = [Document(page_content=f"chunk {i}", metadata={"source": "a.pdf", "page": i}) for i in range(25)]
+
+        ids = add_documents_in_batches(backend, "pdf_test", embeddings, docs, batch_size=4, max_concurrency=3)
+
+        assert len(ids) == 25
+        assert backend.count("pdf_test") == 25
+        stored = backend.get("pdf_test", ids=[ids[7]])
+        assert stored[0]["document"] == "chunk 7"
+        assert stored[0]["metadata"]["page"] == 7
+
+    def test_searchable_after_ingest(self, backend, embeddings):
+        docs = [Document(page_content=f"chunk {i}", metadata={"source": "a.pdf"}) for i in range(5)]
+
+        add_documents_in_batches(backend, "pdf_test", embeddings, docs, batch_size=2)
+
+        vectorstore = backend.vectorstore("pdf_test", embeddings)
+        assert vectorstore.similarity_search("chunk 3", k=1)[0].page_content == "chunk 3"
+
+    def test_documents_without_metadata(self, backend, embeddings):
+        docs = [Document(page_content="no metadata")]
+
+        add_documents_in_batches(backend, "pdf_test", embeddings, docs)
+
+        assert backend.count("pdf_test") == 1
+
+    def test_custom_ids(self, backend, embeddings):
+        docs = [Document(page_content="a", metadata={"source": "x"}), Document(page_content="b", metadata={"source": "x"})]
+
+        ids = add_documents_in_batches(backend, "pdf_test", embeddings, docs, ids=["id-a", "id-b"], batch_size=1)
+
+        assert ids == ["id-a", "id-b"]
+        assert sorted(backend.get_ids("pdf_test")) == ["id-a", "id-b"]
+
+
+class TestStreamDocumentsToVectorstore:
+    """Tests for the streaming ingestion pipeline"""
+
+    @pytest.fixture
+    def splitter(self):
+        return RecursiveCharacterTextSplitter(chunk_size=50, chunk_overlap=0)
+
+    def page_stream(self, count, tracker=None, total_pages=None):
+        for i in range(count):
+            if tracker is not None:
+                tracker["yielded"] += 1
+            metadata = {"source": "manual.pdf", "page": i}
+            if total_pages:
+                metadata["total_pages"] = total_pages
+            yield Document(page_content=f"Page {i} text.", metadata=metadata)
+        if tracker is not None:
+            tracker["exhausted"] = True
+
+    def test_iter_split_documents_is_lazy(self, splitter):
+        tracker = {"yielded": 0}
+        chunks = iter_split_documents(self.page_stream(100, tracker), splitter)
+
+        first = next(chunks)
+
+        assert first.page_content == "Page 0 text."
+        assert tracker["yielded"] == 1
+
+    def test_stores_every_chunk(self, backend, splitter):
+        embeddings = DeterministicFakeEmbedding(size=8)
+
+        stats = stream_documents_to_vectorstore(backend, "pdf_stream", embeddings, self.page_stream(23), splitter,
+                                                batch_size=4, max_concurrency=2)
+
+        assert stats == {"pages": 23, "chars": sum(len(f"Page {i} text.") for i in range(23)), "chunks": 23, "resumed": 0}
+        assert backend.count("pdf_stream") == 23
+        assert sorted(chunk["metadata"]["page"] for chunk in backend.get("pdf_stream")) == list(range(23))
+
+    def test_stages_overlap(self, backend, splitter):
+        """Test that embedding starts before extraction has finished"""
+        tracker = {"yielded": 0, "exhausted": False}
+        seen_exhausted = []
+
+        class RecordingEmbeddings(SlowEmbeddings):
+            def embed_documents(self, texts):
+                seen_exhausted.append(tracker["exhausted"])
+                return super().embed_documents(texts)
+
+        embeddings = RecordingEmbeddings(delay=0.01)
+        stream_documents_to_vectorstore(
+            backend, "pdf_stream", embeddings, self.page_stream(200, tracker), splitter,
+            batch_size=5, max_concurrency=2, queue_batches=2
+        )
+
+        assert seen_exhausted[0] is False
+
+    def test_memory_is_bounded(self, backend, splitter):
+        """Test that extraction never runs far ahead of embedding"""
+        tracker = {"yielded": 0, "exhausted": False}
+        embedded = {"count": 0}
+        lead = []
+        lock = threading.Lock()
+
+        class BoundedEmbeddings(SlowEmbeddings):
+            def embed_documents(self, texts):
+                vectors = super().embed_documents(texts)
+                with lock:
+                    embedded["count"] += len(texts)
+                    lead.append(tracker["yielded"] - embedded["count"])
+                return vectors
+
+        batch_size, queue_batches, concurrency = 5, 2, 2
+        embeddings = BoundedEmbeddings(delay=0.005)
+        stream_documents_to_vectorstore(
+            backend, "pdf_stream", embeddings, self.page_stream(300, tracker), splitter,
+            batch_size=batch_size, max_concurrency=concurrency, queue_batches=queue_batches
+        )
+
+        assert max(lead) <= batch_size * (queue_batches + concurrency + 2)
+        assert backend.count("pdf_stream") == 300
+
+    def test_progress_estimates_total_from_page_count(self, backend, splitter):
+        updates = []
+        embeddings = DeterministicFakeEmbedding(size=8)
+
+        stream_documents_to_vectorstore(
+            backend, "pdf_stream", embeddings, self.page_stream(12, total_pages=12), splitter,
+            batch_size=4, max_concurrency=1,
+            progress_callback=lambda done, total, elapsed: updates.append((done, total))
+        )
+
+        assert updates[-1] == (12, 12)
+        assert all(total is None or total >= done for done, total in updates)
+
+    def test_embedding_error_propagates(self, backend, splitter):
+        class FailingEmbeddings(SlowEmbeddings):
+            def embed_documents(self, texts):
+                raise ConnectionError("ollama down")
+
+        embeddings = FailingEmbeddings()
+
+        with pytest.raises(ConnectionError):
+            stream_documents_to_vectorstore(backend, "pdf_stream", embeddings, self.page_stream(50), splitter,
+                                            batch_size=2, queue_batches=1)
+
+    def test_extraction_error_propagates(self, backend, splitter):
+        def broken_pages():
+            yield Document(page_content="fine", metadata={"source": "a.pdf", "page": 0})
+            raise ValueError("corrupt page")
+
+        embeddings = DeterministicFakeEmbedding(size=8)
+
+        with pytest.raises(ValueError, match="corrupt page"):
+            stream_documents_to_vectorstore(backend, "pdf_stream", embeddings, broken_pages(), splitter)
+
+    def test_on_stored_receives_stored_ids(self, backend, splitter):
+        embeddings = DeterministicFakeEmbedding(size=8)
+        seen = []
+
+        stream_documents_to_vectorstore(
+            backend, "pdf_stream", embeddings, self.page_stream(7), splitter, batch_size=3,
+            on_stored=lambda docs, ids: seen.extend(zip(ids, docs))
+        )
+
+        assert len(seen) == 7
+        assert backend.get("pdf_stream", ids=[seen[0][0]])[0]["document"] == seen[0][1].page_content
+
+    def test_empty_pages_store_nothing(self, backend, splitter):
+        embeddings = DeterministicFakeEmbedding(size=8)
+        pages = [Document(page_content="", metadata={"source": "scan.pdf", "page": i}) for i in range(3)]
+
+        stats = stream_documents_to_vectorstore(backend, "pdf_stream", embeddings, iter(pages), splitter)
+
+        assert stats == {"pages": 3, "chars": 0, "chunks": 0, "resumed": 0}
+        assert backend.count("pdf_stream") == 0
+
+
+class TestIncrementalUpdate:
+    """Tests for diff_chunks and update_vectorstore_incrementally"""
+
+    @pytest.fixture
+    def splitter(self):
+        return RecursiveCharacterTextSplitter(chunk_size=120, chunk_overlap=0, add_start_index=True)
+
+    def manual(self, pages=30, source="manual.pdf", revised=None):
+        """Pages of a manual, revised maps page numbers to replacement text"""
+        revised = revised or {}
+        return [
+            Document(
+                page_content=revised.get(page, " ".join(f"Page {page} step {i}: check valve {page}-{i}." for i in range(6))),
+                metadata={"source": source, "page": page}
+            )
+            for page in range(pages)
+        ]
+
+    def stored_texts(self, backend, name="pdf_manual", where=None):
+        return sorted(chunk["document"] for chunk in backend.get(name, where=where))
+
+    def test_diff_chunks(self):
+        stored = (["1", "2", "3"], ["kept", "moved", "gone"],
+                  [{"page": 0}, {"page": 1, "total_pages": 3}, {"page": 2}])
+        chunks = [Document(page_content="kept", metadata={"page": 0}),
+                  Document(page_content="moved", metadata={"page": 2}),
+                  Document(page_content="new", metadata={"page": 3})]
+
+        changes = diff_chunks(*stored, chunks)
+
+        assert changes["unchanged"] == ["1"]
+        assert changes["moved"] == [("2", {"page": 2, "total_pages": None})]
+        assert [doc.page_content for doc in changes["added"]] == ["new"]
+        assert changes["deleted"] == ["3"]
+
+    def test_repeated_text_prefers_same_metadata(self):
+        stored = (["a", "b"], ["Warranty notice.", "Warranty notice."], [{"page": 1}, {"page": 9}])
+        chunks = [Document(page_content="Warranty notice.", metadata={"page": 9})]
+
+        changes = diff_chunks(*stored, chunks)
+
+        assert changes["unchanged"] == ["b"]
+        assert changes["deleted"] == ["a"]
+
+    def test_erratum_embeds_only_changed_page(self, backend, splitter):
+        embeddings = SlowEmbeddings()
+        stream_documents_to_vectorstore(backend, "pdf_manual", embeddings, iter(self.manual()), splitter)
+        embeddings.batches.clear()
+        revised = self.manual(revised={5: "Erratum: torque valve 5 to 40 Nm. " * 5})
+        new_chunks = splitter.split_documents(revised)
+        page_5_chunks = [chunk for chunk in new_chunks if chunk.metadata["page"] == 5]
+
+        changes = update_vectorstore_incrementally(backend, "pdf_manual", embeddings, new_chunks, batch_size=4)
+
+        assert sum(len(batch) for batch in embeddings.batches) == len(page_5_chunks)
+        assert changes["added"] == len(page_5_chunks)
+        assert changes["unchanged"] == len(new_chunks) - len(page_5_chunks)
+        assert changes["deleted"] > 0
+        assert self.stored_texts(backend) == sorted(chunk.page_content for chunk in new_chunks)
+
+    def test_unchanged_document_embeds_nothing(self, backend, splitter):
+        embeddings = SlowEmbeddings()
+        stream_documents_to_vectorstore(backend, "pdf_manual", embeddings, iter(self.manual(pages=3)), splitter)
+        embeddings.batches.clear()
+
+        changes = update_vectorstore_incrementally(backend, "pdf_manual", embeddings,
+                                                   splitter.split_documents(self.manual(pages=3)))
+
+        assert embeddings.batches == []
+        assert changes["added"] == changes["deleted"] == changes["moved"] == 0
+
+    def test_moved_chunks_get_new_metadata(self, backend, splitter):
+        embeddings = SlowEmbeddings()
+        stream_documents_to_vectorstore(backend, "pdf_manual", embeddings, iter(self.manual(pages=3)), splitter)
+        embeddings.batches.clear()
+        # A page inserted at the front shifts every page number
+        revised = [Document(page_content="New foreword.", metadata={"source": "manual.pdf", "page": 0})] + [
+            Document(page_content=page.page_content, metadata={"source": "manual.pdf", "page": page.metadata["page"] + 1})
+            for page in self.manual(pages=3)
+        ]
+
+        changes = update_vectorstore_incrementally(backend, "pdf_manual", embeddings,
+                                                   splitter.split_documents(revised))
+
+        assert embeddings.batches == [["New foreword."]]
+        assert changes["moved"] == backend.count("pdf_manual") - 1
+        pages = {chunk["metadata"]["page"] for chunk in backend.get("pdf_manual")}
+        assert pages == {0, 1, 2, 3}
+
+    def test_shared_collection_only_touches_filtered_document(self, backend, splitter):
+        embeddings = DeterministicFakeEmbedding(size=8)
+        stream_documents_to_vectorstore(backend, "documents", embeddings, iter(self.manual(pages=2)), splitter)
+        stream_documents_to_vectorstore(backend, "documents", embeddings,
+                                        iter(self.manual(pages=2, source="other.pdf")), splitter)
+        other_before = self.stored_texts(backend, "documents", where={"source": "other.pdf"})
+
+        update_vectorstore_incrementally(backend, "documents", embeddings,
+                                         splitter.split_documents(self.manual(pages=1)),
+                                         where={"source": "manual.pdf"})
+
+        assert self.stored_texts(backend, "documents", where={"source": "other.pdf"}) == other_before
+        assert self.stored_texts(backend, "documents", where={"source": "manual.pdf"}) == sorted(
+            chunk.page_content for chunk in splitter.split_documents(self.manual(pages=1))
+        )
+
+
+class TestResumableIngest:
+    """Tests for deterministic chunk ids and resuming an interrupted ingest"""
+
+    @pytest.fixture
+    def splitter(self):
+        return RecursiveCharacterTextSplitter(chunk_size=60, chunk_overlap=0, add_start_index=True)
+
+    def pages(self, count=20):
+        return [
+            Document(page_content=f"Page {i}: bleed the hydraulic line. Check the seal {i}.",
+                     metadata={"source": "manual.pdf", "page": i})
+            for i in range(count)
+        ]
+
+    def test_chunk_id_is_deterministic(self):
+        chunk = Document(page_content="text", metadata={"source": "a.pdf", "page": 3, "start_index": 120})
+
+        assert chunk_id("h1", chunk, 0) == chunk_id("h1", Document(page_content="other", metadata=chunk.metadata), 7)
+        assert chunk_id("h2", chunk, 0) != chunk_id("h1", chunk, 0)
+        assert chunk_id("h1", Document(page_content="text", metadata={**chunk.metadata, "page": 4}), 0) != \
+            chunk_id("h1", chunk, 0)
+        assert chunk_id("h1", Document(page_content="text", metadata={**chunk.metadata, "source": "b.pdf"}), 0) != \
+            chunk_id("h1", chunk, 0)
+
+    def test_chunk_ids_without_start_index_use_position(self):
+        chunks = [Document(page_content="same", metadata={"page": 0}) for _ in range(3)]
+
+        assert len(set(chunk_ids(chunks, "h1"))) == 3
+        assert chunk_ids(chunks, "h1") == chunk_ids(chunks, "h1")
+        assert chunk_ids(chunks) != chunk_ids(chunks)
+
+    def test_reingest_upserts_same_ids(self, backend, splitter):
+        embeddings = DeterministicFakeEmbedding(size=8)
+        seen = []
+
+        for _ in range(2):
+            stream_documents_to_vectorstore(backend, "pdf_manual", embeddings, iter(self.pages()), splitter,
+                                            file_hash="h1", on_stored=lambda docs, ids: seen.append(sorted(ids)))
+
+        assert backend.count("pdf_manual") == sum(len(ids) for ids in seen) // 2
+
+    def test_interrupted_ingest_resumes_from_stored_batches(self, backend, splitter):
+        class FailingEmbeddings(SlowEmbeddings):
+            def embed_documents(self, texts):
+                if len(self.batches) >= 3:
+                    raise ConnectionError("ollama restarted")
+                return super().embed_documents(texts)
+
+        with pytest.raises(ConnectionError):
+            stream_documents_to_vectorstore(backend, "pdf_manual", FailingEmbeddings(), iter(self.pages()),
+                                            splitter, batch_size=4, max_concurrency=1, file_hash="h1")
+        embeddings = SlowEmbeddings()
+        stored_before = backend.count("pdf_manual")
+        assert stored_before == 12
+
+        stats = stream_documents_to_vectorstore(backend, "pdf_manual", embeddings, iter(self.pages()), splitter,
+                                                batch_size=4, file_hash="h1", resume=True)
+
+        embedded = sum(len(batch) for batch in embeddings.batches)
+        assert stats["resumed"] == stored_before
+        assert embedded == stats["chunks"] - stored_before
+        assert backend.count("pdf_manual") == stats["chunks"]
+
+    def test_resume_reports_stored_chunks(self, backend, splitter):
+        embeddings = DeterministicFakeEmbedding(size=8)
+        stream_documents_to_vectorstore(backend, "pdf_manual", embeddings, iter(self.pages(3)), splitter,
+                                        file_hash="h1")
+        seen, updates = [], []
+
+        stats = stream_documents_to_vectorstore(
+            backend, "pdf_manual", embeddings, iter(self.pages(3)), splitter, file_hash="h1", resume=True,
+            on_stored=lambda docs, ids: seen.extend(ids),
+            progress_callback=lambda done, total, elapsed: updates.append(done)
+        )
+
+        assert stats["resumed"] == stats["chunks"] == len(seen)
+        assert updates[-1] == stats["chunks"]
+
+    def test_incremental_update_uses_deterministic_ids(self, backend, splitter):
+        embeddings = DeterministicFakeEmbedding(size=8)
+        stream_documents_to_vectorstore(backend, "pdf_manual", embeddings, iter(self.pages(2)), splitter,
+                                        file_hash="h1")
+        revised = splitter.split_documents(self.pages(3))
+
+        update_vectorstore_incrementally(backend, "pdf_manual", embeddings, revised, file_hash="h2")
+
+        new_ids = [i for i, chunk in zip(chunk_ids(revised, "h2"), revised) if chunk.metadata["page"] == 2]
+        assert len(backend.get_ids("pdf_manual", ids=new_ids)) == len(new_ids)
@@ -0,0 +1,163 @@
+"""
+Unit tests for ingestion_jobs.py
+
+Tests the background ingestion queue including:
+- Job status transitions and results
+- Concurrent processing bounded by the worker count
+- Progress and message reporting
+- Failure handling and retries
+"""
+import threading
+import time
+import pytest
+
+from ingestion_jobs import IngestionQueue, IngestionJob, QUEUED, RUNNING, DONE, FAILED
+
+
+@pytest.fixture
+def ingestion_queue():
+    queue = IngestionQueue(max_workers=2)
+    yield queue
+    queue.shutdown()
+
+
+def ingest_ok(job, chunks):
+    job.log(f"Split into {chunks} chunks")
+    return f"store-{job.name}", chunks
+
+
+def ingest_fail(job):
+    raise ValueError("No text content found")
+
+
+class TestIngestionJob:
+    """Tests for IngestionJob status helpers"""
+
+    def test_initial_state(self):
+        job = IngestionJob("a.pdf")
+        assert job.status == QUEUED
+        assert not job.finished
+        assert job.progress_fraction() == 0.0
+
+    def test_progress_fraction(self):
+        job = IngestionJob("a.pdf")
+        job.status = RUNNING
+        job.report_progress(25, 100, 2.0)
+        assert job.progress_fraction() == 0.25
+        assert job.describe() == "running · 25/100 chunks · 12.5 chunks/s · ETA 6s"
+
+    def test_unknown_total(self):
+        job = IngestionJob("a.pdf")
+        job.report_progress(10, None, 1.0)
+        assert job.progress_fraction() == 0.0
+
+    def test_done_is_complete(self):
+        job = IngestionJob("a.pdf")
+        job.status = DONE
+        assert job.progress_fraction() == 1.0
+
+
+class TestIngestionQueue:
+    """Tests for IngestionQueue"""
+
+    def test_job_completes_with_result(self, ingestion_queue):
+        job = ingestion_queue.submit("a.pdf", ingest_ok, 12)
+
+        assert ingestion_queue.wait(timeout=5)
+        assert job.status == DONE
+        assert job.result == ("store-a.pdf", 12)
+        assert job.messages == [("info", "Split into 12 chunks")]
+
+    def test_failure_is_recorded(self, ingestion_queue):
+        job = ingestion_queue.submit("scan.pdf", ingest_fail)
+
+        ingestion_queue.wait(timeout=5)
+
+        assert job.status == FAILED
+        assert job.error == "No text content found"
+        assert job.describe() == "failed · No text content found"
+
+    def test_files_processed_concurrently(self):
+        """Test that several files run at once, bounded by max_workers"""
+        active = []
+        peak = []
+        lock = threading.Lock()
+
+        def slow(job):
+            with lock:
+                active.append(job.name)
+                peak.append(len(active))
+            time.sleep(0.05)
+            with lock:
+                active.remove(job.name)
+
+        queue = IngestionQueue(max_workers=3)
+        for i in range(9):
+            queue.submit(f"doc{i}.pdf", slow)
+        queue.wait(timeout=5)
+        queue.shutdown()
+
+        assert 1 < max(peak) <= 3
+
+    def test_submit_does_not_block(self, ingestion_queue):
+        release = threading.Event()
+
+        start = time.perf_counter()
+        for i in range(5):
+            ingestion_queue.submit(f"doc{i}.pdf", lambda job: release.wait(5))
+        elapsed = time.perf_counter() - start
+
+        assert elapsed < 0.5
+        assert ingestion_queue.has_pending()
+        release.set()
+        assert ingestion_queue.wait(timeout=5)
+
+    def test_duplicate_submission_returns_existing_job(self, ingestion_queue):
+        release = threading.Event()
+        first = ingestion_queue.submit("a.pdf", lambda job: release.wait(5))
+
+        second = ingestion_queue.submit("a.pdf", ingest_ok, 1)
+        release.set()
+
+        assert second is first
+        assert len(ingestion_queue.jobs()) == 1
+
+    def test_collect_finished_returns_each_job_once(self, ingestion_queue):
+        ingestion_queue.submit("a.pdf", ingest_ok, 1)
+        ingestion_queue.submit("b.md", ingest_ok, 2)
+        ingestion_queue.submit("scan.pdf", ingest_fail)
+        ingestion_queue.wait(timeout=5)
+
+        collected = ingestion_queue.collect_finished()
+
+        assert sorted(job.name for job in collected) == ["a.pdf", "b.md"]
+        assert ingestion_queue.collect_finished() == []
+        # Failed jobs stay visible until cleared
+        assert [job.name for job in ingestion_queue.jobs()] == ["scan.pdf"]
+
+    def test_clear_failed_allows_retry(self, ingestion_queue):
+        ingestion_queue.submit("a.pdf", ingest_fail)
+        ingestion_queue.wait(timeout=5)
+
+        ingestion_queue.clear_failed()
+        job = ingestion_queue.submit("a.pdf", ingest_ok, 3)
+        ingestion_queue.wait(timeout=5)
+
+        assert job.status == DONE
+
+    def test_resubmitting_failed_job_retries(self, ingestion_queue):
+        failed = ingestion_queue.submit("a.pdf", ingest_fail)
+        ingestion_queue.wait(timeout=5)
+
+        retry = ingestion_queue.submit("a.pdf", ingest_ok, 3)
+        ingestion_queue.wait(timeout=5)
+
+        assert retry is not failed
+        assert retry.status == DONE
+
+    def test_wait_timeout(self, ingestion_queue):
+        release = threading.Event()
+        ingestion_queue.submit("a.pdf", lambda job: release.wait(5))
+
+        assert ingestion_queue.wait(timeout=0.05) is False
+        release.set()
@@ -0,0 +1,61 @@
+"""
+Unit tests for latency_callbacks.py
+
+Tests the LLM callbacks for time to first token, generation and model load
+"""
+import pytest
+from langchain_core.outputs import Generation, LLMResult
+
+from latency_callbacks import LatencyCallbackHandler, ollama_load_seconds
+from latency_tracing import HISTOGRAMS, QUESTION, trace
+
+
+@pytest.fixture(autouse=True)
+def clear_histograms():
+    HISTOGRAMS.clear()
+    yield
+    HISTOGRAMS.clear()
+
+
+class TestLatencyCallbackHandler:
+    """Tests for LLM stage timing through callbacks"""
+
+    def test_first_token_and_generation(self):
+        from benchmarks.fake_models import FakeLLM
+
+        llm = FakeLLM(first_token_latency=0.02, token_latency=0.005, answer_tokens=5,
+                      callbacks=[LatencyCallbackHandler()])
+
+        with trace(QUESTION) as question_trace:
+            assert len(list(llm.stream("Question: pump"))) == 5
+
+        stages = {entry["stage"]: entry["ms"] for entry in question_trace.summary()["stages"]}
+        assert stages["first_token"] >= 20
+        assert stages["generation"] >= 20
+        assert "model_load" not in stages
+
+    def test_outside_trace_records_nothing(self):
+        from benchmarks.fake_models import FakeLLM
+
+        handler = LatencyCallbackHandler()
+        FakeLLM(answer_tokens=2, callbacks=[handler]).invoke("Question: pump")
+
+        assert handler._runs == {}
+
+    def test_model_load_from_ollama_metadata(self):
+        handler = LatencyCallbackHandler()
+
+        with trace(QUESTION) as question_trace:
+            handler.on_llm_start({}, ["prompt"], run_id="run")
+            handler.on_llm_end(LLMResult(generations=[[Generation(
+                text="ok", generation_info={"load_duration": 1_500_000_000}
+            )]]), run_id="run")
+
+        stages = {entry["stage"]: entry["ms"] for entry in question_trace.summary()["stages"]}
+        assert stages["model_load"] == pytest.approx(1500)
+        assert "generation" in stages
+
+    def test_ollama_load_seconds(self):
+        assert ollama_load_seconds({"load_duration": 250_000_000}) == 0.25
+        assert ollama_load_seconds({"load_duration": 0}) is None
+        assert ollama_load_seconds({}) is None
@@ -0,0 +1,320 @@
+"""
+Unit tests for latency_tracing.py
+
+Tests the per-stage latency tracing including:
+- Spans recorded inside a trace and ignored outside one
+- Trace propagation into worker threads with bind()
+- Stage summaries and the text report
+- Cumulative histograms in the Prometheus text format
+- Stages recorded by the retrieval, ingestion and job queue helpers
+"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from langchain_core.documents import Document
+from langchain_core.runnables import RunnableLambda
+
+from latency_callbacks import LatencyCallbackHandler
+from latency_tracing import (
+    HISTOGRAMS,
+    INGEST,
+    QUESTION,
+    LatencyHistograms,
+    Trace,
+    bind,
+    current_trace,
+    format_trace_report,
+    record,
+    span,
+    timed_iter,
+    trace,
+)
+
+
+@pytest.fixture(autouse=True)
+def clear_histograms():
+    HISTOGRAMS.clear()
+    yield
+    HISTOGRAMS.clear()
+
+
+def stage_names(summary):
+    return [entry["stage"] for entry in summary["stages"]]
+
+
+class TestSpans:
+    """Tests for trace(), span(), record() and timed_iter()"""
+
+    def test_span_outside_trace_is_noop(self):
+        with span("search"):
+            pass
+        record("model_load", 1.0)
+
+        assert current_trace() is None
+        assert HISTOGRAMS.count(QUESTION, "search") == 0
+
+    def test_spans_recorded_in_order_started(self):
+        with trace(QUESTION, "pump?") as question_trace:
+            with span("retrieval"):
+                with span("embed_query"):
+                    time.sleep(0.01)
+            with span("generation"):
+                pass
+
+        summary = question_trace.summary()
+        assert summary["operation"] == QUESTION
+        assert summary["name"] == "pump?"
+        assert stage_names(summary) == ["retrieval", "embed_query", "generation"]
+        assert summary["stages"][0]["ms"] >= 10
+        assert summary["total_ms"] >= summary["stages"][0]["ms"]
+
+    def test_repeated_stages_summed_and_counted(self):
+        with trace(QUESTION) as question_trace:
+            for _ in range(3):
+                with span("search"):
+                    pass
+
+        assert question_trace.summary()["stages"][0]["count"] == 3
+
+    def test_trace_restored_after_exit(self):
+        with trace(INGEST, "a.pdf"):
+            with trace(QUESTION, "q") as inner:
+                assert current_trace() is inner
+            assert current_trace().operation == INGEST
+        assert current_trace() is None
+
+    def test_spans_after_finish_are_ignored(self):
+        finished = Trace(QUESTION)
+        finished.finish()
+        finished.add("generation", 1.0)
+
+        assert finished.summary()["stages"] == []
+
+    def test_error_still_observed(self):
+        with pytest.raises(ValueError):
+            with trace(QUESTION):
+                with span("search"):
+                    raise ValueError("collection missing")
+
+        assert HISTOGRAMS.count(QUESTION, "search") == 1
+        assert HISTOGRAMS.count(QUESTION, "total") == 1
+
+    def test_record_measured_stage(self):
+        with trace(QUESTION) as question_trace:
+            record("model_load", 2.5)
+
+        assert question_trace.summary()["stages"] == [{"stage": "model_load", "ms": 2500.0, "count": 1}]
+
+    def test_timed_iter(self):
+        def pages():
+            for i in range(3):
+                time.sleep(0.005)
+                yield i
+
+        with trace(INGEST) as ingest_trace:
+            assert list(timed_iter(pages(), "extract")) == [0, 1, 2]
+
+        entry = ingest_trace.summary()["stages"][0]
+        assert entry["stage"] == "extract"
+        # One span per page plus the one noticing the end
+        assert entry["count"] == 4
+        assert entry["ms"] >= 15
+
+
+class TestBind:
+    """Tests for carrying the trace into worker threads"""
+
+    def test_thread_pool_workers_record_in_trace(self):
+        def search(name):
+            with span("search"):
+                return name
+
+        with trace(QUESTION) as question_trace:
+            with ThreadPoolExecutor(max_workers=2) as executor:
+                assert list(executor.map(bind(search), ["a", "b", "c"])) == ["a", "b", "c"]
+
+        assert question_trace.summary()["stages"][0]["count"] == 3
+
+    def test_stage_times_each_call(self):
+        with trace(INGEST) as ingest_trace:
+            thread = threading.Thread(target=bind(lambda: time.sleep(0.01), "embed"))
+            thread.start()
+            thread.join()
+
+        assert ingest_trace.summary()["stages"][0]["stage"] == "embed"
+        assert ingest_trace.summary()["stages"][0]["ms"] >= 10
+
+    def test_unbound_thread_is_outside_trace(self):
+        seen = []
+        with trace(QUESTION):
+            thread = threading.Thread(target=lambda: seen.append(current_trace()))
+            thread.start()
+            thread.join()
+
+        assert seen == [None]
+
+    def test_returns_function_outside_trace(self):
+        assert bind(len, "search") is len
+
+
+class TestReport:
+    """Tests for format_trace_report"""
+
+    def test_report_lines(self):
+        summary = {"total_ms": 1234.4, "stages": [
+            {"stage": "retrieval", "ms": 200.2, "count": 1},
+            {"stage": "search", "ms": 350.0, "count": 3},
+        ]}
+
+        assert format_trace_report(summary) == "Total: 1234 ms\nretrieval: 200 ms\nsearch: 350 ms (3×)"
+
+
+class TestHistograms:
+    """Tests for LatencyHistograms"""
+
+    def test_render_cumulative_buckets(self):
+        histograms = LatencyHistograms(buckets=(0.1, 1.0))
+        for seconds in (0.05, 0.5, 0.7, 5.0):
+            histograms.observe(QUESTION, "generation", seconds)
+
+        text = histograms.render({"app": "document_qa"})
+
+        series = 'app="document_qa",operation="question",stage="generation"'
+        assert "# TYPE rag_stage_duration_seconds histogram" in text
+        assert f'rag_stage_duration_seconds_bucket{{{series},le="0.1"}} 1' in text
+        assert f'rag_stage_duration_seconds_bucket{{{series},le="1"}} 3' in text
+        assert f'rag_stage_duration_seconds_bucket{{{series},le="+Inf"}} 4' in text
+        assert f"rag_stage_duration_seconds_sum{{{series}}} 6.250000" in text
+        assert f"rag_stage_duration_seconds_count{{{series}}} 4" in text
+
+    def test_label_values_escaped(self):
+        histograms = LatencyHistograms()
+        histograms.observe(INGEST, "total", 1.0)
+
+        assert 'app="a\\"b\\\\c"' in histograms.render({"app": 'a"b\\c'})
+
+    def test_observe_trace_adds_total(self):
+        histograms = LatencyHistograms()
+        finished = Trace(QUESTION)
+        finished.add("search", 0.1)
+        finished.add("search", 0.2)
+
+        histograms.observe_trace(finished)
+
+        assert histograms.count(QUESTION, "search") == 2
+        assert histograms.count(QUESTION, "total") == 1
+
+    def test_trace_writes_metrics_file(self, tmp_path):
+        path = tmp_path / "metrics" / "rag.prom"
+
+        with trace(QUESTION, "q", str(path), {"app": "timeseries"}):
+            with span("retrieval"):
+                pass
+
+        text = path.read_text()
+        assert 'app="timeseries",operation="question",stage="retrieval"' in text
+        assert 'stage="total"' in text
+        assert [p.name for p in path.parent.iterdir()] == ["rag.prom"]
+
+    def test_unwritable_metrics_path_does_not_fail(self, tmp_path):
+        blocker = tmp_path / "file"
+        blocker.write_text("")
+
+        with trace(QUESTION, "q", str(blocker / "rag.prom")):
+            pass
+
+        assert HISTOGRAMS.count(QUESTION, "total") == 1
+
+
+class TestInstrumentedHelpers:
+    """Tests for the stages recorded by the retrieval, ingestion and job helpers"""
+
+    def test_retrieve_once_chain_stages(self):
+        from langchain_core.prompts import PromptTemplate
+        from benchmarks.fake_models import FakeLLM
+        from retrieval import create_retrieve_once_chain, stream_retrieve_once
+
+        retriever = RunnableLambda(lambda question: [Document(page_content="pump manual")])
+        llm = FakeLLM(answer_tokens=3, callbacks=[LatencyCallbackHandler()])
+        chain = create_retrieve_once_chain(
+            retriever, PromptTemplate.from_template("{context}\nQuestion: {question}") | llm,
+            docs_packer=lambda docs: docs
+        )
+
+        with trace(QUESTION) as question_trace:
+            assert len(list(stream_retrieve_once(chain, "pump?"))) == 3
+
+        assert stage_names(question_trace.summary()) == [
+            "retrieval", "pack_context", "prompt_assembly", "first_token", "generation"
+        ]
+
+    def test_hybrid_retriever_stages(self):
+        from retrieval import HybridRetriever
+
+        vector = RunnableLambda(lambda question: [Document(page_content="semantic")])
+        retriever = HybridRetriever(vector, lambda question: [Document(page_content="E-1042")], k=5)
+
+        with trace(QUESTION) as question_trace:
+            retriever.invoke("E-1042")
+
+        assert set(stage_names(question_trace.summary())) == {"keyword_search", "vector_search", "fusion"}
+
+    def test_mmr_retriever_stages(self, tmp_path):
+        from langchain_core.embeddings import DeterministicFakeEmbedding
+        from retrieval import MMRRetriever
+        from vector_backends import ChromaBackend
+
+        embeddings = DeterministicFakeEmbedding(size=8)
+        backend = ChromaBackend(str(tmp_path / "chroma"))
+        for name in ["alpha", "beta"]:
+            backend.vectorstore(name, embeddings).add_documents(
+                [Document(page_content=f"pump {name}", metadata={"source": name})]
+            )
+
+        with trace(QUESTION) as question_trace:
+            MMRRetriever(backend, ["alpha", "beta"], embeddings, k=2).invoke("pump")
+
+        summary = question_trace.summary()
+        assert stage_names(summary) == ["embed_query", "search", "mmr"]
+        assert summary["stages"][1]["count"] == 2
+
+    def test_streaming_ingest_stages(self, tmp_path):
+        from langchain_core.embeddings import DeterministicFakeEmbedding
+        from langchain_text_splitters import RecursiveCharacterTextSplitter
+        from ingestion import stream_documents_to_vectorstore
+        from vector_backends import ChromaBackend
+
+        backend = ChromaBackend(str(tmp_path / "chroma"))
+        pages = (Document(page_content=f"Page {i} text.", metadata={"source": "manual.pdf", "page": i})
+                 for i in range(10))
+        splitter = RecursiveCharacterTextSplitter(chunk_size=200, chunk_overlap=0)
+
+        with trace(INGEST, "manual.pdf") as ingest_trace:
+            stream_documents_to_vectorstore(backend, "pdf_manual", DeterministicFakeEmbedding(size=8), pages, splitter,
+                                            batch_size=4, max_concurrency=2)
+
+        counts = {entry["stage"]: entry["count"] for entry in ingest_trace.summary()["stages"]}
+        assert set(counts) == {"extract", "split", "embed", "upsert"}
+        assert counts["embed"] == counts["upsert"] == 3
+
+    def test_ingestion_queue_records_job_timings(self, tmp_path):
+        from ingestion_jobs import IngestionQueue
+
+        def ingest(job):
+            with span("embed"):
+                pass
+            return "store", 1
+
+        queue = IngestionQueue(max_workers=1, metrics_path=str(tmp_path / "ingest.prom"),
+                               metrics_labels={"app": "document_qa"})
+        try:
+            job = queue.submit("a.pdf", ingest)
+            queue.wait(5)
+        finally:
+            queue.shutdown()
+
+        assert job.timings["name"] == "a.pdf"
+        assert stage_names(job.timings) == ["embed"]
+        assert 'operation="ingest",stage="embed"' in (tmp_path / "ingest.prom").read_text()
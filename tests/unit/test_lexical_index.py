@@ -0,0 +1,130 @@
+"""
+Unit tests for lexical_index.py
+
+Tests the BM25 keyword index including:
+- Tokenization of identifiers such as part numbers and error codes
+- BM25 ranking and document filters
+- Persistence, deletion and clearing
+- Backfilling from existing vector collections
+"""
+import pytest
+from langchain_core.documents import Document
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+from lexical_index import LexicalIndex, tokenize
+from vector_backends import ChromaBackend
+
+
+def make_chunk(text, source="manual.pdf", page=0):
+    return Document(page_content=text, metadata={"source": source, "page": page})
+
+
+@pytest.fixture
+def index(tmp_path):
+    index = LexicalIndex(str(tmp_path / "lexical.sqlite3"))
+    chunks = [
+        make_chunk("Error E-1042 indicates low hydraulic pressure in the pump.", page=1),
+        make_chunk("Replace filter part 7734-A every 500 operating hours.", page=2),
+        make_chunk("The pump pressure should be checked weekly. Pump pressure matters.", page=3),
+        make_chunk("Meeting notes about the hydraulic pump budget.", source="notes.md")
+    ]
+    index.add_documents(chunks[:3], ["c1", "c2", "c3"])
+    index.add_documents(chunks[3:], ["c4"])
+    return index
+
+
+class TestTokenize:
+    """Tests for tokenize"""
+
+    def test_lowercases_and_drops_stopwords(self):
+        assert tokenize("The Pump IS running") == ["pump", "running"]
+
+    def test_keeps_identifiers_and_their_parts(self):
+        assert tokenize("Code E-1042") == ["code", "e-1042", "e", "1042"]
+
+    def test_version_numbers(self):
+        assert "v2.3.1" in tokenize("firmware v2.3.1")
+
+
+class TestLexicalIndex:
+    """Tests for LexicalIndex"""
+
+    def test_exact_error_code_ranks_first(self, index):
+        results = index.search("what does E-1042 mean?")
+
+        assert results[0][0].metadata == {"source": "manual.pdf", "page": 1}
+        assert results[0][0].id == "c1"
+
+    def test_part_number_number_only(self, index):
+        docs = index.retrieve("7734")
+
+        assert [d.metadata["page"] for d in docs] == [2]
+
+    def test_term_frequency_ranking(self, index):
+        docs = index.retrieve("pump pressure")
+
+        assert docs[0].metadata["page"] == 3
+        assert {d.id for d in docs} == {"c1", "c3", "c4"}
+
+    def test_scores_descending(self, index):
+        scores = [score for _, score in index.search("hydraulic pump pressure")]
+
+        assert scores == sorted(scores, reverse=True)
+
+    def test_document_filter(self, index):
+        docs = index.retrieve("hydraulic", documents=["notes.md"])
+
+        assert [d.metadata["source"] for d in docs] == ["notes.md"]
+        assert index.retrieve("hydraulic", documents=[]) == []
+
+    def test_k_limits_results(self, index):
+        assert len(index.retrieve("pump", k=2)) == 2
+
+    def test_no_matching_terms(self, index):
+        assert index.search("zebra") == []
+        assert index.search("the of and") == []
+
+    def test_persists_across_instances(self, index, tmp_path):
+        reopened = LexicalIndex(str(tmp_path / "lexical.sqlite3"))
+
+        assert reopened.retrieve("E-1042")[0].id == "c1"
+        assert reopened.documents() == ["manual.pdf", "notes.md"]
+
+    def test_readding_chunk_replaces_postings(self, index):
+        index.add_documents([make_chunk("Completely different text")], ["c1"])
+
+        assert [d.id for d in index.retrieve("E-1042")] == []
+        assert index.retrieve("different")[0].id == "c1"
+
+    def test_explicit_document_name(self, tmp_path):
+        index = LexicalIndex(str(tmp_path / "lexical.sqlite3"))
+        index.add_documents([make_chunk("valve", source="/tmp/tmpab12.pdf")], ["v1"], document_name="valves.pdf")
+
+        assert index.documents() == ["valves.pdf"]
+        assert index.retrieve("valve", documents=["valves.pdf"])[0].id == "v1"
+
+    def test_delete_document(self, index):
+        index.delete_document("notes.md")
+
+        assert index.documents() == ["manual.pdf"]
+        assert index.retrieve("budget") == []
+
+    def test_clear(self, index):
+        index.clear()
+
+        assert index.documents() == []
+        assert index.search("pump") == []
+
+    def test_backfill_from_collection(self, tmp_path):
+        """Test indexing chunks that were embedded before keyword search existed"""
+        backend = ChromaBackend(str(tmp_path / "chroma"))
+        store = backend.vectorstore("documents", DeterministicFakeEmbedding(size=8))
+        store.add_documents([make_chunk(f"valve V-{i}", page=i) for i in range(5)])
+        store.add_documents([make_chunk("other document", source="other.pdf")])
+        index = LexicalIndex(str(tmp_path / "lexical.sqlite3"))
+
+        count = index.backfill_from_collection(backend, "documents", "manual.pdf", where={"source": "manual.pdf"})
+
+        assert count == 5
+        assert index.documents() == ["manual.pdf"]
+        assert index.retrieve("V-3")[0].metadata["page"] == 3
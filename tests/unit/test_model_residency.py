@@ -0,0 +1,208 @@
+"""
+Unit tests for model_residency.py
+
+Tests Ollama model residency including:
+- Policy parsing and keep_alive values
+- Preloading and unloading through the Ollama client
+- Unloading "pressure" models when memory runs low
+- Load versus inference timings from LangChain callbacks
+"""
+from types import SimpleNamespace
+
+import pytest
+from langchain_core.language_models import FakeListLLM
+from langchain_core.outputs import Generation, LLMResult
+
+from model_residency import (
+    ModelResidencyManager,
+    parse_policy,
+    keep_alive_for,
+    response_timings,
+    same_model,
+    EMBEDDING,
+    LLM
+)
+
+
+class FakeOllamaClient:
+    """Records requests and reports loaded models like ollama.Client"""
+
+    def __init__(self, loaded=(), load_duration=2_000_000_000, fail=False):
+        self.loaded = list(loaded)
+        self.load_duration = load_duration
+        self.fail = fail
+        self.calls = []
+
+    def generate(self, model, prompt, keep_alive):
+        return self._request("generate", model, keep_alive)
+
+    def embed(self, model, input, keep_alive):
+        return self._request("embed", model, keep_alive)
+
+    def _request(self, endpoint, model, keep_alive):
+        if self.fail:
+            raise ConnectionError("ollama down")
+        self.calls.append((endpoint, model, keep_alive))
+        if keep_alive == 0:
+            self.loaded = [m for m in self.loaded if not same_model(m, model)]
+        return SimpleNamespace(load_duration=self.load_duration)
+
+    def ps(self):
+        return SimpleNamespace(models=[SimpleNamespace(model=name) for name in self.loaded])
+
+
+def make_manager(client=None, free_mb=8192.0, **kwargs):
+    policies = {"big:latest": "pressure", "small": "idle:10m", "embedder": "pinned", "once": "unload"}
+    return ModelResidencyManager(
+        policies, client=client or FakeOllamaClient(), memory_probe=lambda: free_mb,
+        min_free_memory_mb=1024, **kwargs
+    )
+
+
+class TestPolicies:
+    """Tests for parse_policy and keep_alive_for"""
+
+    def test_parse(self):
+        assert parse_policy("pinned") == ("pinned", None)
+        assert parse_policy("idle:10m") == ("idle", "10m")
+        assert parse_policy(" Pressure ") == ("pressure", None)
+
+    def test_bare_duration_is_idle(self):
+        assert parse_policy("30s") == ("idle", "30s")
+
+    def test_invalid_policy(self):
+        with pytest.raises(ValueError):
+            parse_policy("forever")
+        with pytest.raises(ValueError):
+            parse_policy("idle:10 minutes")
+
+    def test_keep_alive_values(self):
+        assert keep_alive_for("pinned") == -1
+        assert keep_alive_for("pressure") == -1
+        assert keep_alive_for("unload") == 0
+        assert keep_alive_for("idle:10m") == 600
+        assert keep_alive_for("idle:1h30m") == 5400
+
+    def test_manager_rejects_invalid_policy(self):
+        with pytest.raises(ValueError):
+            ModelResidencyManager({"x": "sometimes"}, client=FakeOllamaClient())
+
+    def test_lookup_ignores_latest_tag(self):
+        manager = make_manager()
+
+        assert manager.policy("big") == "pressure"
+        assert manager.policy("small:latest") == "idle:10m"
+        assert manager.policy("unknown") == manager.default_policy
+
+
+class TestPreloadAndUnload:
+    """Tests for preloading and unloading models"""
+
+    def test_preload_uses_policy_keep_alive(self):
+        client = FakeOllamaClient()
+        manager = make_manager(client)
+
+        assert manager.preload("small") == 2.0
+        assert manager.preload("embedder", EMBEDDING) == 2.0
+        assert client.calls == [("generate", "small", 600), ("embed", "embedder", -1)]
+
+    def test_preload_records_load_without_calls(self):
+        manager = make_manager()
+
+        manager.preload("small")
+
+        assert manager.stats()["small"]["calls"] == 0
+        assert manager.stats()["small"]["cold_loads"] == 1
+
+    def test_unload_policy_is_not_preloaded(self):
+        client = FakeOllamaClient()
+
+        assert make_manager(client).preload("once") is None
+        assert client.calls == []
+
+    def test_preload_without_ollama(self):
+        assert make_manager(FakeOllamaClient(fail=True)).preload("small") is None
+
+    def test_preload_in_background(self):
+        client = FakeOllamaClient()
+        manager = make_manager(client)
+
+        manager.preload_in_background([("embedder", EMBEDDING), ("small", LLM)]).join(timeout=5)
+
+        assert [call[1] for call in client.calls] == ["embedder", "small"]
+
+    def test_unload_embedding_model(self):
+        client = FakeOllamaClient(loaded=["embedder:latest"])
+        manager = make_manager(client)
+        manager.keep_alive("embedder", EMBEDDING)
+
+        assert manager.unload("embedder")
+        assert client.calls == [("embed", "embedder", 0)]
+        assert manager.stats()["embedder"]["unloads"] == 1
+
+
+class TestMemoryPressure:
+    """Tests for release_under_pressure"""
+
+    def test_unloads_pressure_models_when_memory_is_low(self):
+        client = FakeOllamaClient(loaded=["big:latest", "small:latest", "embedder:latest"])
+        manager = make_manager(client, free_mb=512)
+
+        assert manager.release_under_pressure() == ["big:latest"]
+        assert client.loaded == ["small:latest", "embedder:latest"]
+
+    def test_nothing_unloaded_with_enough_memory(self):
+        client = FakeOllamaClient(loaded=["big:latest"])
+
+        assert make_manager(client, free_mb=4096).release_under_pressure() == []
+        assert client.calls == []
+
+    def test_model_in_use_is_kept(self):
+        client = FakeOllamaClient(loaded=["big:latest"])
+
+        assert make_manager(client, free_mb=512).release_under_pressure(keep="big") == []
+
+    def test_unknown_memory_unloads_nothing(self):
+        client = FakeOllamaClient(loaded=["big:latest"])
+        manager = ModelResidencyManager({"big": "pressure"}, client=client, memory_probe=lambda: None)
+
+        assert manager.release_under_pressure() == []
+
+
+class TestTimings:
+    """Tests for load and inference timing"""
+
+    def test_response_timings(self):
+        assert response_timings({"total_duration": 3_000_000_000, "load_duration": 1_000_000_000}) == (1.0, 2.0)
+        assert response_timings({}) is None
+
+    def test_callback_records_llm_timings(self):
+        manager = make_manager()
+        handler = manager.callback_handler("small")
+        result = LLMResult(generations=[[Generation(
+            text="answer", generation_info={"total_duration": 1_500_000_000, "load_duration": 1_000_000}
+        )]])
+
+        handler.on_llm_end(result)
+
+        stats = manager.stats()["small"]
+        assert stats["calls"] == 1
+        assert stats["cold_loads"] == 0
+        assert stats["inference_seconds"] == pytest.approx(1.499)
+
+    def test_callback_runs_pressure_check_before_request(self):
+        client = FakeOllamaClient(loaded=["big:latest"])
+        manager = make_manager(client, free_mb=512)
+        llm = FakeListLLM(responses=["ok"], callbacks=[manager.callback_handler("small")])
+
+        llm.invoke("question")
+
+        assert client.loaded == []
+
+    def test_responses_without_timings_are_ignored(self):
+        manager = make_manager()
+        llm = FakeListLLM(responses=["ok"], callbacks=[manager.callback_handler("small")])
+
+        llm.invoke("question")
+
+        assert manager.stats() == {}
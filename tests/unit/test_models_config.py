@@ -6,6 +6,8 @@ Tests the model configuration functions including:
 - Display name mapping
 - Model configuration lookup
 - Default model selection
+- Ollama residency policies
+- Context token budgets
 - Configuration structure validation
 """
 import pytest
@@ -15,6 +17,8 @@ from models_config import (
     get_model_list,
     get_model_display_names,
     get_model_config,
+    get_residency_policies,
+    get_context_budget,
     get_default_model
 )
 
@@ -73,6 +77,13 @@ class TestModelsConfiguration:
                 assert isinstance(model['description'], str)
                 assert len(model['description']) > 0
 
+    def test_optional_residency_field(self):
+        """Test that residency policies, when present, are valid"""
+        from model_residency import parse_policy
+        for model in MODELS + [EMBEDDING_MODEL]:
+            if 'residency' in model:
+                parse_policy(model['residency'])
+
 
 class TestEmbeddingConfiguration:
     """Tests for EMBEDDING_MODEL configuration"""
@@ -342,6 +353,42 @@ class TestConfigurationValidation:
                 assert len(name) > 0
 
 
+class TestGetResidencyPolicies:
+    """Tests for get_residency_policies function"""
+
+    def test_only_ollama_models(self):
+        """Test that only Ollama models get residency policies"""
+        policies = get_residency_policies()
+        for name in policies:
+            config = get_model_config(name) or EMBEDDING_MODEL
+            assert config['provider'] == 'ollama'
+
+    def test_includes_embedding_model(self):
+        """Test that the embedding model's policy is included"""
+        if 'residency' in EMBEDDING_MODEL:
+            assert get_residency_policies()[EMBEDDING_MODEL['name']] == EMBEDDING_MODEL['residency']
+
+
+class TestGetContextBudget:
+    """Tests for get_context_budget function"""
+
+    def test_configured_budget(self):
+        """Test that a model's context_tokens entry is used"""
+        for model in MODELS:
+            if model.get('context_tokens'):
+                assert get_context_budget(model['name']) == model['context_tokens']
+
+    def test_unknown_model_uses_default(self):
+        """Test that models missing from MODELS get the default budget"""
+        from models_config import DEFAULT_CONTEXT_TOKENS
+        assert get_context_budget('unknown:latest') == DEFAULT_CONTEXT_TOKENS
+
+    def test_budgets_are_positive(self):
+        """Test that every model has a usable budget"""
+        for model in MODELS:
+            assert get_context_budget(model['name']) > 0
+
+
 class TestEmptyModelsEdgeCase:
     """Test behavior when MODELS list is empty (edge case)"""
 
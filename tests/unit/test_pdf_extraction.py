@@ -0,0 +1,92 @@
+"""
+Unit tests for pdf_extraction.py
+
+Tests PDF page extraction including:
+- Page range splitting
+- In-process extraction with source/page metadata
+- Parallel extraction matching in-process output and page order
+"""
+import pytest
+
+fitz = pytest.importorskip("fitz")
+
+from pdf_extraction import page_ranges, count_pages, extract_page_range, iter_pdf_pages, MIN_PARALLEL_PAGES
+
+
+def write_pdf(path, page_count):
+    doc = fitz.open()
+    for i in range(page_count):
+        page = doc.new_page()
+        page.insert_text((72, 72), f"Page {i} of the turbine maintenance manual")
+    doc.save(str(path))
+    doc.close()
+    return str(path)
+
+
+@pytest.fixture
+def large_pdf(tmp_path):
+    return write_pdf(tmp_path / "manual.pdf", MIN_PARALLEL_PAGES + 13)
+
+
+class TestPageRanges:
+    """Tests for page_ranges"""
+
+    def test_even_split(self):
+        assert page_ranges(8, 4) == [(0, 4), (4, 8)]
+
+    def test_remainder(self):
+        assert page_ranges(10, 4) == [(0, 4), (4, 8), (8, 10)]
+
+    def test_empty_document(self):
+        assert page_ranges(0, 4) == []
+
+    def test_rejects_zero(self):
+        with pytest.raises(ValueError):
+            page_ranges(10, 0)
+
+
+class TestExtraction:
+    """Tests for in-process and parallel extraction"""
+
+    def test_extract_page_range(self, large_pdf):
+        texts = extract_page_range(large_pdf, 3, 5)
+
+        assert len(texts) == 2
+        assert "Page 3 " in texts[0]
+        assert "Page 4 " in texts[1]
+
+    def test_sequential_metadata(self, tmp_path):
+        pdf_path = write_pdf(tmp_path / "tmp123.pdf", 3)
+
+        pages = list(iter_pdf_pages(pdf_path, "guide.pdf"))
+
+        assert [p.metadata for p in pages] == [{"source": "guide.pdf", "page": i} for i in range(3)]
+        assert "Page 2 " in pages[2].page_content
+
+    def test_parallel_matches_sequential(self, large_pdf):
+        """Test that parallel extraction returns the same pages in order"""
+        sequential = list(iter_pdf_pages(large_pdf, "manual.pdf", workers=1))
+        parallel = list(iter_pdf_pages(large_pdf, "manual.pdf", workers=3, pages_per_task=4))
+
+        assert count_pages(large_pdf) == len(parallel)
+        assert [p.metadata for p in parallel] == [p.metadata for p in sequential]
+        assert [p.page_content for p in parallel] == [p.page_content for p in sequential]
+
+    def test_small_documents_stay_in_process(self, tmp_path, monkeypatch):
+        import pdf_extraction
+
+        def fail(*args, **kwargs):
+            raise AssertionError("process pool should not be used")
+
+        monkeypatch.setattr(pdf_extraction, "ProcessPoolExecutor", fail)
+        pdf_path = write_pdf(tmp_path / "short.pdf", 2)
+
+        assert len(list(iter_pdf_pages(pdf_path, "short.pdf", workers=8))) == 2
+
+    def test_consumer_can_stop_early(self, large_pdf):
+        pages = iter_pdf_pages(large_pdf, "manual.pdf", workers=2, pages_per_task=4)
+
+        first = next(pages)
+        pages.close()
+
+        assert first.metadata == {"source": "manual.pdf", "page": 0}
@@ -0,0 +1,426 @@
+"""
+Unit tests for retrieval.py
+
+Tests the retrieval helpers including:
+- Concurrent fan-out across collections
+- Vectorized MMR over candidates from every collection
+- Error handling for failing collections
+- Retrieve-once query pipeline
+- Reciprocal rank fusion and hybrid retrieval with keyword fallback
+- Answer streaming with sources reported before the first token
+"""
+import threading
+import time
+import pytest
+from langchain_core.documents import Document
+from langchain_core.runnables import RunnableLambda
+
+from retrieval import (
+    MMRRetriever,
+    HybridRetriever,
+    DEFAULT_TOP_K,
+    format_docs,
+    create_retrieve_once_chain,
+    reciprocal_rank_fusion,
+    maximal_marginal_relevance,
+    message_text,
+    stream_retrieve_once
+)
+
+
+class KeywordEmbeddings:
+    """Embeds text as counts of a few keywords, so similar texts get similar vectors"""
+
+    KEYWORDS = ["warning", "pump", "valve", "filter", "torque", "seal"]
+
+    def __init__(self):
+        self.query_calls = 0
+
+    def embed_documents(self, texts):
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text):
+        self.query_calls += 1
+        return self._embed(text)
+
+    def _embed(self, text):
+        words = text.lower().split()
+        return [float(words.count(keyword)) + 0.01 for keyword in self.KEYWORDS]
+
+
+class TestMaximalMarginalRelevance:
+    """Tests for maximal_marginal_relevance"""
+
+    def test_matches_langchain_reference(self):
+        import numpy as np
+        from langchain_core.vectorstores.utils import maximal_marginal_relevance as reference
+        rng = np.random.default_rng(7)
+
+        for _ in range(20):
+            embeddings = rng.normal(size=(30, 8))
+            query = rng.normal(size=8)
+            for lambda_mult in (0.2, 0.5, 0.9):
+                assert maximal_marginal_relevance(query, embeddings, k=8, lambda_mult=lambda_mult) == \
+                    reference(query, embeddings, k=8, lambda_mult=lambda_mult)
+
+    def test_prefers_diverse_candidates(self):
+        embeddings = [[1.0, 0.0], [1.0, 0.0], [0.7, 0.7]]
+
+        assert maximal_marginal_relevance([1.0, 0.1], embeddings, k=2) == [0, 2]
+
+    def test_pure_relevance(self):
+        embeddings = [[0.0, 1.0], [1.0, 0.0], [1.0, 0.1]]
+
+        assert maximal_marginal_relevance([1.0, 0.0], embeddings, k=2, lambda_mult=1.0) == [1, 2]
+
+    def test_k_larger_than_candidates(self):
+        assert sorted(maximal_marginal_relevance([1.0, 0.0], [[1.0, 0.0], [0.0, 1.0]], k=5)) == [0, 1]
+
+    def test_empty(self):
+        assert maximal_marginal_relevance([1.0, 0.0], [], k=3) == []
+        assert maximal_marginal_relevance([1.0, 0.0], [[1.0, 0.0]], k=0) == []
+
+
+class TestMMRRetriever:
+    """Tests for MMRRetriever against real Chroma collections"""
+
+    NAMES = ["pdf_alpha", "pdf_beta", "pdf_gamma"]
+
+    @pytest.fixture
+    def backend(self, tmp_path):
+        from vector_backends import ChromaBackend
+
+        embeddings = KeywordEmbeddings()
+        backend = ChromaBackend(str(tmp_path / "chroma"))
+        for name in ["alpha", "beta", "gamma"]:
+            chunks = [
+                # Boilerplate repeated in every manual
+                Document(page_content="warning pump warning pump", metadata={"source": f"{name}.pdf", "page": 0}),
+                Document(page_content=f"pump valve {name}", metadata={"source": f"{name}.pdf", "page": 1}),
+                Document(page_content=f"pump filter seal {name}", metadata={"source": f"{name}.pdf", "page": 2}),
+            ]
+            backend.vectorstore(f"pdf_{name}", embeddings).add_documents(chunks)
+        return backend, embeddings
+
+    def test_repeated_boilerplate_selected_once(self, backend):
+        backend, embeddings = backend
+
+        docs = MMRRetriever(backend, self.NAMES, embeddings, k=3, fetch_k=9, lambda_mult=0.4).invoke("warning pump")
+
+        assert docs[0].page_content == "warning pump warning pump"
+        assert [d.metadata["page"] for d in docs].count(0) == 1
+        assert sorted(d.metadata["page"] for d in docs) == [0, 1, 2]
+
+    def test_candidates_from_all_collections(self, backend):
+        backend, embeddings = backend
+
+        docs = MMRRetriever(backend, self.NAMES, embeddings, k=9, fetch_k=9).invoke("pump")
+
+        assert {d.metadata["source"] for d in docs} == {"alpha.pdf", "beta.pdf", "gamma.pdf"}
+        assert all(d.id for d in docs)
+
+    def test_relevance_scores_in_metadata(self, backend):
+        backend, embeddings = backend
+
+        docs = MMRRetriever(backend, self.NAMES, embeddings, k=3).invoke("valve")
+
+        scores = [d.metadata["relevance_score"] for d in docs]
+        assert all(-1.0 <= score <= 1.0001 for score in scores)
+        assert max(scores) == docs[0].metadata["relevance_score"]
+
+    def test_embeds_query_once(self, backend):
+        backend, embeddings = backend
+
+        MMRRetriever(backend, self.NAMES, embeddings).invoke({"question": "valve"})
+
+        assert embeddings.query_calls == 1
+
+    def test_where_filter(self, backend):
+        backend, embeddings = backend
+
+        docs = MMRRetriever(backend, self.NAMES, embeddings, k=5, where={"page": 1}).invoke("pump")
+
+        assert sorted(d.page_content for d in docs) == ["pump valve alpha", "pump valve beta", "pump valve gamma"]
+
+    def test_missing_collection_is_skipped(self, backend):
+        backend, embeddings = backend
+
+        docs = MMRRetriever(backend, ["pdf_deleted", "pdf_alpha"], embeddings, k=3).invoke("pump")
+
+        assert {d.metadata["source"] for d in docs} == {"alpha.pdf"}
+
+    def test_failing_collection_is_skipped(self, backend):
+        backend, embeddings = backend
+        query = backend.query
+
+        def failing_query(collection_name, *args, **kwargs):
+            if collection_name == "pdf_broken":
+                raise RuntimeError("index is corrupt")
+            return query(collection_name, *args, **kwargs)
+
+        backend.query = failing_query
+        docs = MMRRetriever(backend, ["pdf_broken", "pdf_alpha"], embeddings, k=3).invoke("pump")
+
+        assert {d.metadata["source"] for d in docs} == {"alpha.pdf"}
+
+    def test_searches_run_concurrently(self):
+        """Test that latency tracks the slowest collection, not the sum"""
+        thread_ids = set()
+
+        class SlowBackend:
+            def query(self, collection_name, embedding, k, where=None, include_embeddings=False):
+                thread_ids.add(threading.get_ident())
+                time.sleep(0.2)
+                return [{"id": collection_name, "document": "pump", "metadata": {"source": "a.pdf"},
+                         "distance": 0.1, "embedding": embedding}]
+
+        start = time.perf_counter()
+        names = [f"pdf_{i}" for i in range(6)]
+        docs = MMRRetriever(SlowBackend(), names, KeywordEmbeddings(), k=6, max_workers=6).invoke("pump")
+        elapsed = time.perf_counter() - start
+
+        assert len(docs) == 6
+        assert elapsed < 0.6
+        assert len(thread_ids) > 1
+
+    def test_no_collections(self):
+        assert MMRRetriever(None, [], KeywordEmbeddings()).invoke("question") == []
+
+
+class TestRetrieveOnceChain:
+    """Tests for create_retrieve_once_chain and format_docs"""
+
+    @pytest.fixture
+    def counting_retriever(self):
+        calls = []
+
+        def retrieve(question):
+            calls.append(question)
+            return [Document(page_content="alpha"), Document(page_content="beta")]
+
+        return RunnableLambda(retrieve), calls
+
+    def test_format_docs_joins_content(self):
+        """Test that documents are joined with blank lines"""
+        docs = [Document(page_content="one"), Document(page_content="two")]
+        assert format_docs(docs) == "one\n\ntwo"
+
+    def test_retrieves_once_per_question(self, counting_retriever):
+        """Test that the retriever runs exactly once per invocation"""
+        retriever, calls = counting_retriever
+        chain = create_retrieve_once_chain(retriever, RunnableLambda(lambda x: "answer"))
+
+        chain.invoke({"question": "what?"})
+
+        assert calls == ["what?"]
+
+    def test_context_and_sources_share_documents(self, counting_retriever):
+        """Test that the prompt context is built from the returned sources"""
+        retriever, _ = counting_retriever
+        seen = {}
+
+        def answer(inputs):
+            seen.update(inputs)
+            return "answer"
+
+        result = create_retrieve_once_chain(retriever, RunnableLambda(answer)).invoke({"question": "what?"})
+
+        assert result["answer"] == "answer"
+        assert result["question"] == "what?"
+        assert [d.page_content for d in result["source_documents"]] == ["alpha", "beta"]
+        assert result["context"] == format_docs(result["source_documents"])
+        assert seen["context"] == "alpha\n\nbeta"
+
+    def test_custom_formatter(self, counting_retriever):
+        """Test that a custom document formatter is applied"""
+        retriever, _ = counting_retriever
+        chain = create_retrieve_once_chain(
+            retriever,
+            RunnableLambda(lambda x: x["context"]),
+            docs_formatter=lambda docs: str(len(docs))
+        )
+
+        assert chain.invoke({"question": "q"})["answer"] == "2"
+
+    def test_docs_packer_selects_prompt_and_sources(self, counting_retriever):
+        """Test that packed documents feed both the prompt and the sources"""
+        retriever, calls = counting_retriever
+        chain = create_retrieve_once_chain(
+            retriever,
+            RunnableLambda(lambda x: x["context"]),
+            docs_packer=lambda docs: docs[:1]
+        )
+
+        result = chain.invoke({"question": "q"})
+
+        assert result["answer"] == "alpha"
+        assert [d.page_content for d in result["source_documents"]] == ["alpha"]
+        assert calls == ["q"]
+
+
+def make_doc(name, source="a.pdf"):
+    return Document(page_content=name, metadata={"source": source})
+
+
+class StubRetriever:
+    """Vector retriever stub with optional delay or failure"""
+
+    def __init__(self, docs, delay=0.0, fail=False):
+        self.docs = docs
+        self.delay = delay
+        self.fail = fail
+        self.calls = 0
+
+    def invoke(self, query):
+        self.calls += 1
+        if self.delay:
+            time.sleep(self.delay)
+        if self.fail:
+            raise ConnectionError("ollama down")
+        return list(self.docs)
+
+
+class TestReciprocalRankFusion:
+    """Tests for reciprocal_rank_fusion"""
+
+    def test_documents_in_both_lists_rank_first(self):
+        vector = [make_doc("x"), make_doc("shared"), make_doc("y")]
+        lexical = [make_doc("z"), make_doc("shared")]
+
+        fused = reciprocal_rank_fusion([vector, lexical], k=4)
+
+        assert fused[0].page_content == "shared"
+        assert {d.page_content for d in fused} == {"x", "y", "z", "shared"}
+
+    def test_duplicates_merged_by_source_and_text(self):
+        fused = reciprocal_rank_fusion([[make_doc("a")], [make_doc("a"), make_doc("a", source="b.pdf")]], k=10)
+
+        assert len(fused) == 2
+
+    def test_limited_to_k(self):
+        ranking = [make_doc(str(i)) for i in range(10)]
+
+        assert [d.page_content for d in reciprocal_rank_fusion([ranking], k=3)] == ["0", "1", "2"]
+
+    def test_empty_rankings(self):
+        assert reciprocal_rank_fusion([[], []]) == []
+
+
+class TestHybridRetriever:
+    """Tests for HybridRetriever"""
+
+    def test_fuses_vector_and_keyword_results(self):
+        vector = StubRetriever([make_doc("semantic"), make_doc("E-1042 fault")])
+        retriever = HybridRetriever(vector, lambda q: [make_doc("E-1042 fault")], k=5)
+
+        docs = retriever.invoke("error E-1042")
+
+        assert docs[0].page_content == "E-1042 fault"
+        assert not retriever.used_lexical_fallback
+
+    def test_lexical_only_skips_vector_search(self):
+        retriever = HybridRetriever(None, lambda q: [make_doc(q)], k=5)
+
+        assert [d.page_content for d in retriever.invoke({"question": "pump"})] == ["pump"]
+
+    def test_falls_back_when_embedder_is_slow(self):
+        """Test that a cold embedding model does not delay the answer"""
+        vector = StubRetriever([make_doc("late")], delay=1.0)
+        retriever = HybridRetriever(vector, lambda q: [make_doc("keyword")], vector_timeout=0.05)
+
+        start = time.perf_counter()
+        docs = retriever.invoke("q")
+
+        assert time.perf_counter() - start < 0.5
+        assert [d.page_content for d in docs] == ["keyword"]
+        assert retriever.used_lexical_fallback
+
+    def test_deadline_shared_with_earlier_steps(self):
+        """Test that time already spent waiting on the embedder counts against the deadline"""
+        vector = StubRetriever([make_doc("late")], delay=1.0)
+        retriever = HybridRetriever(vector, lambda q: [make_doc("keyword")], vector_timeout=10,
+                                    vector_deadline=time.monotonic() - 1)
+
+        start = time.perf_counter()
+        docs = retriever.invoke("q")
+
+        assert time.perf_counter() - start < 0.5
+        assert [d.page_content for d in docs] == ["keyword"]
+        assert retriever.used_lexical_fallback
+
+    def test_falls_back_when_embedder_fails(self):
+        retriever = HybridRetriever(StubRetriever([], fail=True), lambda q: [make_doc("keyword")])
+
+        assert [d.page_content for d in retriever.invoke("q")] == ["keyword"]
+        assert retriever.used_lexical_fallback
+
+    def test_error_raised_without_keyword_hits(self):
+        retriever = HybridRetriever(StubRetriever([], fail=True), lambda q: [])
+
+        with pytest.raises(ConnectionError):
+            retriever.invoke("q")
+
+    def test_waits_for_vector_search_without_keyword_hits(self):
+        vector = StubRetriever([make_doc("semantic")], delay=0.1)
+        retriever = HybridRetriever(vector, lambda q: [], vector_timeout=0.01)
+
+        assert [d.page_content for d in retriever.invoke("q")] == ["semantic"]
+
+    def test_usable_in_retrieve_once_chain(self):
+        retriever = HybridRetriever(None, lambda q: [make_doc("keyword")])
+        chain = create_retrieve_once_chain(retriever, RunnableLambda(lambda x: x["context"]))
+
+        assert chain.invoke({"question": "q"})["answer"] == "keyword"
+
+
+class TestStreaming:
+    """Tests for message_text and stream_retrieve_once"""
+
+    @pytest.fixture
+    def prompt(self):
+        from langchain_core.prompts import PromptTemplate
+        return PromptTemplate.from_template("{context}\n{question}")
+
+    def retriever(self, calls):
+        def retrieve(question):
+            calls.append(question)
+            return [make_doc("pump manual")]
+        return RunnableLambda(retrieve)
+
+    def test_message_text(self):
+        from langchain_core.messages import AIMessageChunk
+
+        assert message_text("plain") == "plain"
+        assert message_text(AIMessageChunk(content="chat")) == "chat"
+        assert message_text(AIMessageChunk(content=[{"type": "text", "text": "blocks"}, {"type": "tool_use"}])) == "blocks"
+
+    def test_streams_llm_tokens(self, prompt):
+        from langchain_core.language_models.fake import FakeStreamingListLLM
+
+        calls = []
+        chain = create_retrieve_once_chain(self.retriever(calls), prompt | FakeStreamingListLLM(responses=["pressure ok"]))
+
+        tokens = list(stream_retrieve_once(chain, "status?"))
+
+        assert len(tokens) > 1
+        assert "".join(tokens) == "pressure ok"
+        assert calls == ["status?"]
+
+    def test_streams_chat_model_chunks(self, prompt):
+        from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+
+        model = GenericFakeChatModel(messages=iter(["the pump is fine"]))
+        chain = create_retrieve_once_chain(self.retriever([]), prompt | model)
+
+        assert "".join(stream_retrieve_once(chain, "q")) == "the pump is fine"
+
+    def test_sources_reported_before_first_token(self, prompt):
+        from langchain_core.language_models.fake import FakeStreamingListLLM
+
+        events = []
+        chain = create_retrieve_once_chain(self.retriever([]), prompt | FakeStreamingListLLM(responses=["ab"]))
+
+        for token in stream_retrieve_once(chain, "q", on_sources=lambda docs: events.append(("sources", len(docs)))):
+            events.append(("token", token))
+
+        assert events == [("sources", 1), ("token", "a"), ("token", "b")]
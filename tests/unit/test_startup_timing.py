@@ -0,0 +1,75 @@
+"""
+Unit tests for startup_timing.py
+
+Tests deferred imports including:
+- Recording the time of a first import
+- Modules already imported are returned without being recorded
+- The report order and formatting
+- The apps' helper modules do not import provider, Chroma or PDF modules
+"""
+import os
+import subprocess
+import sys
+
+import pytest
+
+import startup_timing
+from startup_timing import timed_import, import_report, format_import_report
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture(autouse=True)
+def empty_report(monkeypatch):
+    monkeypatch.setattr(startup_timing, "IMPORT_TIMES", {})
+
+
+class TestTimedImport:
+    """Tests for timed_import"""
+
+    def test_records_first_import(self, monkeypatch):
+        monkeypatch.delitem(sys.modules, "colorsys", raising=False)
+
+        module = timed_import("colorsys")
+
+        assert module.rgb_to_hsv(1.0, 0.0, 0.0) == (0.0, 1.0, 1.0)
+        assert [name for name, _ in import_report()] == ["colorsys"]
+
+    def test_already_imported_module_is_not_recorded(self):
+        assert timed_import("os") is os
+        assert import_report() == []
+
+    def test_missing_module_raises(self):
+        with pytest.raises(ImportError):
+            timed_import("no_such_module_for_startup_timing")
+
+
+class TestReport:
+    """Tests for import_report and format_import_report"""
+
+    def test_slowest_first(self, monkeypatch):
+        monkeypatch.setattr(startup_timing, "IMPORT_TIMES", {"fast": 5.0, "slow": 900.0})
+
+        assert import_report() == [("slow", 900.0), ("fast", 5.0)]
+
+    def test_format(self):
+        assert format_import_report([("chromadb", 812.4), ("fitz", 120.0)]) == "chromadb: 812 ms\nfitz: 120 ms"
+
+    def test_format_empty(self):
+        assert format_import_report([]) == "No deferred imports yet"
+
+
+def test_helper_modules_defer_heavy_imports():
+    """Importing the modules both apps load at start-up leaves the slow packages unimported"""
+    heavy = ["langchain_anthropic", "langchain_ollama", "ollama", "langchain_chroma", "chromadb",
+             "langchain_community.document_loaders", "fitz"]
+    code = (
+        "import sys\n"
+        "import pdf_extraction, model_residency, retrieval, embedding_cache, ingestion, ingestion_jobs, "
+        "lexical_index, context_packing, answer_cache, unified_index, models_config\n"
+        "model_residency.ModelResidencyManager()\n"
+        f"print([name for name in {heavy!r} if name in sys.modules])"
+    )
+    output = subprocess.run([sys.executable, "-c", code], cwd=REPO_DIR, capture_output=True, text=True, check=True)
+
+    assert output.stdout.strip() == "[]"
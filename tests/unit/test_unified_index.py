@@ -0,0 +1,164 @@
+"""
+Unit tests for unified_index.py
+
+Tests the single-collection index helpers including:
+- Source metadata filters
+- Listing and counting documents in the shared collection
+- Filtered retrieval over selected documents
+- Migration of per-file collections
+"""
+import pytest
+from langchain_core.documents import Document
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+from unified_index import (
+    UNIFIED_COLLECTION_NAME,
+    source_filter,
+    create_filtered_retriever,
+    list_indexed_sources,
+    count_source_chunks,
+    delete_source,
+    legacy_collection_names,
+    legacy_source_name,
+    migrate_legacy_collections
+)
+from vector_backends import ChromaBackend
+
+
+@pytest.fixture
+def backend(tmp_path):
+    """Chroma backend on a temporary directory"""
+    return ChromaBackend(str(tmp_path / "chroma"))
+
+
+@pytest.fixture
+def embeddings():
+    return DeterministicFakeEmbedding(size=16)
+
+
+def make_docs(source, count):
+    return [Document(page_content=f"{source} chunk {i}", metadata={"source": source, "page": i}) for i in range(count)]
+
+
+@pytest.fixture
+def unified_store(backend, embeddings):
+    """Unified vectorstore holding three documents"""
+    store = backend.vectorstore(UNIFIED_COLLECTION_NAME, embeddings)
+    for source, count in [("manual.pdf", 4), ("my_file.pdf", 3), ("notes.md", 2)]:
+        store.add_documents(make_docs(source, count))
+    return store
+
+
+class TestSourceFilter:
+    """Tests for source_filter"""
+
+    def test_empty_selection(self):
+        assert source_filter([]) is None
+
+    def test_single_document(self):
+        assert source_filter(["a.pdf"]) == {"source": "a.pdf"}
+
+    def test_multiple_documents(self):
+        assert source_filter(["a.pdf", "b.md"]) == {"source": {"$in": ["a.pdf", "b.md"]}}
+
+    def test_duplicates_removed(self):
+        assert source_filter(["a.pdf", "a.pdf"]) == {"source": "a.pdf"}
+
+
+class TestUnifiedCollection:
+    """Tests for listing, counting and deleting documents"""
+
+    def test_lists_original_filenames(self, backend, unified_store):
+        """Test that filenames keep their underscores"""
+        sources = list_indexed_sources(backend)
+        assert sources == ["manual.pdf", "my_file.pdf", "notes.md"]
+
+    def test_counts_chunks_per_source(self, backend, unified_store):
+        assert count_source_chunks(backend, "manual.pdf") == 4
+        assert count_source_chunks(backend, "missing.pdf") == 0
+
+    def test_delete_source(self, backend, unified_store):
+        delete_source(backend, "notes.md")
+        assert list_indexed_sources(backend) == ["manual.pdf", "my_file.pdf"]
+
+    def test_missing_collection_is_empty(self, backend):
+        assert list_indexed_sources(backend) == []
+        assert count_source_chunks(backend, "manual.pdf") == 0
+
+
+class TestFilteredRetriever:
+    """Tests for create_filtered_retriever"""
+
+    def test_returns_none_without_selection(self, unified_store):
+        assert create_filtered_retriever(unified_store, [], k=5) is None
+
+    def test_only_selected_sources_returned(self, unified_store):
+        """Test that results come only from the selected documents"""
+        retriever = create_filtered_retriever(unified_store, ["manual.pdf", "notes.md"], k=10)
+
+        docs = retriever.invoke("chunk")
+
+        assert docs
+        assert {d.metadata["source"] for d in docs} <= {"manual.pdf", "notes.md"}
+
+    def test_single_source_selection(self, unified_store):
+        retriever = create_filtered_retriever(unified_store, ["my_file.pdf"], k=10)
+
+        docs = retriever.invoke("chunk")
+
+        assert len(docs) == 3
+        assert all(d.metadata["source"] == "my_file.pdf" for d in docs)
+
+
+class TestMigration:
+    """Tests for migrating per-file collections"""
+
+    @pytest.fixture
+    def legacy_backend(self, backend, embeddings):
+        backend.vectorstore("pdf_guide", embeddings).add_documents(make_docs("guide.pdf", 3))
+        backend.vectorstore("md_readme", embeddings).add_documents(make_docs("readme.md", 2))
+        # Chunk without source metadata falls back to the collection name
+        backend.upsert("pdf_old_file", ids=["1"], embeddings=[[0.0] * 16], documents=["orphan"],
+                       metadatas=[{"page": 0}])
+        backend.vectorstore("unrelated", embeddings)
+        return backend
+
+    def test_legacy_collection_names(self, legacy_backend):
+        assert sorted(legacy_collection_names(legacy_backend)) == ["md_readme", "pdf_guide", "pdf_old_file"]
+
+    def test_legacy_source_name(self):
+        assert legacy_source_name("pdf_old_file") == "old file.pdf"
+        assert legacy_source_name("md_notes") == "notes.md"
+        assert legacy_source_name("other") == "other"
+
+    def test_migrates_chunks_and_embeddings(self, legacy_backend):
+        """Test that chunks are copied with their stored embeddings"""
+        original = legacy_backend.get("pdf_guide", include_embeddings=True)
+
+        result = migrate_legacy_collections(legacy_backend, batch_size=2)
+
+        assert result == {"pdf_guide": 3, "md_readme": 2, "pdf_old_file": 1}
+        assert legacy_backend.count(UNIFIED_COLLECTION_NAME) == 6
+        copied = legacy_backend.get(UNIFIED_COLLECTION_NAME, ids=[f"pdf_guide:{chunk['id']}" for chunk in original],
+                                    include_embeddings=True)
+        assert {chunk["id"]: list(chunk["embedding"]) for chunk in copied} == {
+            f"pdf_guide:{chunk['id']}": list(chunk["embedding"]) for chunk in original
+        }
+        assert sorted(list_indexed_sources(legacy_backend)) == ["guide.pdf", "old file.pdf", "readme.md"]
+
+    def test_deletes_legacy_collections(self, legacy_backend):
+        migrate_legacy_collections(legacy_backend)
+
+        assert legacy_backend.collection_names() == sorted([UNIFIED_COLLECTION_NAME, "unrelated"])
+
+    def test_keep_legacy_collections(self, legacy_backend):
+        migrate_legacy_collections(legacy_backend, delete_legacy=False)
+
+        assert len(legacy_collection_names(legacy_backend)) == 3
+
+    def test_migration_is_idempotent(self, legacy_backend):
+        """Test that re-running a kept migration does not duplicate chunks"""
+        migrate_legacy_collections(legacy_backend, delete_legacy=False)
+        migrate_legacy_collections(legacy_backend, delete_legacy=False)
+
+        assert legacy_backend.count(UNIFIED_COLLECTION_NAME) == 6
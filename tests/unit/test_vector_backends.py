@@ -0,0 +1,246 @@
+"""
+Unit tests for vector_backends.py
+
+Runs the same conformance checks against every registered backend:
+- Adding, replacing, updating, reading, counting and deleting chunks
+- Queries with and without filters against a brute-force ranking
+- Dropping and listing collections
+- Vectorstores and reopening the persist directory
+- Backend selection by name
+"""
+import numpy as np
+import pytest
+from langchain_core.documents import Document
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+from unified_index import source_filter
+from vector_backends import (
+    BACKENDS, ChromaBackend, FlatBackend, VectorBackend, get_backend_class, default_persist_directory, open_backend
+)
+
+
+@pytest.fixture(params=sorted(BACKENDS))
+def backend_name(request):
+    return request.param
+
+
+@pytest.fixture
+def backend(backend_name, tmp_path):
+    return open_backend(backend_name, str(tmp_path / backend_name))
+
+
+def make_chunks(count, dimension=16, seed=0):
+    rng = np.random.default_rng(seed)
+    vectors = rng.normal(size=(count, dimension))
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    ids = [f"chunk-{i}" for i in range(count)]
+    documents = [f"text {i}" for i in range(count)]
+    metadatas = [{"source": f"doc_{i % 3}.pdf", "page": i} for i in range(count)]
+    return ids, vectors, documents, metadatas
+
+
+def brute_force(vectors, metadatas, query, k, sources=None):
+    scores = vectors @ query
+    order = [i for i in np.argsort(-scores) if sources is None or metadatas[i]["source"] in sources]
+    return [f"chunk-{i}" for i in order[:k]]
+
+
+class TestWrites:
+    """Tests for adding, replacing and deleting chunks"""
+
+    def test_upsert_and_count(self, backend):
+        ids, vectors, documents, metadatas = make_chunks(12)
+        backend.upsert("docs", ids, vectors, documents, metadatas)
+
+        assert backend.count("docs") == 12
+        assert backend.count("docs", where=source_filter(["doc_0.pdf"])) == 4
+
+    def test_upsert_replaces_same_id(self, backend):
+        ids, vectors, documents, metadatas = make_chunks(3)
+        backend.upsert("docs", ids, vectors, documents, metadatas)
+        backend.upsert("docs", ids[:1], vectors[2:3], ["revised"], [{"source": "doc_9.pdf", "page": 0}])
+
+        assert backend.count("docs") == 3
+        top = backend.query("docs", vectors[2], 2)
+        assert {hit["id"] for hit in top} == {"chunk-0", "chunk-2"}
+        assert [hit for hit in top if hit["id"] == "chunk-0"][0]["document"] == "revised"
+
+    def test_delete_by_ids_and_where(self, backend):
+        ids, vectors, documents, metadatas = make_chunks(9)
+        backend.upsert("docs", ids, vectors, documents, metadatas)
+
+        backend.delete("docs", ids=["chunk-0", "chunk-1"])
+        backend.delete("docs", where=source_filter(["doc_2.pdf"]))
+
+        assert backend.count("docs") == 4
+        assert backend.count("docs", where=source_filter(["doc_2.pdf"])) == 0
+
+    def test_delete_everything(self, backend):
+        ids, vectors, documents, metadatas = make_chunks(5)
+        backend.upsert("docs", ids, vectors, documents, metadatas)
+
+        backend.delete("docs")
+
+        assert backend.count("docs") == 0
+        assert backend.collection_names() == ["docs"]
+
+    def test_update_replaces_metadata(self, backend):
+        ids, vectors, documents, metadatas = make_chunks(3)
+        backend.upsert("docs", ids, vectors, documents, metadatas)
+
+        backend.update("docs", ids=["chunk-1"], metadatas=[{"source": "doc_1.pdf", "page": 7}])
+
+        assert backend.get("docs", ids=["chunk-1"])[0]["metadata"] == {"source": "doc_1.pdf", "page": 7}
+        assert backend.get("docs", ids=["chunk-1"])[0]["document"] == "text 1"
+
+    def test_get_pages_through_chunks(self, backend):
+        ids, vectors, documents, metadatas = make_chunks(7)
+        backend.upsert("docs", ids, vectors, documents, metadatas)
+
+        pages = [backend.get("docs", limit=3, offset=offset) for offset in (0, 3, 6, 9)]
+
+        assert [len(page) for page in pages] == [3, 3, 1, 0]
+        assert sorted(chunk["id"] for page in pages for chunk in page) == sorted(ids)
+        assert {chunk["document"] for chunk in backend.get("docs", where=source_filter(["doc_0.pdf"]))} == {
+            "text 0", "text 3", "text 6"
+        }
+
+    def test_get_ids(self, backend):
+        ids, vectors, documents, metadatas = make_chunks(6)
+        backend.upsert("docs", ids, vectors, documents, metadatas)
+
+        assert sorted(backend.get_ids("docs", ids=["chunk-1", "chunk-9"])) == ["chunk-1"]
+        assert sorted(backend.get_ids("docs", where=source_filter(["doc_2.pdf"]))) == ["chunk-2", "chunk-5"]
+        assert backend.get_ids("docs", ids=[]) == []
+
+    def test_embeddings_are_returned_on_request(self, backend):
+        ids, vectors, documents, metadatas = make_chunks(4)
+        backend.upsert("docs", ids, vectors, documents, metadatas)
+
+        stored = backend.get("docs", ids=["chunk-2"], include_embeddings=True)[0]
+        hit = backend.query("docs", vectors[2], 1, include_embeddings=True)[0]
+
+        assert np.asarray(stored["embedding"]) == pytest.approx(vectors[2], abs=1e-6)
+        assert np.asarray(hit["embedding"]) == pytest.approx(vectors[2], abs=1e-6)
+        assert "embedding" not in backend.get("docs", ids=["chunk-2"])[0]
+
+    def test_missing_collection_is_empty(self, backend):
+        backend.delete("missing", ids=["chunk-0"])
+        backend.update("missing", ids=["chunk-0"], metadatas=[{"page": 1}])
+
+        assert backend.count("missing") == 0
+        assert backend.query("missing", np.ones(16), 3) == []
+        assert backend.get("missing") == []
+        assert backend.get_ids("missing", ids=["chunk-0"]) == []
+        assert backend.collection_names() == []
+
+    def test_operations_do_not_list_collections(self, backend, monkeypatch):
+        """Test that one collection is looked up by name, not found among all of them"""
+        ids, vectors, documents, metadatas = make_chunks(3)
+        backend.upsert("docs", ids, vectors, documents, metadatas)
+
+        def list_collections():
+            raise AssertionError("every collection was listed")
+        monkeypatch.setattr(backend.client, "list_collections", list_collections)
+
+        assert backend.count("docs") == 3
+        assert backend.count("missing") == 0
+        assert len(backend.query("docs", vectors[0], 2)) == 2
+
+
+class TestQuery:
+    """Tests for nearest-chunk queries"""
+
+    def test_matches_brute_force(self, backend):
+        ids, vectors, documents, metadatas = make_chunks(60)
+        backend.upsert("docs", ids, vectors, documents, metadatas)
+        query = make_chunks(1, seed=7)[1][0]
+
+        hits = backend.query("docs", query, 5)
+
+        assert [hit["id"] for hit in hits] == brute_force(vectors, metadatas, query, 5)
+        assert [hit["distance"] for hit in hits] == sorted(hit["distance"] for hit in hits)
+        assert hits[0]["metadata"]["source"].startswith("doc_")
+
+    def test_filter_matches_brute_force(self, backend):
+        ids, vectors, documents, metadatas = make_chunks(60)
+        backend.upsert("docs", ids, vectors, documents, metadatas)
+        query = make_chunks(1, seed=7)[1][0]
+        sources = ["doc_0.pdf", "doc_2.pdf"]
+
+        hits = backend.query("docs", query, 5, where=source_filter(sources))
+
+        assert [hit["id"] for hit in hits] == brute_force(vectors, metadatas, query, 5, sources)
+
+    def test_distances_agree_across_backends(self, tmp_path):
+        ids, vectors, documents, metadatas = make_chunks(20)
+        query = make_chunks(1, seed=3)[1][0]
+        distances = []
+        for name in sorted(BACKENDS):
+            backend = open_backend(name, str(tmp_path / name))
+            backend.upsert("docs", ids, vectors, documents, metadatas)
+            distances.append([hit["distance"] for hit in backend.query("docs", query, 4)])
+
+        for other in distances[1:]:
+            assert other == pytest.approx(distances[0], abs=1e-4)
+
+
+class TestCollections:
+    """Tests for listing, dropping and reopening collections"""
+
+    def test_drop(self, backend):
+        ids, vectors, documents, metadatas = make_chunks(4)
+        backend.upsert("first", ids, vectors, documents, metadatas)
+        backend.upsert("second", ids, vectors, documents, metadatas)
+
+        backend.drop("first")
+
+        assert backend.collection_names() == ["second"]
+        assert backend.count("first") == 0
+
+    def test_drop_missing_raises(self, backend):
+        with pytest.raises(Exception):
+            backend.drop("missing")
+
+    def test_vectorstore_sees_upserted_chunks(self, backend):
+        ids, vectors, documents, metadatas = make_chunks(4, dimension=8)
+        backend.upsert("docs", ids, vectors, documents, metadatas)
+        vectorstore = backend.vectorstore("docs", DeterministicFakeEmbedding(size=8))
+
+        vectorstore.add_documents([Document(page_content="Prime the pump.", metadata={"source": "doc_0.pdf"})])
+
+        assert backend.count("docs") == 5
+        assert len(vectorstore.similarity_search("pump", k=2, filter=source_filter(["doc_0.pdf"]))) == 2
+
+    def test_reopen_persist_directory(self, backend_name, tmp_path):
+        ids, vectors, documents, metadatas = make_chunks(6)
+        open_backend(backend_name, str(tmp_path)).upsert("docs", ids, vectors, documents, metadatas)
+
+        reopened = open_backend(backend_name, str(tmp_path))
+
+        assert reopened.count("docs") == 6
+        assert reopened.disk_bytes() > 0
+
+
+class TestSelection:
+    """Tests for choosing a backend by name"""
+
+    def test_backends_by_name(self):
+        assert get_backend_class("chroma") is ChromaBackend
+        assert get_backend_class("flat") is FlatBackend
+
+    def test_unknown_backend(self):
+        with pytest.raises(ValueError, match="Unknown vector backend"):
+            get_backend_class("faiss")
+
+    def test_default_persist_directory(self):
+        assert default_persist_directory("chroma") == "./chroma_db"
+        assert default_persist_directory("flat", "_timeseries") == "./flat_index_timeseries"
+
+    def test_incomplete_backend_fails_on_construction(self, tmp_path):
+        class NoVectorstore(VectorBackend):
+            def open_client(self):
+                return None
+
+        with pytest.raises(TypeError):
+            NoVectorstore(str(tmp_path))
@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""
+Single-collection document index for the Document Q&A app
+All chunks live in one collection tagged with their ``source`` filename,
+so selecting documents becomes a metadata filter on a single ANN query instead
+of one search per per-file collection.
+
+Run as a script to migrate existing per-file collections:
+    python unified_index.py --persist-dir ./chroma_db
+"""
+
+import argparse
+from typing import Dict, List, Optional
+
+# Name of the shared collection holding every document's chunks
+UNIFIED_COLLECTION_NAME = "documents"
+
+# Collection prefixes used by the per-file index layout
+LEGACY_PREFIXES = {"pdf_": ".pdf", "md_": ".md"}
+
+# Number of chunks copied per request during migration
+MIGRATION_BATCH_SIZE = 500
+
+
+def source_filter(selected_names: List[str]) -> Optional[Dict]:
+    """
+    Build a ``where`` filter restricting results to the selected documents.
+
+    Args:
+        selected_names: Original filenames stored in the ``source`` metadata
+
+    Returns:
+        Where clause for the vector backend, or None when nothing is selected
+    """
+    names = list(dict.fromkeys(selected_names))
+    if not names:
+        return None
+    if len(names) == 1:
+        return {"source": names[0]}
+    return {"source": {"$in": names}}
+
+
+def create_filtered_retriever(vectorstore, selected_names: List[str], k: int, fetch_k: Optional[int] = None):
+    """
+    Create an MMR retriever over the unified collection limited to the selected documents.
+
+    Args:
+        vectorstore: Chroma vectorstore wrapping the unified collection
+        selected_names: Filenames to search in
+        k: Number of chunks to return
+        fetch_k: Number of MMR candidates (defaults to 2 * k)
+
+    Returns:
+        Retriever running a single filtered search, or None when nothing is selected
+    """
+    where = source_filter(selected_names)
+    if where is None:
+        return None
+    return vectorstore.as_retriever(
+        search_type="mmr",
+        search_kwargs={"k": k, "fetch_k": fetch_k or k * 2, "filter": where}
+    )
+
+
+def list_indexed_sources(backend, collection_name: str = UNIFIED_COLLECTION_NAME) -> List[str]:
+    """Return the distinct ``source`` filenames in the unified collection, in insertion order"""
+    sources = {}
+    for chunk in backend.get(collection_name):
+        if chunk["metadata"].get("source"):
+            sources[chunk["metadata"]["source"]] = True
+    return list(sources)
+
+
+def count_source_chunks(backend, source: str, collection_name: str = UNIFIED_COLLECTION_NAME) -> int:
+    """Return the number of chunks stored for one document"""
+    return backend.count(collection_name, where={"source": source})
+
+
+def delete_source(backend, source: str, collection_name: str = UNIFIED_COLLECTION_NAME) -> None:
+    """Remove every chunk belonging to one document"""
+    backend.delete(collection_name, where={"source": source})
+
+
+def legacy_collection_names(backend) -> List[str]:
+    """Return the names of per-file (``pdf_``/``md_``) collections"""
+    return [name for name in backend.collection_names() if name.startswith(tuple(LEGACY_PREFIXES))]
+
+
+def legacy_source_name(collection_name: str) -> str:
+    """
+    Best-effort filename for a per-file collection.
+
+    Only used for chunks missing ``source`` metadata, since the collection
+    name replaced spaces and dots with underscores.
+    """
+    for prefix, extension in LEGACY_PREFIXES.items():
+        if collection_name.startswith(prefix):
+            return collection_name[len(prefix):].replace("_", " ") + extension
+    return collection_name
+
+
+def migrate_legacy_collections(backend, target_name: str = UNIFIED_COLLECTION_NAME,
+                               delete_legacy: bool = True,
+                               batch_size: int = MIGRATION_BATCH_SIZE) -> Dict[str, int]:
+    """
+    Copy per-file collections into the unified collection.
+
+    Stored embeddings are copied as-is, so migration never calls the embedding
+    model. Chunk ids are prefixed with the old collection name to stay unique.
+
+    Args:
+        backend: VectorBackend holding the collections
+        target_name: Name of the unified collection
+        delete_legacy: Drop each per-file collection once it has been copied
+        batch_size: Number of chunks read and written per request
+
+    Returns:
+        Dictionary mapping each migrated collection name to its chunk count
+    """
+    migrated = {}
+
+    for name in legacy_collection_names(backend):
+        fallback_source = legacy_source_name(name)
+        copied = 0
+
+        while True:
+            batch = backend.get(name, limit=batch_size, offset=copied, include_embeddings=True)
+            if not batch:
+                break
+
+            backend.upsert(
+                target_name,
+                ids=[f"{name}:{chunk['id']}" for chunk in batch],
+                embeddings=[chunk["embedding"] for chunk in batch],
+                documents=[chunk["document"] for chunk in batch],
+                metadatas=[{"source": fallback_source, **chunk["metadata"]} for chunk in batch]
+            )
+            copied += len(batch)
+
+        migrated[name] = copied
+        if delete_legacy:
+            backend.drop(name)
+
+    return migrated
+
+
+if __name__ == "__main__":
+    from vector_backends import BACKENDS, default_persist_directory, open_backend
+
+    parser = argparse.ArgumentParser(description="Migrate per-file collections into the unified collection")
+    parser.add_argument("--backend", default="chroma", choices=list(BACKENDS), help="Vector backend")
+    parser.add_argument("--persist-dir", help="Persistent directory (default: the backend's, e.g. ./chroma_db)")
+    parser.add_argument("--keep-legacy", action="store_true", help="Keep the per-file collections after copying")
+    args = parser.parse_args()
+
+    backend = open_backend(args.backend, args.persist_dir or default_persist_directory(args.backend))
+    results = migrate_legacy_collections(backend, delete_legacy=not args.keep_legacy)
+    for collection_name, count in results.items():
+        print(f"✓ {collection_name}: {count} chunks")
+    print(f"✓ Migrated {len(results)} collections into '{UNIFIED_COLLECTION_NAME}'")
@@ -0,0 +1,255 @@
+"""
+Vector store backends for both apps
+The apps used to build ``langchain_chroma.Chroma`` vectorstores directly in
+every place that stores or loads chunks. A VectorBackend owns the client of
+one persist directory and is the single place where collections are opened,
+read, written, searched, counted and dropped, so the store is chosen by
+configuration (``VECTOR_BACKEND``):
+
+- ``chroma``: Chroma's persistent client and HNSW index
+- ``flat``: the memory-mapped exact index in flat_index.py
+
+Backend modules are imported when a backend is opened, not when this module
+is imported, so an empty app still starts without loading Chroma.
+"""
+
+import os
+from abc import ABC, abstractmethod
+from typing import Dict, List, Optional, Tuple, Type
+
+from startup_timing import timed_import
+
+# Collection langchain_chroma uses when no name is given (the Time-Series app's collection)
+DEFAULT_COLLECTION_NAME = "langchain"
+
+
+class VectorBackend(ABC):
+    """
+    Named collections of embedded chunks in a persist directory.
+
+    Subclasses open the client and name the LangChain vectorstore class; the
+    collection operations only use the Chroma collection API, which both
+    clients implement. Embeddings are passed in already computed.
+    """
+
+    # Configuration name and the default persist directory of the Document Q&A app
+    name = ""
+    directory = ""
+
+    def __init__(self, persist_directory: str):
+        """
+        Args:
+            persist_directory: Directory the backend stores its collections in
+        """
+        self.persist_directory = persist_directory
+        self.client = self.open_client()
+
+    @abstractmethod
+    def open_client(self):
+        """Open the client for the persist directory"""
+
+    @abstractmethod
+    def vectorstore_class(self):
+        """LangChain vectorstore class wrapping the client's collections"""
+
+    def vectorstore(self, collection_name: str, embeddings):
+        """LangChain vectorstore for a collection, creating the collection if needed"""
+        return self.vectorstore_class()(
+            collection_name=collection_name,
+            embedding_function=embeddings,
+            persist_directory=self.persist_directory,
+            client=self.client
+        )
+
+    def collection_names(self) -> List[str]:
+        """Names of every collection in the persist directory"""
+        return sorted(collection.name for collection in self.client.list_collections())
+
+    def missing_collection_errors(self) -> Tuple[Type[Exception], ...]:
+        """Exceptions the client's get_collection raises for a collection that does not exist"""
+        return (ValueError,)
+
+    def _collection(self, collection_name: str, create: bool = False):
+        if create:
+            return self.client.get_or_create_collection(name=collection_name, embedding_function=None)
+        # One lookup by name, listing every collection would cost O(collections) per operation
+        try:
+            return self.client.get_collection(name=collection_name)
+        except self.missing_collection_errors():
+            return None
+
+    def upsert(self, collection_name: str, ids: List[str], embeddings, documents: List[str],
+               metadatas: List[dict]):
+        """Add chunks to a collection, replacing chunks with the same ids"""
+        self._collection(collection_name, create=True).upsert(
+            ids=ids, embeddings=embeddings, documents=documents, metadatas=metadatas
+        )
+
+    add = upsert
+
+    def update(self, collection_name: str, ids: List[str], metadatas: List[dict]):
+        """Replace the metadata of stored chunks, keys set to None are removed"""
+        collection = self._collection(collection_name)
+        if collection is not None and ids:
+            collection.update(ids=ids, metadatas=metadatas)
+
+    def delete(self, collection_name: str, ids: Optional[List[str]] = None, where: Optional[dict] = None):
+        """Delete chunks by id or ``where`` filter, or every chunk when neither is given"""
+        collection = self._collection(collection_name)
+        if collection is None:
+            return
+        if ids is None and where is None:
+            ids = collection.get(include=[])["ids"]
+            if not ids:
+                return
+        collection.delete(ids=ids, where=where)
+
+    def get(self, collection_name: str, ids: Optional[List[str]] = None, where: Optional[dict] = None,
+            limit: Optional[int] = None, offset: int = 0, include_embeddings: bool = False) -> List[Dict]:
+        """
+        Stored chunks by id or ``where`` filter, or every chunk, in storage order.
+
+        Args:
+            collection_name: Collection to read
+            ids: Only these chunks
+            where: Only chunks whose metadata match the filter
+            limit: Maximum number of chunks, for reading a collection page by page
+            offset: Number of matching chunks skipped
+            include_embeddings: Also return each chunk's stored embedding
+
+        Returns:
+            Dicts with the chunk's id, document and metadata (and embedding)
+        """
+        collection = self._collection(collection_name)
+        if collection is None:
+            return []
+        include = ["documents", "metadatas"] + (["embeddings"] if include_embeddings else [])
+        result = collection.get(ids=ids, where=where, limit=limit, offset=offset, include=include)
+        chunks = [
+            {"id": chunk_id, "document": document or "", "metadata": metadata or {}}
+            for chunk_id, document, metadata in zip(result["ids"], result["documents"], result["metadatas"])
+        ]
+        if include_embeddings:
+            for chunk, embedding in zip(chunks, result["embeddings"]):
+                chunk["embedding"] = embedding
+        return chunks
+
+    def get_ids(self, collection_name: str, ids: Optional[List[str]] = None, where: Optional[dict] = None) -> List[str]:
+        """Ids of the stored chunks among ``ids``, or of those matching a ``where`` filter"""
+        if ids is not None and not ids:
+            return []
+        collection = self._collection(collection_name)
+        if collection is None:
+            return []
+        return collection.get(ids=ids, where=where, include=[])["ids"]
+
+    def query(self, collection_name: str, embedding, k: int, where: Optional[dict] = None,
+              include_embeddings: bool = False) -> List[Dict]:
+        """
+        Closest chunks to an embedding, best first.
+
+        Args:
+            include_embeddings: Also return each chunk's stored embedding, e.g. for MMR
+
+        Returns:
+            Dicts with the chunk's id, document, metadata and distance (and embedding)
+        """
+        collection = self._collection(collection_name)
+        if collection is None:
+            return []
+        include = ["documents", "metadatas", "distances"] + (["embeddings"] if include_embeddings else [])
+        result = collection.query(query_embeddings=[embedding], n_results=k, where=where, include=include)
+        chunks = [
+            {"id": chunk_id, "document": document or "", "metadata": metadata or {}, "distance": distance}
+            for chunk_id, document, metadata, distance in zip(
+                result["ids"][0], result["documents"][0], result["metadatas"][0], result["distances"][0]
+            )
+        ]
+        if include_embeddings:
+            for chunk, chunk_embedding in zip(chunks, result["embeddings"][0]):
+                chunk["embedding"] = chunk_embedding
+        return chunks
+
+    def count(self, collection_name: str, where: Optional[dict] = None) -> int:
+        """Number of chunks in a collection, or of those matching a ``where`` filter"""
+        if where is not None:
+            return len(self.get_ids(collection_name, where=where))
+        collection = self._collection(collection_name)
+        return 0 if collection is None else collection.count()
+
+    def drop(self, collection_name: str):
+        """Delete a collection and its chunks, the client raises if it does not exist"""
+        self.client.delete_collection(name=collection_name)
+
+    def disk_bytes(self) -> int:
+        """Size of the persist directory's files"""
+        total = 0
+        for root, _, files in os.walk(self.persist_directory):
+            for name in files:
+                try:
+                    total += os.path.getsize(os.path.join(root, name))
+                except OSError:
+                    pass
+        return total
+
+
+class ChromaBackend(VectorBackend):
+    """Chroma's persistent client with langchain_chroma vectorstores"""
+
+    name = "chroma"
+    directory = "chroma_db"
+
+    def open_client(self):
+        chromadb = timed_import("chromadb")
+        return chromadb.PersistentClient(
+            path=self.persist_directory,
+            settings=chromadb.Settings(
+                allow_reset=True,
+                anonymized_telemetry=False
+            )
+        )
+
+    def vectorstore_class(self):
+        return timed_import("langchain_chroma").Chroma
+
+    def missing_collection_errors(self):
+        # Chroma 1.x raises NotFoundError, earlier versions ValueError or InvalidCollectionException
+        errors = timed_import("chromadb.errors")
+        return (ValueError,) + tuple(
+            getattr(errors, name) for name in ("NotFoundError", "InvalidCollectionException") if hasattr(errors, name)
+        )
+
+
+class FlatBackend(VectorBackend):
+    """Memory-mapped flat index with exact search (see flat_index.py)"""
+
+    name = "flat"
+    directory = "flat_index"
+
+    def open_client(self):
+        return timed_import("flat_index").FlatClient(self.persist_directory)
+
+    def vectorstore_class(self):
+        return timed_import("flat_index").FlatVectorStore
+
+
+# Backends by configuration name
+BACKENDS: Dict[str, Type[VectorBackend]] = {backend.name: backend for backend in (ChromaBackend, FlatBackend)}
+
+
+def get_backend_class(name: str) -> Type[VectorBackend]:
+    """Backend class for a ``VECTOR_BACKEND`` value"""
+    try:
+        return BACKENDS[name]
+    except KeyError:
+        raise ValueError(f"Unknown vector backend: {name!r} (expected one of {', '.join(BACKENDS)})") from None
+
+
+def default_persist_directory(name: str, suffix: str = "") -> str:
+    """Default persist directory of a backend, e.g. ./chroma_db or ./flat_index_timeseries"""
+    return f"./{get_backend_class(name).directory}{suffix}"
+
+
+def open_backend(name: str, persist_directory: str) -> VectorBackend:
+    """Open the backend for a ``VECTOR_BACKEND`` value in a persist directory"""
+    return get_backend_class(name)(persist_directory)